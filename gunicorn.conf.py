@@ -17,6 +17,8 @@ def get_workers():
     return min(3, max(1, multiprocessing.cpu_count() // 2))  # 較保守的設定
 
 workers = get_workers()
+# 讓應用程式依 worker 數量分配資料庫連線池（見 src/database/engine.py）
+os.environ['GUNICORN_WORKERS'] = str(workers)
 worker_class = "sync"  # 使用 sync 避免額外依賴
 worker_connections = 1000
 
@@ -33,6 +35,10 @@ max_requests_jitter = 100
 # Cloud Run 建議使用 preload_app=True 以減少啟動時間
 preload_app = True
 
+# preload 時 app 在 master 建立，常駐連線（Discord gateway）延到 worker fork 後才啟動
+if preload_app:
+    os.environ['DEFER_PLATFORM_GATEWAYS'] = 'true'
+
 # 日誌配置
 accesslog = "-"
 errorlog = "-"
@@ -64,6 +70,10 @@ def worker_int(worker):
 # 監控設置
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # 各 worker 競爭 gateway 檔案鎖，只有一個 worker 登入 Discord bot
+    os.environ.pop('DEFER_PLATFORM_GATEWAYS', None)
+    from src.platforms.base import get_platform_manager
+    get_platform_manager().start_gateways()
 
 def pre_fork(server, worker):
     server.log.info("Worker about to fork (pid: %s)", worker.pid)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+冷啟動基準測試腳本
+重複啟動應用程式，量測從進程啟動到 /health 第一次回應的時間（time-to-first-response），
+用來追蹤延遲匯入與延遲初始化的效果，並在 CI 中偵測啟動時間退化
+
+使用方式:
+    python scripts/benchmark_startup.py --runs 5
+    python scripts/benchmark_startup.py --command "gunicorn -c gunicorn.conf.py main:application" --port 8080
+"""
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# 專案根目錄
+project_root = Path(__file__).parent.parent
+
+# 預設以 Flask 內建伺服器啟動（不啟用 reloader，避免多一個子進程）
+DEFAULT_COMMAND = (
+    f"{shlex.quote(sys.executable)} -c "
+    "\"import os; from main import application; "
+    "application.run(host='127.0.0.1', port=int(os.environ['PORT']), use_reloader=False)\""
+)
+
+
+def wait_for_first_response(url: str, process: subprocess.Popen, timeout: float) -> float:
+    """輪詢 URL 直到取得任何 HTTP 回應，返回所花秒數"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"服務在回應前結束（exit code {process.returncode}）")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return time.perf_counter() - start
+        except urllib.error.HTTPError:
+            # 503 等錯誤狀態也代表服務已可處理請求
+            return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.02)
+    raise TimeoutError(f"{timeout} 秒內沒有回應: {url}")
+
+
+def run_once(command: str, port: int, path: str, timeout: float) -> float:
+    env = dict(os.environ, PORT=str(port))
+    env.setdefault('LOG_FILE', os.devnull)
+    process = subprocess.Popen(
+        command, shell=True, cwd=project_root, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        return wait_for_first_response(f"http://127.0.0.1:{port}{path}", process, timeout)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='量測應用程式冷啟動到第一次回應的時間')
+    parser.add_argument('--command', default=DEFAULT_COMMAND, help='啟動服務的指令（可使用 $PORT 環境變數）')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8099)), help='服務埠號（預設 8099）')
+    parser.add_argument('--path', default='/health', help='第一次請求的路徑（預設 /health）')
+    parser.add_argument('--runs', type=int, default=5, help='重複次數（預設 5）')
+    parser.add_argument('--timeout', type=float, default=60.0, help='單次等待上限秒數（預設 60）')
+    parser.add_argument('--max-median', type=float, help='中位數超過此秒數時以非零狀態結束（供 CI 使用）')
+    args = parser.parse_args()
+
+    print(f"🚀 {args.command}")
+    durations = []
+    for i in range(1, args.runs + 1):
+        elapsed = run_once(args.command, args.port, args.path, args.timeout)
+        durations.append(elapsed)
+        print(f"  run {i}: {elapsed * 1000:.0f} ms")
+
+    median = statistics.median(durations)
+    print(f"\n📊 time-to-first-response: median {median * 1000:.0f} ms, "
+          f"min {min(durations) * 1000:.0f} ms, max {max(durations) * 1000:.0f} ms")
+
+    if args.max_median is not None and median > args.max_median:
+        print(f"❌ 中位數超過門檻 {args.max_median:.2f} 秒")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+匯入時間分析腳本
+以 python -X importtime 匯入指定模組，列出累計與自身耗時最高的模組，
+用來找出拖慢冷啟動的匯入（例如未啟用平台或模型提供商的 SDK）
+
+使用方式:
+    python scripts/import_profile.py                 # 分析 src.app
+    python scripts/import_profile.py main --top 30   # 分析 WSGI 入口
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# 專案根目錄
+project_root = Path(__file__).parent.parent
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def profile_imports(module: str) -> list:
+    """
+    在新的 Python 進程中匯入模組並解析 -X importtime 輸出
+
+    Returns:
+        list: (模組名稱, 自身耗時 μs, 累計耗時 μs, 巢狀深度) 列表
+    """
+    env = dict(os.environ)
+    env.setdefault('LOG_FILE', os.devnull)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"❌ 匯入 {module} 失敗")
+
+    records = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def print_table(title: str, records: list, key: int, top: int) -> None:
+    print(f"\n{title}")
+    print(f"{'cumulative(ms)':>15} {'self(ms)':>10}  module")
+    for name, self_us, cumulative_us, _ in sorted(records, key=lambda r: r[key], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>10.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析模組匯入耗時')
+    parser.add_argument('module', nargs='?', default='src.app', help='要分析的模組（預設 src.app）')
+    parser.add_argument('--top', type=int, default=20, help='列出前幾名（預設 20）')
+    args = parser.parse_args()
+
+    records = profile_imports(args.module)
+    total = next((r[2] for r in records if r[0] == args.module), 0)
+
+    print(f"📦 import {args.module}: {total / 1000:.1f} ms（{len(records)} 個模組）")
+    # 只列第一層的第三方套件，方便看出哪個依賴最重
+    top_level = [r for r in records if r[3] <= 1]
+    print_table("🔝 第一層匯入（依累計耗時）", top_level, 2, args.top)
+    print_table("🐢 自身耗時最高的模組", records, 1, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@
 使用新的平台架構和設計模式
 """
 import atexit
+from functools import partial
 from flask import Flask, request, abort, jsonify, render_template
 from typing import Dict, Any
 
@@ -13,12 +14,18 @@ logger = get_logger(__name__)
 from .core.security import init_security, InputValidator, require_json_input
 from .core.auth import init_test_auth_with_config, get_auth_status_info, require_test_auth, init_test_auth
 from .core.error_handler import ErrorHandler
+from .core.http_pool import get_http_registry
+from .core.media_fetch import configure_media_fetcher, get_media_fetcher
+from .core.async_runtime import get_async_runtime
 
 # 模型和服務
 from .models.factory import ModelFactory
 from .database.connection import Database
 from .services.chat import ChatService
 from .services.audio import AudioService
+from .services.reply_worker import ReplyWorkerPool
+from .services.delivery import DeliveryScheduler
+from .services.conversation import ORMConversationManager
 
 # 平台架構
 from .platforms.factory import get_platform_factory, get_config_validator
@@ -45,6 +52,8 @@ class MultiPlatformChatBot:
         self.database = None
         self.model = None
         self.chat_service = None
+        self.reply_worker_pool = None
+        self.delivery_scheduler = None
         
         # 平台管理
         self.platform_factory = get_platform_factory()
@@ -90,16 +99,20 @@ class MultiPlatformChatBot:
             # 5. 初始化核心聊天服務
             self._initialize_core_service()
             
-            # 6. 初始化平台處理器
+            # 6. 初始化背景回覆工作池（可選）與回覆發送排程
+            self._initialize_reply_workers()
+            self._initialize_delivery()
+            
+            # 7. 初始化平台處理器
             self._initialize_platforms()
             
-            # 7. 註冊路由
+            # 8. 註冊路由
             self._register_routes()
             
-            # 8. 初始化記憶體監控
+            # 9. 初始化記憶體監控
             self._initialize_memory_monitoring()
             
-            # 9. 註冊清理函數
+            # 10. 註冊清理函數
             self._register_cleanup()
             
             logger.info("Multi-platform chat bot initialized successfully")
@@ -168,10 +181,43 @@ class MultiPlatformChatBot:
         
         logger.info("Core chat service and audio service initialized successfully")
     
+    def _initialize_reply_workers(self):
+        """初始化背景回覆工作池 - 啟用後 webhook 解析完即回應 200 OK"""
+        worker_config = self.config.get('reply_worker', {})
+        if not worker_config.get('enabled', False):
+            logger.info("Reply worker pool disabled, webhooks are processed inline")
+            return
+        
+        self.reply_worker_pool = ReplyWorkerPool(
+            num_workers=worker_config.get('workers', 4),
+            max_queue_size=worker_config.get('max_queue_size', 100),
+            shutdown_timeout=worker_config.get('shutdown_timeout', 30)
+        )
+        logger.info("Reply worker pool initialized, webhooks will be acknowledged before processing")
+    
+    def _initialize_delivery(self):
+        """初始化回覆發送排程 - 依平台速率上限發送並重試暫時失敗"""
+        delivery_config = self.config.get('delivery', {})
+        if not delivery_config.get('enabled', True):
+            logger.info("Delivery scheduler disabled, responses are sent immediately")
+            return
+        
+        self.delivery_scheduler = DeliveryScheduler(
+            limits=delivery_config.get('limits'),
+            max_retries=delivery_config.get('max_retries', 3),
+            max_wait=delivery_config.get('max_wait', 30),
+            base_backoff=delivery_config.get('base_backoff', 1),
+            max_backoff=delivery_config.get('max_backoff', 30)
+        )
+        logger.info("Delivery scheduler initialized with per-platform rate limits")
+    
     def _initialize_platforms(self):
         """初始化平台處理器"""
         logger.info("Initializing platform handlers...")
         
+        # 語音訊息背景預取（平台解析 webhook 時排入下載）
+        configure_media_fetcher(self.config.get('media_fetch'))
+        
         # 創建所有啟用的平台處理器
         handlers = self.platform_factory.create_enabled_handlers(self.config)
         
@@ -180,6 +226,8 @@ class MultiPlatformChatBot:
             success = self.platform_manager.register_handler(handler)
             if success:
                 logger.info(f"Registered {platform_type.value} platform handler")
+                # 使用常駐連線的平台（Discord gateway）由連線直接推送訊息，不必等待 webhook 請求
+                handler.start_consumer(partial(self._process_message, platform_type))
             else:
                 logger.error(f"Failed to register {platform_type.value} platform handler")
         
@@ -548,82 +596,22 @@ class MultiPlatformChatBot:
                 logger.warning(f"[WEBHOOK] No valid messages from {platform_name} webhook - returning OK")
                 return 'OK'
             
+            # 啟用背景工作池時先排入佇列，立即回應 200 OK
+            if self.reply_worker_pool:
+                for message in messages:
+                    queued = self.reply_worker_pool.submit(platform_type.value, self._process_message, platform_type, message)
+                    if not queued:
+                        # 佇列已滿，退回同步處理避免訊息遺失
+                        logger.warning(f"[WEBHOOK] Reply queue full, processing message inline for {platform_name}")
+                        self._process_message(platform_type, message)
+                logger.debug(f"[WEBHOOK] Queued {len(messages)} messages from {platform_name}")
+                return 'OK'
+            
             # 處理每個訊息
             logger.debug(f"[WEBHOOK] Processing {len(messages)} messages")
             for i, message in enumerate(messages):
-                try:
-                    logger.info(f"[WEBHOOK] Received - User: {getattr(message.user, 'user_id', 'unknown')}, Content: {str(message.content)[:100]}{'...' if len(str(message.content)) > 100 else ''}")
-                    logger.debug(f"[WEBHOOK] Processing message {i+1}/{len(messages)} - ID: {getattr(message, 'message_id', 'unknown')}, Type: {getattr(message, 'message_type', 'unknown')}")
-                    
-                    # 根據訊息類型選擇合適的服務處理
-                    if message.message_type == "audio":
-                        logger.debug(f"[WEBHOOK] Processing audio message with audio service")
-                        
-                        # 步驟 1: 使用音訊服務進行轉錄
-                        audio_result = self.audio_service.handle_message(
-                            user_id=message.user.user_id,
-                            audio_content=message.raw_data,
-                            platform=message.user.platform.value
-                        )
-                        
-                        if not audio_result['success']:
-                            # 轉錄失敗，返回錯誤訊息
-                            error_response = self.error_handler.get_error_message(
-                                Exception(audio_result['error_message']), 
-                                use_detailed=False
-                            )
-                            from .platforms.base import PlatformResponse
-                            response = PlatformResponse(
-                                content=error_response,
-                                response_type='text'
-                            )
-                            logger.error(f"[WEBHOOK] Audio transcription failed for user {message.user.user_id}")
-                        else:
-                            # 步驟 2: 轉錄成功，創建文字訊息並交給 ChatService 處理
-                            logger.debug(f"[WEBHOOK] Audio transcription successful, processing with chat service")
-                            transcribed_text = audio_result['transcribed_text']
-                            
-                            # 創建文字訊息
-                            from .platforms.base import PlatformMessage
-                            text_message = PlatformMessage(
-                                message_id=f"audio_transcribed_{message.user.user_id}",
-                                user=message.user,
-                                content=transcribed_text,
-                                message_type="text",
-                                reply_token=getattr(message, 'reply_token', None)
-                            )
-                            
-                            # 使用 ChatService 處理轉錄文字
-                            response = self.chat_service.handle_message(text_message)
-                            logger.info(f"[WEBHOOK] Audio processing completed successfully")
-                            
-                    else:
-                        # 使用核心聊天服務處理文字訊息
-                        logger.debug(f"[WEBHOOK] Processing text message with chat service")
-                        response = self.chat_service.handle_message(message)
-                    
-                    logger.info(f"[WEBHOOK] Sending - Content: {str(getattr(response, 'content', 'No content'))[:100]}{'...' if hasattr(response, 'content') and len(str(response.content)) > 100 else ''}")
-                    logger.debug(f"[WEBHOOK] Response type: {getattr(response, 'response_type', 'unknown')}")
-                    
-                    # 發送回應
-                    logger.debug(f"[WEBHOOK] Getting platform handler for response")
-                    handler = self.platform_manager.get_handler(platform_type)
-                    if handler:
-                        logger.debug(f"[WEBHOOK] Platform handler found, sending response")
-                        success = handler.send_response(response, message)
-                        if success:
-                            logger.info(f"[WEBHOOK] Response sent successfully to user: {getattr(message.user, 'user_id', 'unknown')}")
-                        else:
-                            logger.error(f"[WEBHOOK] Failed to send response via {platform_name}")
-                    else:
-                        logger.error(f"[WEBHOOK] No platform handler found for {platform_name}")
-                    
-                except Exception as e:
-                    # 記錄詳細的錯誤 log
-                    logger.error(f"[WEBHOOK] Error processing message from {platform_name}: {type(e).__name__}: {e}")
-                    logger.error(f"[WEBHOOK] Error details - Platform: {platform_name}, Message ID: {getattr(message, 'message_id', 'unknown')}")
-                    logger.error(f"[WEBHOOK] Exception traceback:", exc_info=True)
-                    continue
+                logger.debug(f"[WEBHOOK] Processing message {i+1}/{len(messages)} - ID: {getattr(message, 'message_id', 'unknown')}, Type: {getattr(message, 'message_type', 'unknown')}")
+                self._process_message(platform_type, message)
             
             logger.debug(f"[WEBHOOK] Webhook processing completed successfully for {platform_name}")
             return 'OK'
@@ -635,6 +623,89 @@ class MultiPlatformChatBot:
             logger.error(f"[WEBHOOK] Exception traceback:", exc_info=True)
             abort(500)
     
+    def _process_message(self, platform_type: PlatformType, message):
+        """處理單一平台訊息並發送回應（同步或由背景工作池呼叫）"""
+        try:
+            logger.info(f"[WEBHOOK] Received - User: {getattr(message.user, 'user_id', 'unknown')}, Content: {str(message.content)[:100]}{'...' if len(str(message.content)) > 100 else ''}")
+            
+            # 根據訊息類型選擇合適的服務處理
+            if message.message_type == "audio":
+                logger.debug(f"[WEBHOOK] Processing audio message with audio service")
+                
+                # 步驟 1: 使用音訊服務進行轉錄
+                audio_result = self.audio_service.handle_message(
+                    user_id=message.user.user_id,
+                    audio_content=message.raw_data,
+                    platform=message.user.platform.value
+                )
+                
+                if not audio_result['success']:
+                    # 轉錄失敗，返回錯誤訊息
+                    error_response = self.error_handler.get_error_message(
+                        Exception(audio_result['error_message']), 
+                        use_detailed=False
+                    )
+                    from .platforms.base import PlatformResponse
+                    response = PlatformResponse(
+                        content=error_response,
+                        response_type='text'
+                    )
+                    logger.error(f"[WEBHOOK] Audio transcription failed for user {message.user.user_id}")
+                else:
+                    # 步驟 2: 轉錄成功，創建文字訊息並交給 ChatService 處理
+                    logger.debug(f"[WEBHOOK] Audio transcription successful, processing with chat service")
+                    transcribed_text = audio_result['transcribed_text']
+                    
+                    # 創建文字訊息
+                    from .platforms.base import PlatformMessage
+                    text_message = PlatformMessage(
+                        message_id=f"audio_transcribed_{message.user.user_id}",
+                        user=message.user,
+                        content=transcribed_text,
+                        message_type="text",
+                        reply_token=getattr(message, 'reply_token', None)
+                    )
+                    
+                    # 使用 ChatService 處理轉錄文字
+                    response = self.chat_service.handle_message(text_message)
+                    logger.info(f"[WEBHOOK] Audio processing completed successfully")
+                    
+            else:
+                # 使用核心聊天服務處理文字訊息
+                logger.debug(f"[WEBHOOK] Processing text message with chat service")
+                response = self.chat_service.handle_message(message)
+            
+            # 已合併到同一用戶後續訊息的回應中，不需另外發送
+            response_metadata = getattr(response, 'metadata', None)
+            if isinstance(response_metadata, dict) and response_metadata.get('coalesced'):
+                logger.info(f"[WEBHOOK] Message {getattr(message, 'message_id', 'unknown')} coalesced into {response_metadata.get('coalesced_into')}, skipping reply")
+                return
+            
+            logger.info(f"[WEBHOOK] Sending - Content: {str(getattr(response, 'content', 'No content'))[:100]}{'...' if hasattr(response, 'content') and len(str(response.content)) > 100 else ''}")
+            logger.debug(f"[WEBHOOK] Response type: {getattr(response, 'response_type', 'unknown')}")
+            
+            # 發送回應
+            logger.debug(f"[WEBHOOK] Getting platform handler for response")
+            handler = self.platform_manager.get_handler(platform_type)
+            if handler:
+                logger.debug(f"[WEBHOOK] Platform handler found, sending response")
+                if self.delivery_scheduler:
+                    success = self.delivery_scheduler.deliver(platform_type, handler, response, message)
+                else:
+                    success = handler.send_response(response, message)
+                if success:
+                    logger.info(f"[WEBHOOK] Response sent successfully to user: {getattr(message.user, 'user_id', 'unknown')}")
+                else:
+                    logger.error(f"[WEBHOOK] Failed to send response via {platform_type.value}")
+            else:
+                logger.error(f"[WEBHOOK] No platform handler found for {platform_type.value}")
+            
+        except Exception as e:
+            # 記錄詳細的錯誤 log
+            logger.error(f"[WEBHOOK] Error processing message from {platform_type.value}: {type(e).__name__}: {e}")
+            logger.error(f"[WEBHOOK] Error details - Platform: {platform_type.value}, Message ID: {getattr(message, 'message_id', 'unknown')}")
+            logger.error(f"[WEBHOOK] Exception traceback:", exc_info=True)
+    
     def _health_check(self):
         """健康檢查"""
         from datetime import datetime
@@ -721,6 +792,38 @@ class MultiPlatformChatBot:
                 except:
                     metrics_data['database'] = {'status': 'unavailable'}
             
+            # 用戶訊息佇列資訊
+            user_message_queue = getattr(self.chat_service, 'user_message_queue', None)
+            if user_message_queue:
+                metrics_data['user_message_queue'] = user_message_queue.get_stats()
+            
+            # 對話歷史快取與批次寫入資訊
+            conversation_manager = getattr(self.model, 'conversation_manager', None)
+            if isinstance(conversation_manager, ORMConversationManager):
+                metrics_data['conversation'] = conversation_manager.get_stats()
+            
+            # 背景回覆工作池資訊
+            if self.reply_worker_pool:
+                metrics_data['reply_workers'] = self.reply_worker_pool.get_stats()
+            
+            # 模型 API 連線池資訊（連線重用率與建立連線耗時）
+            metrics_data['http_pools'] = get_http_registry().get_stats()
+            
+            # 語音訊息背景下載資訊
+            metrics_data['media_fetch'] = get_media_fetcher().get_stats()
+            
+            # 回覆發送延遲、重試與放棄發送的訊息數
+            if self.delivery_scheduler:
+                metrics_data['delivery'] = self.delivery_scheduler.get_stats()
+            
+            # MCP 工具結果快取資訊
+            mcp_service = getattr(self.model, 'mcp_service', None)
+            if mcp_service is not None:
+                # MCP 模組（含 aiohttp）只在模型啟用 MCP 時才需要載入
+                from .services.mcp_service import MCPService
+                if isinstance(mcp_service, MCPService) and mcp_service.result_cache:
+                    metrics_data['mcp_result_cache'] = mcp_service.get_cache_stats()
+            
             return jsonify(metrics_data)
             
         except Exception as e:
@@ -732,6 +835,33 @@ class MultiPlatformChatBot:
         def cleanup():
             # Logger 不應該拋出 ValueError，如果出現請檢查 logging 配置
             print("Shutting down application...")
+            try:
+                if self.reply_worker_pool:
+                    self.reply_worker_pool.shutdown()
+            except Exception as e:
+                print(f"Error during reply worker shutdown: {e}")
+            try:
+                # 資料庫關閉前寫入緩衝中的對話歷史
+                conversation_manager = getattr(self.model, 'conversation_manager', None)
+                if isinstance(conversation_manager, ORMConversationManager):
+                    conversation_manager.shutdown()
+            except Exception as e:
+                print(f"Error during conversation buffer flush: {e}")
+            try:
+                get_media_fetcher().shutdown()
+            except Exception as e:
+                print(f"Error during media fetcher shutdown: {e}")
+            try:
+                get_http_registry().close_all()
+            except Exception as e:
+                print(f"Error during HTTP session cleanup: {e}")
+            try:
+                # MCP 常駐 session 綁定背景事件迴圈，需先關閉再停止迴圈
+                from .services.mcp_service import close_mcp_service
+                close_mcp_service()
+                get_async_runtime().stop()
+            except Exception as e:
+                print(f"Error during MCP session cleanup: {e}")
             try:
                 if self.database:
                     self.database.close_engine()
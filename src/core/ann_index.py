@@ -0,0 +1,276 @@
+"""
+本地知識庫的近似最近鄰（ANN）索引
+以球面 k-means 訓練的 IVF 粗量化器將片段分到 nlist 個倒排串列，
+查詢時只對最接近的 nprobe 個串列計算內積，語料達數十萬片段時仍能維持毫秒級檢索
+"""
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 指派片段到質心時的批次大小（限制暫存矩陣的記憶體用量）
+ASSIGN_BATCH_SIZE = 8192
+
+
+class IVFIndex:
+    """
+    IVF（inverted file）粗量化索引
+
+    特色功能：
+    - 片段數低於 min_size 或尚未訓練完成時返回 None，由呼叫端改用精確搜尋
+    - 訓練於背景執行緒進行，不阻塞查詢；固定亂數種子，各 worker 訓練出相同的質心
+    - 訓練後新增的片段直接指派到最近的質心，片段數成長超過 retrain_growth 倍時重新訓練
+    - nprobe 越大召回率越高、延遲越長；nlist 為 0 時依片段數自動決定（4 * sqrt(n)）
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 16, min_size: int = 20000,
+                 retrain_growth: float = 2.0, max_train_size: int = 65536,
+                 kmeans_iterations: int = 10, seed: int = 0):
+        """
+        初始化 IVF 索引
+
+        Args:
+            nlist: 倒排串列（質心）數量，0 表示自動
+            nprobe: 每次查詢探測的串列數
+            min_size: 啟用 ANN 的最少片段數，低於此數量使用精確搜尋
+            retrain_growth: 片段數相對上次訓練成長到此倍數時重新訓練
+            max_train_size: k-means 訓練取樣的片段數上限
+            kmeans_iterations: k-means 疊代次數
+            seed: 亂數種子
+        """
+        self.nlist = max(0, int(nlist))
+        self.nprobe = max(1, int(nprobe))
+        self.min_size = max(1, int(min_size))
+        self.retrain_growth = max(1.0, float(retrain_growth))
+        self.max_train_size = max(1, int(max_train_size))
+        self.kmeans_iterations = max(1, int(kmeans_iterations))
+        self.seed = seed
+
+        self._lock = threading.Lock()
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._trained_size = 0
+        self._training: Optional[threading.Thread] = None
+
+        # 統計資訊
+        self.trainings = 0
+        self.last_train_seconds = 0.0
+        self.ann_queries = 0
+        self.exact_queries = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional['IVFIndex']:
+        """依模型的 vector_ann 設定建立索引，未啟用時返回 None"""
+        if not config or not config.get('enabled', False):
+            return None
+        return cls(
+            nlist=config.get('nlist', 0),
+            nprobe=config.get('nprobe', 16),
+            min_size=config.get('min_size', 20000),
+            retrain_growth=config.get('retrain_growth', 2.0),
+            max_train_size=config.get('max_train_size', 65536),
+            kmeans_iterations=config.get('kmeans_iterations', 10),
+        )
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    # === 與 VectorIndex 同步（呼叫端需持有 VectorIndex 的鎖） ===
+
+    def on_add(self, start: int, vectors: np.ndarray) -> None:
+        """新增的片段（位於 start 起的列）指派到最近的質心"""
+        with self._lock:
+            if self._centroids is None:
+                return
+            assigned = self._assign(vectors, self._centroids)
+            current = self._assignments[:start]
+            self._assignments = np.concatenate([current, assigned])
+            self._lists = None
+
+    def on_remove(self, keep, previous_size: int) -> None:
+        """依保留的列重新對應指派結果（指派與移除前的列數不一致時等待重新訓練）"""
+        with self._lock:
+            if self._centroids is None:
+                return
+            if len(self._assignments) == previous_size:
+                self._assignments = self._assignments[np.asarray(keep, dtype=np.intp)]
+            else:
+                self._assignments = self._assignments[:0]
+            self._lists = None
+
+    def reset(self) -> None:
+        """捨棄訓練結果（索引內容被整批取代時）"""
+        with self._lock:
+            self._centroids = None
+            self._assignments = None
+            self._lists = None
+            self._trained_size = 0
+
+    # === 查詢 ===
+
+    def snapshot(self, size: int):
+        """
+        取得查詢用的快照（呼叫端需持有 VectorIndex 的鎖）
+
+        Returns:
+            (centroids, order, offsets) 或 None（應使用精確搜尋）
+        """
+        with self._lock:
+            if size < self.min_size or self._centroids is None or len(self._assignments) != size:
+                return None
+            if self._lists is None:
+                order = np.argsort(self._assignments, kind='stable')
+                offsets = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+                self._lists = (order, offsets)
+            return (self._centroids,) + self._lists
+
+    def candidates(self, snapshot, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """取得最接近查詢向量的 nprobe 個串列中的所有列"""
+        centroids, order, offsets = snapshot
+        probes = min(nprobe or self.nprobe, len(centroids))
+        centroid_scores = centroids @ query
+        if probes < len(centroids):
+            nearest = np.argpartition(-centroid_scores, probes - 1)[:probes]
+        else:
+            nearest = np.arange(len(centroids))
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in nearest])
+
+    def record_query(self, approximate: bool) -> None:
+        """記錄查詢方式"""
+        with self._lock:
+            if approximate:
+                self.ann_queries += 1
+            else:
+                self.exact_queries += 1
+
+    # === 訓練 ===
+
+    def needs_training(self, size: int) -> bool:
+        """是否需要（重新）訓練"""
+        if size < self.min_size:
+            return False
+        with self._lock:
+            if self._centroids is None or len(self._assignments) != size:
+                return True
+            return size > self._trained_size * self.retrain_growth
+
+    def start_training(self, get_snapshot: Callable, install: Callable) -> bool:
+        """
+        於背景執行緒訓練
+
+        Args:
+            get_snapshot: 返回 (matrix, size, version) 的函數
+            install: install(version, centroids, assignments, trained_size) 套用訓練結果，版本不符時返回 False
+
+        Returns:
+            bool: 是否啟動新的訓練
+        """
+        with self._lock:
+            if self._training is not None and self._training.is_alive():
+                return False
+            self._training = threading.Thread(
+                target=self._train_worker, args=(get_snapshot, install), name='IVFIndexTraining', daemon=True
+            )
+            self._training.start()
+            return True
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> None:
+        """等待背景訓練完成"""
+        thread = self._training
+        if thread is not None:
+            thread.join(timeout)
+
+    def _train_worker(self, get_snapshot: Callable, install: Callable) -> None:
+        """背景訓練流程"""
+        try:
+            matrix, size, version = get_snapshot()
+            if size < self.min_size:
+                return
+            started = time.perf_counter()
+            centroids = self.train(matrix[:size])
+            assignments = self._assign(matrix[:size], centroids)
+            elapsed = time.perf_counter() - started
+            if install(version, centroids, assignments, size):
+                with self._lock:
+                    self.trainings += 1
+                    self.last_train_seconds = elapsed
+                logger.info(f"IVF index trained: {size} chunks, {len(centroids)} lists in {elapsed:.2f}s")
+            else:
+                logger.debug("Vector index changed during IVF training, result discarded")
+        except Exception as e:
+            logger.error(f"IVF index training failed: {e}")
+
+    def install(self, centroids: np.ndarray, assignments: np.ndarray, trained_size: int) -> None:
+        """套用訓練結果（呼叫端需持有 VectorIndex 的鎖並確認版本一致）"""
+        with self._lock:
+            self._centroids = centroids
+            self._assignments = assignments
+            self._lists = None
+            self._trained_size = trained_size
+
+    def train(self, vectors: np.ndarray) -> np.ndarray:
+        """以球面 k-means 訓練質心"""
+        size = vectors.shape[0]
+        nlist = self.nlist or int(4 * math.sqrt(size))
+        nlist = max(1, min(nlist, size))
+
+        rng = np.random.default_rng(self.seed)
+        if size > self.max_train_size:
+            sample_rows = np.sort(rng.choice(size, self.max_train_size, replace=False))
+            sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        else:
+            sample = np.asarray(vectors, dtype=np.float32)
+        nlist = min(nlist, sample.shape[0])
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assigned = self._assign(sample, centroids)
+            order = np.argsort(assigned, kind='stable')
+            counts = np.bincount(assigned, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            non_empty = counts > 0
+            sums = np.zeros_like(centroids)
+            sums[non_empty] = np.add.reduceat(sample[order], starts[non_empty], axis=0)
+
+            # 空的串列以隨機片段重新播種
+            empty = np.flatnonzero(~non_empty)
+            if len(empty):
+                sums[empty] = sample[rng.choice(sample.shape[0], len(empty), replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """將每個向量指派到內積最大的質心"""
+        assigned = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], ASSIGN_BATCH_SIZE):
+            batch = vectors[start:start + ASSIGN_BATCH_SIZE]
+            assigned[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+        return assigned
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得 ANN 索引統計資訊"""
+        with self._lock:
+            return {
+                'trained': self._centroids is not None,
+                'nlist': 0 if self._centroids is None else len(self._centroids),
+                'nprobe': self.nprobe,
+                'min_size': self.min_size,
+                'trained_size': self._trained_size,
+                'trainings': self.trainings,
+                'last_train_seconds': round(self.last_train_seconds, 3),
+                'training': self._training is not None and self._training.is_alive(),
+                'ann_queries': self.ann_queries,
+                'exact_queries': self.exact_queries,
+            }
@@ -0,0 +1,145 @@
+"""
+進程內共用的背景事件迴圈
+每個 worker 只建立一個常駐事件迴圈執行緒，同步程式碼把協程提交到該迴圈執行，
+避免每次呼叫都以 asyncio.run() 建立並關閉事件迴圈；綁定於迴圈的資源
+（例如 MCP 客戶端的 aiohttp session 與連線池）也因此可以跨呼叫保留
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BackgroundEventLoop:
+    """
+    在 daemon 執行緒中常駐的事件迴圈
+
+    - 第一次提交協程時才啟動執行緒
+    - gunicorn preload 後 fork 出的 worker 不會繼承執行緒，子進程中會重新建立迴圈
+    - 在迴圈執行緒內以同步方式等待結果會造成死結，此時直接拋出 RuntimeError
+    """
+
+    def __init__(self, name: str = 'AsyncRuntime'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # 統計資訊
+        self.submitted = 0
+        self.loops_created = 0
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """取得（必要時啟動）背景事件迴圈"""
+        loop = self._loop
+        if loop is not None and self._thread is not None and self._thread.is_alive():
+            return loop
+
+        with self._lock:
+            if self._loop is None or self._thread is None or not self._thread.is_alive():
+                ready = threading.Event()
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._run_loop, args=(loop, ready), name=self.name, daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+                self.loops_created += 1
+                logger.info(f"Started background event loop thread {self.name}")
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def in_loop_thread(self) -> bool:
+        """目前是否在背景迴圈執行緒中"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """提交協程到背景迴圈，返回 concurrent.futures.Future"""
+        loop = self.get_loop()
+        self.submitted += 1
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        同步執行協程並等待結果
+
+        Args:
+            coro: 要執行的協程
+            timeout: 最長等待秒數，逾時會取消協程並拋出 concurrent.futures.TimeoutError
+
+        Raises:
+            RuntimeError: 在背景迴圈執行緒內呼叫
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("Cannot block on the background event loop from its own thread")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def run_async(self, coro: Awaitable[Any]) -> Any:
+        """
+        在任意事件迴圈中等待協程在背景迴圈上執行的結果
+
+        已在背景迴圈中時直接 await；否則提交到背景迴圈，
+        讓綁定於背景迴圈的資源不會在其他迴圈中被使用
+        """
+        if self.in_loop_thread():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止背景迴圈並等待執行緒結束"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or thread is None:
+            return
+        if thread.is_alive():
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+
+    def after_fork(self) -> None:
+        """fork 後於子進程丟棄繼承的迴圈（執行緒不會跟著 fork），下次提交時重新建立"""
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        """取得背景迴圈統計資訊"""
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'submitted': self.submitted,
+            'loops_created': self.loops_created,
+        }
+
+
+_async_runtime = BackgroundEventLoop()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: _async_runtime.after_fork())
+
+
+def get_async_runtime() -> BackgroundEventLoop:
+    """取得進程內共用的背景事件迴圈"""
+    return _async_runtime
+
+
+def run_coroutine_sync(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """在共用的背景事件迴圈上同步執行協程"""
+    return _async_runtime.run(coro, timeout)
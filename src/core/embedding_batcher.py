@@ -0,0 +1,97 @@
+"""
+批次嵌入向量生成
+將大量片段切成固定大小的批次，以有限的並行數送出批次嵌入請求，
+批次請求失敗時逐筆退回單筆請求，並回報處理進度
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Sequence
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+Embedding = List[float]
+# 批次請求：輸入文字清單，返回等長的嵌入向量清單，失敗時返回 None
+BatchEmbedder = Callable[[List[str]], Optional[List[Optional[Embedding]]]]
+# 單筆請求：批次失敗時逐筆使用
+SingleEmbedder = Callable[[str], Optional[Embedding]]
+# 進度回報：progress_callback(已完成片段數, 總片段數)
+ProgressCallback = Callable[[int, int], None]
+
+
+def embed_in_batches(texts: Sequence[str], embed_batch: BatchEmbedder,
+                     fallback: Optional[SingleEmbedder] = None, batch_size: int = 32,
+                     max_workers: int = 4, progress_callback: Optional[ProgressCallback] = None,
+                     label: str = '') -> List[Optional[Embedding]]:
+    """
+    以批次並行生成嵌入向量
+
+    Args:
+        texts: 要生成嵌入向量的文字
+        embed_batch: 批次請求函數
+        fallback: 批次請求失敗或回應長度不符時逐筆使用的單筆請求函數
+        batch_size: 每批的片段數
+        max_workers: 同時進行的批次請求數上限
+        progress_callback: 每完成一批時呼叫
+        label: 記錄用的名稱（例如檔名）
+
+    Returns:
+        List[Optional[Embedding]]: 與 texts 順序對應的嵌入向量，失敗的片段為 None
+    """
+    total = len(texts)
+    results: List[Optional[Embedding]] = [None] * total
+    if total == 0:
+        return results
+
+    batch_size = max(1, int(batch_size))
+    batches = [(start, list(texts[start:start + batch_size])) for start in range(0, total, batch_size)]
+    workers = max(1, min(int(max_workers), len(batches)))
+
+    def run(batch: List[str]) -> List[Optional[Embedding]]:
+        try:
+            embeddings = embed_batch(batch)
+        except Exception as e:
+            logger.warning(f"Batch embedding request failed: {e}")
+            embeddings = None
+        if embeddings is None or len(embeddings) != len(batch):
+            if fallback is None:
+                return [None] * len(batch)
+            embeddings = [None] * len(batch)
+        if fallback is not None:
+            embeddings = [
+                embedding if embedding is not None else fallback(text)
+                for text, embedding in zip(batch, embeddings)
+            ]
+        return embeddings
+
+    done = 0
+    if workers == 1:
+        for start, batch in batches:
+            results[start:start + len(batch)] = run(batch)
+            done += len(batch)
+            _report(progress_callback, done, total)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='EmbeddingBatch') as executor:
+            futures = {executor.submit(run, batch): (start, len(batch)) for start, batch in batches}
+            for future in as_completed(futures):
+                start, count = futures[future]
+                results[start:start + count] = future.result()
+                done += count
+                _report(progress_callback, done, total)
+
+    failed = sum(1 for embedding in results if embedding is None)
+    logger.info(
+        f"Embedded {total - failed}/{total} chunks{f' for {label}' if label else ''} "
+        f"in {len(batches)} batches ({workers} concurrent)"
+    )
+    return results
+
+
+def _report(progress_callback: Optional[ProgressCallback], done: int, total: int) -> None:
+    """呼叫進度回報（回報失敗不影響嵌入流程）"""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(done, total)
+    except Exception as e:
+        logger.debug(f"Embedding progress callback failed: {e}")
@@ -0,0 +1,308 @@
+"""
+跨行程共用的嵌入向量快取
+以 (嵌入模型, sha256(文字)) 為鍵，行程內保留 LRU 記憶體層，
+設定 path 時另以 SQLite 檔案保存，各 gunicorn worker 與重啟後都能重複使用
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+Embedding = List[float]
+
+# 讀取時最多每隔多少秒更新一次 last_access（避免每次命中都寫入）
+TOUCH_INTERVAL = 60
+# 每新增多少筆檢查一次是否超過容量
+EVICT_CHECK_INTERVAL = 256
+# 超過容量時淘汰到上限的比例
+EVICT_TARGET_RATIO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_access INTEGER NOT NULL,
+    PRIMARY KEY (model, digest)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access);
+"""
+
+# 已建立的快取實例，fork 後於子行程重設鎖
+_instances: 'weakref.WeakSet[EmbeddingCache]' = weakref.WeakSet()
+
+
+def text_digest(text: str) -> str:
+    """計算文字的 sha256（不受行程 hash 隨機化影響）"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    兩層式嵌入向量快取
+
+    特色功能：
+    - 記憶體層為有界 LRU，超過 max_memory_entries 時淘汰最久未使用的項目
+    - 持久層為 SQLite（WAL 模式），向量以 float32 BLOB 保存，多個行程可同時讀寫
+    - 持久層超過 max_entries 時依 last_access 淘汰最久未使用的項目
+    - SQLite 發生錯誤時記錄警告並退回只使用記憶體層，不影響嵌入流程
+    - SQLite 連線於各行程首次使用時才開啟，preload_app 下 fork 出的 worker 不共用 master 的連線
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 200000,
+                 max_memory_entries: int = 10000):
+        """
+        初始化嵌入向量快取
+
+        Args:
+            path: SQLite 檔案路徑，None 表示只使用記憶體層
+            max_entries: 持久層的項目數上限
+            max_memory_entries: 記憶體層的項目數上限
+        """
+        self.path = os.path.abspath(path) if path else None
+        self.max_entries = max(1, int(max_entries))
+        self.max_memory_entries = max(1, int(max_memory_entries))
+
+        self._lock = threading.RLock()
+        self._memory: 'OrderedDict[Tuple[str, str], Embedding]' = OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._inserts_since_check = EVICT_CHECK_INTERVAL
+
+        # 統計資訊
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        _instances.add(self)
+
+    @property
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        """目前行程的 SQLite 連線（呼叫端需持有 _lock；首次使用或 fork 後重新開啟）"""
+        pid = os.getpid()
+        if self.path and self._connection_pid != pid:
+            # 不關閉繼承的連線：SQLite 連線不可跨 fork 使用，關閉也會影響父行程的檔案鎖
+            self._connection = None
+            self._connection_pid = pid
+            try:
+                self._connection = self._connect()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Embedding cache at {self.path} unavailable, using memory only: {e}")
+        return self._connection
+
+    def _after_fork(self) -> None:
+        """fork 後於子行程重設鎖（父行程其他執行緒可能在 fork 時持有鎖）"""
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """開啟 SQLite 連線並建立資料表"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @property
+    def persistent(self) -> bool:
+        with self._lock:
+            return self._conn is not None
+
+    # === 讀取 ===
+
+    def get(self, model: str, text: str) -> Optional[Embedding]:
+        """取得單一文字的嵌入向量"""
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[Embedding]]:
+        """
+        批次取得嵌入向量
+
+        Args:
+            model: 嵌入模型名稱
+            texts: 文字清單
+
+        Returns:
+            List[Optional[Embedding]]: 與 texts 對應的嵌入向量，未快取者為 None
+        """
+        digests = [text_digest(text) for text in texts]
+        results: List[Optional[Embedding]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, digest in enumerate(digests):
+                key = (model, digest)
+                embedding = self._memory.get(key)
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    results[i] = embedding
+                else:
+                    missing.setdefault(digest, []).append(i)
+
+            if missing and self._conn is not None:
+                for digest, embedding in self._load(model, list(missing)).items():
+                    self._remember((model, digest), embedding)
+                    for i in missing.pop(digest):
+                        results[i] = embedding
+                        self.disk_hits += 1
+
+            self.misses += sum(len(positions) for positions in missing.values())
+        return results
+
+    def _load(self, model: str, digests: List[str]) -> Dict[str, Embedding]:
+        """從 SQLite 讀取並更新 last_access"""
+        found: Dict[str, Embedding] = {}
+        now = int(time.time())
+        try:
+            for start in range(0, len(digests), 500):
+                batch = digests[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? WHERE model = ? AND digest IN ({placeholders}) "
+                        f"AND last_access < ?",
+                        [now, model, *batch, now - TOUCH_INTERVAL]
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+        return found
+
+    # === 寫入 ===
+
+    def set(self, model: str, text: str, embedding: Embedding) -> None:
+        """保存單一文字的嵌入向量"""
+        self.set_many(model, [(text, embedding)])
+
+    def set_many(self, model: str, items: Sequence[Tuple[str, Embedding]]) -> None:
+        """
+        批次保存嵌入向量
+
+        Args:
+            model: 嵌入模型名稱
+            items: (文字, 嵌入向量) 清單
+        """
+        rows = []
+        now = int(time.time())
+        with self._lock:
+            for text, embedding in items:
+                if not embedding:
+                    continue
+                digest = text_digest(text)
+                embedding = list(embedding)
+                self._remember((model, digest), embedding)
+                vector = np.asarray(embedding, dtype=np.float32)
+                rows.append((model, digest, int(vector.shape[0]), vector.tobytes(), now))
+
+            if not rows or self._conn is None:
+                return
+            try:
+                # 同一批次以單一交易寫入
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, digest, dimension, vector, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    self._conn.execute('COMMIT')
+                except sqlite3.Error:
+                    self._conn.execute('ROLLBACK')
+                    raise
+                self._inserts_since_check += len(rows)
+                if self._inserts_since_check >= EVICT_CHECK_INTERVAL:
+                    self._inserts_since_check = 0
+                    self._evict()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def _remember(self, key: Tuple[str, str], embedding: Embedding) -> None:
+        """放入記憶體層並淘汰最久未使用的項目"""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        """持久層超過上限時淘汰最久未使用的項目"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * EVICT_TARGET_RATIO)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+        logger.info(f"Evicted {excess} embeddings from cache ({count} > {self.max_entries})")
+
+    def clear(self) -> None:
+        """清空快取（含持久層）"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM embeddings")
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache clear failed: {e}")
+
+    def close(self) -> None:
+        """關閉 SQLite 連線"""
+        with self._lock:
+            if self._connection is not None and self._connection_pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._connection_pid = os.getpid()
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return len(self._memory)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得快取統計資訊"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'path': self.path,
+                'persistent': self._conn is not None,
+                'entries': len(self),
+                'memory_entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'max_memory_entries': self.max_memory_entries,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': f"{(hits / lookups * 100) if lookups else 0:.1f}%",
+                'evictions': self.evictions,
+            }
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: [cache._after_fork() for cache in list(_instances)])
@@ -1,12 +1,14 @@
 from .logger import get_logger
-from typing import Dict, Optional
-from linebot.v3.messaging import TextMessage
+from typing import TYPE_CHECKING, Dict, Optional
 from .exceptions import (
     ChatBotError, OpenAIError, DatabaseError, ThreadError, 
     ModelError, AnthropicError, GeminiError, OllamaError, 
     AudioError, PlatformError, ValidationError, ConfigurationError
 )
 
+if TYPE_CHECKING:
+    from linebot.v3.messaging import TextMessage
+
 logger = get_logger(__name__)
 
 
@@ -68,8 +70,11 @@ class ErrorHandler:
         'unknown_error': '未知錯誤：發生了未預期的系統錯誤，請聯繫管理員。'
     }
     
-    def handle_error(self, error: Exception, use_detailed: bool = False) -> TextMessage:
+    def handle_error(self, error: Exception, use_detailed: bool = False) -> 'TextMessage':
         """統一錯誤處理"""
+        # LINE SDK 載入很慢，只在實際需要包裝訊息時才匯入
+        from linebot.v3.messaging import TextMessage
+        
         logger.error(f"Error occurred: {type(error).__name__}: {error}")
         
         error_message = self._get_user_friendly_message(error, use_detailed)
@@ -56,6 +56,22 @@ class PlatformError(ChatBotError):
     pass
 
 
+class DeliveryError(PlatformError):
+    """訊息發送暫時失敗（速率限制或平台伺服器錯誤），可稍後重試"""
+    def __init__(self, message: str, status_code: int = None, retry_after: float = None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(message, error_code=str(status_code) if status_code else None)
+
+    @staticmethod
+    def parse_retry_after(value) -> float:
+        """解析 Retry-After 標頭（秒數），無法解析時返回 None"""
+        try:
+            return max(0.0, float(value)) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+
 class ValidationError(ChatBotError):
     """輸入驗證相關錯誤"""
     pass
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+檔案引用對應表快取
+保存「檔案 ID → 檔名」對應表供引用格式化使用：TTL 內直接使用快取，
+過期時由單一背景執行緒重新列出檔案（其他請求繼續使用舊資料），
+未知的檔案 ID 個別查詢，不會為了一個引用重新列出所有檔案
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 列出所有檔案：返回 {file_id: 檔名}，失敗時返回空字典
+ReferenceLoader = Callable[[], Dict[str, str]]
+# 查詢單一檔案：返回檔名，找不到時返回 None
+ReferenceResolver = Callable[[str], Optional[str]]
+
+
+class FileReferenceCache:
+    """
+    檔案 ID → 檔名對應表快取
+
+    特色功能：
+    - 同一時間只會有一個重新列出檔案的請求（single-flight），過期時在背景更新，不阻塞回覆
+    - 尚未載入過時最多等待 cold_wait 秒，逾時則改為個別查詢被引用的檔案
+    - 未知的檔案 ID 以 resolver 個別查詢；查不到的 ID 在 negative_ttl 內不再重查
+    - 設定 path 時對應表以 JSON 檔與其他 worker 共用，檔案仍在 TTL 內時直接讀檔而不呼叫 API
+    """
+
+    def __init__(self, loader: ReferenceLoader, resolver: Optional[ReferenceResolver] = None,
+                 ttl: float = 300, negative_ttl: float = 300, cold_wait: float = 1.0,
+                 retry_after: float = 30, path: Optional[str] = None):
+        """
+        初始化檔案引用快取
+
+        Args:
+            loader: 列出所有檔案的函數
+            resolver: 查詢單一檔案的函數，None 表示不個別查詢
+            ttl: 對應表有效秒數
+            negative_ttl: 查不到的檔案 ID 不再重查的秒數
+            cold_wait: 尚未載入過時等待背景載入的最長秒數
+            retry_after: 列出檔案失敗後多久再試
+            path: 跨 worker 共用的 JSON 檔路徑
+        """
+        self.loader = loader
+        self.resolver = resolver
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cold_wait = cold_wait
+        self.retry_after = retry_after
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._references: Dict[str, str] = {}
+        self._missing: Dict[str, float] = {}
+        self._loaded_at = 0.0
+        self._refreshing: Optional[threading.Event] = None
+
+        # 統計資訊
+        self.hits = 0
+        self.resolved = 0
+        self.unresolved = 0
+        self.refreshes = 0
+        self.shared_loads = 0
+
+    # === 查詢 ===
+
+    def lookup(self, file_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        取得檔案 ID 對應的檔名
+
+        Args:
+            file_ids: 要查詢的檔案 ID
+
+        Returns:
+            Dict[str, str]: 找得到檔名的 {file_id: 檔名}
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        self._ensure_fresh()
+
+        now = time.time()
+        with self._lock:
+            result = {fid: self._references[fid] for fid in file_ids if fid in self._references}
+            self.hits += len(result)
+            unknown = [
+                fid for fid in file_ids
+                if fid not in result and self._missing.get(fid, 0) <= now
+            ]
+
+        for file_id in unknown:
+            filename = self._resolve(file_id)
+            if filename is not None:
+                result[file_id] = filename
+        return result
+
+    def get_all(self) -> Dict[str, str]:
+        """取得目前的完整對應表（必要時載入）"""
+        self._ensure_fresh()
+        with self._lock:
+            return dict(self._references)
+
+    def _resolve(self, file_id: str) -> Optional[str]:
+        """個別查詢單一檔案"""
+        filename = None
+        if self.resolver is not None:
+            try:
+                filename = self.resolver(file_id)
+            except Exception as e:
+                logger.warning(f"Failed to resolve file reference {file_id}: {e}")
+
+        with self._lock:
+            if filename is None:
+                self.unresolved += 1
+                self._missing[file_id] = time.time() + self.negative_ttl
+            else:
+                self.resolved += 1
+                self._references[file_id] = filename
+                self._missing.pop(file_id, None)
+        return filename
+
+    # === 更新 ===
+
+    def _ensure_fresh(self) -> None:
+        """過期時啟動背景更新；從未載入過時最多等待 cold_wait 秒"""
+        with self._lock:
+            if self._loaded_at and time.time() - self._loaded_at < self.ttl:
+                return
+            cold = not self._loaded_at
+            event = self._refreshing
+            if event is None:
+                event = self._refreshing = threading.Event()
+                threading.Thread(target=self._refresh, name='FileReferenceRefresh', daemon=True).start()
+        if cold:
+            event.wait(self.cold_wait)
+
+    def _refresh(self) -> None:
+        """重新載入對應表（由單一背景執行緒執行）"""
+        try:
+            references = self._load_shared()
+            if references is None:
+                references = self.loader() or {}
+                self.refreshes += 1
+                if references:
+                    self._save_shared(references)
+
+            with self._lock:
+                if references:
+                    self._references = dict(references)
+                    self._missing = {fid: t for fid, t in self._missing.items() if fid not in references}
+                    self._loaded_at = time.time()
+                else:
+                    # 載入失敗或沒有檔案：保留舊資料，retry_after 秒後再試
+                    self._loaded_at = time.time() - self.ttl + self.retry_after
+            logger.debug(f"File reference cache refreshed: {len(references)} files")
+        except Exception as e:
+            logger.warning(f"File reference refresh failed: {e}")
+            with self._lock:
+                self._loaded_at = time.time() - self.ttl + self.retry_after
+        finally:
+            with self._lock:
+                event, self._refreshing = self._refreshing, None
+            if event is not None:
+                event.set()
+
+    def add(self, file_id: str, filename: str) -> None:
+        """加入（例如剛上傳的）檔案"""
+        with self._lock:
+            self._references[file_id] = filename
+            self._missing.pop(file_id, None)
+
+    def invalidate(self) -> None:
+        """標記對應表過期，下次查詢時在背景重新載入"""
+        with self._lock:
+            if self._loaded_at:
+                self._loaded_at = time.time() - self.ttl
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    # === 跨 worker 共用 ===
+
+    def _load_shared(self) -> Optional[Dict[str, str]]:
+        """讀取其他 worker 寫入且仍在 TTL 內的對應表"""
+        if not self.path:
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if time.time() - float(data.get('loaded_at', 0)) >= self.ttl:
+                return None
+            references = data.get('references') or {}
+            if references:
+                self.shared_loads += 1
+            return references or None
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.debug(f"Ignoring shared file reference cache {self.path}: {e}")
+            return None
+
+    def _save_shared(self, references: Dict[str, str]) -> None:
+        """寫入共用檔案（先寫暫存檔再取代）"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'loaded_at': time.time(), 'references': references}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save file reference cache to {self.path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得快取統計資訊"""
+        with self._lock:
+            age = time.time() - self._loaded_at if self._loaded_at else None
+            return {
+                'entries': len(self._references),
+                'age_seconds': round(age, 1) if age is not None else None,
+                'ttl': self.ttl,
+                'refreshing': self._refreshing is not None,
+                'hits': self.hits,
+                'resolved': self.resolved,
+                'unresolved': self.unresolved,
+                'refreshes': self.refreshes,
+                'shared_loads': self.shared_loads,
+                'path': self.path,
+            }
@@ -0,0 +1,221 @@
+"""
+模型提供商共用的 HTTP 連線池
+每個提供商在進程內共用一個 requests.Session（HTTP keep-alive、可設定連線池大小），
+避免每次 API 呼叫（例如 Assistant run 的狀態輪詢）都重新建立 TCP + TLS 連線，
+並記錄連線重用率與建立連線（含 TLS 握手）的耗時供 /metrics 使用
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_POOL_SETTINGS = {
+    'pool_connections': 4,   # 每個 session 保留的主機連線池數
+    'pool_maxsize': 16,      # 每個主機保留的 keep-alive 連線數
+    'pool_block': False,     # 連線數用盡時是否等待（False 表示暫時多開連線）
+}
+
+
+class ConnectionMetrics:
+    """HTTP 請求數、新建連線數與建立連線耗時統計"""
+
+    def __init__(self, sample_size: int = 500):
+        self._lock = threading.Lock()
+        self._connect_times = deque(maxlen=sample_size)
+        self.requests = 0
+        self.connections = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.connections += 1
+            self._connect_times.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            connect_times = sorted(self._connect_times)
+            requests_count = self.requests
+            connections = self.connections
+
+        if connect_times:
+            avg = sum(connect_times) / len(connect_times)
+            p95 = connect_times[min(len(connect_times) - 1, int(len(connect_times) * 0.95))]
+            connect_ms = {
+                'avg': round(avg * 1000, 3),
+                'p95': round(p95 * 1000, 3),
+                'max': round(connect_times[-1] * 1000, 3),
+            }
+        else:
+            connect_ms = {'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+
+        reused = max(requests_count - connections, 0)
+        return {
+            'requests': requests_count,
+            'new_connections': connections,
+            'reused_connections': reused,
+            'reuse_rate': f"{(reused / requests_count * 100) if requests_count else 0:.1f}%",
+            'connect_latency_ms': connect_ms,
+        }
+
+
+def _instrumented_pool_classes(metrics: ConnectionMetrics) -> Dict[str, type]:
+    """建立會記錄 connect()（TCP 連線與 TLS 握手）耗時的 urllib3 連線池類別"""
+
+    class TimedHTTPConnection(HTTPConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            metrics.record_connect(time.perf_counter() - start)
+
+    class TimedHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            metrics.record_connect(time.perf_counter() - start)
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    return {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """記錄請求數與新建連線的 HTTPAdapter"""
+
+    def __init__(self, metrics: ConnectionMetrics, **kwargs):
+        # HTTPAdapter.__init__ 會呼叫 init_poolmanager，metrics 需先設定
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _instrumented_pool_classes(self.metrics)
+
+    def send(self, request, **kwargs):
+        self.metrics.record_request()
+        return super().send(request, **kwargs)
+
+
+def get_pool_settings(pool_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合併預設值與配置中的連線池設定（忽略無效值）"""
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    for key, value in (pool_config or {}).items():
+        if key not in settings:
+            continue
+        if key == 'pool_block':
+            settings[key] = bool(value)
+        elif isinstance(value, int) and not isinstance(value, bool) and value > 0:
+            settings[key] = value
+    return settings
+
+
+class HTTPSessionRegistry:
+    """
+    進程內共用的 HTTP session 註冊表
+
+    以提供商名稱為鍵，同一提供商的所有模型實例共用一個 session 與連線池。
+    gunicorn preload 後 fork 出的 worker 會丟棄繼承自父進程的連線，不與父進程共用 socket
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._metrics: Dict[str, ConnectionMetrics] = {}
+        self._settings: Dict[str, Dict[str, Any]] = {}
+
+    def configure(self, provider: str, pool_config: Optional[Dict[str, Any]] = None):
+        """
+        設定提供商的連線池參數；設定改變時關閉既有 session，下次取用時重建
+
+        Args:
+            provider: 提供商名稱（例如 openai）
+            pool_config: pool_connections / pool_maxsize / pool_block
+        """
+        settings = get_pool_settings(pool_config)
+        with self._lock:
+            if self._settings.get(provider) == settings:
+                return
+            self._settings[provider] = settings
+            session = self._sessions.pop(provider, None)
+        if session is not None:
+            session.close()
+
+    def get_session(self, provider: str) -> requests.Session:
+        """取得（必要時建立）提供商的共用 session"""
+        session = self._sessions.get(provider)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(provider)
+            if session is None:
+                settings = self._settings.get(provider) or get_pool_settings()
+                metrics = self._metrics.setdefault(provider, ConnectionMetrics())
+                session = requests.Session()
+                adapter = InstrumentedHTTPAdapter(metrics, **settings)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[provider] = session
+                logger.info(
+                    f"Created shared HTTP session for {provider} "
+                    f"(pool_connections={settings['pool_connections']}, pool_maxsize={settings['pool_maxsize']})"
+                )
+        return session
+
+    def after_fork(self):
+        """fork 後於子進程丟棄繼承的 session（不關閉父進程仍在使用的 socket）"""
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def close_all(self):
+        """關閉並移除所有 session"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得各提供商的連線重用與建立連線耗時統計"""
+        stats = {}
+        for provider, metrics in list(self._metrics.items()):
+            settings = self._settings.get(provider) or get_pool_settings()
+            stats[provider] = dict(metrics.snapshot(), **settings)
+        return stats
+
+
+_http_registry = HTTPSessionRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: _http_registry.after_fork())
+
+
+def get_http_registry() -> HTTPSessionRegistry:
+    """取得全域 HTTP session 註冊表"""
+    return _http_registry
+
+
+def get_http_session(provider: str) -> requests.Session:
+    """取得提供商的共用 HTTP session"""
+    return _http_registry.get_session(provider)
+
+
+def configure_http_pool(provider: str, pool_config: Optional[Dict[str, Any]] = None):
+    """設定提供商的連線池參數"""
+    _http_registry.configure(provider, pool_config)
@@ -41,6 +41,14 @@ class MCPClient:
         # 建立 session 設定
         self.session_timeout = aiohttp.ClientTimeout(total=self.timeout)
         self._session = None
+        self._session_loop = None
+        
+        # 連線池設定（session 跨呼叫保留時重用 keep-alive 連線）
+        pool_config = server_config.get('connection_pool', {})
+        self.pool_limit = pool_config.get('limit', 20)
+        self.pool_limit_per_host = pool_config.get('limit_per_host', 10)
+        self.keepalive_timeout = pool_config.get('keepalive_timeout', 60)
+        self.sessions_created = 0
         
         logger.info(f"Initialized MCP client for: {self.base_url}")
         if self.auth_config:
@@ -56,15 +64,29 @@ class MCPClient:
         await self.close()
     
     async def _ensure_session(self):
-        """確保 HTTP session 存在"""
+        """確保 HTTP session 存在且屬於目前的事件迴圈"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._session_loop is not None and self._session_loop is not loop:
+            # aiohttp session 綁定建立時的事件迴圈，不能在其他迴圈（或 fork 後的子進程）中使用
+            logger.debug("Dropping MCP session bound to another event loop")
+            self._session = None
+        
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(timeout=self.session_timeout)
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(timeout=self.session_timeout, connector=connector)
+            self._session_loop = loop
+            self.sessions_created += 1
     
     async def close(self):
         """關閉 HTTP session"""
         if self._session and not self._session.closed:
             await self._session.close()
-            self._session = None
+        self._session = None
+        self._session_loop = None
     
     @retry_with_backoff(max_retries=3, base_delay=1.0)
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
@@ -7,21 +7,156 @@ MCP 設定載入和管理器
 - 支援設定檔案驗證和熱重載
 """
 
+import hashlib
 import json
 import os
-from typing import Dict, List, Any, Optional, Tuple
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Dict, List, Any, Mapping, Optional, Tuple
 from ..core.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 兩次檢查設定檔案是否變更（stat）之間的最短秒數
+CONFIG_CHECK_INTERVAL = 1.0
+
+ArgumentValidator = Callable[[Dict[str, Any]], Tuple[bool, Optional[str]]]
+
+
+@dataclass(frozen=True)
+class CompiledMCPConfig:
+    """
+    預先編譯的 MCP 設定（每個設定檔版本只建立一次）
+    
+    各模型格式的 function schemas 與參數驗證器都在載入時建立，
+    呼叫時只需查表；內容視為唯讀，呼叫端不應修改
+    """
+    version: str
+    functions: Mapping[str, Dict[str, Any]]
+    openai_schemas: Tuple[Dict[str, Any], ...]
+    gemini_schemas: Tuple[Dict[str, Any], ...]
+    anthropic_prompt: str
+    validators: Mapping[str, ArgumentValidator]
+
+
+def _compile_validator(validation: Dict[str, Any]) -> ArgumentValidator:
+    """將 tools.<name>.validation 轉為驗證函數（必填欄位與欄位限制只解析一次）"""
+    required_fields = tuple(validation.get('required_fields', []))
+    field_limits = tuple(validation.get('field_limits', {}).items())
+    
+    def validate(arguments: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+        # 檢查必填欄位
+        for required_field in required_fields:
+            if required_field not in arguments:
+                return False, f"Missing required field: {required_field}"
+        
+        # 檢查欄位限制
+        for field_name, limits in field_limits:
+            if field_name in arguments:
+                value = arguments[field_name]
+                
+                # 檢查陣列長度
+                if isinstance(value, list):
+                    if 'max_items' in limits and len(value) > limits['max_items']:
+                        return False, f"Field {field_name} exceeds max items: {limits['max_items']}"
+                
+                # 檢查字串長度
+                if isinstance(value, str):
+                    if 'max_length' in limits and len(value) > limits['max_length']:
+                        return False, f"Field {field_name} exceeds max length: {limits['max_length']}"
+                
+                # 檢查數值範圍
+                if isinstance(value, int):
+                    if 'min' in limits and value < limits['min']:
+                        return False, f"Field {field_name} below minimum: {limits['min']}"
+                    if 'max' in limits and value > limits['max']:
+                        return False, f"Field {field_name} above maximum: {limits['max']}"
+        
+        return True, None
+    
+    return validate
+
+
+def compile_mcp_config(config: Dict[str, Any], version: str = "") -> CompiledMCPConfig:
+    """
+    編譯 MCP 設定：建立 OpenAI / Gemini / Anthropic schemas 與參數驗證器
+    
+    Args:
+        config: 已驗證的 MCP 設定
+        version: 設定檔內容的雜湊值
+    """
+    functions: Dict[str, Dict[str, Any]] = {}
+    for func in config['functions']:
+        functions.setdefault(func['name'], func)
+    
+    # 缺少 description / parameters 的函數以空值補齊，不影響其他函數載入
+    enabled = [
+        {'description': '', 'parameters': {'type': 'object', 'properties': {}}, **func}
+        for func in config['functions'] if func.get('enabled', True)
+    ]
+    
+    openai_schemas = tuple({
+        "type": "function",
+        "function": {
+            "name": func['name'],
+            "description": func['description'],
+            "parameters": func['parameters']
+        }
+    } for func in enabled)
+    
+    # Gemini function declaration 格式
+    gemini_schemas = tuple({
+        "name": func['name'],
+        "description": func['description'],
+        "parameters": func['parameters']
+    } for func in enabled)
+    
+    functions_desc = []
+    for func in enabled:
+        func_desc = f"Function: {func['name']}\n"
+        func_desc += f"Description: {func['description']}\n"
+        func_desc += f"Parameters: {json.dumps(func['parameters'], ensure_ascii=False, indent=2)}\n"
+        
+        # 新增使用範例
+        if 'usage_examples' in func:
+            func_desc += "Examples:\n"
+            for example in func['usage_examples']:
+                func_desc += f"- {example['description']}: {json.dumps(example['arguments'], ensure_ascii=False)}\n"
+        
+        functions_desc.append(func_desc)
+    
+    anthropic_prompt = "Available tools:\n\n" + "\n".join(functions_desc)
+    anthropic_prompt += "\nTo use a tool, respond with a JSON object containing 'function_name' and 'arguments'."
+    
+    validators = {
+        name: _compile_validator(tool_config['validation'])
+        for name, tool_config in config['tools'].items()
+        if isinstance(tool_config, dict) and 'validation' in tool_config
+    }
+    
+    return CompiledMCPConfig(
+        version=version,
+        functions=MappingProxyType(functions),
+        openai_schemas=openai_schemas,
+        gemini_schemas=gemini_schemas,
+        anthropic_prompt=anthropic_prompt,
+        validators=MappingProxyType(validators)
+    )
+
 
 class MCPConfigManager:
     """MCP 設定載入和管理器"""
     
-    def __init__(self, config_dir: str = "config/mcp"):
+    def __init__(self, config_dir: str = "config/mcp", check_interval: float = CONFIG_CHECK_INTERVAL):
         self.config_dir = config_dir
+        self.check_interval = check_interval
         self._config_cache = {}
         self._last_modified = {}
+        self._content_hash: Dict[str, str] = {}
+        self._last_checked: Dict[str, float] = {}
+        self._compiled: Dict[str, CompiledMCPConfig] = {}
+        self._default_config: Optional[Tuple[str, float]] = None
     
     def load_mcp_config(self, config_name: str = None) -> Dict[str, Any]:
         """
@@ -39,36 +174,66 @@ class MCPConfigManager:
         """
         try:
             if config_name is None:
-                config_name = self._find_available_config()
+                config_name = self._get_default_config_name()
             
             config_path = os.path.join(self.config_dir, config_name)
             
+            # 距離上次檢查不到 check_interval 秒時直接使用快取（不做 stat）
+            cached = self._config_cache.get(config_name)
+            if cached is not None and time.monotonic() - self._last_checked.get(config_path, 0) < self.check_interval:
+                return cached
+            
             # 檢查檔案是否存在
             if not os.path.exists(config_path):
                 raise FileNotFoundError(f"MCP config file not found: {config_path}")
             
             # 檢查是否需要重新載入
-            if self._should_reload(config_path):
-                logger.info(f"Loading MCP config from: {config_path}")
+            if self._should_reload(config_path) or config_name not in self._config_cache:
+                with open(config_path, 'rb') as f:
+                    raw = f.read()
+                content_hash = hashlib.sha256(raw).hexdigest()
                 
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                
-                # 驗證設定檔案
-                self._validate_config(config)
+                # 只有內容真的改變時才重新解析與編譯（touch 或重寫相同內容不算）
+                if content_hash != self._content_hash.get(config_path) or config_name not in self._config_cache:
+                    logger.info(f"Loading MCP config from: {config_path}")
+                    config = json.loads(raw.decode('utf-8'))
+                    
+                    # 驗證設定檔案
+                    self._validate_config(config)
+                    
+                    # 更新快取與編譯結果
+                    self._config_cache[config_name] = config
+                    self._compiled[config_name] = compile_mcp_config(config, content_hash)
+                    self._content_hash[config_path] = content_hash
+                    
+                    logger.info(f"Successfully loaded MCP config: {config_name}")
                 
-                # 更新快取
-                self._config_cache[config_name] = config
                 self._last_modified[config_path] = os.path.getmtime(config_path)
-                
-                logger.info(f"Successfully loaded MCP config: {config_name}")
             
+            self._last_checked[config_path] = time.monotonic()
             return self._config_cache[config_name]
             
         except Exception as e:
             logger.error(f"Failed to load MCP config {config_name}: {e}")
             raise
     
+    def get_compiled_config(self, config_name: str = None) -> CompiledMCPConfig:
+        """取得預先編譯的設定（必要時載入）"""
+        if config_name is None:
+            config_name = self._get_default_config_name()
+        self.load_mcp_config(config_name)
+        return self._compiled[config_name]
+    
+    def _get_default_config_name(self) -> str:
+        """取得自動選擇的設定檔案名稱（check_interval 內不重新列出目錄）"""
+        if self._default_config is not None:
+            name, checked_at = self._default_config
+            if time.monotonic() - checked_at < self.check_interval:
+                return name
+        name = self._find_available_config()
+        self._default_config = (name, time.monotonic())
+        return name
+    
     def _find_available_config(self) -> str:
         """尋找可用的設定檔案"""
         if not os.path.exists(self.config_dir):
@@ -128,47 +293,15 @@ class MCPConfigManager:
     
     def get_function_schemas_for_openai(self, config_name: str = None) -> List[Dict[str, Any]]:
         """取得 OpenAI function calling 格式的 schemas"""
-        config = self.load_mcp_config(config_name)
-        schemas = []
-        
-        for func in config['functions']:
-            if func.get('enabled', True):
-                schema = {
-                    "type": "function",
-                    "function": {
-                        "name": func['name'],
-                        "description": func['description'],
-                        "parameters": func['parameters']
-                    }
-                }
-                schemas.append(schema)
-        
-        logger.debug(f"Generated {len(schemas)} OpenAI function schemas")
-        return schemas
+        return list(self.get_compiled_config(config_name).openai_schemas)
+    
+    def get_function_schemas_for_gemini(self, config_name: str = None) -> List[Dict[str, Any]]:
+        """取得 Gemini function declaration 格式的 schemas"""
+        return list(self.get_compiled_config(config_name).gemini_schemas)
     
     def get_function_schemas_for_anthropic(self, config_name: str = None) -> str:
         """取得 Anthropic system prompt 格式的 function schemas"""
-        config = self.load_mcp_config(config_name)
-        
-        functions_desc = []
-        for func in config['functions']:
-            if func.get('enabled', True):
-                func_desc = f"Function: {func['name']}\n"
-                func_desc += f"Description: {func['description']}\n"
-                func_desc += f"Parameters: {json.dumps(func['parameters'], ensure_ascii=False, indent=2)}\n"
-                
-                # 新增使用範例
-                if 'usage_examples' in func:
-                    func_desc += "Examples:\n"
-                    for example in func['usage_examples']:
-                        func_desc += f"- {example['description']}: {json.dumps(example['arguments'], ensure_ascii=False)}\n"
-                
-                functions_desc.append(func_desc)
-        
-        prompt = "Available tools:\n\n" + "\n".join(functions_desc)
-        prompt += "\nTo use a tool, respond with a JSON object containing 'function_name' and 'arguments'."
-        
-        return prompt
+        return self.get_compiled_config(config_name).anthropic_prompt
     
     def get_tool_config(self, function_name: str, config_name: str = None) -> Optional[Dict[str, Any]]:
         """取得特定工具的設定"""
@@ -177,56 +310,20 @@ class MCPConfigManager:
     
     def get_function_by_name(self, function_name: str, config_name: str = None) -> Optional[Dict[str, Any]]:
         """根據函數名稱取得函數設定"""
-        config = self.load_mcp_config(config_name)
-        
-        for func in config['functions']:
-            if func['name'] == function_name:
-                return func
-        
-        return None
+        return self.get_compiled_config(config_name).functions.get(function_name)
     
     def validate_function_arguments(self, function_name: str, arguments: Dict[str, Any], config_name: str = None) -> Tuple[bool, Optional[str]]:
         """驗證函數參數"""
         try:
-            func_config = self.get_function_by_name(function_name, config_name)
-            if not func_config:
+            compiled = self.get_compiled_config(config_name)
+            if function_name not in compiled.functions:
                 return False, f"Unknown function: {function_name}"
             
-            tool_config = self.get_tool_config(function_name, config_name)
-            if not tool_config or 'validation' not in tool_config:
+            validator = compiled.validators.get(function_name)
+            if validator is None:
                 return True, None  # 沒有驗證規則就通過
             
-            validation = tool_config['validation']
-            
-            # 檢查必填欄位
-            for required_field in validation.get('required_fields', []):
-                if required_field not in arguments:
-                    return False, f"Missing required field: {required_field}"
-            
-            # 檢查欄位限制
-            field_limits = validation.get('field_limits', {})
-            for field_name, limits in field_limits.items():
-                if field_name in arguments:
-                    value = arguments[field_name]
-                    
-                    # 檢查陣列長度
-                    if isinstance(value, list):
-                        if 'max_items' in limits and len(value) > limits['max_items']:
-                            return False, f"Field {field_name} exceeds max items: {limits['max_items']}"
-                    
-                    # 檢查字串長度
-                    if isinstance(value, str):
-                        if 'max_length' in limits and len(value) > limits['max_length']:
-                            return False, f"Field {field_name} exceeds max length: {limits['max_length']}"
-                    
-                    # 檢查數值範圍
-                    if isinstance(value, int):
-                        if 'min' in limits and value < limits['min']:
-                            return False, f"Field {field_name} below minimum: {limits['min']}"
-                        if 'max' in limits and value > limits['max']:
-                            return False, f"Field {field_name} above maximum: {limits['max']}"
-            
-            return True, None
+            return validator(arguments)
             
         except Exception as e:
             logger.error(f"Error validating function arguments: {e}")
@@ -249,15 +346,20 @@ class MCPConfigManager:
             # 清除所有快取
             self._config_cache.clear()
             self._last_modified.clear()
+            self._content_hash.clear()
+            self._last_checked.clear()
+            self._compiled.clear()
+            self._default_config = None
             logger.info("Cleared all MCP config cache")
         else:
             # 清除特定設定檔案的快取
-            if config_name in self._config_cache:
-                del self._config_cache[config_name]
+            self._config_cache.pop(config_name, None)
+            self._compiled.pop(config_name, None)
             
             config_path = os.path.join(self.config_dir, config_name)
-            if config_path in self._last_modified:
-                del self._last_modified[config_path]
+            self._last_modified.pop(config_path, None)
+            self._content_hash.pop(config_path, None)
+            self._last_checked.pop(config_path, None)
             
             logger.info(f"Cleared MCP config cache for: {config_name}")
     
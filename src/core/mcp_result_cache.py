@@ -0,0 +1,165 @@
+"""
+MCP 工具結果快取
+議會會議、議員與提案查詢等工具以讀取為主，同一段時間內許多使用者會重複相同查詢。
+以 (mcp_tool, 正規化參數) 為鍵快取成功的結果，每個工具各自設定 TTL，
+同時進行的相同呼叫只會送出一次請求（single-flight）
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CacheKey = Tuple[str, str]
+
+
+def canonicalize_arguments(arguments: Dict[str, Any]) -> str:
+    """將參數轉為固定格式的字串（鍵排序、無多餘空白），作為快取鍵的一部分"""
+    return json.dumps(arguments or {}, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class MCPResultCache:
+    """
+    有界的 MCP 工具結果快取
+
+    特色功能：
+    - 每個項目各自的到期時間（依工具設定的 TTL）
+    - 以項目數與估計位元組數限制記憶體，超過時淘汰最久未使用的項目
+    - 同一個鍵同時只會有一個進行中的呼叫，其他呼叫等待同一個結果
+    - 只快取成功的結果，失敗與例外不會被快取
+    """
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 8 * 1024 * 1024):
+        """
+        初始化結果快取
+
+        Args:
+            max_entries: 最多保留的結果數
+            max_bytes: 所有結果序列化後的總大小上限（估計值）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # key -> (到期時間, 大小, 結果)
+        self._entries: 'OrderedDict[CacheKey, Tuple[float, int, Dict[str, Any]]]' = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._bytes = 0
+
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(mcp_tool: str, arguments: Dict[str, Any]) -> CacheKey:
+        """建立快取鍵"""
+        return mcp_tool, canonicalize_arguments(arguments)
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """取得未過期的結果，沒有則返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, result = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def set(self, key: CacheKey, result: Dict[str, Any], ttl: float) -> None:
+        """保存結果（超過容量時淘汰最久未使用的項目）"""
+        size = len(canonicalize_arguments(result))
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, size, result)
+            self._bytes += size
+            self.stores += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: CacheKey) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get_or_call(self, key: CacheKey, ttl: float,
+                          call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        取得快取結果，沒有時執行 call 並快取成功的結果
+
+        同一個鍵已有進行中的呼叫時等待該呼叫的結果（須在同一個事件迴圈中使用）
+
+        Args:
+            key: 快取鍵
+            ttl: 結果有效秒數
+            call: 實際呼叫 MCP 工具的函數
+        """
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+            if result.get('success', True):
+                self.set(key, result, ttl)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 沒有其他等待者時避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        """清除所有快取結果"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得快取統計資訊"""
+        with self._lock:
+            entries = len(self._entries)
+            size = self._bytes
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'inflight': len(self._inflight),
+            'hit_rate': f"{((self.hits + self.coalesced) / lookups * 100) if lookups else 0:.1f}%",
+        }
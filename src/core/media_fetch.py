@@ -0,0 +1,235 @@
+"""
+媒體預取
+webhook 解析時只排入下載工作並立即返回，下載在有上限的背景執行緒池中並行進行，
+內容以串流方式寫入 SpooledTemporaryFile（小檔留在記憶體，超過門檻改寫入磁碟），
+並限制單一檔案大小，避免大型語音訊息佔滿 worker 記憶體或延遲 webhook 回應
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+from .exceptions import PlatformError
+from .http_pool import get_http_session
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_SETTINGS = {
+    'max_concurrent': 4,                   # 同時下載的檔案數
+    'max_bytes': 25 * 1024 * 1024,         # 單一檔案大小上限（語音轉錄 API 的上限）
+    'spool_threshold': 1024 * 1024,        # 超過此大小改寫入磁碟暫存檔
+    'timeout': 60,                         # 等待下載完成的秒數
+}
+
+
+class MediaTooLargeError(PlatformError):
+    """媒體檔案超過大小上限"""
+    pass
+
+
+class _CappedWriter:
+    """寫入時檢查大小上限的檔案包裝"""
+
+    def __init__(self, target: BinaryIO, max_bytes: int):
+        self.target = target
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise MediaTooLargeError(f"Media exceeds size limit of {self.max_bytes} bytes")
+        return self.target.write(data)
+
+    def flush(self):
+        self.target.flush()
+
+
+class MediaHandle:
+    """
+    背景下載中的媒體
+
+    提供類檔案介面（read / seek / tell），第一次讀取時等待下載完成；
+    下載失敗或超過大小上限時在讀取時拋出對應的例外
+    """
+
+    def __init__(self, future: Future, name: str, timeout: float):
+        self._future = future
+        self.name = name
+        self.timeout = timeout
+
+    def _file(self, timeout: Optional[float] = None) -> BinaryIO:
+        try:
+            return self._future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            raise PlatformError(f"Media download timed out: {self.name}")
+
+    def result(self, timeout: Optional[float] = None) -> BinaryIO:
+        """等待下載完成，返回位於開頭的暫存檔"""
+        spooled = self._file(timeout)
+        spooled.seek(0)
+        return spooled
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    @property
+    def size(self) -> int:
+        spooled = self._file()
+        position = spooled.tell()
+        size = spooled.seek(0, os.SEEK_END)
+        spooled.seek(position)
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file().read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file().seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file().tell()
+
+    def close(self):
+        """釋放暫存檔（下載尚未完成時取消）"""
+        if self._future.cancel():
+            return
+        try:
+            self._future.result(self.timeout).close()
+        except Exception:
+            pass
+
+
+class MediaFetcher:
+    """
+    有界並行的媒體下載器
+
+    download 函數接收一個可寫入的檔案物件，以串流方式寫入內容；
+    寫入超過 max_bytes 時中止下載
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_bytes: int = 25 * 1024 * 1024,
+                 spool_threshold: int = 1024 * 1024, timeout: float = 60):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_bytes = int(max_bytes)
+        self.spool_threshold = int(spool_threshold)
+        self.timeout = float(timeout)
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # 統計資訊
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.too_large = 0
+        self.bytes_fetched = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                        thread_name_prefix='MediaFetch')
+        return self._executor
+
+    def submit(self, download: Callable[[BinaryIO], Any], name: str = 'media') -> MediaHandle:
+        """
+        排入背景下載
+
+        Args:
+            download: 將內容寫入傳入檔案物件的函數
+            name: 媒體名稱（用於記錄與轉錄 API 的檔名）
+
+        Returns:
+            MediaHandle: 可於稍後讀取的下載結果
+        """
+        self.submitted += 1
+        future = self._get_executor().submit(self._run, download, name)
+        return MediaHandle(future, name, self.timeout)
+
+    def _run(self, download: Callable[[BinaryIO], Any], name: str) -> BinaryIO:
+        spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold, prefix='chatbot_media_')
+        writer = _CappedWriter(spooled, self.max_bytes)
+        try:
+            download(writer)
+        except MediaTooLargeError:
+            spooled.close()
+            self.too_large += 1
+            logger.warning(f"Media {name} exceeds {self.max_bytes} bytes, download aborted")
+            raise
+        except Exception as e:
+            spooled.close()
+            self.failed += 1
+            logger.error(f"Media {name} download failed: {e}")
+            raise
+        self.completed += 1
+        self.bytes_fetched += writer.size
+        logger.debug(f"Media {name} downloaded ({writer.size} bytes)")
+        spooled.seek(0)
+        return spooled
+
+    def fetch_url(self, url: str, headers: Optional[Dict[str, str]] = None, name: str = 'media') -> MediaHandle:
+        """排入以 HTTP GET 串流下載 URL 的工作"""
+        return self.submit(lambda sink: stream_url(url, sink, headers, self.timeout), name)
+
+    def after_fork(self):
+        """fork 後於子進程丟棄繼承的執行緒池"""
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得下載統計資訊"""
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_bytes': self.max_bytes,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'too_large': self.too_large,
+            'bytes_fetched': self.bytes_fetched,
+        }
+
+
+def stream_url(url: str, sink: BinaryIO, headers: Optional[Dict[str, str]] = None, timeout: float = 60) -> None:
+    """以共用連線池串流下載 URL，逐塊寫入 sink"""
+    with get_http_session('media').get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        content_length = response.headers.get('Content-Length')
+        max_bytes = getattr(sink, 'max_bytes', None)
+        if content_length and max_bytes and int(content_length) > max_bytes:
+            raise MediaTooLargeError(f"Media exceeds size limit of {max_bytes} bytes")
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if chunk:
+                sink.write(chunk)
+
+
+_media_fetcher = MediaFetcher()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: _media_fetcher.after_fork())
+
+
+def get_media_fetcher() -> MediaFetcher:
+    """取得全域媒體下載器"""
+    return _media_fetcher
+
+
+def configure_media_fetcher(config: Optional[Dict[str, Any]] = None) -> MediaFetcher:
+    """依設定重建全域媒體下載器"""
+    global _media_fetcher
+    settings = dict(DEFAULT_SETTINGS, **{k: v for k, v in (config or {}).items() if k in DEFAULT_SETTINGS})
+    _media_fetcher.shutdown()
+    _media_fetcher = MediaFetcher(**settings)
+    return _media_fetcher
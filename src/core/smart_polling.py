@@ -1,10 +1,15 @@
 """
 智慧輪詢策略模組
-實施用戶建議的 5s→3s→2s→1s→1s 輪詢策略
+實施用戶建議的 5s→3s→2s→1s→1s 輪詢策略，
+並以各狀態實際持續時間的線上直方圖學習檢查時間點（AdaptivePollingStrategy）
 """
 
+import json
+import math
+import os
+import threading
 import time
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Sequence
 from .logger import get_logger
 
 logger = get_logger(__name__)
@@ -19,13 +24,14 @@ class SmartPollingStrategy:
         self.final_interval = 1  # 之後固定1秒
         self.max_wait_time = 120  # 增加最大等待時間支援 MCP
         
-    def get_wait_time(self, attempt: int, status: str) -> float:
+    def get_wait_time(self, attempt: int, status: str, status_elapsed: float = None) -> float:
         """
         根據嘗試次數和狀態決定等待時間
         
         Args:
             attempt: 嘗試次數（從0開始）
             status: 當前狀態
+            status_elapsed: 已處於此狀態的秒數（固定序列不使用）
             
         Returns:
             等待時間（秒）
@@ -56,6 +62,10 @@ class SmartPollingStrategy:
         """取得最大等待時間"""
         return self.max_wait_time
     
+    def record_status_duration(self, status: str, duration: float) -> None:
+        """記錄某狀態實際持續的秒數（固定序列不需要，供自適應策略覆寫）"""
+        pass
+    
     def should_continue_polling(self, elapsed_time: float) -> bool:
         """判斷是否應該繼續輪詢"""
         return elapsed_time < self.max_wait_time
@@ -81,12 +91,18 @@ class SmartPollingStrategy:
 class PollingContext:
     """輪詢上下文 - 管理單次輪詢操作的狀態"""
     
-    def __init__(self, operation_name: str, polling_strategy: SmartPollingStrategy = None):
+    def __init__(self, operation_name: str, polling_strategy: SmartPollingStrategy = None,
+                 max_wait_time: float = None):
         self.operation_name = operation_name
         self.strategy = polling_strategy or SmartPollingStrategy()
+        # 單次輪詢的等待上限（不修改共用策略的 max_wait_time）
+        self.max_wait_time = max_wait_time
         self.start_time = time.time()
         self.attempt_count = 0
         self.last_status = None
+        # 目前狀態的起始時間與最後一次檢查時間，用於回報各狀態的持續時間
+        self._status_since = self.start_time
+        self._last_check = self.start_time
     
     def __enter__(self):
         logger.info(f"開始智慧輪詢: {self.operation_name}")
@@ -105,6 +121,41 @@ class PollingContext:
         
         return False  # 不抑制異常
     
+    def observe(self, status: str, now: float = None) -> None:
+        """
+        記錄一次檢查結果；狀態改變時將上一個狀態的持續時間回報給策略
+        
+        Args:
+            status: 本次檢查的狀態
+            now: 檢查時間，None 表示現在
+        """
+        now = time.time() if now is None else now
+        if status != self.last_status:
+            if self.last_status is not None:
+                # 狀態在上次與本次檢查之間改變，以中點估計改變時間
+                changed_at = (self._last_check + now) / 2
+                self.strategy.record_status_duration(self.last_status, changed_at - self._status_since)
+                self._status_since = changed_at
+            self.last_status = status
+        self._last_check = now
+    
+    def next_wait(self) -> float:
+        """依目前狀態與已持續時間向策略取得下次檢查前的等待秒數"""
+        return self.strategy.get_wait_time(
+            self.attempt_count, self.last_status, status_elapsed=self._last_check - self._status_since
+        )
+    
+    def should_continue(self, elapsed: float) -> bool:
+        """判斷是否仍在等待上限內"""
+        if self.max_wait_time:
+            return elapsed < self.max_wait_time
+        return self.strategy.should_continue_polling(elapsed)
+    
+    def remaining(self) -> float:
+        """距離等待上限的剩餘秒數"""
+        limit = self.max_wait_time or self.strategy.get_max_wait_time()
+        return limit - (time.time() - self.start_time)
+    
     def wait_for_condition(
         self, 
         check_function: Callable[[], tuple[bool, str, Any]], 
@@ -129,15 +180,16 @@ class PollingContext:
                 # Handle test scenarios where time.time() is mocked with limited values
                 return False, None, "Request timeout"
             
-            if not self.strategy.should_continue_polling(current_time - self.start_time):
+            if not self.should_continue(current_time - self.start_time):
                 break
             try:
                 # 執行檢查
                 is_successful, status, data = check_function()
-                self.last_status = status
                 
                 if not is_successful:
+                    self.last_status = status
                     return False, None, f"檢查操作失敗: {data}"
+                self.observe(status, current_time)
                 
                 # 檢查完成狀態
                 if status in completion_statuses:
@@ -157,7 +209,7 @@ class PollingContext:
                     return False, data, error_msg
                 
                 # 計算等待時間並等待
-                wait_time = self.strategy.get_wait_time(self.attempt_count, status)
+                wait_time = self.next_wait()
                 try:
                     elapsed_time = time.time() - self.start_time
                     self.strategy.log_polling_attempt(
@@ -230,8 +282,188 @@ class OpenAIPollingStrategy(SmartPollingStrategy):
             'cancelling': 0.5,      # 取消中快速檢查
         }
     
-    def get_wait_time(self, attempt: int, status: str) -> float:
+    def get_wait_time(self, attempt: int, status: str, status_elapsed: float = None) -> float:
         """OpenAI 特定的等待時間計算"""
         base_wait = self._get_base_wait_time(attempt)
         multiplier = self.status_multipliers.get(status, 1.0)
-        return base_wait * multiplier
\ No newline at end of file
+        return base_wait * multiplier
+
+
+class LatencyHistogram:
+    """
+    對數分桶的線上延遲直方圖
+
+    桶寬隨延遲等比成長（0.25 秒起、每桶 ×1.25），短延遲有細緻解析度、長延遲也有足夠範圍；
+    總權重超過 max_weight 時整體減半，讓分布跟上近期變化
+    """
+
+    MIN_SECONDS = 0.25
+    GROWTH = 1.25
+    BUCKETS = 36  # 最後一桶涵蓋約 13 分鐘以上
+
+    def __init__(self, max_weight: float = 1000.0, counts: Sequence[float] = None):
+        self.max_weight = max_weight
+        if counts is not None and len(counts) == self.BUCKETS:
+            self.counts = [float(c) for c in counts]
+        else:
+            self.counts = [0.0] * self.BUCKETS
+        self.total = sum(self.counts)
+
+    @classmethod
+    def _upper_edge(cls, index: int) -> float:
+        return cls.MIN_SECONDS * cls.GROWTH ** index
+
+    @classmethod
+    def _bucket(cls, seconds: float) -> int:
+        if seconds < cls.MIN_SECONDS:
+            return 0
+        index = int(math.log(seconds / cls.MIN_SECONDS, cls.GROWTH)) + 1
+        return min(index, cls.BUCKETS - 1)
+
+    def add(self, seconds: float) -> None:
+        """加入一筆觀測值"""
+        self.counts[self._bucket(max(0.0, seconds))] += 1.0
+        self.total += 1.0
+        if self.total > self.max_weight:
+            self.counts = [c / 2 for c in self.counts]
+            self.total /= 2
+
+    def quantile(self, q: float) -> float:
+        """估計分位數（桶內線性內插）"""
+        if self.total <= 0:
+            return 0.0
+        target = min(max(q, 0.0), 1.0) * self.total
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            if count > 0 and cumulative + count >= target:
+                lower = 0.0 if index == 0 else self._upper_edge(index - 1)
+                upper = self._upper_edge(index)
+                return lower + (target - cumulative) / count * (upper - lower)
+            cumulative += count
+        return self._upper_edge(self.BUCKETS - 1)
+
+
+class AdaptivePollingStrategy(OpenAIPollingStrategy):
+    """
+    依觀測到的狀態持續時間分布安排檢查時間點的輪詢策略
+
+    特色功能：
+    - 每個 (provider, status) 維護一個 LatencyHistogram，記錄該狀態實際持續的秒數
+    - 在預測的分位數（例如 p25/p50/p75/p90/p95/p99）附近安排檢查，減少無效輪詢
+    - 超過預測尾端後改以 final_interval 密集檢查，等待間隔上限為 max_interval，控制尾端延遲
+    - 樣本數不足時沿用 OpenAIPollingStrategy 的固定序列
+    - 設定 path 時直方圖以 JSON 保存，重啟後沿用（多個 worker 共用時以最後寫入者為準）
+    """
+
+    def __init__(self, provider: str = 'openai', path: str = None,
+                 quantiles: Sequence[float] = (0.25, 0.5, 0.75, 0.9, 0.95, 0.99),
+                 min_samples: int = 20, min_interval: float = 0.5, max_interval: float = 5.0,
+                 save_interval: float = 60.0):
+        super().__init__()
+        self.provider = provider
+        self.path = path
+        self.quantiles = sorted(quantiles)
+        self.min_samples = min_samples
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.save_interval = save_interval
+
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._last_save = time.time()
+        self._dirty = False
+        self.adaptive_waits = 0
+        self.fallback_waits = 0
+        if path:
+            self._load()
+
+    def _key(self, status: str) -> str:
+        return f"{self.provider}:{status}"
+
+    def get_wait_time(self, attempt: int, status: str, status_elapsed: float = None) -> float:
+        """在下一個尚未經過的預測分位數檢查；資料不足時使用固定序列"""
+        with self._lock:
+            histogram = self._histograms.get(self._key(status))
+            if status_elapsed is None or histogram is None or histogram.total < self.min_samples:
+                self.fallback_waits += 1
+                targets = None
+            else:
+                self.adaptive_waits += 1
+                targets = [histogram.quantile(q) for q in self.quantiles]
+
+        if targets is None:
+            return super().get_wait_time(attempt, status)
+
+        wait = next((target - status_elapsed for target in targets if target > status_elapsed), None)
+        if wait is None:
+            # 已超過預測的尾端，改以固定短間隔檢查
+            wait = self.final_interval
+        return min(max(wait, self.min_interval), self.max_interval)
+
+    def record_status_duration(self, status: str, duration: float) -> None:
+        """將狀態持續時間加入對應的直方圖"""
+        if not status or duration < 0:
+            return
+        with self._lock:
+            key = self._key(status)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.add(duration)
+            self._dirty = True
+            should_save = self.path and time.time() - self._last_save >= self.save_interval
+        if should_save:
+            self.save()
+
+    def predict(self, status: str) -> Dict[str, float]:
+        """取得某狀態持續時間的預測分位數"""
+        with self._lock:
+            histogram = self._histograms.get(self._key(status))
+            if histogram is None:
+                return {}
+            return {f"p{int(q * 100)}": round(histogram.quantile(q), 2) for q in self.quantiles}
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, counts in data.get('histograms', {}).items():
+                self._histograms[key] = LatencyHistogram(counts=counts)
+            logger.info(f"Loaded polling histograms from {self.path}: {len(self._histograms)} statuses")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Failed to load polling histograms from {self.path}: {e}")
+
+    def save(self) -> None:
+        """將直方圖寫入檔案（先寫暫存檔再取代，避免寫到一半的檔案）"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'histograms': {key: h.counts for key, h in self._histograms.items()}}
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save polling histograms to {self.path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得學習狀態"""
+        with self._lock:
+            samples = {key: round(h.total, 1) for key, h in self._histograms.items()}
+            adaptive, fallback = self.adaptive_waits, self.fallback_waits
+        return {
+            'provider': self.provider,
+            'path': self.path,
+            'samples': samples,
+            'adaptive_waits': adaptive,
+            'fallback_waits': fallback,
+        }
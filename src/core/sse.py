@@ -0,0 +1,43 @@
+"""
+Server-Sent Events 解析
+將 requests 串流回應拆解為 (event, data) 事件，供 OpenAI Assistants 等串流 API 使用
+"""
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+def iter_sse_events(lines: Iterable) -> Iterator[Tuple[Optional[str], str]]:
+    """
+    逐一產生 SSE 事件
+
+    Args:
+        lines: 逐行的回應內容（例如 response.iter_lines(decode_unicode=True)），可為 str 或 bytes
+
+    Yields:
+        (event, data): event 為事件名稱（未指定時為 None），data 為以換行串接的資料內容
+    """
+    event: Optional[str] = None
+    data_lines = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r')
+
+        if not line:
+            # 空行代表一個事件結束
+            if data_lines or event is not None:
+                yield event, '\n'.join(data_lines)
+            event, data_lines = None, []
+            continue
+        if line.startswith(':'):
+            continue  # 註解（keep-alive）
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            event = value
+        elif field == 'data':
+            data_lines.append(value)
+
+    if data_lines or event is not None:
+        yield event, '\n'.join(data_lines)
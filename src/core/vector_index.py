@@ -0,0 +1,312 @@
+"""
+本地知識庫向量索引
+將所有文件片段的嵌入向量正規化後存放於連續的 float32 矩陣，
+查詢時以單次矩陣向量乘積計算餘弦相似度，並以 argpartition 取出前 k 名；
+片段數量大時可選用 IVF 近似最近鄰索引，只對候選片段計算相似度
+"""
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .ann_index import IVFIndex
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class VectorIndex:
+    """
+    以檔案為單位增量維護的向量索引
+
+    特色功能：
+    - 嵌入向量於加入時正規化，查詢只需計算一次查詢向量的長度
+    - 矩陣以倍增容量成長，新增檔案不需重建整個矩陣
+    - sync() 依 knowledge_store 內容補齊或移除檔案，直接修改 knowledge_store 也能保持一致
+    - 查詢使用加入時的快照，與新增檔案並行時不需加鎖
+    - load() 可直接掛上磁碟的唯讀 mmap 矩陣，矩陣只在成長或移除時才複製
+    - 設定 ann 時，片段數達門檻後於背景訓練 IVF 索引，完成前與小型知識庫仍使用精確搜尋
+    """
+
+    def __init__(self, initial_capacity: int = 1024, ann: Optional[IVFIndex] = None):
+        self._lock = threading.RLock()
+        self._initial_capacity = max(1, int(initial_capacity))
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self.dimension: Optional[int] = None
+
+        # 近似最近鄰索引；列的位置因移除或整批載入而改變時遞增 _layout_version，
+        # 使訓練期間內容被改寫的結果作廢（單純新增的列則於套用時補上指派）
+        self.ann = ann
+        self._layout_version = 0
+
+        # 與矩陣列對應的片段資訊
+        self._file_ids: List[str] = []
+        self._filenames: List[str] = []
+        self._texts: List[str] = []
+
+        # file_id -> 建立索引時的 chunks 清單（用於 sync 判斷是否需要重建）
+        self._sources: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, file_id: str) -> bool:
+        return file_id in self._sources
+
+    def add_file(self, file_id: str, filename: str, chunks: List[Dict], source: Any = None) -> int:
+        """
+        加入（或取代）一個檔案的所有片段
+
+        Args:
+            file_id: 檔案 ID
+            filename: 檔案名稱
+            chunks: 含 'text' 與 'embedding' 的片段清單
+            source: 用於 sync 比對的來源物件，預設為 chunks 本身
+
+        Returns:
+            int: 加入索引的片段數
+        """
+        rows = []
+        texts = []
+        for chunk in chunks:
+            embedding = chunk.get('embedding')
+            if embedding is None:
+                continue
+            rows.append(embedding)
+            texts.append(chunk['text'])
+
+        with self._lock:
+            if file_id in self._sources:
+                self._remove_locked(file_id)
+            self._sources[file_id] = chunks if source is None else source
+
+            if not rows:
+                return 0
+
+            vectors = self._normalize(np.asarray(rows, dtype=np.float32))
+            if self.dimension is None or self._size == 0:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                logger.warning(
+                    f"Embedding dimension mismatch for {filename}: {vectors.shape[1]} != {self.dimension}, skipped"
+                )
+                return 0
+
+            self._reserve(self._size + len(vectors))
+            self._matrix[self._size:self._size + len(vectors)] = vectors
+            if self.ann is not None:
+                self.ann.on_add(self._size, vectors)
+            self._file_ids.extend([file_id] * len(vectors))
+            self._filenames.extend([filename] * len(vectors))
+            self._texts.extend(texts)
+            self._size += len(vectors)
+            return len(vectors)
+
+    def remove_file(self, file_id: str) -> None:
+        """移除一個檔案的所有片段"""
+        with self._lock:
+            if file_id in self._sources:
+                self._remove_locked(file_id)
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._matrix = None
+            self._size = 0
+            self.dimension = None
+            self._file_ids = []
+            self._filenames = []
+            self._texts = []
+            self._sources = {}
+            self._layout_changed()
+
+    def load(self, matrix: Optional[np.ndarray], file_ids: List[str], filenames: List[str],
+             texts: List[str], sources: Dict[str, Any]) -> None:
+        """
+        以已正規化的矩陣整批取代索引內容（不複製，可直接使用唯讀 mmap）
+
+        Args:
+            matrix: 已正規化的嵌入矩陣，列數需與 file_ids 相同
+            file_ids: 每一列的檔案 ID
+            filenames: 每一列的檔案名稱
+            texts: 每一列的片段文字
+            sources: file_id -> 用於 sync 比對的來源物件
+        """
+        size = 0 if matrix is None else matrix.shape[0]
+        if not (size == len(file_ids) == len(filenames) == len(texts)):
+            raise ValueError("Matrix rows and chunk metadata length mismatch")
+        with self._lock:
+            self._matrix = matrix if size else None
+            self._size = size
+            self.dimension = matrix.shape[1] if size else None
+            self._file_ids = list(file_ids)
+            self._filenames = list(filenames)
+            self._texts = list(texts)
+            self._sources = dict(sources)
+            self._layout_changed()
+
+    def sync(self, knowledge_store: Dict[str, Dict]) -> None:
+        """依 knowledge_store 補齊新增或變更的檔案，並移除已不存在的檔案"""
+        with self._lock:
+            for file_id in [fid for fid in self._sources if fid not in knowledge_store]:
+                self._remove_locked(file_id)
+            for file_id, data in knowledge_store.items():
+                chunks = data.get('chunks', [])
+                if self._sources.get(file_id) is not chunks:
+                    self.add_file(file_id, data.get('filename', file_id), chunks)
+
+    def search(self, query_embedding: Sequence[float], top_k: int = 3,
+               threshold: float = 0.0, inclusive: bool = True,
+               exact: bool = False, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        搜尋最相似的片段
+
+        Args:
+            query_embedding: 查詢向量
+            top_k: 返回數量
+            threshold: 最低相似度
+            inclusive: True 時保留相似度等於 threshold 的片段
+            exact: True 時略過 ANN 索引，強制精確搜尋
+            nprobe: 覆寫 ANN 索引每次探測的串列數（越大召回率越高）
+
+        Returns:
+            List[Dict]: 依相似度由高到低排序的片段（file_id、filename、text、similarity）
+        """
+        ann_snapshot = None
+        with self._lock:
+            size = self._size
+            matrix = self._matrix
+            file_ids, filenames, texts = self._file_ids, self._filenames, self._texts
+            if self.ann is not None and not exact:
+                ann_snapshot = self.ann.snapshot(size)
+                # 成長超過 retrain_growth 倍時於背景重新訓練，完成前沿用目前的串列
+                if self.ann.needs_training(size):
+                    self.ann.start_training(self._training_snapshot, self._install_training)
+
+        if size == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        if query.shape[0] != matrix.shape[1]:
+            logger.warning(f"Query embedding dimension {query.shape[0]} does not match index dimension {matrix.shape[1]}")
+            return []
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return []
+
+        query = query / norm
+
+        rows = None
+        if ann_snapshot is not None:
+            rows = self.ann.candidates(ann_snapshot, query, nprobe)
+            scores = matrix[rows] @ query
+        else:
+            scores = matrix[:size] @ query
+        if self.ann is not None:
+            self.ann.record_query(rows is not None)
+        return self._top_k(scores, top_k, threshold, inclusive, file_ids, filenames, texts, rows)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int, threshold: float, inclusive: bool,
+               file_ids: List[str], filenames: List[str], texts: List[str],
+               rows: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """以 argpartition 取出前 k 名並過濾相似度（rows 為 scores 對應的矩陣列，None 表示全部）"""
+        k = min(top_k, scores.shape[0])
+        if k <= 0:
+            return []
+        if k < scores.shape[0]:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        results = []
+        for position in order:
+            similarity = float(scores[position])
+            if similarity < threshold or (not inclusive and similarity == threshold):
+                break
+            idx = position if rows is None else rows[position]
+            results.append({
+                'file_id': file_ids[idx],
+                'filename': filenames[idx],
+                'text': texts[idx],
+                'similarity': similarity
+            })
+        return results
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """將每一列正規化為單位向量（零向量維持為零）"""
+        if vectors.ndim != 2:
+            raise ValueError(f"Embeddings must be a 2-D array, got shape {vectors.shape}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, required: int) -> None:
+        """確保矩陣容量足夠（倍增成長，既有查詢快照不受影響）"""
+        if self._matrix is not None and self._matrix.shape[0] >= required:
+            return
+        capacity = self._initial_capacity if self._matrix is None else self._matrix.shape[0]
+        while capacity < required:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        if self._matrix is not None and self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+    def _layout_changed(self) -> None:
+        """列的位置整批改變，捨棄 ANN 訓練結果"""
+        self._layout_version += 1
+        if self.ann is not None:
+            self.ann.reset()
+
+    def _training_snapshot(self):
+        """提供背景訓練使用的矩陣快照（前 size 列在版本不變時不會被改寫）"""
+        with self._lock:
+            return self._matrix, self._size, self._layout_version
+
+    def _install_training(self, version: int, centroids: np.ndarray,
+                          assignments: np.ndarray, trained_size: int) -> bool:
+        """套用背景訓練結果，訓練期間新增的列於此補上指派"""
+        with self._lock:
+            if version != self._layout_version or self._size < trained_size:
+                return False
+            if self._size > trained_size:
+                extra = IVFIndex._assign(self._matrix[trained_size:self._size], centroids)
+                assignments = np.concatenate([assignments, extra])
+            self.ann.install(centroids, assignments, trained_size)
+            return True
+
+    def _remove_locked(self, file_id: str) -> None:
+        """移除檔案並壓縮矩陣（建立新陣列，不影響進行中的查詢）"""
+        del self._sources[file_id]
+        keep = [i for i, fid in enumerate(self._file_ids) if fid != file_id]
+        if len(keep) == self._size:
+            return
+
+        matrix = np.zeros(self._matrix.shape, dtype=np.float32)
+        if keep:
+            matrix[:len(keep)] = self._matrix[keep]
+        self._matrix = matrix
+        self._file_ids = [self._file_ids[i] for i in keep]
+        self._filenames = [self._filenames[i] for i in keep]
+        self._texts = [self._texts[i] for i in keep]
+        previous_size, self._size = self._size, len(keep)
+        self._layout_version += 1
+        if self.ann is not None:
+            self.ann.on_remove(keep, previous_size)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得索引統計資訊"""
+        with self._lock:
+            capacity = 0 if self._matrix is None else self._matrix.shape[0]
+            return {
+                'files': len(self._sources),
+                'chunks': self._size,
+                'dimension': self.dimension,
+                'capacity': capacity,
+                'memory_bytes': 0 if self._matrix is None else int(self._matrix.nbytes),
+                'ann': None if self.ann is None else self.ann.get_stats(),
+            }
@@ -0,0 +1,383 @@
+"""
+本地知識庫的磁碟持久化向量索引
+嵌入矩陣以 .npy 檔案存放並以唯讀 mmap 開啟，多個 gunicorn worker 共用同一份 page cache；
+片段文字與檔案資訊存放於 manifest.json，並以內容 sha256 為鍵，相同內容的檔案共用嵌入向量
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .logger import get_logger
+from .vector_index import VectorIndex
+
+logger = get_logger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+FORMAT_VERSION = 1
+
+
+def content_hash(content: str) -> str:
+    """計算檔案內容的 sha256"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class PersistentVectorStore:
+    """
+    磁碟持久化的知識庫向量索引
+
+    目錄結構：
+    - manifest.json: 版本、世代編號、嵌入矩陣檔名、contents（sha256 -> 內容與片段）與 files（file_id -> 檔名與 sha256）
+    - embeddings-<generation>.npy: 所有片段正規化後的 float32 嵌入矩陣（依 contents 的 row_start/row_count 對應）
+
+    特色功能：
+    - 讀取端以 np.load(mmap_mode='r') 開啟矩陣，啟動時只需解析 manifest，不需重新計算嵌入向量
+    - 寫入端持有 flock 後重新讀取最新 manifest、寫入新世代的矩陣，再以 os.replace 原子替換 manifest
+    - 其他 worker 於查詢時（最多每 reload_interval 秒）檢查 manifest 是否變更並重新載入
+    """
+
+    def __init__(self, directory: str, reload_interval: float = 2.0):
+        """
+        初始化持久化向量索引
+
+        Args:
+            directory: 索引目錄（不存在時自動建立）
+            reload_interval: 檢查其他 worker 更新的最短間隔（秒）
+        """
+        self.directory = os.path.abspath(directory)
+        self.reload_interval = max(0.0, float(reload_interval))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._manifest: Dict[str, Any] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._signature = None
+        self._last_check = 0.0
+        self._loaded_file_ids: set = set()
+
+        # 統計資訊
+        self.reloads = 0
+        self.saves = 0
+        self.reused_contents = 0
+        self.last_load_ms = 0.0
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    # === 讀取 ===
+
+    def refresh(self, knowledge_store: Dict[str, Dict], vector_index: VectorIndex, force: bool = False) -> bool:
+        """
+        manifest 有變更時重新載入，並更新 knowledge_store 與 vector_index
+
+        Args:
+            knowledge_store: 模型的本地知識庫
+            vector_index: 模型的向量索引
+            force: 忽略 reload_interval 立即檢查
+
+        Returns:
+            bool: 是否重新載入
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.reload_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            signature = self._stat_signature()
+            if signature is None or signature == self._signature:
+                return False
+
+            started = time.perf_counter()
+            try:
+                manifest, matrix = self._read_snapshot()
+            except Exception as e:
+                logger.error(f"Failed to load vector index from {self.directory}: {e}")
+                return False
+            self._manifest, self._matrix, self._signature = manifest, matrix, signature
+            self._apply(knowledge_store, vector_index)
+            self.last_load_ms = (time.perf_counter() - started) * 1000
+            self.reloads += 1
+
+        logger.info(
+            f"Loaded vector index from {self.directory}: {len(manifest.get('files', {}))} files, "
+            f"{manifest.get('rows', 0)} chunks in {self.last_load_ms:.1f}ms"
+        )
+        return True
+
+    def get_chunks(self, digest: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        取得指定內容 sha256 已儲存的片段（含嵌入向量），供相同內容的檔案重複使用
+
+        Returns:
+            Optional[List[Dict]]: 片段清單，不存在時返回 None
+        """
+        with self._lock:
+            entry = self._manifest.get('contents', {}).get(digest)
+            if entry is None or self._matrix is None:
+                return None
+            self.reused_contents += 1
+            return self._build_chunks(entry, self._matrix)
+
+    def _stat_signature(self):
+        """以 manifest 的 inode、大小與修改時間判斷是否變更"""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        """讀取 manifest（不存在時返回空索引）"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {'version': FORMAT_VERSION, 'generation': 0, 'rows': 0, 'contents': {}, 'files': {}}
+        if manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index version: {manifest.get('version')}")
+        return manifest
+
+    def _read_snapshot(self):
+        """讀取 manifest 與對應的嵌入矩陣（矩陣檔案於讀取期間被替換時重試）"""
+        for attempt in range(3):
+            manifest = self._read_manifest()
+            name = manifest.get('embeddings')
+            if not name:
+                return manifest, None
+            try:
+                matrix = np.load(os.path.join(self.directory, name), mmap_mode='r')
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                continue
+            if matrix.ndim != 2 or matrix.shape[0] != manifest.get('rows', 0):
+                raise ValueError(f"Embedding matrix shape {matrix.shape} does not match manifest")
+            return manifest, matrix
+
+    def _apply(self, knowledge_store: Dict[str, Dict], vector_index: VectorIndex) -> None:
+        """將目前的快照套用到 knowledge_store 與 vector_index"""
+        files = self._manifest.get('files', {})
+        contents = self._manifest.get('contents', {})
+
+        # 移除已被其他 worker 刪除的檔案
+        for file_id in self._loaded_file_ids - set(files):
+            knowledge_store.pop(file_id, None)
+
+        file_ids: List[str] = []
+        filenames: List[str] = []
+        texts: List[str] = []
+        rows: List[np.ndarray] = []
+        sources: Dict[str, Any] = {}
+        for file_id, info in files.items():
+            entry = contents.get(info['content_hash'])
+            if entry is None:
+                continue
+            chunks = self._build_chunks(entry, self._matrix)
+            knowledge_store[file_id] = {
+                'filename': info['filename'],
+                'content': entry['content'],
+                'content_hash': info['content_hash'],
+                'chunks': chunks,
+                'metadata': info.get('metadata', {})
+            }
+            sources[file_id] = chunks
+            count = entry['row_count']
+            if count:
+                file_ids.extend([file_id] * count)
+                filenames.extend([info['filename']] * count)
+                texts.extend(chunk['text'] for chunk in chunks)
+                rows.append(np.arange(entry['row_start'], entry['row_start'] + count))
+
+        self._loaded_file_ids = set(files)
+
+        if self._matrix is None or not rows:
+            vector_index.load(None, [], [], [], sources)
+            return
+        order = np.concatenate(rows)
+        if len(order) == self._matrix.shape[0] and np.array_equal(order, np.arange(len(order))):
+            # 每份內容只被一個檔案使用時直接以 mmap 作為索引矩陣，各 worker 共用 page cache
+            matrix = self._matrix
+        else:
+            matrix = np.ascontiguousarray(self._matrix[order])
+        vector_index.load(matrix, file_ids, filenames, texts, sources)
+
+    @staticmethod
+    def _build_chunks(entry: Dict[str, Any], matrix: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """組合片段資訊與嵌入向量（嵌入向量為 mmap 的唯讀視圖）"""
+        chunks = []
+        for offset, meta in enumerate(entry.get('chunks', [])):
+            chunk = dict(meta)
+            if matrix is not None:
+                chunk['embedding'] = matrix[entry['row_start'] + offset]
+            chunks.append(chunk)
+        return chunks
+
+    # === 寫入 ===
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """跨行程的寫入鎖"""
+        with open(os.path.join(self.directory, LOCK_NAME), 'a+') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def save_file(self, file_id: str, data: Dict[str, Any]) -> bool:
+        """
+        儲存（或取代）一個檔案
+
+        Args:
+            file_id: 檔案 ID
+            data: knowledge_store 的項目（filename、content、chunks、metadata）
+
+        Returns:
+            bool: 是否成功
+        """
+        digest = data.get('content_hash') or content_hash(data['content'])
+        chunks = [chunk for chunk in data.get('chunks', []) if chunk.get('embedding') is not None]
+        try:
+            with self._lock, self._file_lock():
+                manifest, matrix = self._read_snapshot()
+                contents = manifest['contents']
+
+                if digest not in contents:
+                    vectors = np.zeros((0, 0), dtype=np.float32)
+                    if chunks:
+                        vectors = VectorIndex._normalize(
+                            np.asarray([chunk['embedding'] for chunk in chunks], dtype=np.float32)
+                        )
+                        if matrix is not None and vectors.shape[1] != matrix.shape[1]:
+                            logger.warning(
+                                f"Embedding dimension mismatch for {data.get('filename')}: "
+                                f"{vectors.shape[1]} != {matrix.shape[1]}, not persisted"
+                            )
+                            return False
+                    contents[digest] = {
+                        'content': data['content'],
+                        'row_start': manifest['rows'],
+                        'row_count': len(chunks),
+                        'chunks': [
+                            {key: value for key, value in chunk.items() if key != 'embedding'}
+                            for chunk in chunks
+                        ]
+                    }
+                    if len(chunks):
+                        matrix = vectors if matrix is None else np.concatenate([matrix, vectors])
+                    manifest['rows'] += len(chunks)
+
+                manifest['files'][file_id] = {
+                    'filename': data['filename'],
+                    'content_hash': digest,
+                    'metadata': data.get('metadata', {})
+                }
+                self._write_snapshot(manifest, matrix)
+                self.saves += 1
+            return True
+        except Exception as e:
+            logger.error(f"Failed to persist vector index entry {file_id}: {e}")
+            return False
+
+    def remove_file(self, file_id: str) -> bool:
+        """
+        移除一個檔案（不再被任何檔案引用的內容會一併壓縮掉）
+
+        Returns:
+            bool: 是否有移除
+        """
+        try:
+            with self._lock, self._file_lock():
+                manifest, matrix = self._read_snapshot()
+                if manifest['files'].pop(file_id, None) is None:
+                    return False
+
+                used = {info['content_hash'] for info in manifest['files'].values()}
+                keep_rows = []
+                contents = {}
+                row = 0
+                for digest, entry in manifest['contents'].items():
+                    if digest not in used:
+                        continue
+                    keep_rows.extend(range(entry['row_start'], entry['row_start'] + entry['row_count']))
+                    contents[digest] = dict(entry, row_start=row)
+                    row += entry['row_count']
+                manifest['contents'] = contents
+                manifest['rows'] = row
+                if matrix is not None:
+                    matrix = np.ascontiguousarray(matrix[keep_rows]) if keep_rows else None
+                self._write_snapshot(manifest, matrix)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to remove {file_id} from vector index: {e}")
+            return False
+
+    def _write_snapshot(self, manifest: Dict[str, Any], matrix: Optional[np.ndarray]) -> None:
+        """寫入新世代的矩陣與 manifest（需持有寫入鎖）"""
+        previous = manifest.get('embeddings')
+        manifest['generation'] = manifest.get('generation', 0) + 1
+        manifest['version'] = FORMAT_VERSION
+
+        if matrix is not None and matrix.shape[0]:
+            name = f"embeddings-{manifest['generation']}.npy"
+            self._atomic_write(name, lambda f: np.save(f, np.asarray(matrix, dtype=np.float32)))
+            manifest['embeddings'] = name
+            manifest['dimension'] = int(matrix.shape[1])
+        else:
+            manifest['embeddings'] = None
+            manifest['dimension'] = None
+
+        payload = json.dumps(manifest, ensure_ascii=False, default=str).encode('utf-8')
+        self._atomic_write(MANIFEST_NAME, lambda f: f.write(payload))
+
+        # 保留前一世代供剛讀到舊 manifest 的 worker 開啟，其餘舊檔刪除
+        # （已 mmap 的舊檔在 Linux 上刪除後仍可繼續讀取）
+        keep = {manifest['embeddings'], previous}
+        for name in os.listdir(self.directory):
+            if name.startswith('embeddings-') and name.endswith('.npy') and name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _atomic_write(self, name: str, writer) -> None:
+        """寫入暫存檔後以 os.replace 原子替換"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f'.{name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得持久化索引統計資訊"""
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'generation': self._manifest.get('generation', 0),
+                'files': len(self._manifest.get('files', {})),
+                'contents': len(self._manifest.get('contents', {})),
+                'chunks': self._manifest.get('rows', 0),
+                'mmap': isinstance(self._matrix, np.memmap),
+                'reloads': self.reloads,
+                'saves': self.saves,
+                'reused_contents': self.reused_contents,
+                'last_load_ms': round(self.last_load_ms, 2),
+            }
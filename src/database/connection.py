@@ -2,28 +2,13 @@ import datetime
 from ..core.logger import get_logger
 from contextlib import contextmanager
 from typing import Optional
-from sqlalchemy import create_engine, Column, String, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker
 from ..core.exceptions import DatabaseError
+from .engine import build_connect_args, build_database_url, get_engine_registry, get_pool_settings, get_pool_stats, get_ssl_args
+from .models import UserThreadTable
 
 logger = get_logger(__name__)
 
-# CREATE TABLE user_thread_table (
-#     user_id VARCHAR(255) PRIMARY KEY,
-#     thread_id VARCHAR(255),
-#     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-# );
-
-Base = declarative_base()
-
-class UserThreadTable(Base):
-    __tablename__ = 'user_thread_table'
-
-    user_id = Column(String(255), primary_key=True)
-    platform = Column(String(50), primary_key=True, default='line')
-    thread_id = Column(String(255))
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
-
 class Database:
     def __init__(self, config):
         self.config = config
@@ -38,44 +23,21 @@ class Database:
             pass
 
     def _create_engine(self):
-        """建立資料庫引擎with最佳化設定"""
+        """取得共用資料庫引擎（與 DatabaseManager 共用同一個連線池）"""
         connection_string = self._build_connection_string()
-        ssl_args = self._get_ssl_args()
-        
-        return create_engine(
+        return get_engine_registry().get_engine(
             connection_string,
-            connect_args=ssl_args,
-            pool_size=5,            # 優化：降低基本連線數（適配 2 worker gunicorn）
-            max_overflow=10,        # 優化：降低最大溢出數
-            pool_pre_ping=True,     # 連線健康檢查
-            pool_recycle=1800,      # 優化：30分鐘回收連線，減少記憶體使用
-            echo=False              # 生產環境關閉SQL日誌
+            connect_args=build_connect_args(connection_string, self.config),
+            pool_settings=get_pool_settings(self.config)
         )
     
     def _build_connection_string(self) -> str:
         """建立資料庫連線字串"""
-        host = self.config['host']
-        port = self.config['port']
-        db_name = self.config['db_name']
-        user = self.config['user']
-        password = self.config['password']
-        
-        return f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
+        return build_database_url(self.config)
     
     def _get_ssl_args(self) -> dict:
         """取得 SSL 參數"""
-        ssl_args = {}
-        
-        if 'sslmode' in self.config:
-            ssl_args['sslmode'] = self.config['sslmode']
-        if 'sslrootcert' in self.config:
-            ssl_args['sslrootcert'] = self.config['sslrootcert']
-        if 'sslcert' in self.config:
-            ssl_args['sslcert'] = self.config['sslcert']
-        if 'sslkey' in self.config:
-            ssl_args['sslkey'] = self.config['sslkey']
-            
-        return ssl_args
+        return get_ssl_args(self.config)
 
     @contextmanager
     def get_session(self):
@@ -144,15 +106,8 @@ class Database:
             pass
     
     def get_connection_info(self) -> dict:
-        """取得連線池資訊（用於監控）"""
-        pool = self.engine.pool
-        return {
-            'pool_size': pool.size(),
-            'checked_in': pool.checkedin(),
-            'checked_out': pool.checkedout(),
-            'overflow': pool.overflow(),
-            'invalid': getattr(pool, 'invalidated', 0)  # 使用 invalidated 或默認值
-        }
+        """取得連線池資訊（用於監控），包含取得連線延遲與飽和度"""
+        return get_pool_stats(self.engine)
 
 
 # 全局資料庫實例管理 - 修復記憶體洩漏
@@ -0,0 +1,327 @@
+"""
+共用 SQLAlchemy 引擎註冊表
+同一進程內對同一個資料庫只建立一個引擎與連線池，供 Database、DatabaseManager、
+ORMConversationManager、DatabaseOperations 與 thread 輔助函數共用。
+連線池大小依 gunicorn worker 數量分配，並記錄取得連線的延遲與飽和度供 /metrics 使用
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import ArgumentError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 單一實例（所有 worker 合計）預設允許的最大資料庫連線數
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+
+# PostgreSQL 連線參數預設值（連線逾時與 TCP keepalive）
+POSTGRES_CONNECT_DEFAULTS = {
+    'connect_timeout': 10,
+    'keepalives_idle': 600,
+    'keepalives_interval': 30,
+    'keepalives_count': 3,
+}
+
+SQLITE_CONNECT_DEFAULTS = {
+    'check_same_thread': False,
+    'timeout': 20,
+}
+
+SSL_KEYS = ('sslmode', 'sslrootcert', 'sslcert', 'sslkey')
+# 未設定 sslmode 時 PostgreSQL 連線預設要求 TLS
+DEFAULT_SSLMODE = 'require'
+
+
+class PoolMetrics:
+    """連線池取得連線的延遲與飽和度統計"""
+
+    def __init__(self, sample_size: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=sample_size)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+
+    def record_checkout(self, latency: float, checked_out: int):
+        with self._lock:
+            self.checkouts += 1
+            self._latencies.append(latency)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            checkouts = self.checkouts
+            timeouts = self.timeouts
+            peak = self.peak_checked_out
+
+        if latencies:
+            avg = sum(latencies) / len(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            latency_ms = {
+                'avg': round(avg * 1000, 3),
+                'p95': round(p95 * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3),
+            }
+        else:
+            latency_ms = {'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+
+        return {
+            'checkouts': checkouts,
+            'checkout_timeouts': timeouts,
+            'checkout_latency_ms': latency_ms,
+            'peak_checked_out': peak,
+        }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """記錄取得連線延遲的 QueuePool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+    def recreate(self) -> 'InstrumentedQueuePool':
+        # engine.dispose() 會重建連線池，統計資料需延續
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def capacity(self) -> int:
+        """連線池可提供的最大連線數"""
+        return self.size() + max(0, self._max_overflow)
+
+    def get_checkout_stats(self) -> Dict[str, Any]:
+        """取得連線延遲與飽和度統計"""
+        capacity = self.capacity()
+        stats = self.metrics.snapshot()
+        stats['max_connections'] = capacity
+        stats['saturation'] = round(self.checkedout() / capacity, 3) if capacity else 0.0
+        stats['peak_saturation'] = round(stats['peak_checked_out'] / capacity, 3) if capacity else 0.0
+        return stats
+
+
+def get_worker_count() -> int:
+    """取得 gunicorn worker 數量（由 gunicorn.conf.py 設定 GUNICORN_WORKERS）"""
+    for key in ('GUNICORN_WORKERS', 'WEB_CONCURRENCY'):
+        value = os.environ.get(key)
+        if value:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                logger.warning(f"Invalid {key} value: {value}")
+    return 1
+
+
+def get_pool_settings(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    依 worker 數量計算每個進程的連線池設定
+
+    db.pool.max_connections 為整個實例的連線預算，平均分配給各 worker，
+    每個 worker 的常駐連線佔一半，其餘作為溢出連線。
+    db.pool.pool_size / max_overflow 若有設定則直接使用
+    """
+    pool_config = (db_config or {}).get('pool') or {}
+    workers = get_worker_count()
+
+    max_connections = int(pool_config.get('max_connections') or DEFAULT_MAX_CONNECTIONS)
+    per_worker = max(2, max_connections // workers)
+    pool_size = pool_config.get('pool_size')
+    pool_size = int(pool_size) if pool_size is not None else max(1, per_worker // 2)
+    max_overflow = pool_config.get('max_overflow')
+    max_overflow = int(max_overflow) if max_overflow is not None else max(0, per_worker - pool_size)
+
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': int(pool_config.get('pool_timeout') or DEFAULT_POOL_TIMEOUT),
+        'pool_recycle': int(pool_config.get('pool_recycle') or DEFAULT_POOL_RECYCLE),
+    }
+
+
+def build_database_url(db_config: Dict[str, Any]) -> str:
+    """從 db 配置建立 PostgreSQL 連線字串（SSL 參數經由 connect_args 傳入）"""
+    return (
+        f"postgresql://{db_config['user']}:{db_config['password']}"
+        f"@{db_config['host']}:{db_config['port']}/{db_config['db_name']}"
+    )
+
+
+def get_ssl_args(db_config: Dict[str, Any]) -> Dict[str, Any]:
+    """取得 db 配置中有設定的 SSL 參數"""
+    return {key: db_config[key] for key in SSL_KEYS if db_config.get(key) is not None}
+
+
+def build_connect_args(database_url: str, db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """依資料庫類型建立 connect_args"""
+    if database_url.startswith('sqlite'):
+        return dict(SQLITE_CONNECT_DEFAULTS)
+
+    connect_args = {}
+    if database_url.startswith('postgresql'):
+        connect_args.update(POSTGRES_CONNECT_DEFAULTS)
+        # URL 查詢參數已指定 sslmode 時不覆寫（connect_args 優先於 URL）
+        if 'sslmode=' not in database_url.partition('?')[2]:
+            connect_args['sslmode'] = DEFAULT_SSLMODE
+    if db_config:
+        connect_args.update(get_ssl_args(db_config))
+    return connect_args
+
+
+class EngineRegistry:
+    """
+    進程內共用的引擎註冊表
+
+    引擎以不含查詢參數的連線字串為鍵，URL 中的查詢參數（例如 sslmode）併入 connect_args，
+    因此以配置或以完整 URL 建立的呼叫端都會取得同一個引擎。
+    gunicorn preload 後 fork 出的 worker 會丟棄繼承自父進程的連線，不與父進程共用 socket
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Engine] = {}
+
+    @staticmethod
+    def _normalize(database_url: str, connect_args: Optional[Dict[str, Any]]):
+        merged = {}
+        try:
+            url = make_url(database_url)
+        except (ArgumentError, ValueError):
+            # 無法解析的 URL 交由 create_engine 回報錯誤
+            merged.update(connect_args or {})
+            return database_url, merged
+        if url.query and not url.drivername.startswith('sqlite'):
+            merged.update({k: v for k, v in url.query.items() if v not in (None, '', 'None')})
+            url = url.set(query={})
+        merged.update({k: v for k, v in (connect_args or {}).items() if v is not None})
+        return url.render_as_string(hide_password=False), merged
+
+    def get_engine(self, database_url: str, connect_args: Optional[Dict[str, Any]] = None,
+                   pool_settings: Optional[Dict[str, int]] = None) -> Engine:
+        """
+        取得（必要時建立）指定資料庫的共用引擎
+
+        Args:
+            database_url: 資料庫連線字串
+            connect_args: DBAPI 連線參數
+            pool_settings: 連線池設定，預設依 worker 數量計算
+        """
+        key, merged_args = self._normalize(database_url, connect_args)
+        engine = self._engines.get(key)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                settings = pool_settings or get_pool_settings()
+                engine = create_engine(
+                    key,
+                    poolclass=InstrumentedQueuePool,
+                    pool_size=settings['pool_size'],
+                    max_overflow=settings['max_overflow'],
+                    pool_timeout=settings['pool_timeout'],
+                    pool_recycle=settings['pool_recycle'],
+                    pool_pre_ping=True,     # 連線健康檢查
+                    echo=False,             # 生產環境關閉 SQL 日誌
+                    connect_args=merged_args
+                )
+                self._engines[key] = engine
+                logger.info(
+                    f"Created shared database engine {_mask_url(key)} "
+                    f"(pool_size={settings['pool_size']}, max_overflow={settings['max_overflow']}, "
+                    f"workers={get_worker_count()})"
+                )
+        return engine
+
+    def after_fork(self):
+        """fork 後於子進程丟棄繼承的連線（不關閉父進程仍在使用的 socket）"""
+        for engine in list(self._engines.values()):
+            try:
+                engine.dispose(close=False)
+            except Exception:
+                pass
+        self._lock = threading.Lock()
+
+    def dispose_all(self):
+        """關閉並移除所有引擎"""
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得所有引擎的連線池統計"""
+        return {
+            _mask_url(key): get_pool_stats(engine)
+            for key, engine in list(self._engines.items())
+        }
+
+
+def _mask_url(database_url: str) -> str:
+    """隱藏連線字串中的密碼"""
+    try:
+        return make_url(database_url).render_as_string(hide_password=True)
+    except (ArgumentError, ValueError):
+        return '<unparsable url>'
+
+
+def get_pool_stats(engine: Engine) -> Dict[str, Any]:
+    """取得引擎連線池狀態，以及延遲與飽和度統計（若有）"""
+    pool = engine.pool
+    stats = {
+        'pool_size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+        'invalid': getattr(pool, 'invalidated', 0)  # 使用 invalidated 或默認值
+    }
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.get_checkout_stats())
+    return stats
+
+
+_engine_registry = EngineRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: _engine_registry.after_fork())
+
+
+def get_engine_registry() -> EngineRegistry:
+    """取得全域引擎註冊表"""
+    return _engine_registry
+
+
+def get_engine(db_config: Dict[str, Any]) -> Engine:
+    """依 db 配置取得共用引擎"""
+    database_url = build_database_url(db_config)
+    return _engine_registry.get_engine(
+        database_url,
+        connect_args=build_connect_args(database_url, db_config),
+        pool_settings=get_pool_settings(db_config)
+    )
@@ -4,11 +4,11 @@ SQLAlchemy ORM Models and Database Configuration
 import os
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import create_engine, Column, String, Text, DateTime, Integer, Boolean, Index
+from sqlalchemy import Column, String, Text, DateTime, Integer, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
 from ..core.logger import get_logger
+from .engine import build_connect_args, get_engine_registry, get_pool_settings
 
 logger = get_logger(__name__)
 
@@ -48,41 +48,19 @@ class SimpleConversationHistory(Base):
         return f"<Conversation(user_id='{self.user_id}', platform='{self.platform}', provider='{self.model_provider}', role='{self.role}')>"
 
 class DatabaseManager:
-    """資料庫連線管理器 - 高可用性配置"""
+    """資料庫連線管理器 - 使用共用引擎註冊表的連線池"""
     
     def __init__(self, database_url: str = None):
+        db_config = None
         if not database_url:
+            db_config = self._load_db_config()
             database_url = self._build_database_url()
         
-        # 根據資料庫類型設定連線參數
-        connect_args = {}
-        if database_url.startswith('postgresql'):
-            # PostgreSQL 特定設定
-            connect_args = {
-                "sslmode": "require",
-                "connect_timeout": 10,
-                "keepalives_idle": 600,    # TCP keepalive
-                "keepalives_interval": 30,
-                "keepalives_count": 3,
-            }
-        elif database_url.startswith('sqlite'):
-            # SQLite 特定設定
-            connect_args = {
-                "check_same_thread": False,
-                "timeout": 20
-            }
-        
-        # 高可用性連線池配置
-        self.engine = create_engine(
+        # 與 Database 共用同一個引擎與連線池，連線池大小依 worker 數量分配
+        self.engine = get_engine_registry().get_engine(
             database_url,
-            poolclass=QueuePool,
-            pool_size=20,          # 連線池大小
-            max_overflow=30,       # 最大溢出連線
-            pool_timeout=30,       # 連線等待超時
-            pool_recycle=3600,     # 連線回收時間（1小時）
-            pool_pre_ping=True,    # 連線前測試
-            echo=False,            # 生產環境關閉 SQL 日誌
-            connect_args=connect_args
+            connect_args=build_connect_args(database_url, db_config),
+            pool_settings=get_pool_settings(db_config)
         )
         
         self.SessionLocal = sessionmaker(
@@ -91,6 +69,15 @@ class DatabaseManager:
             bind=self.engine
         )
     
+    @staticmethod
+    def _load_db_config() -> Optional[dict]:
+        """載入 db 配置（失敗時返回 None）"""
+        try:
+            from ..core.config import load_config
+            return load_config().get('db', {})
+        except Exception:
+            return None
+    
     def _build_database_url(self) -> str:
         """從配置或環境變數建構資料庫 URL"""
         try:
@@ -109,14 +96,9 @@ class DatabaseManager:
             
             # 添加 SSL 參數
             ssl_params = []
-            if 'sslmode' in db_config:
-                ssl_params.append(f"sslmode={db_config['sslmode']}")
-            if 'sslrootcert' in db_config:
-                ssl_params.append(f"sslrootcert={db_config['sslrootcert']}")
-            if 'sslcert' in db_config:
-                ssl_params.append(f"sslcert={db_config['sslcert']}")
-            if 'sslkey' in db_config:
-                ssl_params.append(f"sslkey={db_config['sslkey']}")
+            for key in ('sslmode', 'sslrootcert', 'sslcert', 'sslkey'):
+                if db_config.get(key) is not None:
+                    ssl_params.append(f"{key}={db_config[key]}")
             
             if ssl_params:
                 base_url += "?" + "&".join(ssl_params)
@@ -10,10 +10,23 @@ from .base import (
     ThreadInfo,
     FileInfo
 )
-from .openai_model import OpenAIModel
-from .huggingface_model import HuggingFaceModel
 from .factory import ModelFactory
 
+# 模型實作依賴各家 SDK，匯入成本高，改為第一次存取時才載入
+_LAZY_MODELS = {
+    'OpenAIModel': '.openai_model',
+    'HuggingFaceModel': '.huggingface_model',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_MODELS:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_MODELS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     'BaseLLMInterface',
     'AssistantInterface', 
@@ -39,6 +39,7 @@ import time
 import uuid
 import re
 from ..core.logger import get_logger
+from ..core.http_pool import get_http_session
 from typing import List, Dict, Tuple, Optional, Any
 from .base import (
     FullLLMInterface, 
@@ -64,6 +65,8 @@ class AnthropicModel(FullLLMInterface):
         self.api_key = api_key
         self.model_name = model_name
         self.base_url = base_url or "https://api.anthropic.com/v1"
+        # 同一提供商共用 keep-alive 連線池，避免每次呼叫重新建立 TCP + TLS 連線
+        self.session = get_http_session('anthropic')
         self.file_cache = FileCache(max_files=300, file_ttl=3600)
         self.speech_service = None
         self.conversation_manager = get_conversation_manager()
@@ -437,18 +440,21 @@ class AnthropicModel(FullLLMInterface):
             logger.info(f"🔧 Anthropic Model: Processing {len(function_calls)} function calls")
             logger.debug(f"📋 Function calls detected: {[call['function_name'] for call in function_calls]}")
             
-            # 執行 function calls 並收集結果
-            function_results = []
-            mcp_interactions = []  # 🔥 收集 MCP 互動資訊，用於前端顯示
+            # 執行 function calls 並收集結果（多個呼叫並行分派，結果保持原順序）
+            from ..services.mcp_service import dispatch_function_calls
+            
+            calls = []
             for i, function_call in enumerate(function_calls, 1):
                 function_name = function_call['function_name']
                 arguments = function_call['arguments']
+                calls.append((function_name, arguments))
                 
                 logger.info(f"🎯 Anthropic Model: Executing function {i}/{len(function_calls)}: {function_name}")
                 logger.debug(f"📊 Function arguments: {json.dumps(arguments, ensure_ascii=False, indent=2)}")
-                
-                result = self.mcp_service.handle_function_call_sync(function_name, arguments)
-                
+            
+            function_results = []
+            mcp_interactions = []  # 🔥 收集 MCP 互動資訊，用於前端顯示
+            for (function_name, arguments), result in zip(calls, dispatch_function_calls(self.mcp_service, calls)):
                 if result.get('success', False):
                     logger.info(f"✅ Function {function_name} executed successfully")
                 else:
@@ -573,7 +579,7 @@ class AnthropicModel(FullLLMInterface):
             headers['Content-Type'] = 'application/json'
         
         try:
-            response = requests.request(
+            response = self.session.request(
                 method, f'{self.base_url}{endpoint}', headers=headers, json=body, 
                 files=files, data=data, timeout=(30, 60)
             )
@@ -1,10 +1,29 @@
-from typing import Dict, Any, Optional
+import importlib
+from typing import TYPE_CHECKING, Dict, Any, Optional
 from .base import BaseLLMInterface, ModelProvider
-from .openai_model import OpenAIModel
-from .anthropic_model import AnthropicModel
-from .gemini_model import GeminiModel
-from .ollama_model import OllamaModel
-from .huggingface_model import HuggingFaceModel
+from ..core.http_pool import configure_http_pool
+
+if TYPE_CHECKING:
+    from .openai_model import OpenAIModel
+    from .anthropic_model import AnthropicModel
+    from .gemini_model import GeminiModel
+    from .ollama_model import OllamaModel
+    from .huggingface_model import HuggingFaceModel
+
+# 各提供商的模型類別位置；只載入實際設定的提供商，避免啟動時匯入所有 SDK
+PROVIDER_MODULES: Dict[ModelProvider, tuple] = {
+    ModelProvider.OPENAI: ('.openai_model', 'OpenAIModel'),
+    ModelProvider.ANTHROPIC: ('.anthropic_model', 'AnthropicModel'),
+    ModelProvider.GEMINI: ('.gemini_model', 'GeminiModel'),
+    ModelProvider.HUGGINGFACE: ('.huggingface_model', 'HuggingFaceModel'),
+    ModelProvider.OLLAMA: ('.ollama_model', 'OllamaModel'),
+}
+
+
+def load_model_class(provider: ModelProvider) -> type:
+    """匯入並返回提供商對應的模型類別"""
+    module_name, class_name = PROVIDER_MODULES[provider]
+    return getattr(importlib.import_module(module_name, __package__), class_name)
 
 
 class ModelFactory:
@@ -14,6 +33,9 @@ class ModelFactory:
     def create_model(provider: ModelProvider, config: Dict[str, Any]) -> BaseLLMInterface:
         """根據提供商和配置建立模型實例"""
         
+        # 各提供商共用的 HTTP 連線池設定（須在模型建立 session 之前）
+        configure_http_pool(provider.value, config.get('http_pool'))
+        
         if provider == ModelProvider.OPENAI:
             return ModelFactory._create_openai_model(config)
         elif provider == ModelProvider.ANTHROPIC:
@@ -40,25 +62,32 @@ class ModelFactory:
         return ModelFactory.create_model(provider, config)
     
     @staticmethod
-    def _create_openai_model(config: Dict[str, Any]) -> OpenAIModel:
+    def _create_openai_model(config: Dict[str, Any]) -> 'OpenAIModel':
         """建立 OpenAI 模型"""
         api_key = config.get('api_key')
         if not api_key:
             raise ValueError("OpenAI API key is required")
         
+        OpenAIModel = load_model_class(ModelProvider.OPENAI)
         return OpenAIModel(
             api_key=api_key,
             assistant_id=config.get('assistant_id'),
-            base_url=config.get('base_url')
+            base_url=config.get('base_url'),
+            stream_runs=config.get('stream_runs', False),
+            combined_runs=config.get('combined_runs', False),
+            polling_histogram_path=config.get('polling_histogram_path'),
+            file_reference_ttl=config.get('file_reference_ttl', 300),
+            file_reference_cache_path=config.get('file_reference_cache_path')
         )
     
     @staticmethod
-    def _create_anthropic_model(config: Dict[str, Any]) -> AnthropicModel:
+    def _create_anthropic_model(config: Dict[str, Any]) -> 'AnthropicModel':
         """建立 Anthropic 模型"""
         api_key = config.get('api_key')
         if not api_key:
             raise ValueError("Anthropic API key is required")
         
+        AnthropicModel = load_model_class(ModelProvider.ANTHROPIC)
         return AnthropicModel(
             api_key=api_key,
             model_name=config.get('model', 'claude-3-sonnet-20240229'),
@@ -66,12 +95,13 @@ class ModelFactory:
         )
     
     @staticmethod
-    def _create_gemini_model(config: Dict[str, Any]) -> GeminiModel:
+    def _create_gemini_model(config: Dict[str, Any]) -> 'GeminiModel':
         """建立 Gemini 模型"""
         api_key = config.get('api_key')
         if not api_key:
             raise ValueError("Gemini API key is required")
         
+        GeminiModel = load_model_class(ModelProvider.GEMINI)
         return GeminiModel(
             api_key=api_key,
             model_name=config.get('model', 'gemini-pro'),
@@ -79,12 +109,13 @@ class ModelFactory:
         )
     
     @staticmethod
-    def _create_huggingface_model(config: Dict[str, Any]) -> HuggingFaceModel:
+    def _create_huggingface_model(config: Dict[str, Any]) -> 'HuggingFaceModel':
         """建立 HuggingFace 模型"""
         api_key = config.get('api_key')
         if not api_key:
             raise ValueError("HuggingFace API key is required")
         
+        HuggingFaceModel = load_model_class(ModelProvider.HUGGINGFACE)
         return HuggingFaceModel(
             api_key=api_key,
             model_name=config.get('model_name', 'mistralai/Mistral-7B-Instruct-v0.1'),
@@ -97,14 +128,27 @@ class ModelFactory:
             image_model=config.get('image_model'),
             temperature=config.get('temperature'),
             max_tokens=config.get('max_tokens'),
-            timeout=config.get('timeout')
+            timeout=config.get('timeout'),
+            vector_index_dir=config.get('vector_index_dir'),
+            vector_ann=config.get('vector_ann'),
+            embedding_batch_size=config.get('embedding_batch_size'),
+            embedding_concurrency=config.get('embedding_concurrency'),
+            embedding_cache_path=config.get('embedding_cache_path'),
+            embedding_cache_max_entries=config.get('embedding_cache_max_entries')
         )
     
     @staticmethod
-    def _create_ollama_model(config: Dict[str, Any]) -> OllamaModel:
+    def _create_ollama_model(config: Dict[str, Any]) -> 'OllamaModel':
         """建立 Ollama 本地模型"""
+        OllamaModel = load_model_class(ModelProvider.OLLAMA)
         return OllamaModel(
             base_url=config.get('base_url', 'http://localhost:11434'),
-            model_name=config.get('model', 'llama2')
+            model_name=config.get('model', 'llama2'),
+            vector_index_dir=config.get('vector_index_dir'),
+            vector_ann=config.get('vector_ann'),
+            embedding_batch_size=config.get('embedding_batch_size', 32),
+            embedding_concurrency=config.get('embedding_concurrency', 4),
+            embedding_cache_path=config.get('embedding_cache_path'),
+            embedding_cache_max_entries=config.get('embedding_cache_max_entries', 200000)
         )
 
@@ -16,6 +16,7 @@ from .base import (
 from ..utils.retry import retry_on_rate_limit
 from ..services.conversation import get_conversation_manager
 from ..core.logger import get_logger
+from ..core.http_pool import get_http_session
 
 logger = get_logger(__name__)
 
@@ -48,6 +49,8 @@ class GeminiModel(FullLLMInterface):
         self.api_key = api_key
         self.model_name = model_name
         self.base_url = base_url or "https://generativelanguage.googleapis.com/v1beta"
+        # 同一提供商共用 keep-alive 連線池，避免每次呼叫重新建立 TCP + TLS 連線
+        self.session = get_http_session('gemini')
         
         self.project_id = project_id  # Google Cloud 專案 ID，用於 Vertex AI
         
@@ -685,9 +688,9 @@ class GeminiModel(FullLLMInterface):
         
         try:
             if method == 'POST':
-                r = requests.post(url, headers=headers, json=body, timeout=30)
+                r = self.session.post(url, headers=headers, json=body, timeout=30)
             elif method == 'GET':
-                r = requests.get(url, headers=headers, timeout=30)
+                r = self.session.get(url, headers=headers, timeout=30)
             else:
                 return False, None, f"Unsupported method: {method}"
             
@@ -1185,34 +1188,35 @@ class GeminiModel(FullLLMInterface):
             logger.info(f"🔧 Gemini Model: Processing {len(function_calls)} function call parts")
             logger.debug(f"📋 Function call metadata: {json.dumps(function_calls, ensure_ascii=False, indent=2)}")
             
-            # 執行 function calls 並收集結果
-            function_results = []
-            valid_calls = 0
+            # 執行 function calls 並收集結果（多個呼叫並行分派，結果保持原順序）
+            from ..services.mcp_service import dispatch_function_calls
             
-            for i, part in enumerate(function_calls, 1):
+            calls = []
+            for part in function_calls:
                 if 'functionCall' in part:
                     function_call = part['functionCall']
                     function_name = function_call['name']
                     arguments = function_call.get('args', {})
-                    valid_calls += 1
+                    calls.append((function_name, arguments))
                     
-                    logger.info(f"🎯 Gemini Model: Executing function {valid_calls}: {function_name}")
+                    logger.info(f"🎯 Gemini Model: Executing function {len(calls)}: {function_name}")
                     logger.debug(f"📊 Function arguments: {json.dumps(arguments, ensure_ascii=False, indent=2)}")
-                    
-                    result = self.mcp_service.handle_function_call_sync(function_name, arguments)
-                    
-                    if result.get('success', False):
-                        logger.info(f"✅ Gemini function {function_name} executed successfully")
-                    else:
-                        error_msg = result.get('error', 'Unknown error')
-                        logger.error(f"❌ Gemini function {function_name} failed: {error_msg}")
-                    
-                    function_results.append({
-                        'functionResponse': {
-                            'name': function_name,
-                            'response': result
-                        }
-                    })
+            valid_calls = len(calls)
+            
+            function_results = []
+            for (function_name, _), result in zip(calls, dispatch_function_calls(self.mcp_service, calls)):
+                if result.get('success', False):
+                    logger.info(f"✅ Gemini function {function_name} executed successfully")
+                else:
+                    error_msg = result.get('error', 'Unknown error')
+                    logger.error(f"❌ Gemini function {function_name} failed: {error_msg}")
+                
+                function_results.append({
+                    'functionResponse': {
+                        'name': function_name,
+                        'response': result
+                    }
+                })
             
             # 建構包含 function results 的新對話
             logger.info(f"🔄 Gemini Model: Building extended conversation with {valid_calls} function results")
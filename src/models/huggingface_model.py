@@ -9,6 +9,12 @@ import uuid
 import base64
 from typing import List, Dict, Tuple, Optional, Any
 from ..core.logger import get_logger
+from ..core.http_pool import get_http_session
+from ..core.ann_index import IVFIndex
+from ..core.embedding_cache import EmbeddingCache
+from ..core.embedding_batcher import embed_in_batches
+from ..core.vector_index import VectorIndex
+from ..core.vector_store import PersistentVectorStore, content_hash
 from .base import (
     FullLLMInterface, 
     ModelProvider, 
@@ -71,11 +77,19 @@ class HuggingFaceModel(FullLLMInterface):
                 - temperature: 生成溫度
                 - max_tokens: 最大token數
                 - timeout: 請求超時時間
+                - vector_index_dir: 持久化向量索引目錄（未設定時只保存在記憶體）
+                - vector_ann: IVF 近似最近鄰索引設定（enabled、nlist、nprobe、min_size 等）
+                - embedding_batch_size: 上傳時每次嵌入請求的片段數
+                - embedding_concurrency: 同時進行的嵌入批次請求數上限
+                - embedding_cache_path: 共用嵌入向量快取的 SQLite 檔案（未設定時只保存在記憶體）
+                - embedding_cache_max_entries: 嵌入向量快取的項目數上限
         """
         self.api_key = api_key
         self.model_name = model_name
         self.api_type = api_type
         self.base_url = base_url
+        # 同一提供商共用 keep-alive 連線池，避免每次呼叫重新建立 TCP + TLS 連線
+        self.session = get_http_session('huggingface')
         
         # 功能專用模型配置（支援從配置覆蓋）
         self.embedding_model = kwargs.get('embedding_model', "sentence-transformers/all-MiniLM-L6-v2")
@@ -104,7 +118,26 @@ class HuggingFaceModel(FullLLMInterface):
         self.conversation_manager = get_conversation_manager()
         self.local_threads = {}  # 本地線程管理
         self.knowledge_store = {}  # 本地知識庫
-        self.embeddings_cache = {}  # 嵌入向量緩存
+        # 嵌入向量緩存（以模型與 sha256 為鍵；設定 embedding_cache_path 時各 worker 共用並跨重啟保存）
+        self.embeddings_cache = EmbeddingCache(
+            kwargs.get('embedding_cache_path'),
+            max_entries=kwargs.get('embedding_cache_max_entries') or 200000
+        )
+        self.embedding_batch_size = kwargs.get('embedding_batch_size') or 32
+        self.embedding_concurrency = kwargs.get('embedding_concurrency') or 4
+        # 正規化後的片段嵌入矩陣（設定 vector_ann 時大型知識庫改用 IVF 近似搜尋）
+        self.vector_index = VectorIndex(ann=IVFIndex.from_config(kwargs.get('vector_ann')))
+
+        # 磁碟持久化向量索引（各 worker 共用，重啟後不需重新計算嵌入向量）
+        self.vector_store = None
+        vector_index_dir = kwargs.get('vector_index_dir')
+        if vector_index_dir:
+            try:
+                self.vector_store = PersistentVectorStore(vector_index_dir)
+                self.vector_store.refresh(self.knowledge_store, self.vector_index, force=True)
+            except Exception as e:
+                logger.error(f"Failed to open vector index at {vector_index_dir}: {e}")
+                self.vector_store = None
 
         # MCP 支援
         if enable_mcp:
@@ -342,7 +375,7 @@ class HuggingFaceModel(FullLLMInterface):
         try:
             url = f"{self.base_url}/models/{model_name}"
             
-            response = requests.post(
+            response = self.session.post(
                 url,
                 headers=self.headers,
                 json=payload,
@@ -727,21 +760,30 @@ class HuggingFaceModel(FullLLMInterface):
             # 生成文件 ID
             file_id = f"hf_{uuid.uuid4().hex[:12]}"
             
-            # 將文件分塊
-            chunks = self._chunk_text(content)
-            
-            # 為每個塊生成嵌入向量
-            embedded_chunks = []
-            for chunk in chunks:
-                embedding = self._get_embedding(chunk['text'])
-                if embedding:
-                    chunk['embedding'] = embedding
-                    embedded_chunks.append(chunk)
+            # 相同內容已存在於持久化索引時直接沿用其片段與嵌入向量
+            digest = content_hash(content)
+            embedded_chunks = self.vector_store.get_chunks(digest) if self.vector_store else None
+            if embedded_chunks is None:
+                # 將文件分塊
+                chunks = self._chunk_text(content)
+                
+                # 以批次請求為所有塊生成嵌入向量
+                embeddings = self._get_embeddings(
+                    [chunk['text'] for chunk in chunks],
+                    progress_callback=kwargs.get('progress_callback'),
+                    label=filename
+                )
+                embedded_chunks = []
+                for chunk, embedding in zip(chunks, embeddings):
+                    if embedding:
+                        chunk['embedding'] = embedding
+                        embedded_chunks.append(chunk)
             
             # 存儲到本地知識庫
             self.knowledge_store[file_id] = {
                 'filename': filename,
                 'content': content,
+                'content_hash': digest,
                 'chunks': embedded_chunks,
                 'metadata': {
                     'size': file_size,
@@ -749,6 +791,9 @@ class HuggingFaceModel(FullLLMInterface):
                     'upload_time': time.time()
                 }
             }
+            self.vector_index.add_file(file_id, filename, embedded_chunks)
+            if self.vector_store:
+                self.vector_store.save_file(file_id, self.knowledge_store[file_id])
             
             # 創建 FileInfo
             file_info = FileInfo(
@@ -781,6 +826,8 @@ class HuggingFaceModel(FullLLMInterface):
                 - context_messages: 對話上下文
                 - top_k: 檢索結果數量 (default: 3)
                 - similarity_threshold: 相似度閾值 (default: 0.7)
+                - exact_search: 略過 ANN 索引強制精確搜尋 (default: False)
+                - nprobe: 覆寫 ANN 索引探測的串列數
         """
         try:
             if not self.knowledge_store:
@@ -797,7 +844,10 @@ class HuggingFaceModel(FullLLMInterface):
             top_k = kwargs.get('top_k', 3)
             similarity_threshold = kwargs.get('similarity_threshold', 0.7)
             
-            relevant_chunks = self._vector_search(query_embedding, top_k, similarity_threshold)
+            relevant_chunks = self._vector_search(
+                query_embedding, top_k, similarity_threshold,
+                exact=kwargs.get('exact_search', False), nprobe=kwargs.get('nprobe')
+            )
             
             if not relevant_chunks:
                 logger.info("No relevant documents found, using normal chat")
@@ -959,9 +1009,9 @@ class HuggingFaceModel(FullLLMInterface):
         """
         try:
             # 檢查緩存
-            text_hash = str(hash(text))
-            if text_hash in self.embeddings_cache:
-                return self.embeddings_cache[text_hash]
+            cached = self.embeddings_cache.get(self.embedding_model, text)
+            if cached is not None:
+                return cached
             
             # 調用 Hugging Face Embedding API
             payload = {
@@ -973,7 +1023,7 @@ class HuggingFaceModel(FullLLMInterface):
             
             if embedding and isinstance(embedding, list):
                 # 緩存結果
-                self.embeddings_cache[text_hash] = embedding
+                self.embeddings_cache.set(self.embedding_model, text, embedding)
                 return embedding
             
             return None
@@ -982,27 +1032,63 @@ class HuggingFaceModel(FullLLMInterface):
             logger.error(f"Failed to generate embedding: {str(e)}")
             return None
 
-    def _vector_search(self, query_embedding: List[float], top_k: int = 3, threshold: float = 0.7) -> List[Dict[str, Any]]:
-        """向量搜索相關文檔"""
+    def _get_embeddings(self, texts: List[str], progress_callback=None, label: str = '') -> List[Optional[List[float]]]:
+        """
+        批次生成多段文本的嵌入向量（緩存命中的文本不重新請求）
+
+        Args:
+            texts: 文本清單
+            progress_callback: 進度回報 progress_callback(已完成數, 總數)
+            label: 記錄用的名稱
+
+        Returns:
+            List[Optional[List[float]]]: 與 texts 對應的嵌入向量，失敗者為 None
+        """
+        cached = self.embeddings_cache.get_many(self.embedding_model, texts)
+        pending = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+
+        if pending:
+            embeddings = embed_in_batches(
+                pending, self._embed_batch, fallback=self._get_embedding,
+                batch_size=self.embedding_batch_size, max_workers=self.embedding_concurrency,
+                progress_callback=progress_callback, label=label
+            )
+            computed = {text: embedding for text, embedding in zip(pending, embeddings) if embedding}
+            self.embeddings_cache.set_many(self.embedding_model, list(computed.items()))
+            cached = [embedding if embedding is not None else computed.get(text) for text, embedding in zip(texts, cached)]
+        elif progress_callback:
+            progress_callback(len(texts), len(texts))
+
+        return cached
+
+    def _embed_batch(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        以 feature-extraction 的陣列輸入一次生成多個嵌入向量
+
+        回應需為每段文本一個向量；模型返回 token 級輸出等其他格式時返回 None，由呼叫端逐筆處理
+        """
+        payload = {
+            "inputs": texts,
+            "options": {"wait_for_model": True}
+        }
+
+        embeddings = self._make_request(self.embedding_model, payload)
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            return None
+        for embedding in embeddings:
+            if not isinstance(embedding, list) or not embedding or not isinstance(embedding[0], (int, float)):
+                return None
+        return embeddings
+
+    def _vector_search(self, query_embedding: List[float], top_k: int = 3, threshold: float = 0.7,
+                       exact: bool = False, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """向量搜索相關文檔（矩陣向量乘積 + argpartition，啟用 ANN 時只計算候選片段）"""
         try:
-            results = []
-            
-            for file_id, file_data in self.knowledge_store.items():
-                for chunk in file_data['chunks']:
-                    if 'embedding' in chunk:
-                        similarity = self._cosine_similarity(query_embedding, chunk['embedding'])
-                        
-                        if similarity >= threshold:
-                            results.append({
-                                'file_id': file_id,
-                                'filename': file_data['filename'],
-                                'text': chunk['text'],
-                                'similarity': similarity
-                            })
-            
-            # 按相似度排序
-            results.sort(key=lambda x: x['similarity'], reverse=True)
-            return results[:top_k]
+            if self.vector_store:
+                self.vector_store.refresh(self.knowledge_store, self.vector_index)
+            self.vector_index.sync(self.knowledge_store)
+            return self.vector_index.search(query_embedding, top_k=top_k, threshold=threshold,
+                                            exact=exact, nprobe=nprobe)
             
         except Exception as e:
             logger.error(f"Vector search failed: {str(e)}")
@@ -1222,7 +1308,7 @@ class HuggingFaceModel(FullLLMInterface):
                 "Authorization": f"Bearer {self.api_key}"
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/models/{self.speech_model}",
                 headers=headers,
                 data=audio_data,
@@ -1271,7 +1357,7 @@ class HuggingFaceModel(FullLLMInterface):
                 }
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/models/{self.image_model}",
                 headers=self.headers,
                 json=payload,
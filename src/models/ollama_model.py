@@ -17,6 +17,12 @@ from .base import (
 from ..utils.retry import retry_on_rate_limit
 from ..services.conversation import get_conversation_manager
 from ..core.logger import get_logger
+from ..core.http_pool import get_http_session
+from ..core.ann_index import IVFIndex
+from ..core.embedding_cache import EmbeddingCache
+from ..core.embedding_batcher import embed_in_batches
+from ..core.vector_index import VectorIndex
+from ..core.vector_store import PersistentVectorStore, content_hash
 import time
 
 logger = get_logger(__name__)
@@ -47,14 +53,34 @@ class OllamaModel(FullLLMInterface):
     - 需要充足的硬體資源 (RAM/GPU)
     """
     
-    def __init__(self, base_url: str = "http://localhost:11434", model_name: str = "llama3.1:8b", embedding_model: str = "nomic-embed-text", enable_mcp: bool = False):
+    def __init__(self, base_url: str = "http://localhost:11434", model_name: str = "llama3.1:8b", embedding_model: str = "nomic-embed-text", enable_mcp: bool = False,
+                 vector_index_dir: Optional[str] = None, vector_ann: Optional[Dict[str, Any]] = None,
+                 embedding_batch_size: int = 32, embedding_concurrency: int = 4,
+                 embedding_cache_path: Optional[str] = None, embedding_cache_max_entries: int = 200000):
         self.base_url = base_url.rstrip('/')
+        # 同一提供商共用 keep-alive 連線池，避免每次呼叫重新建立 TCP + TLS 連線
+        self.session = get_http_session('ollama')
         self.model_name = model_name
         self.embedding_model = embedding_model  # 本地 embedding 模型
         
         # 本地知識庫和向量快取
         self.knowledge_store = {}  # 本地知識庫
-        self.embeddings_cache = {}  # 嵌入向量快取
+        # 嵌入向量快取（以模型與 sha256 為鍵；設定 embedding_cache_path 時各 worker 共用並跨重啟保存）
+        self.embeddings_cache = EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_max_entries)
+        self.embedding_batch_size = embedding_batch_size  # 上傳時每次 /api/embed 請求的片段數
+        self.embedding_concurrency = embedding_concurrency  # 同時進行的批次請求數上限
+        # 正規化後的片段嵌入矩陣（設定 vector_ann 時大型知識庫改用 IVF 近似搜尋）
+        self.vector_index = VectorIndex(ann=IVFIndex.from_config(vector_ann))
+
+        # 磁碟持久化向量索引（各 worker 共用，重啟後不需重新計算嵌入向量）
+        self.vector_store = None
+        if vector_index_dir:
+            try:
+                self.vector_store = PersistentVectorStore(vector_index_dir)
+                self.vector_store.refresh(self.knowledge_store, self.vector_index, force=True)
+            except Exception as e:
+                logger.error(f"Failed to open vector index at {vector_index_dir}: {e}")
+                self.vector_store = None
         
         # 本地快取配置（隱私保護）
         self.local_cache_enabled = True
@@ -108,7 +134,7 @@ class OllamaModel(FullLLMInterface):
         """檢查 Ollama 連線和模型可用性"""
         try:
             # 檢查 Ollama 服務
-            response = requests.get(f"{self.base_url}/api/tags", timeout=10)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=10)
             if response.status_code != 200:
                 return False, f"Ollama 服務不可用: {response.status_code}"
             
@@ -183,24 +209,36 @@ class OllamaModel(FullLLMInterface):
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # 分塊
-            chunks = self._chunk_text(content, chunk_size=kwargs.get('chunk_size', 800))
-            
-            # 生成嵌入向量（使用 Ollama 的 embedding 功能）
-            chunk_embeddings = []
-            for chunk in chunks:
-                embedding = self._get_embedding(chunk['text'])
-                if embedding:
-                    chunk['embedding'] = embedding
-                    chunk_embeddings.append(chunk)
+            # 相同內容已存在於持久化索引時直接沿用其片段與嵌入向量
+            digest = content_hash(content)
+            chunk_embeddings = self.vector_store.get_chunks(digest) if self.vector_store else None
+            if chunk_embeddings is None:
+                # 分塊
+                chunks = self._chunk_text(content, chunk_size=kwargs.get('chunk_size', 800))
+                
+                # 批次生成嵌入向量（使用 Ollama 的 /api/embed 批次輸入）
+                embeddings = self._get_embeddings(
+                    [chunk['text'] for chunk in chunks],
+                    progress_callback=kwargs.get('progress_callback'),
+                    label=filename
+                )
+                chunk_embeddings = []
+                for chunk, embedding in zip(chunks, embeddings):
+                    if embedding:
+                        chunk['embedding'] = embedding
+                        chunk_embeddings.append(chunk)
             
-            # 儲存到知識庫
+            # 儲存到知識庫並增量更新向量索引
             self.knowledge_store[file_id] = {
                 'filename': filename,
                 'content': content,
+                'content_hash': digest,
                 'chunks': chunk_embeddings,
-                'metadata': kwargs
+                'metadata': {key: value for key, value in kwargs.items() if key != 'progress_callback'}
             }
+            self.vector_index.add_file(file_id, filename, chunk_embeddings)
+            if self.vector_store:
+                self.vector_store.save_file(file_id, self.knowledge_store[file_id])
             
             file_info = FileInfo(
                 file_id=file_id,
@@ -281,7 +319,10 @@ class OllamaModel(FullLLMInterface):
                 return self._fallback_chat_completion(query, context_messages, **kwargs)
             
             # 搜尋相關文檔片段
-            relevant_chunks = self._vector_search(query_embedding, top_k=kwargs.get('top_k', 3))
+            relevant_chunks = self._vector_search(
+                query_embedding, top_k=kwargs.get('top_k', 3),
+                exact=kwargs.get('exact_search', False), nprobe=kwargs.get('nprobe')
+            )
             
             if not relevant_chunks:
                 return self._fallback_chat_completion(query, context_messages, **kwargs)
@@ -391,9 +432,9 @@ class OllamaModel(FullLLMInterface):
         """使用 Ollama 生成嵌入向量"""
         try:
             # 檢查快取
-            text_hash = hashlib.md5(text.encode()).hexdigest()
-            if text_hash in self.embeddings_cache:
-                return self.embeddings_cache[text_hash]
+            cached = self.embeddings_cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
             
             # 使用 Ollama 的 embedding 功能
             json_body = {
@@ -409,7 +450,7 @@ class OllamaModel(FullLLMInterface):
             embedding = response.get('embedding')
             if embedding:
                 # 快取結果
-                self.embeddings_cache[text_hash] = embedding
+                self.embeddings_cache.set(self.model_name, text, embedding)
                 return embedding
             
             return None
@@ -417,6 +458,52 @@ class OllamaModel(FullLLMInterface):
         except Exception:
             return None
     
+    def _get_embeddings(self, texts: List[str], progress_callback=None, label: str = '') -> List[Optional[List[float]]]:
+        """
+        批次生成嵌入向量（快取命中的片段不重新請求）
+
+        Args:
+            texts: 片段文字
+            progress_callback: 進度回報 progress_callback(已完成片段數, 總片段數)
+            label: 記錄用的名稱
+
+        Returns:
+            List[Optional[List[float]]]: 與 texts 對應的嵌入向量，失敗者為 None
+        """
+        cached = self.embeddings_cache.get_many(self.model_name, texts)
+        pending = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+
+        if pending:
+            embeddings = embed_in_batches(
+                pending, self._embed_batch, fallback=self._get_embedding,
+                batch_size=self.embedding_batch_size, max_workers=self.embedding_concurrency,
+                progress_callback=progress_callback, label=label
+            )
+            computed = {text: embedding for text, embedding in zip(pending, embeddings) if embedding}
+            self.embeddings_cache.set_many(self.model_name, list(computed.items()))
+            cached = [embedding if embedding is not None else computed.get(text) for text, embedding in zip(texts, cached)]
+        elif progress_callback:
+            progress_callback(len(texts), len(texts))
+
+        return cached
+
+    def _embed_batch(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """以 /api/embed 的陣列輸入一次生成多個嵌入向量（舊版 Ollama 不支援時返回 None）"""
+        json_body = {
+            "model": self.model_name,
+            "input": texts
+        }
+
+        is_successful, response, error = self._request('POST', '/api/embed', body=json_body)
+        if not is_successful:
+            logger.debug(f"Ollama batch embedding failed: {error}")
+            return None
+
+        embeddings = response.get('embeddings')
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            return None
+        return embeddings
+
     def _chunk_text(self, text: str, chunk_size: int = 800, overlap: int = 100) -> List[Dict]:
         """將文本分塊"""
         chunks = []
@@ -438,30 +525,16 @@ class OllamaModel(FullLLMInterface):
         
         return chunks
     
-    def _vector_search(self, query_embedding: List[float], top_k: int = 3) -> List[Dict]:
-        """向量相似度搜尋"""
+    def _vector_search(self, query_embedding: List[float], top_k: int = 3,
+                       exact: bool = False, nprobe: Optional[int] = None) -> List[Dict]:
+        """向量相似度搜尋（矩陣向量乘積 + argpartition，啟用 ANN 時只計算候選片段）"""
         try:
-            scored_chunks = []
-            
-            for file_id, data in self.knowledge_store.items():
-                for chunk in data['chunks']:
-                    if 'embedding' not in chunk:
-                        continue
-                    
-                    # 計算餘弦相似度
-                    similarity = self._cosine_similarity(query_embedding, chunk['embedding'])
-                    
-                    if similarity > 0.1:  # 設定最低相似度閾值
-                        scored_chunks.append({
-                            'file_id': file_id,
-                            'filename': data['filename'],
-                            'text': chunk['text'],
-                            'similarity': similarity
-                        })
-            
-            # 按相似度排序並返回前 top_k 個
-            scored_chunks.sort(key=lambda x: x['similarity'], reverse=True)
-            return scored_chunks[:top_k]
+            if self.vector_store:
+                self.vector_store.refresh(self.knowledge_store, self.vector_index)
+            self.vector_index.sync(self.knowledge_store)
+            # 設定最低相似度閾值
+            return self.vector_index.search(query_embedding, top_k=top_k, threshold=0.1, inclusive=False,
+                                            exact=exact, nprobe=nprobe)
             
         except Exception:
             return []
@@ -488,9 +561,9 @@ class OllamaModel(FullLLMInterface):
             headers = {'Content-Type': 'application/json'}
             
             if method == 'POST':
-                r = requests.post(url, headers=headers, json=body, timeout=60)
+                r = self.session.post(url, headers=headers, json=body, timeout=60)
             elif method == 'GET':
-                r = requests.get(url, headers=headers, timeout=30)
+                r = self.session.get(url, headers=headers, timeout=30)
             else:
                 return False, None, f"Unsupported method: {method}"
             
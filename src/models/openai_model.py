@@ -40,7 +40,11 @@ OpenAI Model 實作
 import requests
 from ..core.logger import get_logger
 from ..core.api_timeouts import SmartTimeoutConfig, TimeoutContext
-from ..core.smart_polling import OpenAIPollingStrategy, PollingContext
+from ..core.smart_polling import AdaptivePollingStrategy, PollingContext
+from ..core.http_pool import get_http_session
+from ..core.file_reference_cache import FileReferenceCache
+from ..core.sse import iter_sse_events
+import json
 import re
 from typing import List, Dict, Tuple, Optional, Any
 import time
@@ -63,11 +67,32 @@ from ..utils import s2t_converter, dedup_citation_blocks
 class OpenAIModel(FullLLMInterface):
     """OpenAI 模型實作"""
     
-    def __init__(self, api_key: str, assistant_id: str = None, base_url: str = None, enable_mcp: bool = False):
+    # 串流 run 的終止事件
+    RUN_FAILURE_EVENTS = ('thread.run.failed', 'thread.run.cancelled', 'thread.run.expired', 'thread.run.incomplete')
+    # 串流中斷後查詢最新 run 時，容許本機與 OpenAI 時鐘的誤差（秒）
+    RUN_LOOKUP_CLOCK_SKEW = 30
+
+    def __init__(self, api_key: str, assistant_id: str = None, base_url: str = None, enable_mcp: bool = False,
+                 stream_runs: bool = False, combined_runs: bool = False, polling_histogram_path: str = None,
+                 file_reference_ttl: int = 300, file_reference_cache_path: str = None):
         self.api_key = api_key
         self.assistant_id = assistant_id
         self.base_url = base_url or 'https://api.openai.com/v1'
-        self.polling_strategy = OpenAIPollingStrategy()
+        # 同一提供商共用 keep-alive 連線池，避免每次呼叫重新建立 TCP + TLS 連線
+        self.session = get_http_session('openai')
+        # 依各 run 狀態的實際持續時間安排輪詢時間點，所有等待迴圈共用
+        self.polling_strategy = AdaptivePollingStrategy('openai', path=polling_histogram_path)
+        # 以 SSE 串流接收 run 事件（完成即返回，不需輪詢）；串流中斷時退回輪詢
+        self.stream_runs = stream_runs
+        # 新對話以 POST /threads/runs 一次建立對話串與 run，既有對話以 additional_messages 隨 run 送出訊息
+        self.combined_runs = combined_runs
+        # 引用格式化使用的檔案 ID → 檔名快取（過期時背景更新，未知 ID 個別查詢）
+        self.file_references = FileReferenceCache(
+            loader=lambda: self.get_file_references(),
+            resolver=self._resolve_file_reference,
+            ttl=file_reference_ttl,
+            path=file_reference_cache_path
+        )
         
         # MCP 支援 - 預設關閉，可透過參數或設定檔啟用
         if enable_mcp:
@@ -263,22 +288,59 @@ class OpenAIModel(FullLLMInterface):
         except Exception as e:
             return False, str(e)
     
-    def run_assistant(self, thread_id: str, **kwargs) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
-        """執行 OpenAI Assistant（支援 MCP function calling）"""
-        try:
-            # 啟動執行
+    def run_assistant(self, thread_id: Optional[str], **kwargs) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
+        """
+        執行 OpenAI Assistant（支援 MCP function calling）
+
+        Args:
+            thread_id: 對話串 ID；為 None 時以 POST /threads/runs 同時建立對話串（見 create_thread_and_run）
+            **kwargs: 額外參數
+                - temperature: 生成溫度
+                - additional_messages: 隨 run 一併加入對話串的 ChatMessage 清單（省去另外新增訊息的請求）
+                - max_wait_time: 最長等待秒數
+                - on_thread_created: 建立新對話串時以新 ID 呼叫
+
+        Returns:
+            (is_successful, chat_response, error_message)，chat_response.metadata['thread_id'] 為使用的對話串 ID
+        """
+        on_thread_created = kwargs.get('on_thread_created')
+        additional_messages = [
+            {'role': message.role, 'content': message.content}
+            for message in kwargs.get('additional_messages') or []
+        ]
+        json_body = {
+            'assistant_id': self.assistant_id,
+            'temperature': kwargs.get('temperature', 0.01)
+        }
+        if thread_id:
             endpoint = f'/threads/{thread_id}/runs'
-            json_body = {
-                'assistant_id': self.assistant_id,
-                'temperature': kwargs.get('temperature', 0.01)
-            }
+            if additional_messages:
+                json_body['additional_messages'] = additional_messages
+        else:
+            endpoint = '/threads/runs'
+            json_body['thread'] = {'messages': additional_messages}
+
+        try:
+            # 串流模式：run 完成事件到達即返回，無法建立串流時改用輪詢
+            if self.stream_runs:
+                handled, result = self._run_assistant_streaming(
+                    endpoint, json_body, thread_id, kwargs.get('max_wait_time'), on_thread_created
+                )
+                if handled:
+                    return result
             
+            # 啟動執行
             is_successful, run_response, error_message = self._request('POST', endpoint, body=json_body, assistant=True)
             if not is_successful:
                 return False, None, error_message
             
-            # 等待完成（使用異步等待提升性能）
             run_id = run_response['id']
+            if not thread_id:
+                thread_id = run_response['thread_id']
+                if on_thread_created:
+                    on_thread_created(thread_id)
+            
+            # 等待完成（使用異步等待提升性能）
             import asyncio
             if self.enable_mcp and self.mcp_service:
                 is_successful, final_response, error_message = asyncio.run(
@@ -293,76 +355,262 @@ class OpenAIModel(FullLLMInterface):
                 return False, None, f"Assistant run failed: {error_message}"
             
             # 取得回應
-            return self._get_thread_messages(thread_id)
+            return self._with_thread_id(self._get_thread_messages(thread_id, run_id), thread_id)
             
         except Exception as e:
             return False, None, str(e)
+
+    def create_thread_and_run(self, message: ChatMessage, on_thread_created=None,
+                              **kwargs) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
+        """
+        以單一請求建立對話串並執行 Assistant（POST /threads/runs）
+
+        Args:
+            message: 對話串的第一則訊息
+            on_thread_created: 取得新對話串 ID 時立即呼叫 on_thread_created(thread_id)，run 失敗時也會呼叫
+            **kwargs: 與 run_assistant 相同
+
+        Returns:
+            (is_successful, chat_response, error_message)，chat_response.metadata['thread_id'] 為新對話串 ID
+        """
+        kwargs['additional_messages'] = [message]
+        return self.run_assistant(None, on_thread_created=on_thread_created, **kwargs)
+
+    @staticmethod
+    def _with_thread_id(result: Tuple[bool, Optional[ChatResponse], Optional[str]],
+                        thread_id: str) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
+        """在成功的回應 metadata 中記錄對話串 ID"""
+        is_successful, chat_response, error_message = result
+        if is_successful and chat_response is not None:
+            chat_response.metadata = dict(chat_response.metadata or {}, thread_id=thread_id)
+        return is_successful, chat_response, error_message
     
+    def _run_assistant_streaming(self, endpoint: str, json_body: Dict, thread_id: Optional[str],
+                                 max_wait_time: int = None, on_thread_created=None) -> Tuple[bool, Optional[Tuple]]:
+        """
+        以 SSE 串流執行 Assistant
+
+        Returns:
+            (handled, result): handled 為 False 表示串流請求本身失敗、run 尚未產生，呼叫端應改用輪詢；
+            handled 為 True 時 result 為 run_assistant 的返回值
+        """
+        import asyncio
+
+        started = time.time()
+        deadline = started + (max_wait_time or SmartTimeoutConfig.get_timeout_for_model('assistant_run', 'openai'))
+        is_successful, stream, error_message = self._open_run_stream(endpoint, dict(json_body, stream=True))
+        if not is_successful:
+            logger.warning(f"Run stream unavailable, falling back to polling: {error_message}")
+            return False, None
+
+        state: Dict[str, Any] = {}
+        while True:
+            outcome, payload = self._consume_run_stream(stream, state, deadline)
+            run = state.get('run') or {}
+            run_id = run.get('id')
+            if thread_id is None and (run.get('thread_id') or state.get('thread_id')):
+                thread_id = run.get('thread_id') or state['thread_id']
+                if on_thread_created:
+                    on_thread_created(thread_id)
+
+            if outcome == 'completed':
+                break
+            if outcome == 'failed':
+                return True, (False, None, f"Assistant run failed: {self._describe_run_failure(payload)}")
+            if outcome == 'error':
+                return True, (False, None, f"Assistant run failed: {payload.get('message', 'Stream error')}")
+            if outcome == 'timeout':
+                return True, (False, None, f"Assistant run failed: Run {run_id} did not complete in time")
+
+            if outcome == 'requires_action':
+                if not (self.enable_mcp and self.mcp_service):
+                    return True, (False, None, "Assistant run failed: Run requires action but MCP is not enabled")
+                call_id = f"openai-mcp-{int(time.time() * 1000) % 100000}"
+                tool_calls = payload.get('required_action', {}).get('submit_tool_outputs', {}).get('tool_calls', [])
+                if not tool_calls:
+                    return True, (False, None, "Assistant run failed: Failed to handle MCP function calls")
+                tool_outputs = self._collect_mcp_tool_outputs(call_id, tool_calls)
+                logger.info(f"[{call_id}] 📤 Submitting {len(tool_outputs)} tool outputs to OpenAI (streaming)")
+                is_successful, stream, error_message = self._open_run_stream(
+                    f'/threads/{thread_id}/runs/{run_id}/submit_tool_outputs',
+                    {'tool_outputs': tool_outputs, 'stream': True}
+                )
+                if is_successful:
+                    continue
+                logger.warning(f"Tool output stream unavailable for run {run_id}: {error_message}")
+
+            # 串流中斷：串流已建立代表請求已被接受，不可重新建立 run（既有對話串會回報忙碌，
+            # 合併路徑則會再建立一個對話串）；尚未收到 run 事件時查詢對話串最新的 run 並改以輪詢等待
+            if not run_id and thread_id:
+                run_id = self._find_latest_run(thread_id, started - self.RUN_LOOKUP_CLOCK_SKEW)
+            if not run_id or not thread_id:
+                return True, (False, None, "Assistant run failed: Run stream interrupted before the run was created")
+            logger.warning(f"Run {run_id} stream interrupted, falling back to polling")
+            if self.enable_mcp and self.mcp_service:
+                is_successful, _, error_message = asyncio.run(self._wait_for_run_completion_with_mcp(thread_id, run_id))
+            else:
+                is_successful, _, error_message = asyncio.run(self._wait_for_run_completion_async(thread_id, run_id))
+            if not is_successful:
+                return True, (False, None, f"Assistant run failed: {error_message}")
+            return True, self._with_thread_id(self._get_thread_messages(thread_id, run_id), thread_id)
+
+        # 直接使用串流中的完成訊息，省去再次列出對話串訊息
+        message = state.get('message')
+        if message:
+            thread_messages = {'object': 'list', 'data': [message]}
+            chat_response = ChatResponse(
+                content=message['content'][0]['text']['value'],
+                metadata={'thread_messages': thread_messages, 'thread_id': thread_id}
+            )
+            return True, (True, chat_response, None)
+        return True, self._with_thread_id(self._get_thread_messages(thread_id, run_id), thread_id)
+
+    def _find_latest_run(self, thread_id: str, created_after: float) -> Optional[str]:
+        """取得對話串在 created_after 之後建立的最新 run ID"""
+        is_successful, response, error_message = self._request(
+            'GET', f'/threads/{thread_id}/runs?limit=1&order=desc', assistant=True
+        )
+        if not is_successful:
+            logger.warning(f"Failed to look up latest run on thread {thread_id}: {error_message}")
+            return None
+        runs = (response or {}).get('data') or []
+        if runs and runs[0].get('created_at', 0) >= created_after:
+            return runs[0].get('id')
+        return None
+
+    def _open_run_stream(self, endpoint: str, body: Dict) -> Tuple[bool, Optional[requests.Response], Optional[str]]:
+        """建立 run 的 SSE 串流連線"""
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            'OpenAI-Beta': 'assistants=v2'
+        }
+        timeout = SmartTimeoutConfig.get_timeout_for_model('assistant_run', 'openai')
+        try:
+            r = self.session.post(f'{self.base_url}{endpoint}', headers=headers, json=body, stream=True, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            return False, None, str(e)
+
+        if r.status_code >= 400:
+            try:
+                error_msg = r.json().get('error', {}).get('message', f'HTTP {r.status_code}')
+            except Exception:
+                error_msg = f'HTTP {r.status_code}'
+            r.close()
+            return False, None, error_msg
+        return True, r, None
+
+    def _consume_run_stream(self, stream: requests.Response, state: Dict[str, Any],
+                            deadline: float) -> Tuple[str, Optional[Dict]]:
+        """
+        讀取串流事件直到 run 需要處理或結束
+
+        Returns:
+            (outcome, payload): outcome 為 completed、requires_action、failed、error、timeout 或 interrupted
+        """
+        try:
+            for event, data in iter_sse_events(stream.iter_lines(decode_unicode=True)):
+                if data == '[DONE]':
+                    break
+                if time.time() > deadline:
+                    return 'timeout', state.get('run')
+                if not event or not data:
+                    continue
+
+                if event == 'error':
+                    return 'error', json.loads(data)
+                if event == 'thread.created':
+                    # 合併路徑先建立對話串，run 事件到達前中斷時仍可依對話串查詢 run
+                    state['thread_id'] = json.loads(data).get('id')
+                    continue
+                if event.startswith('thread.run.step.') or not event.startswith(('thread.run.', 'thread.message.')):
+                    continue
+
+                payload = json.loads(data)
+                if event == 'thread.message.completed':
+                    if payload.get('role') == 'assistant' and payload.get('content'):
+                        state['message'] = payload
+                    continue
+                if event.startswith('thread.message.'):
+                    continue
+
+                state['run'] = payload
+                logger.debug(f"Run {payload.get('id')} event: {event}")
+                if event == 'thread.run.completed':
+                    return 'completed', payload
+                if event == 'thread.run.requires_action':
+                    return 'requires_action', payload
+                if event in self.RUN_FAILURE_EVENTS:
+                    return 'failed', payload
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Run stream read failed: {e}")
+        finally:
+            stream.close()
+        return 'interrupted', state.get('run')
+
+    @staticmethod
+    def _describe_run_failure(run: Dict) -> str:
+        """組成 run 失敗的錯誤訊息（與輪詢路徑一致）"""
+        status = run.get('status', 'failed')
+        error_info = run.get('last_error') or run.get('incomplete_details') or {}
+        error_message = error_info.get('message') or error_info.get('reason') or 'Unknown error'
+        if 'rate limit' in error_message.lower() or error_info.get('code') == 'rate_limit_exceeded':
+            logger.warning(f"⚠️ OpenAI Rate limit hit for run {run.get('id')}: {error_message}")
+            return f"API 速率限制: {error_message}"
+        logger.error(f"❌ OpenAI Run {run.get('id')} {status}: {error_message}")
+        return f"Run {status}: {error_message}"
+
     async def _wait_for_run_completion_with_mcp(self, thread_id: str, run_id: str, max_wait_time: int = None) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """智慧等待執行完成（支援 MCP function calling）"""
+        import asyncio
         
-        if max_wait_time:
-            self.polling_strategy.max_wait_time = max_wait_time
-        
-        max_iterations = 60  # 增加到 60 次檢查 (約 2 分鐘)
-        iteration = 0
-        
-        while iteration < max_iterations:
-            iteration += 1
-            
-            # 檢查執行狀態
-            is_successful, response, error_message = self.retrieve_thread_run(thread_id, run_id)
-            if not is_successful:
-                return False, None, error_message
-            
-            status = response['status']
-            logger.debug(f"Run {run_id} status: {status} (iteration {iteration})")
-            
-            if status == 'completed':
-                return True, response, None
-            elif status in ['failed', 'expired', 'cancelled']:
-                error_info = response.get('last_error', {})
-                error_message = error_info.get('message', 'Unknown error')
-                error_code = error_info.get('code', 'unknown')
+        with PollingContext(f"OpenAI Assistant Run {run_id}", self.polling_strategy, max_wait_time) as context:
+            while True:
+                # 檢查執行狀態
+                is_successful, response, error_message = self.retrieve_thread_run(thread_id, run_id)
+                if not is_successful:
+                    return False, None, error_message
                 
-                # 檢查是否為速率限制錯誤
-                if 'rate limit' in error_message.lower() or error_code == 'rate_limit_exceeded':
-                    logger.warning(f"⚠️ OpenAI Rate limit hit for run {run_id}: {error_message}")
-                    return False, None, f"API 速率限制: {error_message}"
-                else:
-                    logger.error(f"❌ OpenAI Run {run_id} {status}: {error_message}")
-                    return False, None, f"Run {status}: {error_message}"
-            elif status == 'requires_action':
-                # 處理 MCP function calling
-                logger.info(f"🔧 OpenAI Run {run_id} requires action - processing MCP function calls")
-                success = await self._handle_mcp_function_calls(thread_id, run_id, response)
-                if not success:
-                    logger.error(f"❌ Failed to handle MCP function calls for run {run_id}")
-                    return False, None, "Failed to handle MCP function calls"
-                logger.info(f"✅ MCP function calls handled successfully for run {run_id}")
-                # 繼續輪詢
-            elif status in ['queued', 'in_progress']:
-                # 繼續等待
-                pass
-            
-            # 等待一段時間再檢查 - 用戶建議的等待策略：5秒→3秒→2秒→1秒→之後都1秒
-            import asyncio
-            if iteration == 1:
-                sleep_time = 5  # 第一次等5秒
-            elif iteration == 2:
-                sleep_time = 3  # 第二次等3秒
-            elif iteration == 3:
-                sleep_time = 2  # 第三次等2秒
-            elif iteration == 4:
-                sleep_time = 1  # 第四次等1秒
-            else:
-                sleep_time = 1  # 之後每秒檢查
-            
-            logger.debug(f"Waiting {sleep_time}s before next check (iteration {iteration}/{max_iterations})")
-            await asyncio.sleep(sleep_time)
+                status = response['status']
+                context.observe(status)
+                logger.debug(f"Run {run_id} status: {status} (attempt {context.attempt_count + 1})")
+                
+                if status == 'completed':
+                    return True, response, None
+                elif status in ['failed', 'expired', 'cancelled']:
+                    error_info = response.get('last_error', {})
+                    error_message = error_info.get('message', 'Unknown error')
+                    error_code = error_info.get('code', 'unknown')
+                    
+                    # 檢查是否為速率限制錯誤
+                    if 'rate limit' in error_message.lower() or error_code == 'rate_limit_exceeded':
+                        logger.warning(f"⚠️ OpenAI Rate limit hit for run {run_id}: {error_message}")
+                        return False, None, f"API 速率限制: {error_message}"
+                    else:
+                        logger.error(f"❌ OpenAI Run {run_id} {status}: {error_message}")
+                        return False, None, f"Run {status}: {error_message}"
+                elif status == 'requires_action':
+                    # 處理 MCP function calling
+                    logger.info(f"🔧 OpenAI Run {run_id} requires action - processing MCP function calls")
+                    success = await self._handle_mcp_function_calls(thread_id, run_id, response)
+                    if not success:
+                        logger.error(f"❌ Failed to handle MCP function calls for run {run_id}")
+                        return False, None, "Failed to handle MCP function calls"
+                    logger.info(f"✅ MCP function calls handled successfully for run {run_id}")
+                    # 提交 tool outputs 後 run 回到 in_progress，繼續輪詢
+                    context.observe('in_progress')
+                
+                # 由輪詢策略決定等待時間，不超過剩餘的等待上限
+                remaining = context.remaining()
+                if remaining <= 0:
+                    break
+                sleep_time = min(context.next_wait(), remaining)
+                logger.debug(f"Waiting {sleep_time:.1f}s before next check (attempt {context.attempt_count + 1})")
+                await asyncio.sleep(sleep_time)
+                context.attempt_count += 1
         
-        total_wait_time = 5 + 3 + 2 + 1 + (max_iterations - 4) * 1  # 5s + 3s + 2s + 1s + 56*1s = 67秒
-        return False, None, f"Run did not complete within {max_iterations} iterations (~{total_wait_time}s total wait time)"
+        return False, None, f"Run did not complete within {context.max_wait_time or self.polling_strategy.get_max_wait_time()}s (timeout)"
     
     async def _handle_mcp_function_calls(self, thread_id: str, run_id: str, run_response: Dict) -> bool:
         """處理 MCP function calls"""
@@ -385,51 +633,7 @@ class OpenAIModel(FullLLMInterface):
                 logger.warning(f"[{call_id}] ⚠️ No tool calls found in requires_action")
                 return False
             
-            logger.info(f"[{call_id}] 🎯 Processing {len(tool_calls)} OpenAI function calls")
-            tool_outputs = []
-            
-            for i, tool_call in enumerate(tool_calls, 1):
-                tool_call_id = tool_call['id']
-                function_name = tool_call['function']['name']
-                arguments_str = tool_call['function']['arguments']
-                
-                logger.info(f"[{call_id}] 📞 Function {i}/{len(tool_calls)}: {function_name}")
-                logger.info(f"[{call_id}] 🆔 Tool Call ID: {tool_call_id}")
-                logger.debug(f"[{call_id}] 📄 Raw Arguments: {arguments_str}")
-                
-                try:
-                    arguments = json.loads(arguments_str)
-                    logger.debug(f"[{call_id}] 📊 Parsed Arguments: {json.dumps(arguments, ensure_ascii=False, indent=2)}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"[{call_id}] ❌ Invalid JSON in function arguments: {e}")
-                    tool_outputs.append({
-                        "tool_call_id": tool_call_id,
-                        "output": json.dumps({
-                            "success": False,
-                            "error": "Invalid function arguments format"
-                        }, ensure_ascii=False)
-                    })
-                    continue
-                
-                # 執行 MCP function call
-                logger.info(f"[{call_id}] 🚀 Executing MCP function: {function_name}")
-                result = self.mcp_service.handle_function_call_sync(function_name, arguments)
-                
-                if result.get('success', False):
-                    logger.info(f"[{call_id}] ✅ Function {function_name} executed successfully")
-                    output_size = len(str(result.get('data', '')))
-                    logger.debug(f"[{call_id}] 📊 Result size: {output_size} chars")
-                else:
-                    error_msg = result.get('error', 'Unknown error')
-                    logger.error(f"[{call_id}] ❌ Function {function_name} failed: {error_msg}")
-                
-                output_json = json.dumps(result, ensure_ascii=False)
-                tool_outputs.append({
-                    "tool_call_id": tool_call_id,
-                    "output": output_json
-                })
-                
-                logger.debug(f"[{call_id}] 📋 Tool output for {tool_call_id}: {output_json[:200]}...")
+            tool_outputs = self._collect_mcp_tool_outputs(call_id, tool_calls)
             
             # 提交 tool outputs 到 OpenAI
             logger.info(f"[{call_id}] 📤 Submitting {len(tool_outputs)} tool outputs to OpenAI")
@@ -458,6 +662,62 @@ class OpenAIModel(FullLLMInterface):
             logger.exception(f"[{call_id}] 📄 Full Exception Details:")
             return False
     
+    def _collect_mcp_tool_outputs(self, call_id: str, tool_calls: List[Dict]) -> List[Dict[str, str]]:
+        """執行 requires_action 中的 MCP function calls（彼此獨立，並行執行）並依原順序組成 tool outputs"""
+        import json
+        from ..services.mcp_service import dispatch_function_calls
+
+        logger.info(f"[{call_id}] 🎯 Processing {len(tool_calls)} OpenAI function calls")
+        outputs: List[Optional[str]] = [None] * len(tool_calls)
+        pending = []
+        
+        for i, tool_call in enumerate(tool_calls):
+            tool_call_id = tool_call['id']
+            function_name = tool_call['function']['name']
+            arguments_str = tool_call['function']['arguments']
+            
+            logger.info(f"[{call_id}] 📞 Function {i + 1}/{len(tool_calls)}: {function_name}")
+            logger.info(f"[{call_id}] 🆔 Tool Call ID: {tool_call_id}")
+            logger.debug(f"[{call_id}] 📄 Raw Arguments: {arguments_str}")
+            
+            try:
+                arguments = json.loads(arguments_str)
+                logger.debug(f"[{call_id}] 📊 Parsed Arguments: {json.dumps(arguments, ensure_ascii=False, indent=2)}")
+            except json.JSONDecodeError as e:
+                logger.error(f"[{call_id}] ❌ Invalid JSON in function arguments: {e}")
+                outputs[i] = json.dumps({
+                    "success": False,
+                    "error": "Invalid function arguments format"
+                }, ensure_ascii=False)
+                continue
+            
+            pending.append((i, function_name, arguments))
+        
+        # 執行 MCP function calls（多個呼叫並行分派）
+        if pending:
+            logger.info(f"[{call_id}] 🚀 Executing MCP functions: {[name for _, name, _ in pending]}")
+        results = dispatch_function_calls(self.mcp_service, [(name, args) for _, name, args in pending])
+        
+        for (i, function_name, _), result in zip(pending, results):
+            if result.get('success', False):
+                logger.info(f"[{call_id}] ✅ Function {function_name} executed successfully")
+                output_size = len(str(result.get('data', '')))
+                logger.debug(f"[{call_id}] 📊 Result size: {output_size} chars")
+            else:
+                error_msg = result.get('error', 'Unknown error')
+                logger.error(f"[{call_id}] ❌ Function {function_name} failed: {error_msg}")
+            outputs[i] = json.dumps(result, ensure_ascii=False)
+        
+        tool_outputs = []
+        for tool_call, output_json in zip(tool_calls, outputs):
+            tool_outputs.append({
+                "tool_call_id": tool_call['id'],
+                "output": output_json
+            })
+            logger.debug(f"[{call_id}] 📋 Tool output for {tool_call['id']}: {output_json[:200]}...")
+
+        return tool_outputs
+
     def get_mcp_status(self) -> Dict[str, Any]:
         """取得 MCP 服務狀態"""
         return {
@@ -552,6 +812,7 @@ class OpenAIModel(FullLLMInterface):
                 purpose=response.get('purpose'),
                 metadata=response
             )
+            self.file_references.add(file_info.file_id, self._reference_name(file_info.filename))
             
             return True, file_info, None
             
@@ -561,23 +822,30 @@ class OpenAIModel(FullLLMInterface):
     def query_with_rag(self, query: str, thread_id: str = None, **kwargs) -> Tuple[bool, Optional[RAGResponse], Optional[str]]:
         """使用 OpenAI Assistant API 進行 RAG 查詢"""
         try:
-            # 如果沒有 thread_id，建立新的
-            if not thread_id:
-                is_successful, thread_info, error_message = self.create_thread()
+            message = ChatMessage(role='user', content=query)
+            if self.combined_runs:
+                # 快速路徑：訊息隨 run 一併送出
+                is_successful, chat_response, error_message = self._run_with_message(thread_id, message, **kwargs)
+                if not is_successful:
+                    return False, None, error_message
+                thread_id = chat_response.metadata['thread_id']
+            else:
+                # 如果沒有 thread_id，建立新的
+                if not thread_id:
+                    is_successful, thread_info, error_message = self.create_thread()
+                    if not is_successful:
+                        return False, None, error_message
+                    thread_id = thread_info.thread_id
+                
+                # 新增訊息到對話串
+                is_successful, error_message = self.add_message_to_thread(thread_id, message)
+                if not is_successful:
+                    return False, None, error_message
+                
+                # 執行助理
+                is_successful, chat_response, error_message = self.run_assistant(thread_id, **kwargs)
                 if not is_successful:
                     return False, None, error_message
-                thread_id = thread_info.thread_id
-            
-            # 新增訊息到對話串
-            message = ChatMessage(role='user', content=query)
-            is_successful, error_message = self.add_message_to_thread(thread_id, message)
-            if not is_successful:
-                return False, None, error_message
-            
-            # 執行助理
-            is_successful, chat_response, error_message = self.run_assistant(thread_id, **kwargs)
-            if not is_successful:
-                return False, None, error_message
             
             # 使用 OpenAI 特定的引用處理邏輯
             thread_messages = chat_response.metadata.get('thread_messages', {})
@@ -628,6 +896,40 @@ class OpenAIModel(FullLLMInterface):
         except Exception as e:
             return False, None, str(e)
     
+    def retrieve_file(self, file_id: str) -> Tuple[bool, Optional[FileInfo], Optional[str]]:
+        """取得單一檔案資訊"""
+        try:
+            is_successful, response, error_message = self._request('GET', f'/files/{file_id}', assistant=True)
+            
+            if not is_successful:
+                return False, None, error_message
+            
+            file_info = FileInfo(
+                file_id=response['id'],
+                filename=response['filename'],
+                size=response.get('bytes'),
+                status=response.get('status'),
+                purpose=response.get('purpose'),
+                metadata=response
+            )
+            return True, file_info, None
+            
+        except Exception as e:
+            return False, None, str(e)
+    
+    @staticmethod
+    def _reference_name(filename: str) -> str:
+        """引用中顯示的檔名（去除副檔名）"""
+        return filename.replace('.txt', '').replace('.json', '')
+    
+    def _resolve_file_reference(self, file_id: str) -> Optional[str]:
+        """個別查詢引用中未知的檔案 ID"""
+        is_successful, file_info, error_message = self.retrieve_file(file_id)
+        if not is_successful:
+            logger.warning(f"Failed to resolve file {file_id}: {error_message}")
+            return None
+        return self._reference_name(file_info.filename)
+    
     def get_file_references(self) -> Dict[str, str]:
         """取得檔案引用對應表"""
         try:
@@ -638,8 +940,7 @@ class OpenAIModel(FullLLMInterface):
             
             file_dict = {}
             for file in files:
-                filename = file.filename.replace('.txt', '').replace('.json', '')
-                file_dict[file.file_id] = filename
+                file_dict[file.file_id] = self._reference_name(file.filename)
             
             logger.debug(f"Loaded {len(file_dict)} file references")
             return file_dict
@@ -674,8 +975,9 @@ class OpenAIModel(FullLLMInterface):
             # 轉換為繁體中文
             text = s2t_converter.convert(text)
             
-            # 取得檔案字典用於引用處理
-            file_dict = self.get_file_references()
+            # 取得被引用檔案的檔名（使用快取，未知的 ID 個別查詢，不重新列出所有檔案）
+            cited_ids = [a['file_citation']['file_id'] for a in annotations if 'file_citation' in a]
+            file_dict = self.file_references.lookup(cited_ids) if cited_ids else {}
             
             # 替換註釋文本和建立來源清單
             citation_map: dict[str, int] = {}
@@ -707,36 +1009,6 @@ class OpenAIModel(FullLLMInterface):
                 replacement_text = f"[{ref_num}]"
                 text = text.replace(original_text, replacement_text)
             
-            # 檢查是否有 "Unknown" 來源，如果有則重新撈取檔案清單並重新處理
-            unknown_sources = [s for s in sources if s['filename'] == 'Unknown']
-            if unknown_sources:
-                logger.info(f"發現 {len(unknown_sources)} 個 Unknown 來源，重新撈取檔案清單")
-                
-                # 重新撈取最新的檔案清單
-                updated_file_dict = self.get_file_references()
-                
-                # 重新處理 Unknown 來源
-                for source in unknown_sources:
-                    file_id = source['file_id']
-                    updated_filename = updated_file_dict.get(file_id, "Unknown")
-                    
-                    if updated_filename != "Unknown":
-                        # 找到了新的檔案名稱，更新 source
-                        old_filename = source['filename']
-                        source['filename'] = updated_filename
-                        
-                        # 更新 citation_map 和文本中的引用
-                        if old_filename in citation_map:
-                            ref_num = citation_map[old_filename]
-                            # 移除舊的 citation_map 項目
-                            del citation_map[old_filename]
-                            # 添加新的 citation_map 項目
-                            citation_map[updated_filename] = ref_num
-                            
-                        logger.info(f"更新 file_id {file_id} 的檔案名稱: Unknown -> {updated_filename}")
-                    else:
-                        logger.warning(f"重新撈取後仍無法找到 file_id {file_id} 的檔案名稱")
-            
             # 直接返回處理後的文本，讓 ResponseFormatter 統一處理 sources
             final_text = dedup_citation_blocks(text.strip())
             
@@ -838,10 +1110,21 @@ class OpenAIModel(FullLLMInterface):
         except Exception as e:
             return False, None, str(e)
     
-    def list_thread_messages(self, thread_id: str):
-        """向後相容方法"""
+    def list_thread_messages(self, thread_id: str, limit: int = None, order: str = None, run_id: str = None):
+        """
+        列出對話串訊息
+
+        Args:
+            thread_id: 對話串 ID
+            limit: 返回筆數上限
+            order: 排序（asc / desc）
+            run_id: 只列出指定 run 產生的訊息
+        """
         try:
             endpoint = f'/threads/{thread_id}/messages'
+            params = [(key, value) for key, value in (('limit', limit), ('order', order), ('run_id', run_id)) if value]
+            if params:
+                endpoint += '?' + '&'.join(f'{key}={value}' for key, value in params)
             return self._request('GET', endpoint, assistant=True)
         except Exception as e:
             return False, None, str(e)
@@ -868,7 +1151,7 @@ class OpenAIModel(FullLLMInterface):
                     headers['OpenAI-Beta'] = 'assistants=v2'
                 if 'models' in endpoint:
                     timeout = SmartTimeoutConfig.get_timeout('model_list')
-                r = requests.get(f'{self.base_url}{endpoint}', headers=headers, timeout=timeout)
+                r = self.session.get(f'{self.base_url}{endpoint}', headers=headers, timeout=timeout)
             elif method == 'POST':
                 if body:
                     headers['Content-Type'] = 'application/json'
@@ -876,11 +1159,11 @@ class OpenAIModel(FullLLMInterface):
                     headers['OpenAI-Beta'] = 'assistants=v2'
                 if files:  # 檔案上傳
                     timeout = SmartTimeoutConfig.get_timeout('file_upload')
-                r = requests.post(f'{self.base_url}{endpoint}', headers=headers, json=body, files=files, timeout=timeout)
+                r = self.session.post(f'{self.base_url}{endpoint}', headers=headers, json=body, files=files, timeout=timeout)
             elif method == 'DELETE':
                 if assistant:
                     headers['OpenAI-Beta'] = 'assistants=v2'
-                r = requests.delete(f'{self.base_url}{endpoint}', headers=headers, timeout=timeout)
+                r = self.session.delete(f'{self.base_url}{endpoint}', headers=headers, timeout=timeout)
             
             # 檢查 HTTP 狀態碼
             if r.status_code == 429:  # Rate limit
@@ -908,11 +1191,7 @@ class OpenAIModel(FullLLMInterface):
             return False, None, f'OpenAI API 系統不穩定，請稍後再試: {str(e)}'
     
     def _wait_for_run_completion(self, thread_id: str, run_id: str, max_wait_time: int = None) -> Tuple[bool, Optional[Dict], Optional[str]]:
-        """智慧等待執行完成 - 使用 5s→3s→2s→1s→1s 策略"""
-        
-        # 使用智慧輪詢策略
-        if max_wait_time:
-            self.polling_strategy.max_wait_time = max_wait_time
+        """智慧等待執行完成 - 依輪詢策略安排檢查時間"""
         
         def check_run_status():
             """檢查執行狀態的回調函數"""
@@ -924,7 +1203,7 @@ class OpenAIModel(FullLLMInterface):
             return True, status, response
         
         # 使用智慧輪詢等待
-        with PollingContext(f"OpenAI Assistant Run {run_id}", self.polling_strategy) as context:
+        with PollingContext(f"OpenAI Assistant Run {run_id}", self.polling_strategy, max_wait_time) as context:
             return context.wait_for_condition(
                 check_function=check_run_status,
                 completion_statuses=['completed'],
@@ -932,58 +1211,51 @@ class OpenAIModel(FullLLMInterface):
             )
 
     async def _wait_for_run_completion_async(self, thread_id: str, run_id: str, max_wait_time: int = None) -> Tuple[bool, Optional[Dict], Optional[str]]:
-        """異步智慧等待執行完成 - 使用 5s→3s→2s→1s→1s 策略"""
+        """異步智慧等待執行完成 - 與同步版本共用輪詢策略"""
         import asyncio
-        import time
         
-        # 智慧輪詢間隔：5s→3s→2s→1s→之後都1s
-        intervals = [5, 3, 2, 1]
-        max_iterations = 60  # 最大檢查次數
-        start_time = time.time()
-        
-        for iteration in range(max_iterations):
-            # 使用 asyncio.to_thread 包裝同步 API 調用
-            is_successful, response, error_message = await asyncio.to_thread(
-                self.retrieve_thread_run, thread_id, run_id
-            )
-            
-            if not is_successful:
-                return False, None, error_message
-            
-            status = response['status']
-            logger.debug(f"Run {run_id} status: {status} (iteration {iteration + 1})")
-            
-            # 檢查完成狀態
-            if status == 'completed':
-                return True, response, None
-            elif status in ['failed', 'expired', 'cancelled']:
-                error_info = response.get('last_error', {})
-                error_message = error_info.get('message', 'Unknown error')
-                return False, None, f"Run {status}: {error_message}"
-            elif status == 'requires_action':
-                # 標準版本不處理 function calling，直接返回錯誤
-                return False, None, f"Run requires action but MCP is not enabled"
-            
-            # 檢查超時
-            if max_wait_time and (time.time() - start_time) > max_wait_time:
-                return False, None, f"Timeout waiting for run completion ({max_wait_time}s)"
-            
-            # 計算等待時間：5s→3s→2s→1s→之後都1s
-            if iteration < len(intervals):
-                sleep_time = intervals[iteration]
-            else:
-                sleep_time = 1
-            
-            logger.debug(f"Waiting {sleep_time}s before next check (iteration {iteration + 1}/{max_iterations})")
-            await asyncio.sleep(sleep_time)
+        with PollingContext(f"OpenAI Assistant Run {run_id}", self.polling_strategy, max_wait_time) as context:
+            while True:
+                # 使用 asyncio.to_thread 包裝同步 API 調用
+                is_successful, response, error_message = await asyncio.to_thread(
+                    self.retrieve_thread_run, thread_id, run_id
+                )
+                
+                if not is_successful:
+                    return False, None, error_message
+                
+                status = response['status']
+                context.observe(status)
+                logger.debug(f"Run {run_id} status: {status} (attempt {context.attempt_count + 1})")
+                
+                # 檢查完成狀態
+                if status == 'completed':
+                    return True, response, None
+                elif status in ['failed', 'expired', 'cancelled']:
+                    error_info = response.get('last_error', {})
+                    error_message = error_info.get('message', 'Unknown error')
+                    return False, None, f"Run {status}: {error_message}"
+                elif status == 'requires_action':
+                    # 標準版本不處理 function calling，直接返回錯誤
+                    return False, None, f"Run requires action but MCP is not enabled"
+                
+                # 由輪詢策略決定等待時間，不超過剩餘的等待上限
+                remaining = context.remaining()
+                if remaining <= 0:
+                    break
+                sleep_time = min(context.next_wait(), remaining)
+                logger.debug(f"Waiting {sleep_time:.1f}s before next check (attempt {context.attempt_count + 1})")
+                await asyncio.sleep(sleep_time)
+                context.attempt_count += 1
         
-        total_wait_time = sum(intervals) + (max_iterations - len(intervals)) * 1
-        return False, None, f"Run did not complete within {max_iterations} iterations (~{total_wait_time}s total wait time)"
+        return False, None, f"Run did not complete within {context.max_wait_time or self.polling_strategy.get_max_wait_time()}s (timeout)"
     
-    def _get_thread_messages(self, thread_id: str) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
-        """取得對話串訊息"""
+    def _get_thread_messages(self, thread_id: str, run_id: str = None) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
+        """取得最新的助理回應（只取最新一則；指定 run_id 時限定該 run 產生的訊息）"""
         try:
-            is_successful, response, error_message = self.list_thread_messages(thread_id)
+            is_successful, response, error_message = self.list_thread_messages(
+                thread_id, limit=1, order='desc', run_id=run_id
+            )
             if not is_successful:
                 return False, None, error_message
             
@@ -1005,6 +1277,18 @@ class OpenAIModel(FullLLMInterface):
             return False, None, str(e)
     
     # === 🆕 新的用戶級對話管理接口 ===
+
+    def _run_with_message(self, thread_id: Optional[str], message: ChatMessage, on_thread_created=None,
+                          **kwargs) -> Tuple[bool, Optional[ChatResponse], Optional[str]]:
+        """
+        將訊息隨 run 一併送出：沒有對話串時以 POST /threads/runs 建立，否則使用 additional_messages
+
+        Returns:
+            (is_successful, chat_response, error_message)，chat_response.metadata['thread_id'] 為使用的對話串 ID
+        """
+        if not thread_id:
+            return self.create_thread_and_run(message, on_thread_created=on_thread_created, **kwargs)
+        return self.run_assistant(thread_id, additional_messages=[message], **kwargs)
     
     def chat_with_user(self, user_id: str, message: str, platform: str = 'line', **kwargs) -> Tuple[bool, Optional[RAGResponse], Optional[str]]:
         """
@@ -1026,27 +1310,40 @@ class OpenAIModel(FullLLMInterface):
             from ..database.connection import get_thread_id_by_user_id, save_thread_id
             
             thread_id = get_thread_id_by_user_id(user_id, platform)
+            user_message = ChatMessage(role='user', content=message)
             
-            if not thread_id:
-                # 創建新 thread
-                is_successful, thread_info, error = self.create_thread()
+            if self.combined_runs:
+                # 快速路徑：建立 thread、加入訊息與啟動 run 合併為單一請求
+                def on_thread_created(new_thread_id: str) -> None:
+                    save_thread_id(user_id, new_thread_id, platform)
+                    logger.info(f"Created new thread {new_thread_id} for user {user_id} on platform {platform}")
+                
+                is_successful, chat_response, error = self._run_with_message(
+                    thread_id, user_message, on_thread_created=on_thread_created, **kwargs
+                )
                 if not is_successful:
-                    return False, None, f"Failed to create thread: {error}"
+                    return False, None, error
+                thread_id = chat_response.metadata['thread_id']
+            else:
+                if not thread_id:
+                    # 創建新 thread
+                    is_successful, thread_info, error = self.create_thread()
+                    if not is_successful:
+                        return False, None, f"Failed to create thread: {error}"
+                    
+                    thread_id = thread_info.thread_id
+                    save_thread_id(user_id, thread_id, platform)
+                    logger.info(f"Created new thread {thread_id} for user {user_id} on platform {platform}")
                 
-                thread_id = thread_info.thread_id
-                save_thread_id(user_id, thread_id, platform)
-                logger.info(f"Created new thread {thread_id} for user {user_id} on platform {platform}")
-            
-            # 2. 添加用戶訊息到 thread
-            user_message = ChatMessage(role='user', content=message)
-            is_successful, error = self.add_message_to_thread(thread_id, user_message)
-            if not is_successful:
-                return False, None, f"Failed to add message to thread: {error}"
-            
-            # 3. 執行 Assistant
-            is_successful, chat_response, error = self.run_assistant(thread_id, **kwargs)
-            if not is_successful:
-                return False, None, error
+                # 2. 添加用戶訊息到 thread
+                is_successful, error = self.add_message_to_thread(thread_id, user_message)
+                if not is_successful:
+                    return False, None, f"Failed to add message to thread: {error}"
+                
+                # 3. 執行 Assistant
+                is_successful, chat_response, error = self.run_assistant(thread_id, **kwargs)
+                if not is_successful:
+                    return False, None, error
             
             # 4. 處理 OpenAI 回應格式（引用等）
             thread_messages = chat_response.metadata.get('thread_messages', {})
@@ -2,7 +2,7 @@
 多平台支援的抽象介面和基礎類別
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, Union, List
+from typing import BinaryIO, Callable, Dict, Any, Optional, Union, List
 from dataclasses import dataclass
 from enum import Enum
 from ..core.logger import get_logger
@@ -40,7 +40,7 @@ class PlatformMessage:
     user: PlatformUser
     content: str
     message_type: str = "text"  # text, audio, image, file, etc.
-    raw_data: Optional[bytes] = None  # 原始二進位資料（如音訊、圖片）
+    raw_data: Optional[Union[bytes, BinaryIO]] = None  # 原始二進位資料（如音訊、圖片）；音訊為背景下載中的 MediaHandle
     reply_token: Optional[str] = None  # 回覆 token（LINE 需要）
     metadata: Optional[Dict[str, Any]] = None
 
@@ -139,6 +139,21 @@ class BasePlatformHandler(PlatformHandlerInterface):
         logger.debug(f"[BASE] Config validation passed for {platform_name}")
         return True
     
+    def start_consumer(self, consumer: Callable[[PlatformMessage], Any]) -> bool:
+        """
+        啟用推送模式，平台連線收到的訊息直接交給 consumer 處理
+
+        預設不支援（訊息經由 webhook 進入）；使用常駐連線的平台（例如 Discord gateway）覆寫此方法
+
+        Returns:
+            bool: 是否已開始推送訊息
+        """
+        return False
+    
+    def start_gateway(self) -> bool:
+        """啟動平台常駐連線（預設沒有常駐連線）"""
+        return False
+    
     @abstractmethod
     def get_required_config_fields(self) -> List[str]:
         """取得必要的設定欄位"""
@@ -188,6 +203,14 @@ class PlatformManager:
         """取得所有啟用的平台列表"""
         return list(self._handlers.keys())
     
+    def start_gateways(self) -> None:
+        """啟動各平台延後的常駐連線（gunicorn worker fork 後呼叫）"""
+        for platform_type, handler in self._handlers.items():
+            try:
+                handler.start_gateway()
+            except Exception as e:
+                logger.error(f"Error starting {platform_type.value} gateway: {e}")
+    
     def handle_platform_webhook(self, platform_type: PlatformType, request_body: str, headers: Dict[str, str]) -> List[PlatformMessage]:
         """處理指定平台的 webhook"""
         handler = self.get_handler(platform_type)
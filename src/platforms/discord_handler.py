@@ -1,10 +1,21 @@
 """
 Discord 平台處理器
 使用 discord.py 2024 最新版本，支援 async/await 和最新的 Discord API
+
+訊息由 gateway 連線推送：bot 事件迴圈收到訊息後直接交給聊天流程（有上限的並行數），
+不需等待 /webhooks/discord 的 HTTP 請求。多個 gunicorn worker 中只有取得
+gateway 檔案鎖的 worker 會登入 bot，避免每個 worker 各自建立一個 bot session
 """
 import asyncio
-from threading import Thread
-from typing import List, Optional, Any, Dict
+import fcntl
+import hashlib
+import os
+import queue
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, get_ident
+from typing import Callable, List, Optional, Any, Dict
 from ..core.logger import get_logger
 
 try:
@@ -38,11 +49,30 @@ class DiscordHandler(BasePlatformHandler):
         self.guild_id = self.get_config('guild_id')
         self.command_prefix = self.get_config('command_prefix', '!')
         
-        self.message_queue = asyncio.Queue()
+        # 推送模式的並行處理上限與單一 gateway 連線設定
+        self.max_concurrent_messages = max(1, int(self.get_config('max_concurrent_messages', 4)))
+        self.gateway_lock_path = self.get_config('gateway_lock_path') or os.path.join(
+            tempfile.gettempdir(),
+            f"discord-gateway-{hashlib.sha256(str(self.bot_token).encode()).hexdigest()[:12]}.lock"
+        )
+        self.gateway_lock_retry = float(self.get_config('gateway_lock_retry', 30))
+        
+        # 沒有設定 consumer 時，訊息放入執行緒安全的佇列，由 handle_webhook 取出
+        self.message_queue = queue.Queue()
         self.bot = None
         self.event_loop = None
         self.bot_thread = None
         
+        self._consumer: Optional[Callable[[PlatformMessage], Any]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatch_semaphore: Optional[asyncio.Semaphore] = None
+        self._dispatch_tasks = set()
+        self._gateway_lock_file = None
+        self._standby_thread = None
+        self._stopped = False
+        self.dispatched = 0
+        self.dispatch_errors = 0
+        
         if self.is_enabled() and self.validate_config():
             self._setup_bot()
             logger.info("Discord handler initialized")
@@ -85,9 +115,30 @@ class DiscordHandler(BasePlatformHandler):
                 return
             if self.guild_id and str(message.guild.id) != str(self.guild_id):
                 return
-            await self.message_queue.put(message)
+            if self._consumer:
+                task = asyncio.get_running_loop().create_task(self._dispatch_message(message))
+                self._dispatch_tasks.add(task)
+                task.add_done_callback(self._dispatch_tasks.discard)
+            else:
+                self.message_queue.put(message)
             await self.bot.process_commands(message)
 
+    async def _dispatch_message(self, discord_message: Any):
+        """在 bot 事件迴圈中解析訊息，交給 consumer 於工作執行緒處理（受並行上限限制）"""
+        if self._dispatch_semaphore is None:
+            self._dispatch_semaphore = asyncio.Semaphore(self.max_concurrent_messages)
+        async with self._dispatch_semaphore:
+            try:
+                parsed_message = await self._parse_message_async(discord_message)
+                if not parsed_message:
+                    return
+                # consumer 會同步等待模型回應並透過 send_response 回到本迴圈發送，必須在迴圈外執行
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._consumer, parsed_message)
+                self.dispatched += 1
+            except Exception as e:
+                self.dispatch_errors += 1
+                logger.error(f"Error dispatching Discord message {getattr(discord_message, 'id', 'unknown')}: {e}")
+
     def parse_message(self, discord_message: Any) -> Optional[PlatformMessage]:
         """解析 Discord 訊息為統一格式"""
         if not DISCORD_AVAILABLE or discord is None:
@@ -96,6 +147,49 @@ class DiscordHandler(BasePlatformHandler):
         if not isinstance(discord_message, discord.Message):
             return None
 
+        audio_attachment = self._find_audio_attachment(discord_message)
+        audio_content = None
+        if audio_attachment:
+            try:
+                audio_content = self._read_attachment_sync(audio_attachment)
+            except Exception as e:
+                logger.error(f"Error downloading Discord audio: {e}")
+        return self._build_platform_message(discord_message, audio_attachment, audio_content)
+
+    async def _parse_message_async(self, discord_message: Any) -> Optional[PlatformMessage]:
+        """在 bot 事件迴圈中解析訊息（音訊附件以同一個迴圈的連線下載）"""
+        if not DISCORD_AVAILABLE or discord is None:
+            return None
+        
+        if not isinstance(discord_message, discord.Message):
+            return None
+
+        audio_attachment = self._find_audio_attachment(discord_message)
+        audio_content = None
+        if audio_attachment:
+            try:
+                audio_content = await audio_attachment.read()
+            except Exception as e:
+                logger.error(f"Error downloading Discord audio: {e}")
+        return self._build_platform_message(discord_message, audio_attachment, audio_content)
+
+    @staticmethod
+    def _find_audio_attachment(discord_message: Any) -> Any:
+        for attachment in discord_message.attachments or []:
+            if attachment.content_type and attachment.content_type.startswith('audio/'):
+                return attachment
+        return None
+
+    def _read_attachment_sync(self, attachment: Any) -> bytes:
+        """同步下載附件；bot 迴圈執行中時在該迴圈下載，避免跨迴圈使用 discord.py 的連線"""
+        loop = self.event_loop
+        if loop is not None and loop.is_running() and self.bot_thread is not None and \
+                self.bot_thread.ident != get_ident():
+            return asyncio.run_coroutine_threadsafe(attachment.read(), loop).result(timeout=30)
+        return asyncio.run(attachment.read())
+
+    def _build_platform_message(self, discord_message: Any, audio_attachment: Any,
+                                audio_content: Optional[bytes]) -> PlatformMessage:
         user = PlatformUser(
             user_id=str(discord_message.author.id),
             platform=PlatformType.DISCORD,
@@ -111,20 +205,14 @@ class DiscordHandler(BasePlatformHandler):
         message_type = "text"
         raw_data = None
 
-        if discord_message.attachments:
-            for attachment in discord_message.attachments:
-                if attachment.content_type and attachment.content_type.startswith('audio/'):
-                    message_type = "audio"
-                    try:
-                        audio_content = asyncio.run(attachment.read())
-                        content = "[Audio Message]"
-                        raw_data = audio_content
-                        logger.debug(f"[DISCORD] Audio message from {user.user_id}, size: {len(audio_content)} bytes")
-                    except Exception as e:
-                        logger.error(f"Error downloading Discord audio: {e}")
-                        content = "[Audio Message - Download Failed]"
-                        raw_data = None
-                    break
+        if audio_attachment:
+            message_type = "audio"
+            if audio_content is not None:
+                content = "[Audio Message]"
+                raw_data = audio_content
+                logger.debug(f"[DISCORD] Audio message from {user.user_id}, size: {len(audio_content)} bytes")
+            else:
+                content = "[Audio Message - Download Failed]"
 
         return PlatformMessage(
             message_id=str(discord_message.id),
@@ -180,7 +268,7 @@ class DiscordHandler(BasePlatformHandler):
             return []
         
         if not self.bot_thread or not self.bot_thread.is_alive():
-            self._start_bot()
+            self.start_gateway()
         
         messages = []
         try:
@@ -189,13 +277,105 @@ class DiscordHandler(BasePlatformHandler):
                 parsed_message = self.parse_message(discord_message)
                 if parsed_message:
                     messages.append(parsed_message)
-        except asyncio.QueueEmpty:
+        except queue.Empty:
             pass
         except Exception as e:
             logger.error(f"Error getting messages from Discord queue: {e}")
         
         return messages
     
+    def start_consumer(self, consumer: Callable[[PlatformMessage], Any]) -> bool:
+        """
+        啟用推送模式：gateway 收到的訊息直接交給 consumer 處理
+
+        Args:
+            consumer: 處理單一訊息的同步函數（於工作執行緒中呼叫，最多 max_concurrent_messages 個同時執行）
+
+        Returns:
+            bool: 本進程是否已持有 gateway 連線
+        """
+        if not self.bot:
+            return False
+        self._consumer = consumer
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_messages,
+                                                thread_name_prefix='DiscordConsumer')
+        logger.info(f"Discord push consumer enabled (max_concurrent_messages={self.max_concurrent_messages})")
+        return self.start_gateway()
+    
+    def start_gateway(self) -> bool:
+        """
+        取得 gateway 檔案鎖並啟動 bot；鎖被其他 worker 持有時在背景定期重試
+
+        gunicorn preload 時 app 在 master 建立，設定 DEFER_PLATFORM_GATEWAYS 後
+        延到 worker fork 後（post_fork）才啟動，master 不持有連線
+
+        Returns:
+            bool: 本進程是否已持有 gateway 連線
+        """
+        if not self.bot:
+            return False
+        if os.getenv('DEFER_PLATFORM_GATEWAYS') == 'true':
+            logger.debug("Discord gateway start deferred until worker fork")
+            return False
+        if self.bot_thread and self.bot_thread.is_alive():
+            return True
+        if not self._acquire_gateway_lock():
+            self._start_standby()
+            return False
+        self._start_bot()
+        return True
+    
+    def _acquire_gateway_lock(self) -> bool:
+        """以非阻塞 flock 取得 gateway 鎖，進程結束時由系統釋放"""
+        if self._gateway_lock_file is not None:
+            return True
+        lock_file = open(self.gateway_lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._gateway_lock_file = lock_file
+        logger.info(f"Acquired Discord gateway lock (pid: {os.getpid()})")
+        return True
+    
+    def _release_gateway_lock(self):
+        if self._gateway_lock_file is not None:
+            try:
+                fcntl.flock(self._gateway_lock_file.fileno(), fcntl.LOCK_UN)
+            finally:
+                self._gateway_lock_file.close()
+                self._gateway_lock_file = None
+    
+    def _start_standby(self):
+        """其他 worker 持有 gateway 時待命，持有者結束後接手"""
+        if self._standby_thread and self._standby_thread.is_alive():
+            return
+        
+        def standby():
+            while self.bot and not self._stopped:
+                time.sleep(self.gateway_lock_retry)
+                if self._acquire_gateway_lock():
+                    self._start_bot()
+                    return
+        
+        self._standby_thread = Thread(target=standby, name='DiscordGatewayStandby', daemon=True)
+        self._standby_thread.start()
+        logger.info(f"Discord gateway held by another worker, standing by (pid: {os.getpid()})")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """取得 gateway 與推送處理統計"""
+        return {
+            'gateway_owner': self._gateway_lock_file is not None,
+            'running': bool(self.bot_thread and self.bot_thread.is_alive()),
+            'push_consumer': self._consumer is not None,
+            'in_flight': len(self._dispatch_tasks),
+            'dispatched': self.dispatched,
+            'dispatch_errors': self.dispatch_errors,
+            'queued': self.message_queue.qsize(),
+        }
+    
     def _start_bot(self):
         """在新線程中啟動 Discord bot"""
         if self.bot_thread and self.bot_thread.is_alive():
@@ -205,6 +385,7 @@ class DiscordHandler(BasePlatformHandler):
             try:
                 self.event_loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(self.event_loop)
+                self._dispatch_semaphore = asyncio.Semaphore(self.max_concurrent_messages)
                 self.event_loop.run_until_complete(self.bot.start(self.bot_token))
             except Exception as e:
                 logger.error(f"Error running Discord bot: {e}")
@@ -218,9 +399,14 @@ class DiscordHandler(BasePlatformHandler):
     
     def stop_bot(self):
         """停止 Discord bot"""
+        self._stopped = True
         if self.bot and self.event_loop:
             asyncio.run_coroutine_threadsafe(self.bot.close(), self.event_loop).result(timeout=10)
             logger.info("Discord bot stopped")
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._release_gateway_lock()
     
     def __del__(self):
         try:
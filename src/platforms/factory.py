@@ -1,19 +1,25 @@
 """
 平台工廠 - 使用 Factory Pattern 和 Registry Pattern
 """
+import importlib
 from ..core.logger import get_logger
-from typing import Dict, Any, Optional, Type, List, Tuple
+from typing import Dict, Any, Optional, Type, List, Tuple, Union
 from .base import PlatformType, PlatformHandlerInterface, BasePlatformHandler
-from .line_handler import LineHandler
-from .discord_handler import DiscordHandler
-from .telegram_handler import TelegramHandler
-from .slack_handler import SlackHandler
-from .whatsapp_handler import WhatsAppHandler
-from .messenger_handler import MessengerHandler
-from .instagram_handler import InstagramHandler
 
 logger = get_logger(__name__)
 
+# 內建處理器以模組路徑註冊，只有實際用到的平台才會載入其 SDK
+# （LINE、Discord、Slack 等 SDK 的匯入成本很高，未啟用的平台不應拖慢啟動）
+BUILT_IN_HANDLERS: Dict[PlatformType, str] = {
+    PlatformType.LINE: 'src.platforms.line_handler.LineHandler',
+    PlatformType.DISCORD: 'src.platforms.discord_handler.DiscordHandler',
+    PlatformType.TELEGRAM: 'src.platforms.telegram_handler.TelegramHandler',
+    PlatformType.SLACK: 'src.platforms.slack_handler.SlackHandler',
+    PlatformType.WHATSAPP: 'src.platforms.whatsapp_handler.WhatsAppHandler',
+    PlatformType.MESSENGER: 'src.platforms.messenger_handler.MessengerHandler',
+    PlatformType.INSTAGRAM: 'src.platforms.instagram_handler.InstagramHandler',
+}
+
 
 class PlatformRegistry:
     """
@@ -23,31 +29,39 @@ class PlatformRegistry:
     """
     
     def __init__(self):
-        self._handlers: Dict[PlatformType, Type[BasePlatformHandler]] = {}
+        # 值為處理器類別，或尚未載入的處理器模組路徑
+        self._handlers: Dict[PlatformType, Union[Type[BasePlatformHandler], str]] = {}
         self._register_built_in_handlers()
     
     def _register_built_in_handlers(self):
-        """註冊內建的平台處理器"""
-        self.register(PlatformType.LINE, LineHandler)
-        self.register(PlatformType.DISCORD, DiscordHandler)
-        self.register(PlatformType.TELEGRAM, TelegramHandler)
-        self.register(PlatformType.SLACK, SlackHandler)
-        self.register(PlatformType.WHATSAPP, WhatsAppHandler)
-        self.register(PlatformType.MESSENGER, MessengerHandler)
-        self.register(PlatformType.INSTAGRAM, InstagramHandler)
+        """註冊內建的平台處理器（延遲載入）"""
+        for platform_type, handler_path in BUILT_IN_HANDLERS.items():
+            self.register_lazy(platform_type, handler_path)
         logger.info("Built-in platform handlers registered: LINE, Discord, Telegram, Slack, WhatsApp, Messenger, Instagram")
     
     def register(self, platform_type: PlatformType, handler_class: Type[BasePlatformHandler]):
         """註冊平台處理器類別"""
-        if not issubclass(handler_class, BasePlatformHandler):
+        if not isinstance(handler_class, type) or not issubclass(handler_class, BasePlatformHandler):
             raise ValueError(f"Handler class must inherit from BasePlatformHandler")
         
         self._handlers[platform_type] = handler_class
         logger.info(f"Registered handler for platform: {platform_type.value}")
     
+    def register_lazy(self, platform_type: PlatformType, handler_path: str):
+        """以 'module.ClassName' 路徑註冊平台處理器，第一次取得類別時才匯入模組"""
+        self._handlers[platform_type] = handler_path
+        logger.debug(f"Registered lazy handler for platform: {platform_type.value} ({handler_path})")
+    
     def get_handler_class(self, platform_type: PlatformType) -> Optional[Type[BasePlatformHandler]]:
-        """取得平台處理器類別"""
-        return self._handlers.get(platform_type)
+        """取得平台處理器類別（必要時載入模組）"""
+        handler = self._handlers.get(platform_type)
+        if not isinstance(handler, str):
+            return handler
+        
+        module_name, class_name = handler.rsplit('.', 1)
+        handler_class = getattr(importlib.import_module(module_name), class_name)
+        self.register(platform_type, handler_class)
+        return handler_class
     
     def get_available_platforms(self) -> List[PlatformType]:
         """取得所有已註冊的平台類型"""
@@ -262,9 +276,12 @@ class PlatformConfigValidator:
         
         platforms_config = config.get('platforms', {})
         
-        for platform_name in platforms_config.keys():
+        for platform_name, platform_config in platforms_config.items():
             try:
                 platform_type = PlatformType(platform_name)
+                # 未啟用的平台不會建立處理器，也不需要載入其模組來驗證
+                if isinstance(platform_config, dict) and not platform_config.get('enabled', False):
+                    continue
                 is_valid, errors = self.validate_platform_config(platform_type, config)
                 
                 if not is_valid:
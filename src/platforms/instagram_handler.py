@@ -12,6 +12,7 @@ Instagram Business Cloud API 處理器
 
 import requests
 from typing import List, Optional, Any, Dict
+from ..core.exceptions import DeliveryError
 from ..core.logger import get_logger
 from .base import PlatformType, PlatformUser, PlatformMessage
 from .meta_base_handler import MetaBaseHandler
@@ -161,13 +162,10 @@ class InstagramHandler(MetaBaseHandler):
                             message_type = 'audio'
                             audio_url = payload.get('url')
                             if audio_url:
-                                raw_data = self._download_media(audio_url)
-                                if raw_data:
-                                    content = '[Audio Message]'
-                                    logger.debug(f"[INSTAGRAM] Audio message from {sender_id}, size: {len(raw_data)} bytes")
-                                else:
-                                    content = '[Audio Message - Download Failed]'
-                                    raw_data = None
+                                # 背景預取音訊，不阻塞 webhook 回應
+                                raw_data = self._prefetch_media(audio_url, name=f"instagram_{sender_id}.m4a")
+                                content = '[Audio Message]'
+                                logger.debug(f"[INSTAGRAM] Audio message from {sender_id}, download queued")
                             else:
                                 content = '[Audio Message]'
                                 raw_data = None
@@ -244,6 +242,7 @@ class InstagramHandler(MetaBaseHandler):
             }
             
             response = requests.post(url, json=payload, headers=self.headers, timeout=30)
+            self._raise_for_retryable(response)
             
             if response.status_code == 200:
                 logger.debug(f"[INSTAGRAM] _send_text_message success to {recipient_id}")
@@ -252,6 +251,8 @@ class InstagramHandler(MetaBaseHandler):
                 logger.error(f"[INSTAGRAM] _send_text_message failed: {response.status_code} - {response.text}")
                 return False
                 
+        except DeliveryError:
+            raise
         except Exception as e:
             logger.error(f"[INSTAGRAM] _send_text_message error: {e}")
             return False
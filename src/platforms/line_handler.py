@@ -20,19 +20,25 @@ LINE 平台處理器
   app.py → send_response() → LINE Messaging API
 
 🎯 平台特色：
-  - 使用 reply_token 機制回應訊息
+  - 使用 reply_token 機制回應訊息；模型思考過久導致 reply_token 失效時改用 push message
   - 支援豐富的訊息類型 (文字、音訊、圖片、sticker等)
   - Webhook 簽名使用 HMAC-SHA256 驗證
-  - 音訊檔案需透過 Blob API 下載
+  - 音訊檔案需透過 Blob API 下載（於背景預取，不阻塞 webhook 回應）
 """
+import time
+import uuid
+from ..core.exceptions import DeliveryError
 from ..core.logger import get_logger
-from typing import List, Optional, Any, Dict
+from ..core.media_fetch import CHUNK_SIZE, get_media_fetcher
+from typing import BinaryIO, List, Optional, Any, Dict
 
 from linebot.v3.messaging import (
     Configuration,
     ApiClient,
+    ApiException,
     MessagingApi,
     MessagingApiBlob,
+    PushMessageRequest,
     ReplyMessageRequest,
     TextMessage as LineTextMessage,
 )
@@ -54,6 +60,9 @@ class LineHandler(BasePlatformHandler):
         super().__init__(config)
         self.channel_access_token = self.get_config('channel_access_token')
         self.channel_secret = self.get_config('channel_secret')
+        # reply_token 約一分鐘內有效，逾時或被拒時改以 push message 發送（計入每月訊息額度）
+        self.push_fallback = self.get_config('push_fallback', True)
+        self.reply_token_ttl = self.get_config('reply_token_ttl', 50)
 
         if self.is_enabled() and self.validate_config():
             self.parser = WebhookParser(self.channel_secret)
@@ -93,20 +102,14 @@ class LineHandler(BasePlatformHandler):
 
         if isinstance(event.message, AudioMessageContent):
             logger.debug(f"[LINE] parse_message AudioMessageContent id={event.message.id}, duration={event.message.duration}")
-            try:
-                with ApiClient(self.configuration) as api_client:
-                    blob_api = MessagingApiBlob(api_client)
-                    audio_content = blob_api.get_message_content(message_id=event.message.id)
-                logger.debug(f"[LINE] parse_message downloaded audio content ({len(audio_content)} bytes)")
-                
-                # 只標記為音訊訊息，不在此層進行轉錄
-                content = "[Audio Message]"
-                logger.debug(f"[LINE] Audio message from {user.user_id}, size: {len(audio_content)} bytes")
-                    
-            except Exception:
-                logger.error("[LINE] parse_message failed to download audio content", exc_info=True)
-                audio_content = None
-                content = "[Audio Message - Download Failed]"
+            # 只排入背景下載並標記為音訊訊息，不在此層等待下載或進行轉錄
+            message_id = event.message.id
+            audio_content = get_media_fetcher().submit(
+                lambda sink: self._stream_message_content(message_id, sink),
+                name=f"line_{message_id}.m4a"
+            )
+            content = "[Audio Message]"
+            logger.debug(f"[LINE] Audio message from {user.user_id}, download queued")
 
             return PlatformMessage(
                 message_id=event.message.id,
@@ -120,6 +123,18 @@ class LineHandler(BasePlatformHandler):
 
         return None
 
+    def _stream_message_content(self, message_id: str, sink: BinaryIO) -> None:
+        """以串流方式透過 Blob API 下載訊息內容，逐塊寫入 sink"""
+        with ApiClient(self.configuration) as api_client:
+            blob_api = MessagingApiBlob(api_client)
+            response = blob_api.get_message_content_with_http_info(message_id=message_id, _preload_content=False)
+            raw_response = response.raw_data
+            try:
+                for chunk in raw_response.stream(CHUNK_SIZE):
+                    sink.write(chunk)
+            finally:
+                raw_response.release_conn()
+
     def handle_webhook(self, request_body: str, headers: Dict[str, str]) -> List[PlatformMessage]:
         messages: List[PlatformMessage] = []
         signature = headers.get('X-Line-Signature')
@@ -159,15 +174,79 @@ class LineHandler(BasePlatformHandler):
 
         line_message = LineTextMessage(text=response.content)
 
+        # 跨發送排程重試保存的狀態（回覆是否可能已送達、push 的 retry key）
+        metadata = message.metadata if isinstance(message.metadata, dict) else {}
+
         logger.debug(f"[LINE] send_response to user={message.user.user_id}, reply_token={message.reply_token}")
         logger.debug(f"[LINE] send_response content={response.content}")
         try:
             with ApiClient(self.configuration) as api_client:
-                MessagingApi(api_client).reply_message_with_http_info(
-                    ReplyMessageRequest(reply_token=message.reply_token, messages=[line_message])
-                )
+                messaging_api = MessagingApi(api_client)
+                if self.push_fallback and self._reply_token_expired(message):
+                    logger.info(f"[LINE] reply_token expired, pushing response to {self._push_target(message)}")
+                    self._push_message(messaging_api, message, line_message, metadata)
+                else:
+                    try:
+                        messaging_api.reply_message_with_http_info(
+                            ReplyMessageRequest(reply_token=message.reply_token, messages=[line_message])
+                        )
+                    except ApiException as e:
+                        if (e.status or 0) >= 500:
+                            # 伺服器錯誤時回覆可能已送達，重試時 reply_token 被拒不代表需要補發
+                            metadata['line_reply_uncertain'] = True
+                        if not (self.push_fallback and self._is_invalid_reply_token(e)):
+                            raise
+                        if metadata.get('line_reply_uncertain'):
+                            logger.warning("[LINE] reply_token rejected after a server error, reply may have been delivered; push skipped")
+                            return False
+                        logger.info(f"[LINE] reply_token rejected, pushing response to {self._push_target(message)}")
+                        self._push_message(messaging_api, message, line_message, metadata)
             logger.debug("[LINE] send_response succeeded")
             return True
+        except ApiException as e:
+            if e.status == 429 or (e.status or 0) >= 500:
+                retry_after = DeliveryError.parse_retry_after((e.headers or {}).get('Retry-After'))
+                raise DeliveryError(f"LINE send failed: {e.status} {e.reason}", status_code=e.status, retry_after=retry_after)
+            logger.error("[LINE] send_response failed", exc_info=True)
+            return False
         except Exception:
             logger.error("[LINE] send_response failed", exc_info=True)
-            return False
\ No newline at end of file
+            return False
+
+    def _reply_token_expired(self, message: PlatformMessage) -> bool:
+        """依 webhook 事件時間判斷 reply_token 是否已逾時"""
+        event = (message.metadata or {}).get('line_event')
+        timestamp = getattr(event, 'timestamp', None)
+        if not isinstance(timestamp, (int, float)):
+            return False
+        return time.time() - timestamp / 1000 > self.reply_token_ttl
+
+    @staticmethod
+    def _is_invalid_reply_token(error: ApiException) -> bool:
+        return error.status == 400 and 'reply token' in str(error.body or '').lower()
+
+    @staticmethod
+    def _push_target(message: PlatformMessage) -> str:
+        """push message 的對象：群組或聊天室的訊息推送回原群組，否則推送給用戶"""
+        source = getattr((message.metadata or {}).get('line_event'), 'source', None)
+        source_type = getattr(source, 'type', None)
+        if source_type == 'group' and getattr(source, 'group_id', None):
+            return source.group_id
+        if source_type == 'room' and getattr(source, 'room_id', None):
+            return source.room_id
+        return message.user.user_id
+
+    def _push_message(self, messaging_api: MessagingApi, message: PlatformMessage,
+                      line_message: LineTextMessage, metadata: Dict[str, Any]) -> None:
+        """以 push message 發送，重試時沿用同一個 X-Line-Retry-Key 避免重複發送"""
+        retry_key = metadata.setdefault('line_retry_key', str(uuid.uuid4()))
+        try:
+            messaging_api.push_message_with_http_info(
+                PushMessageRequest(to=self._push_target(message), messages=[line_message]),
+                x_line_retry_key=retry_key
+            )
+        except ApiException as e:
+            # 409：相同 retry key 的請求先前已被接受
+            if e.status != 409:
+                raise
+            logger.info("[LINE] push message already accepted for this retry key")
\ No newline at end of file
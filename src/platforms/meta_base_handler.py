@@ -21,12 +21,17 @@ import hmac
 import hashlib
 import requests
 from abc import abstractmethod
-from typing import List, Optional, Any, Dict
+from typing import BinaryIO, List, Optional, Any, Dict
+from ..core.exceptions import DeliveryError
 from ..core.logger import get_logger
+from ..core.media_fetch import MediaHandle, get_media_fetcher, stream_url
 from .base import BasePlatformHandler, PlatformMessage, PlatformResponse
 
 logger = get_logger(__name__)
 
+# Graph API 速率限制與暫時性錯誤碼（多以 HTTP 400 回傳，而非 429）
+RETRYABLE_GRAPH_ERROR_CODES = {1, 2, 4, 17, 32, 613, 80007, 130429, 131048, 131056}
+
 
 class MetaBaseHandler(BasePlatformHandler):
     """
@@ -208,6 +213,27 @@ class MetaBaseHandler(BasePlatformHandler):
             logger.error(f"[{self.get_platform_name()}] Media download error: {e}")
             return None
     
+    def _stream_media_from_url(self, media_url: str, sink: BinaryIO) -> None:
+        """從 URL 串流下載媒體，逐塊寫入 sink (Instagram/Messenger 模式)"""
+        stream_url(media_url, sink, self.headers, timeout=30)
+    
+    def _stream_media_from_id(self, media_id: str, sink: BinaryIO) -> None:
+        """從 Media ID 取得下載 URL 後串流下載 (WhatsApp 模式)"""
+        response = requests.get(f"{self.base_url}/{media_id}", headers=self.headers, timeout=30)
+        response.raise_for_status()
+        media_url = response.json().get('url')
+        if not media_url:
+            raise ValueError(f"No media URL found for {media_id}")
+        self._stream_media_from_url(media_url, sink)
+    
+    def _stream_media(self, source: str, sink: BinaryIO) -> None:
+        """串流下載媒體 (默認以 URL 下載，WhatsApp 覆蓋為 Media ID)"""
+        self._stream_media_from_url(source, sink)
+    
+    def _prefetch_media(self, source: str, name: str) -> MediaHandle:
+        """排入背景下載，webhook 解析不等待下載完成"""
+        return get_media_fetcher().submit(lambda sink: self._stream_media(source, sink), name=name)
+    
     def _download_media_from_id(self, media_id: str) -> Optional[bytes]:
         """從 Media ID 下載媒體 (WhatsApp 模式)"""
         try:
@@ -249,10 +275,29 @@ class MetaBaseHandler(BasePlatformHandler):
             else:
                 logger.warning(f"[{self.get_platform_name()}] Unsupported response type: {response.response_type}")
                 return False
+        except DeliveryError:
+            raise
         except Exception as e:
             logger.error(f"[{self.get_platform_name()}] Send response error: {e}")
             return False
     
+    def _raise_for_retryable(self, response: requests.Response) -> None:
+        """發送遭速率限制或平台暫時錯誤時拋出 DeliveryError，交由發送排程重試"""
+        status_code = response.status_code
+        if status_code < 400:
+            return
+        error_code = None
+        try:
+            error_code = response.json().get('error', {}).get('code')
+        except Exception:
+            pass
+        if status_code == 429 or status_code >= 500 or error_code in RETRYABLE_GRAPH_ERROR_CODES:
+            raise DeliveryError(
+                f"{self.get_platform_name()} send failed: {status_code} (error code {error_code})",
+                status_code=status_code,
+                retry_after=DeliveryError.parse_retry_after(response.headers.get('Retry-After'))
+            )
+    
     @abstractmethod
     def _get_recipient_id(self, message: PlatformMessage) -> str:
         """獲取接收者 ID (平台特定)"""
@@ -3,22 +3,141 @@ Slack 平台處理器
 使用 Slack Bolt for Python 2024 最新版本，支援最新的 Slack API 和事件處理
 """
 import json
-from typing import List, Optional, Any, Dict
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import BinaryIO, Callable, List, Optional, Any, Dict, Tuple
+from ..core.exceptions import DeliveryError
 from ..core.logger import get_logger
+from ..core.media_fetch import get_media_fetcher, stream_url
 
 try:
     from slack_bolt import App
     from slack_bolt.adapter.flask import SlackRequestHandler
     from slack_bolt.request import BoltRequest
     from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
     SLACK_AVAILABLE = True
 except ImportError:
+    SlackApiError = None
     SLACK_AVAILABLE = False
 
 from .base import BasePlatformHandler, PlatformType, PlatformUser, PlatformMessage, PlatformResponse
 
 logger = get_logger(__name__)
 
+# 更新用戶資料快取的事件
+USER_PROFILE_EVENTS = ('user_change', 'team_join')
+
+
+class SlackUserCache:
+    """
+    Slack 用戶資料快取
+
+    - 每個項目自寫入起 ttl 秒後過期，超過 max_size 時淘汰最久未使用的項目
+    - 同一用戶同時只會有一個 users.info 請求，其他執行緒等待同一個結果
+    - 只快取成功取得的資料
+    """
+
+    def __init__(self, max_size: int = 5000, ttl: float = 3600, wait_timeout: float = 10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        # user_id -> (到期時間, 用戶資料)
+        self._entries: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.warmed = 0
+        self.updates = 0
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """取得未過期的用戶資料，沒有則返回 None"""
+        with self._lock:
+            return self._get_locked(user_id)
+
+    def _get_locked(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, profile = entry
+        if expires_at <= time.time():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return profile
+
+    def set(self, user_id: str, profile: Dict[str, Any]) -> None:
+        """保存用戶資料（超過容量時淘汰最久未使用的項目）"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (time.time() + self.ttl, profile)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, user_id: str, loader: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        取得快取的用戶資料，沒有時以 loader 載入並快取
+
+        同一用戶已有進行中的載入時等待該結果；loader 拋出的例外會傳給所有等待者
+        """
+        with self._lock:
+            profile = self._get_locked(user_id)
+            if profile is not None:
+                self.hits += 1
+                return profile
+            future = self._inflight.get(user_id)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._inflight[user_id] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result(self.wait_timeout)
+
+        try:
+            profile = loader(user_id)
+            self.set(user_id, profile)
+            future.set_result(profile)
+            return profile
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(user_id, None)
+
+    def clear(self) -> None:
+        """清除所有快取資料"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得快取統計資訊"""
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': entries,
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'warmed': self.warmed,
+            'updates': self.updates,
+            'hit_rate': f"{((self.hits + self.coalesced) / lookups * 100) if lookups else 0:.1f}%",
+        }
+
 
 class SlackHandler(BasePlatformHandler):
     """
@@ -36,12 +155,22 @@ class SlackHandler(BasePlatformHandler):
         self.bot_token = self.get_config('bot_token')
         self.signing_secret = self.get_config('signing_secret')
         
+        # 用戶資料快取：啟動時以 users.list 批次預熱，user_change 事件時更新
+        cache_config = self.get_config('user_cache', {}) or {}
+        self.user_cache = SlackUserCache(
+            max_size=cache_config.get('max_size', 5000),
+            ttl=cache_config.get('ttl', 3600)
+        )
+        self.warm_up_user_cache = cache_config.get('warm_up', True)
+        self._warm_up_thread: Optional[threading.Thread] = None
+        
         self.app = None
         self.client = None
         self.request_handler = None
         
         if self.is_enabled() and self.validate_config():
             self._setup_slack_app()
+            self.start_gateway()
             logger.info("Slack handler initialized")
         elif self.is_enabled():
             logger.error("Slack handler initialization failed due to invalid config")
@@ -119,13 +248,15 @@ class SlackHandler(BasePlatformHandler):
         for file_info in files:
             if file_info.get('mimetype', '').startswith('audio/'):
                 message_type = "audio"
-                try:
-                    audio_content = self._download_slack_file(file_info)
+                if file_info.get('url_private_download'):
+                    # 背景預取音訊，不阻塞 Slack 事件回應
+                    raw_data = get_media_fetcher().submit(
+                        lambda sink, file_info=file_info: self._stream_slack_file(file_info, sink),
+                        name=file_info.get('name') or f"slack_{file_info.get('id', message_ts)}.m4a"
+                    )
                     content = "[Audio Message]"
-                    raw_data = audio_content
-                    logger.debug(f"[SLACK] Audio message from {user.user_id}, size: {len(audio_content)} bytes")
-                except Exception as e:
-                    logger.error(f"Error downloading Slack audio: {e}")
+                    logger.debug(f"[SLACK] Audio message from {user.user_id}, download queued")
+                else:
                     content = "[Audio Message - Download Failed]"
                     raw_data = None
                 break # 只處理第一個音訊檔案
@@ -144,15 +275,85 @@ class SlackHandler(BasePlatformHandler):
         )
 
     def _get_user_info(self, user_id: str) -> Dict[str, Any]:
-        """取得 Slack 用戶資訊"""
+        """取得 Slack 用戶資訊（優先使用快取）"""
         try:
             if self.client:
-                response = self.client.users_info(user=user_id)
-                return response['user']
+                return self.user_cache.get_or_load(user_id, self._fetch_user_info)
         except Exception as e:
             logger.error(f"Error getting Slack user info: {e}")
         return {'name': user_id, 'real_name': 'Unknown User'}
 
+    def _fetch_user_info(self, user_id: str) -> Dict[str, Any]:
+        """以 users.info 取得單一用戶資訊"""
+        response = self.client.users_info(user=user_id)
+        return response['user']
+
+    def start_gateway(self) -> bool:
+        """
+        Slack 沒有常駐連線；在背景執行緒以 users.list 預熱用戶資料快取
+
+        gunicorn preload 時延到 worker fork 後（post_fork）才執行，避免執行緒在 master 中啟動
+
+        Returns:
+            bool: 是否已開始預熱
+        """
+        if not self.client or not self.warm_up_user_cache:
+            return False
+        if os.getenv('DEFER_PLATFORM_GATEWAYS') == 'true':
+            logger.debug("Slack user cache warm-up deferred until worker fork")
+            return False
+        if self._warm_up_thread and self._warm_up_thread.is_alive():
+            return True
+        self._warm_up_thread = threading.Thread(target=self._warm_user_cache, name='SlackUserCacheWarmUp', daemon=True)
+        self._warm_up_thread.start()
+        return True
+
+    def _warm_user_cache(self, page_size: int = 200) -> int:
+        """分頁讀取 users.list 寫入快取，達到快取上限時停止；返回寫入的用戶數"""
+        cursor = None
+        warmed = 0
+        try:
+            while warmed < self.user_cache.max_size:
+                try:
+                    response = self.client.users_list(limit=page_size, cursor=cursor)
+                except Exception as e:
+                    retry_after = self._get_retry_after(e)
+                    if retry_after is None:
+                        raise
+                    logger.debug(f"Slack users.list rate limited, retrying in {retry_after}s")
+                    time.sleep(retry_after)
+                    continue
+                for member in response.get('members', []):
+                    if member.get('id') and not member.get('deleted'):
+                        self.user_cache.set(member['id'], member)
+                        warmed += 1
+                cursor = (response.get('response_metadata') or {}).get('next_cursor')
+                if not cursor:
+                    break
+        except Exception as e:
+            logger.warning(f"Slack user cache warm-up stopped: {e}")
+        self.user_cache.warmed += warmed
+        logger.info(f"Slack user cache warmed with {warmed} users")
+        return warmed
+
+    @staticmethod
+    def _get_retry_after(error: Exception) -> Optional[float]:
+        """Slack API 速率限制（HTTP 429）時返回建議的等待秒數"""
+        if SlackApiError is None or not isinstance(error, SlackApiError):
+            return None
+        response = error.response
+        if getattr(response, 'status_code', None) != 429:
+            return None
+        return DeliveryError.parse_retry_after(response.headers.get('Retry-After', 1))
+
+    def _handle_user_event(self, event_data: Dict[str, Any]) -> None:
+        """user_change / team_join 事件帶有完整的用戶資料，直接更新快取"""
+        member = event_data.get('user')
+        if isinstance(member, dict) and member.get('id'):
+            self.user_cache.set(member['id'], member)
+            self.user_cache.updates += 1
+            logger.debug(f"[SLACK] User profile updated from {event_data.get('type')}: {member['id']}")
+
     def _download_slack_file(self, file_info: Dict[str, Any]) -> bytes:
         """下載 Slack 檔案"""
         if not self.client:
@@ -170,6 +371,11 @@ class SlackHandler(BasePlatformHandler):
             logger.error(f"Error downloading Slack file: {e}")
             return b''
 
+    def _stream_slack_file(self, file_info: Dict[str, Any], sink: BinaryIO) -> None:
+        """以串流方式下載 Slack 檔案，逐塊寫入 sink"""
+        headers = {'Authorization': f'Bearer {self.bot_token}'}
+        stream_url(file_info['url_private_download'], sink, headers)
+
     def send_response(self, response: PlatformResponse, message: PlatformMessage) -> bool:
         """發送回應到 Slack"""
         if not self.client:
@@ -191,6 +397,10 @@ class SlackHandler(BasePlatformHandler):
             logger.debug(f"Sent Slack message to channel {channel_id}")
             return True
         except Exception as e:
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            if SlackApiError is not None and isinstance(e, SlackApiError) and (status_code == 429 or (status_code or 0) >= 500):
+                raise DeliveryError(f"Slack send failed: {status_code}", status_code=status_code,
+                                    retry_after=self._get_retry_after(e)) from e
             logger.error(f"Error sending Slack response: {e}")
             return False
 
@@ -222,6 +432,10 @@ class SlackHandler(BasePlatformHandler):
 
             # 處理事件回調
             if webhook_data.get('type') == 'event_callback':
+                event_data = webhook_data.get('event') or {}
+                if event_data.get('type') in USER_PROFILE_EVENTS:
+                    self._handle_user_event(event_data)
+                    return []
                 message = self.parse_message(webhook_data)
                 return [message] if message else []
 
@@ -232,6 +446,10 @@ class SlackHandler(BasePlatformHandler):
         
         return []
     
+    def get_stats(self) -> Dict[str, Any]:
+        """取得用戶資料快取統計資訊"""
+        return {'user_cache': self.user_cache.get_stats()}
+    
     def get_app_info(self) -> Optional[Dict[str, Any]]:
         """取得 Slack 應用資訊"""
         if not self.client:
@@ -26,20 +26,28 @@ Telegram 平台處理器
   - 使用 chat_id 進行訊息路由
   - 不需要 webhook 簽名驗證 (通過 bot token 安全性)
   - 異步下載媒體檔案
+  - 所有 Bot API 呼叫在進程共用的背景事件迴圈上執行，Bot 與其連線池跨請求保留
 """
 import json
 import asyncio
-from typing import List, Optional, Any, Dict
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional
+from ..core.async_runtime import get_async_runtime
+from ..core.exceptions import DeliveryError
 from ..core.logger import get_logger
+from ..core.media_fetch import get_media_fetcher
 
 try:
     from telegram import Update, Bot
     from telegram.ext import Application, MessageHandler, filters
+    from telegram.request import HTTPXRequest
+    from telegram.error import BadRequest, NetworkError, RetryAfter
     TELEGRAM_AVAILABLE = True
 except ImportError:
+    BadRequest = NetworkError = RetryAfter = None
     Update = None
     Bot = None
     Application = None
+    HTTPXRequest = None
     MessageHandler = None
     filters = None
     TELEGRAM_AVAILABLE = False
@@ -64,10 +72,15 @@ class TelegramHandler(BasePlatformHandler):
             
         self.bot_token = self.get_config('bot_token')
         self.webhook_secret = self.get_config('webhook_secret', '')
+        self.connection_pool_size = self.get_config('connection_pool_size', 8)
         
         self.bot = None
         self.application = None
         
+        # Bot 與 Application 初始化於哪個事件迴圈（httpx 連線池綁定該迴圈）
+        self._ready_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Future] = None
+        
         if self.is_enabled() and self.validate_config():
             self._setup_bot()
             logger.info("Telegram handler initialized")
@@ -83,7 +96,7 @@ class TelegramHandler(BasePlatformHandler):
     def _setup_bot(self):
         """設置 Telegram bot"""
         try:
-            self.bot = Bot(token=self.bot_token)
+            self.bot = Bot(token=self.bot_token, request=self._build_request())
             
             builder = Application.builder().token(self.bot_token)
             # python-telegram-bot v21+ 透過此參數自動處理簽名驗證
@@ -98,6 +111,46 @@ class TelegramHandler(BasePlatformHandler):
             self.bot = None
             self.application = None
     
+    def _build_request(self):
+        """建立 Bot API 使用的 HTTP 連線池（長回覆分段發送時重用同一批連線）"""
+        if HTTPXRequest is None:
+            return None
+        return HTTPXRequest(connection_pool_size=self.connection_pool_size)
+    
+    async def _ensure_ready(self):
+        """在目前的事件迴圈上初始化 Bot 與 Application，每個迴圈只初始化一次"""
+        loop = asyncio.get_running_loop()
+        if self._ready is None or self._ready_loop is not loop:
+            if self._ready_loop is not None:
+                # 背景迴圈重建（例如 fork 後），舊的連線池綁定已失效的迴圈
+                self._setup_bot()
+            self._ready_loop = loop
+            self._ready = loop.create_task(self._initialize())
+        try:
+            await asyncio.shield(self._ready)
+        except Exception:
+            self._ready_loop = None
+            self._ready = None
+            raise
+    
+    async def _initialize(self):
+        await self.bot.initialize()
+        if self.application:
+            await self.application.initialize()
+        logger.debug("Telegram bot initialized on background event loop")
+    
+    async def _call(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        await self._ensure_ready()
+        return await call()
+    
+    def _run(self, call: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        在共用的背景事件迴圈上執行 Bot API 呼叫並等待結果
+        
+        call 在 Bot 初始化後才建立協程，重建 Bot 後仍會使用新的實例
+        """
+        return get_async_runtime().run(self._call(call), timeout)
+    
     def parse_message(self, telegram_update: Any) -> Optional[PlatformMessage]:
         """解析 Telegram Update 為統一格式"""
         if not TELEGRAM_AVAILABLE or Update is None:
@@ -135,15 +188,13 @@ class TelegramHandler(BasePlatformHandler):
         elif message.voice or message.audio:
             message_type = "audio"
             audio_source = message.voice or message.audio
-            try:
-                audio_content = asyncio.run(self._download_audio(audio_source))
-                content = "[Audio Message]"
-                raw_data = audio_content
-                logger.debug(f"[TELEGRAM] Audio message from {user.user_id}, size: {len(audio_content)} bytes")
-            except Exception as e:
-                logger.error(f"Error downloading Telegram audio: {e}")
-                content = "[Audio Message - Download Failed]"
-                raw_data = None
+            # 背景預取音訊，不阻塞 webhook 回應
+            raw_data = get_media_fetcher().submit(
+                lambda sink: self._run(lambda: self._stream_audio(audio_source, sink)),
+                name=f"telegram_{audio_source.file_id}.ogg"
+            )
+            content = "[Audio Message]"
+            logger.debug(f"[TELEGRAM] Audio message from {user.user_id}, download queued")
         else:
             return None # 不處理其他類型的訊息
 
@@ -167,6 +218,11 @@ class TelegramHandler(BasePlatformHandler):
         byte_array = await file.download_as_bytearray()
         return bytes(byte_array)
     
+    async def _stream_audio(self, audio_source, sink: BinaryIO) -> None:
+        """下載 Telegram 語音或音訊檔案，直接寫入 sink"""
+        file = await self.bot.get_file(audio_source.file_id)
+        await file.download_to_memory(out=sink)
+    
     def send_response(self, response: PlatformResponse, message: PlatformMessage) -> bool:
         """發送回應到 Telegram"""
         if not self.bot:
@@ -179,24 +235,43 @@ class TelegramHandler(BasePlatformHandler):
             return False
             
         try:
-            asyncio.run(self._send_message_async(chat_id, response.content, message))
+            self._run(lambda: self._send_message_async(chat_id, response.content, message))
             return True
         except Exception as e:
+            delivery_error = self._as_delivery_error(e)
+            if delivery_error is not None:
+                raise delivery_error from e
             logger.error(f"Error sending Telegram response: {e}")
             return False
     
+    @staticmethod
+    def _as_delivery_error(error: Exception) -> Optional[DeliveryError]:
+        """將速率限制（RetryAfter）與網路逾時轉為可重試的 DeliveryError"""
+        if RetryAfter is not None and isinstance(error, RetryAfter):
+            retry_after = error.retry_after
+            if hasattr(retry_after, 'total_seconds'):
+                retry_after = retry_after.total_seconds()
+            return DeliveryError(f"Telegram flood control: {error}", status_code=429, retry_after=float(retry_after))
+        if NetworkError is not None and isinstance(error, NetworkError) and not isinstance(error, BadRequest):
+            return DeliveryError(f"Telegram network error: {error}")
+        return None
+    
     async def _send_message_async(self, chat_id: str, content: str, original_message: PlatformMessage):
         """異步發送訊息到 Telegram"""
         try:
-            # Telegram 訊息長度限制為 4096 字符
+            # Telegram 訊息長度限制為 4096 字符，分段依序發送以保持順序，
+            # 各段重用背景迴圈上的 keep-alive 連線
             chunks = [content[i:i+4096] for i in range(0, len(content), 4096)]
-            for chunk in chunks:
+            # 發送排程重試時跳過已送出的分段，避免重複訊息
+            sent_chunks = original_message.metadata.get('telegram_sent_chunks', 0)
+            for index, chunk in enumerate(chunks[sent_chunks:], start=sent_chunks):
                 await self.bot.send_message(
                     chat_id=chat_id,
                     text=chunk,
                     reply_to_message_id=int(original_message.message_id),
                     parse_mode='Markdown'
                 )
+                original_message.metadata['telegram_sent_chunks'] = index + 1
             logger.debug(f"Sent Telegram message to chat {chat_id}")
         except Exception as e:
             logger.error(f"Error in _send_message_async: {e}")
@@ -217,7 +292,7 @@ class TelegramHandler(BasePlatformHandler):
             
             # 官方推薦的異步處理方式
             # process_update 會進行簽名驗證 (如果 secret_token 已設定)
-            asyncio.run(self.application.process_update(update))
+            self._run(lambda: self.application.process_update(update))
             
             # 驗證成功後，解析訊息
             message = self.parse_message(update)
@@ -237,7 +312,7 @@ class TelegramHandler(BasePlatformHandler):
             return False
         
         try:
-            result = asyncio.run(self._set_webhook_async(webhook_url))
+            result = self._run(lambda: self._set_webhook_async(webhook_url))
             return result
         except Exception as e:
             logger.error(f"Error setting Telegram webhook: {e}")
@@ -267,7 +342,7 @@ class TelegramHandler(BasePlatformHandler):
             return False
         
         try:
-            result = asyncio.run(self.bot.delete_webhook())
+            result = self._run(lambda: self.bot.delete_webhook())
             logger.info("Telegram webhook deleted")
             return True
         except Exception as e:
@@ -280,7 +355,7 @@ class TelegramHandler(BasePlatformHandler):
             return None
         
         try:
-            bot_info = asyncio.run(self.bot.get_me())
+            bot_info = self._run(lambda: self.bot.get_me())
             return {
                 'id': bot_info.id,
                 'username': bot_info.username,
@@ -28,7 +28,8 @@ WhatsApp Business Cloud API 平台處理器
 """
 
 import requests
-from typing import List, Optional, Any, Dict
+from typing import BinaryIO, List, Optional, Any, Dict
+from ..core.exceptions import DeliveryError
 from ..core.logger import get_logger
 from .base import PlatformType, PlatformUser, PlatformMessage
 from .meta_base_handler import MetaBaseHandler
@@ -70,6 +71,10 @@ class WhatsAppHandler(MetaBaseHandler):
         """下載媒體檔案 (向後兼容方法名)"""
         return self._download_media_from_id(media_id)
     
+    def _stream_media(self, source: str, sink: BinaryIO) -> None:
+        """WhatsApp 以 Media ID 取得下載 URL"""
+        self._stream_media_from_id(source, sink)
+    
     # =============================================================================
     # Webhook 訊息處理 (WhatsApp 特定)
     # =============================================================================
@@ -174,13 +179,10 @@ class WhatsAppHandler(MetaBaseHandler):
                 audio_data = message_data.get('audio', {})
                 media_id = audio_data.get('id')
                 if media_id:
-                    raw_data = self._download_media(media_id)
-                    if raw_data:
-                        content = '[Audio Message]'
-                        logger.debug(f"[WHATSAPP] Audio message from {from_number}, size: {len(raw_data)} bytes")
-                    else:
-                        content = '[Audio Message - Download Failed]'
-                        raw_data = None
+                    # 背景預取音訊，不阻塞 webhook 回應
+                    raw_data = self._prefetch_media(media_id, name=f"whatsapp_{media_id}.ogg")
+                    content = '[Audio Message]'
+                    logger.debug(f"[WHATSAPP] Audio message from {from_number}, download queued")
                 else:
                     content = '[Audio Message]'
                     raw_data = None
@@ -253,6 +255,7 @@ class WhatsAppHandler(MetaBaseHandler):
             }
             
             response = requests.post(url, json=payload, headers=self.headers, timeout=30)
+            self._raise_for_retryable(response)
             
             if response.status_code == 200:
                 logger.debug(f"[WHATSAPP] _send_text_message success to {to_number}")
@@ -261,6 +264,8 @@ class WhatsAppHandler(MetaBaseHandler):
                 logger.error(f"[WHATSAPP] _send_text_message failed: {response.status_code} - {response.text}")
                 return False
                 
+        except DeliveryError:
+            raise
         except Exception as e:
             logger.error(f"[WHATSAPP] _send_text_message error: {e}")
             return False
@@ -1,6 +1,9 @@
 from .chat import ChatService
 from .audio import AudioService
 from .conversation import ORMConversationManager, get_conversation_manager
+from .conversation_buffer import ConversationWriteBuffer
 from .response import ResponseFormatter
+from .reply_worker import ReplyWorkerPool
+from .user_queue import UserMessageQueue
 
-__all__ = ['ChatService', 'AudioService', 'ORMConversationManager', 'get_conversation_manager', 'ResponseFormatter']
\ No newline at end of file
+__all__ = ['ChatService', 'AudioService', 'ORMConversationManager', 'get_conversation_manager', 'ConversationWriteBuffer', 'ResponseFormatter', 'ReplyWorkerPool', 'UserMessageQueue']
\ No newline at end of file
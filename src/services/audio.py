@@ -4,12 +4,13 @@
 
 import io
 import os
+import shutil
 import uuid
 import threading
 import time
 import tempfile
 import atexit
-from typing import Optional, Tuple, BinaryIO, Dict, Any
+from typing import Optional, Tuple, BinaryIO, Dict, Any, Union
 
 from ..core.logger import get_logger
 from ..core.api_timeouts import SmartTimeoutConfig
@@ -20,6 +21,20 @@ from ..platforms.base import PlatformMessage, PlatformUser, PlatformType
 
 logger = get_logger(__name__)
 
+# 音訊內容可以是 bytes，或平台層背景下載中的類檔案物件（MediaHandle）
+AudioContent = Union[bytes, BinaryIO]
+
+
+def _open_audio(audio_content: AudioContent) -> BinaryIO:
+    """取得位於開頭的音訊檔案物件"""
+    if isinstance(audio_content, (bytes, bytearray)):
+        return io.BytesIO(audio_content)
+    if hasattr(audio_content, 'result'):
+        # MediaHandle：等待背景下載完成
+        return audio_content.result()
+    audio_content.seek(0)
+    return audio_content
+
 
 class AudioHandler:
     """優化的音訊處理器 - 減少磁碟 I/O"""
@@ -43,12 +58,12 @@ class AudioHandler:
         # 啟動定期清理
         self._start_periodic_cleanup()
     
-    def process_audio(self, audio_content: bytes, model_handler) -> Tuple[bool, str, Optional[str]]:
+    def process_audio(self, audio_content: AudioContent, model_handler) -> Tuple[bool, str, Optional[str]]:
         """
         優化的音訊處理流程
         
         Args:
-            audio_content: 音訊檔案內容
+            audio_content: 音訊檔案內容（bytes 或類檔案物件）
             model_handler: 模型處理器（有 transcribe_audio 方法）
             
         Returns:
@@ -122,7 +137,7 @@ class AudioHandler:
         # 檢查模型是否支援檔案物件輸入
         return hasattr(model_handler, 'supports_memory_audio') and model_handler.supports_memory_audio
     
-    def _process_audio_in_memory(self, audio_content: bytes, model_handler) -> Tuple[bool, str, Optional[str]]:
+    def _process_audio_in_memory(self, audio_content: AudioContent, model_handler) -> Tuple[bool, str, Optional[str]]:
         """
         記憶體中處理音訊（無檔案 I/O）
         
@@ -135,8 +150,11 @@ class AudioHandler:
         """
         try:
             # 🔥 關鍵優化：使用 BytesIO 模擬檔案
-            audio_file_obj = io.BytesIO(audio_content)
-            audio_file_obj.name = f"audio_{uuid.uuid4().hex}.m4a"  # 某些 API 需要檔名，使用 m4a 格式以符合容器實際內容
+            if isinstance(audio_content, (bytes, bytearray)):
+                audio_file_obj = io.BytesIO(audio_content)
+                audio_file_obj.name = f"audio_{uuid.uuid4().hex}.m4a"  # 某些 API 需要檔名，使用 m4a 格式以符合容器實際內容
+            else:
+                audio_file_obj = _open_audio(audio_content)
             
             # 直接傳遞檔案物件給轉錄 API
             success, transcription, error = self._transcribe_audio_memory(audio_file_obj, model_handler)
@@ -148,12 +166,12 @@ class AudioHandler:
             logger.error(f"記憶體音訊處理失敗: {e}")
             return False, "", str(e)
     
-    def _create_temp_file_optimized(self, audio_content: bytes) -> str:
+    def _create_temp_file_optimized(self, audio_content: AudioContent) -> str:
         """
         優化的暫存檔案創建
         
         Args:
-            audio_content: 音訊內容
+            audio_content: 音訊內容（類檔案物件以串流方式複製，不整個讀入記憶體）
             
         Returns:
             暫存檔案路徑
@@ -165,11 +183,15 @@ class AudioHandler:
         # 🔥 優化：使用 with 語句確保檔案正確關閉
         try:
             with open(temp_file_path, 'wb') as f:
-                f.write(audio_content)
+                if isinstance(audio_content, (bytes, bytearray)):
+                    f.write(audio_content)
+                else:
+                    shutil.copyfileobj(_open_audio(audio_content), f, 64 * 1024)
                 f.flush()  # 確保寫入磁碟
                 os.fsync(f.fileno())  # 強制同步
+                size = f.tell()
                 
-            logger.debug(f"建立暫存音訊檔案: {temp_file_path}, 大小: {len(audio_content)} bytes")
+            logger.debug(f"建立暫存音訊檔案: {temp_file_path}, 大小: {size} bytes")
             
         except Exception as e:
             # 如果寫入失敗，立即清理
@@ -217,9 +239,7 @@ class AudioHandler:
         # 建立臨時檔案
         temp_path = None
         try:
-            audio_file_obj.seek(0)
-            audio_content = audio_file_obj.read()
-            temp_path = self._create_temp_file_optimized(audio_content)
+            temp_path = self._create_temp_file_optimized(audio_file_obj)
             
             return self._transcribe_audio_file(temp_path, model_handler)
             
@@ -401,7 +421,7 @@ class AudioPerformanceMonitor:
 
 
 # 便捷函數
-def process_audio(audio_content: bytes, model_handler) -> Tuple[bool, str, Optional[str]]:
+def process_audio(audio_content: AudioContent, model_handler) -> Tuple[bool, str, Optional[str]]:
     """
     便捷的音訊處理函數
     
@@ -432,7 +452,7 @@ class AudioService:
         self.model = model
         self.error_handler = ErrorHandler()
     
-    def handle_message(self, user_id: str, audio_content: bytes, platform: str = 'line') -> Dict[str, Any]:
+    def handle_message(self, user_id: str, audio_content: AudioContent, platform: str = 'line') -> Dict[str, Any]:
         """
         處理音訊訊息：僅負責音訊轉錄
         
@@ -440,6 +460,8 @@ class AudioService:
         1. AudioService: 音訊 -> 轉錄文字
         2. 返回轉錄結果給應用層，由應用層決定後續處理
         
+        audio_content 可為平台層背景下載中的 MediaHandle，轉錄完成後釋放其暫存檔
+        
         Returns:
             Dict 包含:
             - success: bool - 轉錄是否成功
@@ -485,4 +507,7 @@ class AudioService:
                 'success': False,
                 'transcribed_text': None,
                 'error_message': str(e)
-            }
\ No newline at end of file
+            }
+        finally:
+            if hasattr(audio_content, 'result'):
+                audio_content.close()
\ No newline at end of file
@@ -12,6 +12,7 @@ from ..utils import preprocess_text, postprocess_text
 from ..core.exceptions import ChatBotError, DatabaseError, ThreadError
 from ..core.error_handler import ErrorHandler
 from .response import ResponseFormatter
+from .user_queue import UserMessageQueue
 from ..platforms.base import PlatformMessage, PlatformResponse, PlatformUser
 
 logger = get_logger(__name__)
@@ -36,6 +37,15 @@ class ChatService:
         self.config = config
         self.error_handler = ErrorHandler()
         self.response_formatter = ResponseFormatter(config)
+        
+        # 每位用戶的序列化與訊息合併層（可選）
+        self.user_message_queue = None
+        queue_config = (config or {}).get('user_message_queue', {})
+        if queue_config.get('enabled', False):
+            self.user_message_queue = UserMessageQueue(
+                debounce_window=queue_config.get('debounce_window', 1.5),
+                max_batch_size=queue_config.get('max_batch_size', 10)
+            )
         try:
             provider = model.get_provider()
             provider_name = provider.value if hasattr(provider, 'value') else str(provider)
@@ -64,6 +74,12 @@ class ChatService:
 
         # 處理不同類型的訊息
         if message.message_type == "text":
+            if self.user_message_queue and not message.content.startswith('/'):
+                # 同一用戶同時只有一個模型呼叫，進行中抵達的訊息合併處理
+                return self.user_message_queue.submit(
+                    message,
+                    lambda merged: self._handle_text_message(merged.user, merged.content, platform)
+                )
             return self._handle_text_message(user, message.content, platform)
         elif message.message_type == "audio":
             # 音訊處理由應用層的 AudioService 處理，ChatService 不應該接收到音訊訊息
@@ -3,46 +3,78 @@ ORM-based Conversation Manager
 使用 SQLAlchemy ORM 管理對話歷史
 整合版本，包含快取、統計和清理功能
 """
+import threading
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 from datetime import datetime, timedelta
 from ..database.models import get_db_session, SimpleConversationHistory
 from ..core.logger import get_logger
+from .conversation_buffer import ConversationWriteBuffer
 
 logger = get_logger(__name__)
 
 class ORMConversationManager:
     """基於 SQLAlchemy ORM 的對話管理器（完整版）"""
     
-    def __init__(self):
+    def __init__(self, write_behind_config: Optional[Dict] = None, cache_stale_after: float = 30):
+        """
+        初始化對話管理器
+        
+        Args:
+            write_behind_config: 批次寫入設定（enabled、max_batch_size、flush_interval），
+                啟用時 add_message 只寫入記憶體緩衝，由背景執行緒批次寫入資料庫
+            cache_stale_after: 快取視窗確認與資料庫一致後，不再查詢資料庫即可直接使用的秒數
+        """
         self.session_factory = get_db_session
         # 記憶體快取最近對話 - 使用有界快取
         from ..core.bounded_cache import BoundedCache
         self.cache_ttl = 300  # 為了測試兼容性，保留這個屬性
         self.memory_cache = BoundedCache(max_size=500, ttl=self.cache_ttl)  # 500個快取項目，5分鐘TTL
+        # 其他 worker 寫入的訊息最多延遲此秒數才會被發現（超過後於未命中路徑以訊息數確認）
+        self.cache_stale_after = max(0.0, float(cache_stale_after))
+        # 寫入世代計數：查詢期間有新訊息寫入時，不以可能過時的查詢結果覆蓋快取
+        self._write_generation = 0
+        # 各模型提供商的快取命中統計
+        self.cache_stats: Dict[str, Dict[str, int]] = {}
+        self._cache_stats_lock = threading.Lock()
         
-        logger.info("ORMConversationManager initialized with bounded caching support")
+        self.write_buffer: Optional[ConversationWriteBuffer] = None
+        if write_behind_config and write_behind_config.get('enabled', False):
+            self.write_buffer = ConversationWriteBuffer(
+                # 透過 lambda 延遲取得 session_factory，保留替換 session_factory 的彈性
+                session_factory=lambda: self.session_factory(),
+                max_batch_size=write_behind_config.get('max_batch_size', 50),
+                flush_interval=write_behind_config.get('flush_interval', 0.5)
+            )
+        
+        logger.info(f"ORMConversationManager initialized with bounded caching support (write_behind={'on' if self.write_buffer else 'off'})")
     
     def add_message(self, user_id: str, model_provider: str, role: str, content: str, platform: str = 'line') -> bool:
-        """新增對話訊息到資料庫"""
+        """新增對話訊息到資料庫（啟用批次寫入時先放入緩衝），並附加到快取中的對話視窗"""
         try:
+            if self.write_buffer:
+                row = self.write_buffer.add(user_id, platform, model_provider, role, content)
+                self._append_to_cache(user_id, model_provider, platform, role, content, row['created_at'])
+                
+                logger.debug(f"Buffered conversation message for user {user_id} on platform {platform} ({model_provider})")
+                return True
+            
             with self.session_factory() as session:
+                created_at = datetime.utcnow()
                 conversation = SimpleConversationHistory(
                     user_id=user_id,
                     platform=platform,
                     model_provider=model_provider,
                     role=role,
-                    content=content
+                    content=content,
+                    created_at=created_at
                 )
                 session.add(conversation)
                 session.commit()
                 
-                # 清除快取，強制下次重新載入
-                cache_key = f"{user_id}:{platform}:{model_provider}"
-                # 使用 BoundedCache 的刪除方法
-                if cache_key in self.memory_cache:
-                    del self.memory_cache[cache_key]
+                # 附加到快取而非清除，下一次讀取不需重新查詢資料庫
+                self._append_to_cache(user_id, model_provider, platform, role, content, created_at)
                 
                 logger.debug(f"Added conversation message for user {user_id} on platform {platform} ({model_provider})")
                 return True
@@ -51,27 +83,91 @@ class ORMConversationManager:
             logger.error(f"Failed to add conversation message: {e}")
             return False
     
+    def _append_to_cache(self, user_id: str, model_provider: str, platform: str,
+                         role: str, content: str, created_at: datetime):
+        """將新訊息附加到快取的對話視窗並裁切至視窗大小"""
+        cache_key = f"{user_id}:{platform}:{model_provider}"
+        with self.memory_cache.lock:
+            self._write_generation += 1
+            if cache_key not in self.memory_cache:
+                return
+            cache_data = self.memory_cache.cache.get(cache_key)
+            if not isinstance(cache_data, dict) or 'conversations' not in cache_data:
+                del self.memory_cache[cache_key]
+                return
+            
+            window = cache_data.get('window')
+            conversations = cache_data['conversations'] + [{
+                'role': role,
+                'content': content,
+                'created_at': created_at.isoformat(),
+                'model_provider': model_provider
+            }]
+            complete = cache_data.get('complete', False)
+            if window and len(conversations) > window:
+                conversations = conversations[-window:]
+                complete = False
+            
+            # 建立新的快取項目，避免修改其他執行緒正在讀取的清單；
+            # 保留原本的 timestamp，持續對話時快取仍會在 cache_ttl 後過期
+            turns = cache_data.get('turns')
+            self.memory_cache.set(cache_key, {
+                **cache_data,
+                'conversations': conversations,
+                'complete': complete,
+                'turns': None if turns is None else turns + 1
+            })
+    
+    def _record_cache_access(self, model_provider: str, hit: bool):
+        """記錄各模型提供商的快取命中與未命中次數"""
+        with self._cache_stats_lock:
+            counters = self.cache_stats.setdefault(model_provider, {'hits': 0, 'misses': 0})
+            counters['hits' if hit else 'misses'] += 1
+    
     def get_recent_conversations(self, user_id: str, model_provider: str, limit: int = 5, platform: str = 'line') -> List[Dict]:
         """取得用戶最近的對話歷史（支援快取）"""
         try:
             cache_key = f"{user_id}:{platform}:{model_provider}"
+            window = limit * 2  # 取雙倍確保有足夠對話
             
-            # 檢查快取
+            # 檢查快取：快取視窗足夠大，或快取已包含完整歷史時命中
+            revalidate = None
             cache_data = self.memory_cache.get(cache_key)
-            if cache_data and cache_data is not None:
-                # BoundedCache 已經處理 TTL，不需要這裡再檢查時間
-                logger.debug(f"Cache hit for user {user_id} on platform {platform} ({model_provider})")
-                return cache_data['conversations'][:limit * 2]  # 取雙倍以防萬一
+            if cache_data and 'conversations' in cache_data:
+                cached_window = cache_data.get('window')
+                if cached_window is None or cached_window >= window or cache_data.get('complete'):
+                    if not self._is_cache_expired(cache_data):
+                        if self._is_recently_verified(cache_data):
+                            self._record_cache_access(model_provider, hit=True)
+                            logger.debug(f"Cache hit for user {user_id} on platform {platform} ({model_provider})")
+                            return cache_data['conversations'][-window:]
+                        # 超過 cache_stale_after：以資料庫訊息數確認其他 worker 沒有寫入新訊息
+                        revalidate = cache_data
+                    else:
+                        with self.memory_cache.lock:
+                            if self.memory_cache.cache.get(cache_key) is cache_data:
+                                del self.memory_cache[cache_key]
+            
+            self._record_cache_access(model_provider, hit=False)
+            generation = self._write_generation
             
-            # 從資料庫查詢
+            # 從資料庫查詢；先計算訊息數，查詢期間其他 worker 的寫入只會使下次比對不符而重新查詢
             with self.session_factory() as session:
+                turns = self._count_turns(session, user_id, model_provider, platform)
+                if revalidate is not None and revalidate.get('turns') == turns:
+                    with self.memory_cache.lock:
+                        if generation == self._write_generation:
+                            self.memory_cache.set(cache_key, {**revalidate, 'verified_at': datetime.now()})
+                            logger.debug(f"Cache revalidated for user {user_id} on platform {platform} ({model_provider})")
+                            return revalidate['conversations'][-window:]
+                
                 conversations = session.query(SimpleConversationHistory).filter(
                     SimpleConversationHistory.user_id == user_id,
                     SimpleConversationHistory.platform == platform,
                     SimpleConversationHistory.model_provider == model_provider
                 ).order_by(
                     desc(SimpleConversationHistory.created_at)
-                ).limit(limit * 2).all()  # 取雙倍確保有足夠對話
+                ).limit(window).all()
                 
                 # 轉換為字典格式，並按時間正序排列
                 result = []
@@ -82,12 +178,23 @@ class ORMConversationManager:
                         'created_at': conv.created_at.isoformat() if conv.created_at else None,
                         'model_provider': conv.model_provider
                     })
+                complete = len(result) < window
+                
+                # 合併尚未寫入資料庫的緩衝訊息（read-your-writes）
+                if self.write_buffer:
+                    result = self._merge_pending(result, user_id, model_provider, platform, window)
                 
-                # 更新快取
-                self.memory_cache.set(cache_key, {
-                    'conversations': result,
-                    'timestamp': datetime.now()
-                })
+                # 更新快取；查詢期間若有新訊息寫入，結果可能已過時，不寫入快取
+                with self.memory_cache.lock:
+                    if generation == self._write_generation:
+                        self.memory_cache.set(cache_key, {
+                            'conversations': result,
+                            'window': window,
+                            'complete': complete,
+                            'turns': turns,
+                            'timestamp': datetime.now(),
+                            'verified_at': datetime.now()
+                        })
                 
                 logger.debug(f"Retrieved {len(result)} conversations for user {user_id} on platform {platform} ({model_provider})")
                 return result
@@ -96,9 +203,80 @@ class ORMConversationManager:
             logger.error(f"Failed to get conversations for user {user_id}: {e}")
             return []
     
+    def _count_turns(self, session: Session, user_id: str, model_provider: str, platform: str) -> int:
+        """資料庫中的訊息數加上本 worker 尚未寫入的緩衝訊息數"""
+        count = session.query(func.count(SimpleConversationHistory.id)).filter(
+            SimpleConversationHistory.user_id == user_id,
+            SimpleConversationHistory.platform == platform,
+            SimpleConversationHistory.model_provider == model_provider
+        ).scalar() or 0
+        if self.write_buffer:
+            count += len(self.write_buffer.get_pending(user_id, platform, model_provider))
+        return count
+    
+    def _is_cache_expired(self, cache_data: Dict) -> bool:
+        """快取自資料庫載入後是否已超過 cache_ttl（附加訊息不延長存活時間）"""
+        timestamp = cache_data.get('timestamp')
+        return not isinstance(timestamp, datetime) or datetime.now() - timestamp > timedelta(seconds=self.cache_ttl)
+    
+    def _is_recently_verified(self, cache_data: Dict) -> bool:
+        """
+        快取視窗是否在 cache_stale_after 內確認過與資料庫一致
+        
+        每個 worker 只會把自己處理的訊息附加到快取；確認後的短時間內直接使用快取，
+        不查詢資料庫，其他 worker 寫入的訊息最多延遲 cache_stale_after 秒才會被發現
+        """
+        verified_at = cache_data.get('verified_at')
+        return isinstance(verified_at, datetime) and datetime.now() - verified_at <= timedelta(seconds=self.cache_stale_after)
+    
+    def _merge_pending(self, result: List[Dict], user_id: str, model_provider: str,
+                       platform: str, max_items: int) -> List[Dict]:
+        """將緩衝中的訊息附加到資料庫查詢結果後，略過查詢期間已寫入資料庫的訊息"""
+        pending = self.write_buffer.get_pending(user_id, platform, model_provider)
+        if not pending:
+            return result
+        
+        persisted = {(item['role'], item['content'], item['created_at']) for item in result}
+        for row in pending:
+            item = {
+                'role': row['role'],
+                'content': row['content'],
+                'created_at': row['created_at'].isoformat(),
+                'model_provider': row['model_provider']
+            }
+            if (item['role'], item['content'], item['created_at']) not in persisted:
+                result.append(item)
+        return result[-max_items:]
+    
+    def flush(self) -> int:
+        """同步寫入緩衝中的訊息，返回寫入筆數"""
+        return self.write_buffer.flush() if self.write_buffer else 0
+    
+    def shutdown(self):
+        """關閉批次寫入緩衝並寫入剩餘訊息"""
+        if self.write_buffer:
+            self.write_buffer.shutdown()
+    
+    def get_stats(self) -> Dict:
+        """取得快取與批次寫入統計"""
+        with self._cache_stats_lock:
+            by_provider = {
+                provider: {
+                    **counters,
+                    'hit_rate': round(counters['hits'] / (counters['hits'] + counters['misses']) * 100, 2)
+                }
+                for provider, counters in self.cache_stats.items()
+            }
+        stats = {'cache': self.memory_cache.stats(), 'cache_by_provider': by_provider}
+        if self.write_buffer:
+            stats['write_behind'] = self.write_buffer.get_stats()
+        return stats
+    
     def clear_user_history(self, user_id: str, model_provider: str, platform: str = 'line') -> bool:
         """清除指定用戶和模型的對話歷史"""
         try:
+            # 先寫入緩衝，避免清除後才寫入的舊訊息
+            self.flush()
             with self.session_factory() as session:
                 deleted_count = session.query(SimpleConversationHistory).filter(
                     SimpleConversationHistory.user_id == user_id,
@@ -110,9 +288,11 @@ class ORMConversationManager:
                 
                 # 清除快取
                 cache_key = f"{user_id}:{platform}:{model_provider}"
-                # 使用 BoundedCache 的刪除方法
-                if cache_key in self.memory_cache:
-                    del self.memory_cache[cache_key]
+                with self.memory_cache.lock:
+                    self._write_generation += 1
+                    # 使用 BoundedCache 的刪除方法
+                    if cache_key in self.memory_cache:
+                        del self.memory_cache[cache_key]
                 
                 logger.info(f"Cleared {deleted_count} conversation records for user {user_id} on platform {platform} ({model_provider})")
                 return True
@@ -124,6 +304,7 @@ class ORMConversationManager:
     def get_conversation_count(self, user_id: str, model_provider: str = None, platform: str = 'line') -> int:
         """取得用戶的對話數量"""
         try:
+            self.flush()
             with self.session_factory() as session:
                 query = session.query(SimpleConversationHistory).filter(
                     SimpleConversationHistory.user_id == user_id,
@@ -145,6 +326,7 @@ class ORMConversationManager:
     def cleanup_old_conversations(self, days_to_keep: int = 30) -> int:
         """清理舊的對話記錄（資料庫維護）"""
         try:
+            self.flush()
             cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
             
             with self.session_factory() as session:
@@ -157,7 +339,9 @@ class ORMConversationManager:
                 logger.info(f"Cleaned up {deleted_count} old conversation records (older than {days_to_keep} days)")
                 
                 # 清除所有快取
-                self.memory_cache.clear()
+                with self.memory_cache.lock:
+                    self._write_generation += 1
+                    self.memory_cache.clear()
                 
                 return deleted_count
                 
@@ -177,6 +361,7 @@ class ORMConversationManager:
             Dict: 統計資訊
         """
         try:
+            self.flush()
             with self.session_factory() as session:
                 # 使用 ORM 查詢統計資訊
                 from sqlalchemy import func
@@ -214,5 +399,18 @@ def get_conversation_manager() -> ORMConversationManager:
     """取得對話管理器實例（單例模式）"""
     global _conversation_manager
     if _conversation_manager is None:
-        _conversation_manager = ORMConversationManager()
-    return _conversation_manager
\ No newline at end of file
+        conversation_config = _load_conversation_config()
+        _conversation_manager = ORMConversationManager(
+            conversation_config.get('write_behind'),
+            cache_stale_after=conversation_config.get('cache_stale_after', 30)
+        )
+    return _conversation_manager
+
+def _load_conversation_config() -> Dict:
+    """從配置讀取 conversation 設定（write_behind、cache_stale_after）"""
+    try:
+        from ..core.config import load_config
+        return load_config().get('conversation') or {}
+    except Exception as e:
+        logger.warning(f"Failed to load conversation config: {e}")
+        return {}
\ No newline at end of file
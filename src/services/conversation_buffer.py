@@ -0,0 +1,203 @@
+"""
+對話歷史寫入緩衝（write-behind）
+add_message 只把訊息放入記憶體緩衝，由背景執行緒在達到批次大小或時間間隔時
+以單次多列 INSERT 寫入 simple_conversation_history，讓回覆路徑不需等待資料庫 commit
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from ..core.logger import get_logger
+from ..database.models import SimpleConversationHistory
+
+logger = get_logger(__name__)
+
+
+class ConversationWriteBuffer:
+    """
+    對話歷史的批次寫入緩衝
+
+    特色功能：
+    - 緩衝筆數達到 max_batch_size 或距離上次寫入超過 flush_interval 時批次寫入
+    - 寫入成功前訊息仍保留在緩衝中，get_pending() 可供讀取端合併，確保讀到自己剛寫入的內容
+    - 寫入失敗時保留訊息並於下次重試，超過 max_pending 時丟棄最舊的訊息
+    - 背景執行緒延遲到第一次寫入才啟動，並偵測 fork（gunicorn preload_app）後重建
+    - 行程結束時同步寫入剩餘訊息
+    """
+
+    def __init__(self, session_factory: Callable, max_batch_size: int = 50,
+                 flush_interval: float = 0.5, max_pending: int = 10000):
+        """
+        初始化寫入緩衝
+
+        Args:
+            session_factory: 取得資料庫 session 的函數
+            max_batch_size: 觸發寫入的緩衝筆數
+            flush_interval: 最長寫入間隔（秒）
+            max_pending: 緩衝上限，資料庫持續失敗時避免記憶體無限成長
+        """
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.max_pending = max(self.max_batch_size, int(max_pending))
+
+        self._pending: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopped = False
+
+        # 統計資訊
+        self.buffered_count = 0
+        self.flushed_rows = 0
+        self.flush_batches = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+
+        atexit.register(self.shutdown)
+        logger.info(f"ConversationWriteBuffer initialized: max_batch_size={self.max_batch_size}, flush_interval={self.flush_interval}s")
+
+    def add(self, user_id: str, platform: str, model_provider: str, role: str, content: str) -> Dict[str, Any]:
+        """
+        將一則訊息放入緩衝
+
+        Returns:
+            Dict: 緩衝中的訊息（created_at 於此時決定，寫入後順序不變）
+        """
+        row = {
+            'user_id': user_id,
+            'platform': platform,
+            'model_provider': model_provider,
+            'role': role,
+            'content': content,
+            'created_at': datetime.utcnow(),
+        }
+        if self._stopped:
+            # 已關閉時直接同步寫入
+            self._write([row])
+            return row
+
+        self._ensure_started()
+        with self._cond:
+            self._pending.append(row)
+            self.buffered_count += 1
+            if len(self._pending) > self.max_pending:
+                overflow = len(self._pending) - self.max_pending
+                del self._pending[:overflow]
+                self.dropped_rows += overflow
+                logger.error(f"Conversation write buffer full, dropped {overflow} oldest messages")
+            if len(self._pending) >= self.max_batch_size:
+                self._cond.notify_all()
+        return row
+
+    def get_pending(self, user_id: str, platform: str, model_provider: str) -> List[Dict[str, Any]]:
+        """取得指定用戶尚未寫入資料庫的訊息（依寫入順序）"""
+        with self._cond:
+            return [
+                dict(row) for row in self._pending
+                if row['user_id'] == user_id and row['platform'] == platform and row['model_provider'] == model_provider
+            ]
+
+    def flush(self) -> int:
+        """
+        同步寫入目前緩衝中的所有訊息
+
+        Returns:
+            int: 寫入的筆數
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+
+            try:
+                self._write(batch)
+            except Exception as e:
+                with self._cond:
+                    self.failed_flushes += 1
+                logger.error(f"Failed to flush {len(batch)} buffered conversation messages: {e}")
+                return 0
+
+            # 寫入成功後才從緩衝移除，期間讀取端仍可從緩衝看到這些訊息
+            written = {id(row) for row in batch}
+            with self._cond:
+                self._pending = [row for row in self._pending if id(row) not in written]
+                self.flushed_rows += len(batch)
+                self.flush_batches += 1
+            logger.debug(f"Flushed {len(batch)} buffered conversation messages")
+            return len(batch)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """以單次多列 INSERT 寫入資料庫"""
+        with self.session_factory() as session:
+            session.execute(insert(SimpleConversationHistory), rows)
+            session.commit()
+
+    def _ensure_started(self) -> None:
+        """啟動背景寫入執行緒（fork 後重新啟動）"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._flush_loop, name='ConversationWriteBuffer', daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self) -> None:
+        """背景寫入迴圈"""
+        failed = False
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                # 上次寫入失敗時等滿一個間隔再重試，避免資料庫故障時空轉
+                while not self._stopped and (failed or len(self._pending) < self.max_batch_size):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopped:
+                    return
+                has_pending = bool(self._pending)
+            failed = has_pending and self.flush() == 0
+
+    def shutdown(self) -> None:
+        """停止背景執行緒並同步寫入剩餘訊息"""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        flushed = self.flush()
+        try:
+            atexit.unregister(self.shutdown)
+            logger.info(f"ConversationWriteBuffer shut down, flushed {flushed} remaining messages")
+        except (ValueError, OSError):
+            # Logger may be closed already during cleanup
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得緩衝統計資訊"""
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'buffered': self.buffered_count,
+                'flushed_rows': self.flushed_rows,
+                'flush_batches': self.flush_batches,
+                'failed_flushes': self.failed_flushes,
+                'dropped_rows': self.dropped_rows,
+                'max_batch_size': self.max_batch_size,
+                'flush_interval': self.flush_interval,
+            }
+
@@ -0,0 +1,264 @@
+"""
+回覆發送排程
+所有平台的 send_response 都經由此層發送：依各平台文件的速率上限，
+以平台與接收者兩層 token bucket 控制發送速率；平台回應速率限制（429）
+或伺服器錯誤（5xx）時以指數退避重試，並統計發送延遲與放棄發送的訊息數
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.exceptions import DeliveryError
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 各平台預設發送速率（每秒請求數），依官方文件的上限設定：
+# - LINE Messaging API：每個 channel 每秒 2,000 次
+# - WhatsApp Cloud API：每個電話號碼每秒 80 則；同一用戶每 6 秒 1 則（可短暫爆量 45 則）
+# - Messenger Send API：每個粉絲專頁每秒 250 次
+# - Instagram Messaging：每個帳號每秒 100 次（文字）
+# - Telegram：整體每秒 30 則；同一聊天每秒 1 則
+# - Slack chat.postMessage：同一頻道每秒 1 則（允許短暫爆量）
+# - Discord：整體每秒 50 次；同一頻道約每 5 秒 5 則
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    'line': {'rate': 2000, 'burst': 2000},
+    'whatsapp': {'rate': 80, 'burst': 80, 'recipient_rate': 1 / 6, 'recipient_burst': 45},
+    'messenger': {'rate': 250, 'burst': 250},
+    'instagram': {'rate': 100, 'burst': 100},
+    'telegram': {'rate': 30, 'burst': 30, 'recipient_rate': 1, 'recipient_burst': 3},
+    'slack': {'recipient_rate': 1, 'recipient_burst': 3},
+    'discord': {'rate': 50, 'burst': 50, 'recipient_rate': 1, 'recipient_burst': 5},
+}
+
+
+class TokenBucket:
+    """
+    執行緒安全的 token bucket
+
+    reserve() 預先扣除 token 並返回需要等待的秒數，同時發送的執行緒依序排隊，
+    不需要重複輪詢
+    """
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        預留一個 token
+
+        Returns:
+            Optional[float]: 需要等待的秒數；超過 max_wait 時不預留並返回 None
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def refund(self) -> None:
+        """歸還預留但未使用的 token"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class DeliveryScheduler:
+    """
+    依平台速率上限排程回覆發送
+
+    特色功能：
+    - 平台層級與接收者層級（用戶、聊天室或頻道）各自的 token bucket
+    - DeliveryError（429 / 5xx）時依 Retry-After 或指數退避重試
+    - 等待時間超過 max_wait 或重試用盡時放棄發送並計入統計
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None, max_retries: int = 3,
+                 max_wait: float = 30.0, base_backoff: float = 1.0, max_backoff: float = 30.0,
+                 max_recipients: int = 10000):
+        """
+        初始化發送排程
+
+        Args:
+            limits: 各平台的 rate / burst / recipient_rate / recipient_burst，覆蓋預設值
+            max_retries: 暫時失敗時的最多重試次數
+            max_wait: 單次發送最長等待秒數（含速率限制與退避）
+            base_backoff: 指數退避的起始秒數
+            max_backoff: 指數退避的上限秒數
+            max_recipients: 每個平台保留的接收者 bucket 數量
+        """
+        self.limits = {platform: dict(settings) for platform, settings in DEFAULT_LIMITS.items()}
+        for platform, settings in (limits or {}).items():
+            self.limits.setdefault(platform, {}).update(settings or {})
+        self.max_retries = max(0, int(max_retries))
+        self.max_wait = float(max_wait)
+        self.base_backoff = float(base_backoff)
+        self.max_backoff = float(max_backoff)
+        self.max_recipients = max_recipients
+
+        self._lock = threading.Lock()
+        self._platform_buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._recipient_buckets: Dict[str, 'OrderedDict[str, TokenBucket]'] = defaultdict(OrderedDict)
+
+        # 統計資訊
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = defaultdict(self._new_platform_stats)
+
+    @staticmethod
+    def _new_platform_stats() -> Dict[str, Any]:
+        return {
+            'sent': 0,
+            'failed': 0,
+            'dropped_rate_limited': 0,
+            'dropped_retries_exhausted': 0,
+            'retries': 0,
+            'throttled': 0,
+            'latencies': deque(maxlen=1000),
+        }
+
+    @staticmethod
+    def get_recipient_key(message: Any) -> str:
+        """接收者鍵：聊天室或頻道優先，否則使用用戶 ID"""
+        metadata = getattr(message, 'metadata', None) or {}
+        recipient = metadata.get('chat_id') or metadata.get('channel_id')
+        if not recipient:
+            recipient = getattr(getattr(message, 'user', None), 'user_id', None)
+        return str(recipient or 'unknown')
+
+    def _get_buckets(self, platform: str, recipient: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        settings = self.limits.get(platform, {})
+        with self._lock:
+            if platform not in self._platform_buckets:
+                rate = settings.get('rate')
+                self._platform_buckets[platform] = TokenBucket(rate, settings.get('burst', rate)) if rate else None
+            platform_bucket = self._platform_buckets[platform]
+
+            recipient_bucket = None
+            recipient_rate = settings.get('recipient_rate')
+            if recipient_rate:
+                buckets = self._recipient_buckets[platform]
+                recipient_bucket = buckets.get(recipient)
+                if recipient_bucket is None:
+                    recipient_bucket = buckets[recipient] = TokenBucket(recipient_rate, settings.get('recipient_burst', 1))
+                    while len(buckets) > self.max_recipients:
+                        buckets.popitem(last=False)
+                else:
+                    buckets.move_to_end(recipient)
+        return platform_bucket, recipient_bucket
+
+    def _reserve(self, platform: str, recipient: str, max_wait: float) -> Optional[float]:
+        """同時預留平台與接收者的 token，返回需要等待的秒數；無法在 max_wait 內發送時返回 None"""
+        platform_bucket, recipient_bucket = self._get_buckets(platform, recipient)
+        wait = 0.0
+        if platform_bucket is not None:
+            wait = platform_bucket.reserve(max_wait)
+            if wait is None:
+                return None
+        if recipient_bucket is not None:
+            recipient_wait = recipient_bucket.reserve(max_wait)
+            if recipient_wait is None:
+                if platform_bucket is not None:
+                    platform_bucket.refund()
+                return None
+            wait = max(wait, recipient_wait)
+        return wait
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def deliver(self, platform_type: Any, handler: Any, response: Any, message: Any) -> bool:
+        """
+        依速率上限發送回應，暫時失敗時重試
+
+        Args:
+            platform_type: 平台類型
+            handler: 平台處理器
+            response: 要發送的回應
+            message: 原始訊息（決定接收者）
+
+        Returns:
+            bool: 是否發送成功
+        """
+        platform = getattr(platform_type, 'value', str(platform_type))
+        recipient = self.get_recipient_key(message)
+        start = time.monotonic()
+        deadline = start + self.max_wait
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._reserve(platform, recipient, max(0.0, deadline - time.monotonic()))
+            if wait is None:
+                self._record(platform, 'dropped_rate_limited')
+                logger.warning(f"[DELIVERY] {platform} rate limit budget exhausted for {recipient}, response dropped")
+                return False
+            if wait > 0:
+                self._record(platform, 'throttled')
+                time.sleep(wait)
+
+            try:
+                success = handler.send_response(response, message)
+            except DeliveryError as e:
+                delay = self._backoff(attempt, e.retry_after)
+                if attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    self._record(platform, 'dropped_retries_exhausted')
+                    logger.error(f"[DELIVERY] {platform} delivery to {recipient} failed after {attempt + 1} attempts: {e}")
+                    return False
+                self._record(platform, 'retries')
+                logger.warning(f"[DELIVERY] {platform} delivery to {recipient} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            self._record(platform, 'sent' if success else 'failed', time.monotonic() - start if success else None)
+            return success
+        return False
+
+    def _record(self, platform: str, key: str, latency: Optional[float] = None) -> None:
+        with self._stats_lock:
+            stats = self._stats[platform]
+            stats[key] += 1
+            if latency is not None:
+                stats['latencies'].append(latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得各平台發送統計資訊"""
+        platforms = {}
+        with self._stats_lock:
+            for platform, stats in self._stats.items():
+                latencies = sorted(stats['latencies'])
+                if latencies:
+                    avg = sum(latencies) / len(latencies)
+                    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                    slowest = latencies[-1]
+                else:
+                    avg = p95 = slowest = 0.0
+                platforms[platform] = {
+                    'sent': stats['sent'],
+                    'failed': stats['failed'],
+                    'dropped_rate_limited': stats['dropped_rate_limited'],
+                    'dropped_retries_exhausted': stats['dropped_retries_exhausted'],
+                    'retries': stats['retries'],
+                    'throttled': stats['throttled'],
+                    'latency_ms': {
+                        'avg': round(avg * 1000, 1),
+                        'p95': round(p95 * 1000, 1),
+                        'max': round(slowest * 1000, 1),
+                    },
+                }
+        return {
+            'max_retries': self.max_retries,
+            'max_wait': self.max_wait,
+            'platforms': platforms,
+        }
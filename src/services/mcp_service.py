@@ -9,13 +9,22 @@ MCP 服務協調層
 
 import asyncio
 import json
+import time
 from typing import Dict, List, Any, Optional, Tuple
 from ..core.logger import get_logger
+from ..core.async_runtime import get_async_runtime
 from ..core.mcp_config import MCPConfigManager
 from ..core.mcp_client import MCPClient, MCPClientError, MCPServerError
+from ..core.mcp_result_cache import MCPResultCache
 
 logger = get_logger(__name__)
 
+DEFAULT_MAX_CONCURRENT_CALLS = 4
+DEFAULT_CALL_TIMEOUT = 60
+DEFAULT_CACHE_TTL = 300
+DEFAULT_TOOL_LIST_TTL = 300
+MAX_CACHED_TOOL_PAGES = 64
+
 
 class MCPService:
     """MCP Function Calling 處理器和服務協調層"""
@@ -27,6 +36,18 @@ class MCPService:
         self.mcp_client = None
         self.is_enabled = False
         
+        # 同一伺服器的並行呼叫上限與單次呼叫逾時（含重試）
+        self.max_concurrent_calls = DEFAULT_MAX_CONCURRENT_CALLS
+        self.call_timeout = DEFAULT_CALL_TIMEOUT
+        self._call_semaphore = None
+        self._call_semaphore_loop = None
+        
+        # 可快取工具（tools.<name>.cacheable）的結果快取，None 表示停用
+        self.result_cache: Optional[MCPResultCache] = None
+        
+        # tools/list 分頁結果快取：(設定檔版本, 游標) -> (到期時間, 結果)
+        self.tool_list_ttl = DEFAULT_TOOL_LIST_TTL
+        self._tool_pages: Dict[Tuple[Any, Optional[str]], Tuple[float, Tuple]] = {}
         
         # 初始化 MCP 服務
         self._init_mcp_service()
@@ -42,6 +63,12 @@ class MCPService:
             # 載入伺服器設定
             server_config = self.config_manager.get_server_config(self.config_name)
             self.mcp_client = MCPClient(server_config)
+            self.max_concurrent_calls = max(1, int(server_config.get('max_concurrent_calls', DEFAULT_MAX_CONCURRENT_CALLS)))
+            self.call_timeout = server_config.get('call_timeout', DEFAULT_CALL_TIMEOUT)
+            self._call_semaphore = None
+            self.result_cache = self._create_result_cache()
+            self.tool_list_ttl = server_config.get('tool_list_ttl', DEFAULT_TOOL_LIST_TTL)
+            self._tool_pages = {}
             self.is_enabled = True
             
             logger.info("MCP service initialized successfully")
@@ -54,21 +81,11 @@ class MCPService:
     def handle_function_call_sync(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """
         同步版本的 function call 處理器（為了與 sync 模型兼容）
-        內部使用 asyncio.run() 執行異步操作
+        將協程提交到進程共用的背景事件迴圈執行，重用常駐的 aiohttp session 與連線
+        （呼叫端本身在其他事件迴圈中也可以安全使用）
         """
-        import asyncio
-        
         try:
-            # 檢查是否已經在事件循環中
-            try:
-                loop = asyncio.get_running_loop()
-                # 如果已經在事件循環中，使用 create_task
-                logger.warning("Already in event loop, using asyncio.create_task")
-                task = asyncio.create_task(self.handle_function_call_async(function_name, arguments))
-                return asyncio.run_coroutine_threadsafe(task, loop).result()
-            except RuntimeError:
-                # 沒有運行中的事件循環，安全使用 asyncio.run
-                return asyncio.run(self.handle_function_call_async(function_name, arguments))
+            return get_async_runtime().run(self._handle_function_call_limited(function_name, arguments))
         except Exception as e:
             logger.error(f"Error in sync MCP call: {e}")
             return {
@@ -77,6 +94,60 @@ class MCPService:
                 "content": f"MCP 調用失敗: {e}"
             }
 
+    def handle_function_calls_sync(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        同時執行同一個模型步驟中彼此獨立的多個 function call
+        
+        Args:
+            calls: [(函數名稱, 參數), ...]
+            
+        Returns:
+            List[Dict[str, Any]]: 與 calls 順序相同的處理結果
+        """
+        if not calls:
+            return []
+        try:
+            return get_async_runtime().run(self.handle_function_calls_async(calls))
+        except Exception as e:
+            logger.error(f"Error in sync MCP batch call: {e}")
+            return [{
+                "success": False,
+                "error": str(e),
+                "content": f"MCP 調用失敗: {e}"
+            } for _ in calls]
+
+    async def handle_function_calls_async(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        並行執行多個 function call（受 max_concurrent_calls 與 call_timeout 限制），結果依呼叫順序返回
+        """
+        logger.info(f"🚀 MCP Service: Dispatching {len(calls)} function calls (max concurrency {self.max_concurrent_calls})")
+        async def gather_calls():
+            return await asyncio.gather(
+                *(self._handle_function_call_limited(function_name, arguments) for function_name, arguments in calls)
+            )
+        
+        return list(await get_async_runtime().run_async(gather_calls()))
+
+    async def _handle_function_call_limited(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """在伺服器並行上限內執行單一 function call，逾時則返回錯誤結果"""
+        async with self._get_call_semaphore():
+            try:
+                return await asyncio.wait_for(
+                    self.handle_function_call_async(function_name, arguments), self.call_timeout
+                )
+            except asyncio.TimeoutError:
+                error_msg = f"MCP function call timeout after {self.call_timeout}s: {function_name}"
+                logger.error(error_msg)
+                return self._format_error_response(error_msg)
+
+    def _get_call_semaphore(self) -> asyncio.Semaphore:
+        """取得目前事件迴圈的並行上限 semaphore（背景迴圈在 fork 後會重建）"""
+        loop = asyncio.get_running_loop()
+        if self._call_semaphore is None or self._call_semaphore_loop is not loop:
+            self._call_semaphore = asyncio.Semaphore(self.max_concurrent_calls)
+            self._call_semaphore_loop = loop
+        return self._call_semaphore
+
     async def handle_function_call(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """異步版本的 function call 處理器（向後兼容）"""
         return await self.handle_function_call_async(function_name, arguments)
@@ -138,8 +209,7 @@ class MCPService:
             logger.info(f"[{call_id}] 🔍 Step 3: Executing MCP tool call")
             logger.info(f"[{call_id}] 🌐 Server: {self.mcp_client.base_url if self.mcp_client else 'N/A'}")
             
-            async with self.mcp_client as client:
-                result = await client.call_tool(mcp_tool_name, arguments)
+            result = await self._run_client(self._call_tool(function_name, mcp_tool_name, arguments))
             
             execution_time = time.time() - start_time
             
@@ -245,6 +315,68 @@ class MCPService:
             }
             return error_response
     
+    def _create_result_cache(self) -> Optional[MCPResultCache]:
+        """依設定檔的 result_cache 區段建立結果快取"""
+        try:
+            config = self.config_manager.load_mcp_config(self.config_name)
+            cache_config = config.get('result_cache', {}) if isinstance(config, dict) else {}
+        except Exception as e:
+            logger.warning(f"Failed to read MCP result cache config, using defaults: {e}")
+            cache_config = {}
+        if not cache_config.get('enabled', True):
+            return None
+        return MCPResultCache(
+            max_entries=cache_config.get('max_entries', 500),
+            max_bytes=cache_config.get('max_bytes', 8 * 1024 * 1024)
+        )
+    
+    def _get_cache_ttl(self, function_name: str) -> float:
+        """取得函數結果的快取秒數（tools.<name>.cacheable 為 true 時才快取），0 表示不快取"""
+        if self.result_cache is None:
+            return 0
+        try:
+            tool_config = self.config_manager.get_tool_config(function_name, self.config_name)
+        except Exception as e:
+            logger.warning(f"Failed to read tool config for {function_name}: {e}")
+            return 0
+        if not isinstance(tool_config, dict) or tool_config.get('cacheable') is not True:
+            return 0
+        return tool_config.get('cache_ttl', DEFAULT_CACHE_TTL)
+    
+    async def _call_tool(self, function_name: str, mcp_tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """呼叫 MCP 工具；可快取的工具先查結果快取，相同的進行中呼叫只送出一次"""
+        ttl = self._get_cache_ttl(function_name)
+        if ttl <= 0:
+            return await self.mcp_client.call_tool(mcp_tool_name, arguments)
+        
+        key = MCPResultCache.make_key(mcp_tool_name, arguments)
+        return await self.result_cache.get_or_call(
+            key, ttl, lambda: self.mcp_client.call_tool(mcp_tool_name, arguments)
+        )
+    
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """取得結果快取統計資訊（停用時返回 None）"""
+        return self.result_cache.get_stats() if self.result_cache else None
+    
+    async def _run_client(self, coro):
+        """
+        在背景事件迴圈上執行 MCP 客戶端呼叫
+        
+        客戶端的 session 與連線池綁定於背景迴圈並跨呼叫保留，
+        不再每次呼叫都建立與關閉 session（以及重新建立 TCP/TLS 連線）
+        """
+        return await get_async_runtime().run_async(coro)
+    
+    def close(self) -> None:
+        """關閉 MCP 客戶端常駐的 HTTP session"""
+        client = self.mcp_client
+        if client is None:
+            return
+        try:
+            get_async_runtime().run(client.close(), timeout=5)
+        except Exception as e:
+            logger.warning(f"Failed to close MCP client session: {e}")
+    
     def get_function_schemas_for_openai(self) -> List[Dict[str, Any]]:
         """取得 OpenAI function calling 格式的 schemas"""
         if not self.is_enabled:
@@ -277,19 +409,7 @@ class MCPService:
             return []
         
         try:
-            config = self.config_manager.load_mcp_config(self.config_name)
-            schemas = []
-            
-            for func in config['functions']:
-                if func.get('enabled', True):
-                    # Gemini function declaration 格式
-                    schema = {
-                        "name": func['name'],
-                        "description": func['description'],
-                        "parameters": func['parameters']
-                    }
-                    schemas.append(schema)
-            
+            schemas = self.config_manager.get_function_schemas_for_gemini(self.config_name)
             logger.debug(f"Generated {len(schemas)} Gemini function schemas")
             return schemas
         except Exception as e:
@@ -333,8 +453,7 @@ class MCPService:
             return False, "MCP service is not enabled"
         
         try:
-            async with self.mcp_client as client:
-                return await client.health_check()
+            return await self._run_client(self.mcp_client.health_check())
         except Exception as e:
             return False, str(e)
     
@@ -349,8 +468,7 @@ class MCPService:
             return False, "MCP service is not enabled"
         
         try:
-            async with self.mcp_client as client:
-                return await client.initialize_capabilities()
+            return await self._run_client(self.mcp_client.initialize_capabilities())
         except Exception as e:
             logger.error(f"Failed to initialize MCP connection: {e}")
             return False, str(e)
@@ -370,8 +488,7 @@ class MCPService:
             return False, "MCP service is not enabled"
         
         try:
-            async with self.mcp_client as client:
-                return await client.authenticate_oauth(authorization_url, redirect_uri)
+            return await self._run_client(self.mcp_client.authenticate_oauth(authorization_url, redirect_uri))
         except Exception as e:
             logger.error(f"Failed to setup OAuth authentication: {e}")
             return False, str(e)
@@ -392,8 +509,7 @@ class MCPService:
             return False, "MCP service is not enabled"
         
         try:
-            async with self.mcp_client as client:
-                return await client.complete_oauth_flow(authorization_code, redirect_uri, token_url)
+            return await self._run_client(self.mcp_client.complete_oauth_flow(authorization_code, redirect_uri, token_url))
         except Exception as e:
             logger.error(f"Failed to complete OAuth authentication: {e}")
             return False, str(e)
@@ -402,6 +518,8 @@ class MCPService:
         """
         取得 MCP 伺服器可用工具列表 (支援分頁)
         
+        成功取得的每一頁依 (設定檔版本, 游標) 快取 tool_list_ttl 秒，設定檔內容改變時失效
+        
         Args:
             cursor: 分頁游標
         
@@ -411,11 +529,47 @@ class MCPService:
         if not self.is_enabled:
             return False, None, None, "MCP service is not enabled"
         
+        key = (self._config_version(), cursor)
+        cached = self._tool_pages.get(key)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        
         try:
-            async with self.mcp_client as client:
-                return await client.list_tools(cursor)
+            result = await self._run_client(self.mcp_client.list_tools(cursor))
         except Exception as e:
             return False, None, None, str(e)
+        
+        if result[0]:
+            if len(self._tool_pages) >= MAX_CACHED_TOOL_PAGES:
+                self._tool_pages.clear()
+            self._tool_pages[key] = (time.time() + self.tool_list_ttl, result)
+        return result
+    
+    async def list_all_tools(self) -> Tuple[bool, Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        依游標走訪所有分頁，取得完整的工具列表（各頁使用快取）
+        
+        Returns:
+            Tuple[bool, Optional[List], Optional[str]]: (成功, 工具列表, 錯誤訊息)
+        """
+        tools: List[Dict[str, Any]] = []
+        cursor = None
+        seen_cursors = set()
+        while True:
+            success, page, cursor, error = await self.list_available_tools(cursor)
+            if not success:
+                return False, None, error
+            tools.extend(page or [])
+            if not cursor or cursor in seen_cursors:
+                return True, tools, None
+            seen_cursors.add(cursor)
+    
+    def _config_version(self) -> Any:
+        """目前設定檔內容的版本（雜湊值），讀取失敗時返回空字串"""
+        try:
+            return self.config_manager.get_compiled_config(self.config_name).version
+        except Exception:
+            return ""
     
     def get_configured_functions(self) -> List[Dict[str, Any]]:
         """取得已設定的函數列表"""
@@ -433,6 +587,7 @@ class MCPService:
         """重新載入 MCP 設定"""
         try:
             self.config_manager.reload_config(self.config_name)
+            self.close()
             self._init_mcp_service()
             logger.info("MCP service config reloaded")
             return True
@@ -456,7 +611,8 @@ class MCPService:
                 "timeout": self.mcp_client.timeout,
                 "auth_configured": bool(self.mcp_client.auth_config),
                 "capabilities": list(self.mcp_client.capabilities.keys()),
-                "has_access_token": bool(self.mcp_client.access_token)
+                "has_access_token": bool(self.mcp_client.access_token),
+                "result_cache": self.get_cache_stats()
             })
         
         return info
@@ -492,4 +648,25 @@ def reload_mcp_service() -> bool:
     if _mcp_service_instance:
         return _mcp_service_instance.reload_config()
     
-    return False
\ No newline at end of file
+    return False
+
+
+def dispatch_function_calls(mcp_service: MCPService, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    執行模型同一步驟中的 function calls，結果依呼叫順序返回
+    
+    單一呼叫直接以 handle_function_call_sync 執行；多個彼此獨立的呼叫以
+    handle_function_calls_sync 並行分派，總耗時約為最慢的一個呼叫
+    """
+    if not calls:
+        return []
+    if len(calls) == 1:
+        function_name, arguments = calls[0]
+        return [mcp_service.handle_function_call_sync(function_name, arguments)]
+    return mcp_service.handle_function_calls_sync(calls)
+
+
+def close_mcp_service() -> None:
+    """關閉全域 MCP 服務的常駐連線（應用程式關閉時呼叫）"""
+    if _mcp_service_instance:
+        _mcp_service_instance.close()
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+背景回覆工作池
+Webhook 驗證並解析完成後即回應 200 OK，訊息交由有界佇列與背景執行緒處理，
+避免轉錄、模型推論與回覆發送長時間佔用 gunicorn sync worker
+"""
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ReplyJob:
+    """佇列中的回覆工作"""
+    platform: str
+    func: Callable[..., Any]
+    args: Tuple[Any, ...] = ()
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class ReplyWorkerPool:
+    """
+    有界佇列 + 固定數量背景執行緒的回覆工作池
+
+    特色功能：
+    - 佇列滿時 submit() 返回 False，由呼叫端決定退回同步處理
+    - 執行緒延遲到第一次 submit 才啟動，並偵測 fork（gunicorn preload_app）後重建
+    - 提供佇列深度、等待時間與各平台吞吐量統計
+    """
+
+    _STOP = object()
+
+    def __init__(self, num_workers: int = 4, max_queue_size: int = 100,
+                 shutdown_timeout: float = 30.0, name: str = 'ReplyWorker'):
+        """
+        初始化回覆工作池
+
+        Args:
+            num_workers: 背景執行緒數量
+            max_queue_size: 佇列上限，超過時拒絕新工作
+            shutdown_timeout: 關閉時等待佇列清空的最長秒數
+            name: 執行緒名稱前綴
+        """
+        self.num_workers = max(1, int(num_workers))
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.shutdown_timeout = shutdown_timeout
+        self.name = name
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue_size)
+        self._threads = []
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        # 統計資訊
+        self._stats_lock = threading.Lock()
+        self._started_at = time.time()
+        self._wait_times = deque(maxlen=1000)
+        self._max_wait_time = 0.0
+        self._platform_stats: Dict[str, Dict[str, Any]] = defaultdict(self._new_platform_stats)
+
+        logger.info(f"ReplyWorkerPool initialized: workers={self.num_workers}, max_queue_size={self.max_queue_size}")
+
+    @staticmethod
+    def _new_platform_stats() -> Dict[str, Any]:
+        return {
+            'submitted': 0,
+            'processed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'processing_time_total': 0.0,
+            'completed_at': deque(maxlen=1000),
+        }
+
+    def _ensure_started(self) -> None:
+        """確保背景執行緒在當前進程中運行（fork 後執行緒不會被複製）"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # fork 後父進程的佇列與執行緒皆不可用，重新建立
+            self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._threads = []
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    daemon=True,
+                    name=f'{self.name}-{i}'
+                )
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+            self._stopped = False
+            logger.info(f"Started {self.num_workers} reply worker threads (pid: {self._pid})")
+
+    def submit(self, platform: str, func: Callable[..., Any], *args) -> bool:
+        """
+        提交回覆工作
+
+        Args:
+            platform: 平台名稱（用於統計）
+            func: 背景執行的函數
+            *args: 函數參數
+
+        Returns:
+            bool: 是否成功放入佇列
+        """
+        if self._stopped:
+            return False
+
+        self._ensure_started()
+        job = ReplyJob(platform=platform, func=func, args=args)
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self._platform_stats[platform]['rejected'] += 1
+            logger.warning(f"Reply queue full ({self.max_queue_size}), rejected job for {platform}")
+            return False
+
+        with self._stats_lock:
+            self._platform_stats[platform]['submitted'] += 1
+        logger.debug(f"Queued reply job for {platform}, queue depth: {self._queue.qsize()}")
+        return True
+
+    def _worker_loop(self) -> None:
+        """背景執行緒主迴圈"""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is self._STOP:
+                    return
+
+                started_at = time.time()
+                wait_time = started_at - job.enqueued_at
+                success = True
+                try:
+                    job.func(*job.args)
+                except Exception as e:
+                    success = False
+                    logger.error(f"Reply job for {job.platform} failed: {type(e).__name__}: {e}", exc_info=True)
+
+                self._record(job.platform, wait_time, time.time() - started_at, success)
+            finally:
+                self._queue.task_done()
+
+    def _record(self, platform: str, wait_time: float, processing_time: float, success: bool) -> None:
+        """記錄單筆工作統計"""
+        with self._stats_lock:
+            self._wait_times.append(wait_time)
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+
+            stats = self._platform_stats[platform]
+            stats['processed' if success else 'failed'] += 1
+            stats['processing_time_total'] += processing_time
+            stats['completed_at'].append(time.time())
+
+    def get_queue_depth(self) -> int:
+        """取得目前佇列深度"""
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得工作池統計資訊"""
+        now = time.time()
+        with self._stats_lock:
+            wait_times = sorted(self._wait_times)
+            if wait_times:
+                avg_wait = sum(wait_times) / len(wait_times)
+                p95_wait = wait_times[min(len(wait_times) - 1, int(len(wait_times) * 0.95))]
+            else:
+                avg_wait = p95_wait = 0.0
+
+            platforms = {}
+            for platform, stats in self._platform_stats.items():
+                finished = stats['processed'] + stats['failed']
+                platforms[platform] = {
+                    'submitted': stats['submitted'],
+                    'processed': stats['processed'],
+                    'failed': stats['failed'],
+                    'rejected': stats['rejected'],
+                    'avg_processing_ms': round(stats['processing_time_total'] / finished * 1000, 1) if finished else 0.0,
+                    'processed_last_minute': sum(1 for t in stats['completed_at'] if now - t <= 60),
+                }
+
+            return {
+                'workers': self.num_workers,
+                'alive_workers': sum(1 for t in self._threads if t.is_alive()),
+                'queue_depth': self._queue.qsize(),
+                'max_queue_size': self.max_queue_size,
+                'wait_time_ms': {
+                    'avg': round(avg_wait * 1000, 1),
+                    'p95': round(p95_wait * 1000, 1),
+                    'max': round(self._max_wait_time * 1000, 1),
+                },
+                'platforms': platforms,
+                'uptime_seconds': round(now - self._started_at, 1),
+            }
+
+    def shutdown(self, timeout: float = None) -> None:
+        """停止接受新工作，等待佇列內既有工作處理完畢"""
+        if self._stopped:
+            return
+        self._stopped = True
+
+        if self._pid != os.getpid():
+            # 當前進程沒有啟動過執行緒
+            return
+
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(self._STOP, timeout=max(0.0, deadline - time.time()))
+            except queue.Full:
+                break
+
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.time()))
+
+        remaining = self._queue.qsize()
+        if remaining:
+            logger.warning(f"ReplyWorkerPool shutdown with {remaining} jobs still queued")
+        else:
+            logger.info("ReplyWorkerPool shutdown complete")
@@ -0,0 +1,206 @@
+"""
+每位用戶的有序訊息佇列
+同一 (platform, user_id) 同時只允許一個模型呼叫；呼叫進行中陸續抵達的訊息
+會在 debounce 時間窗內合併成單一後續對話輪次，避免 OpenAI thread busy 與重複的模型呼叫
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.logger import get_logger
+from ..platforms.base import PlatformMessage, PlatformResponse
+
+logger = get_logger(__name__)
+
+
+class _PendingMessage:
+    """等待處理的單一訊息"""
+
+    __slots__ = ('message', 'done', 'response', 'error')
+
+    def __init__(self, message: PlatformMessage):
+        self.message = message
+        self.done = False
+        self.response: Optional[PlatformResponse] = None
+        self.error: Optional[BaseException] = None
+
+
+class _UserState:
+    """單一用戶的佇列狀態"""
+
+    __slots__ = ('busy', 'pending', 'last_arrival')
+
+    def __init__(self):
+        self.busy = False
+        self.pending: List[_PendingMessage] = []
+        self.last_arrival = 0.0
+
+
+class UserMessageQueue:
+    """
+    每位用戶的序列化與訊息合併層
+
+    處理流程：
+    1. 用戶沒有進行中的呼叫時，訊息立即處理
+    2. 呼叫進行中抵達的訊息排入該用戶的等待清單
+    3. 進行中的呼叫結束後，等待清單中最早的呼叫端接手，等待 debounce 時間窗
+       收集後續訊息，合併成一則訊息只呼叫一次模型
+    4. 合併後的回應交給最後一則訊息的呼叫端（reply token 最新），
+       其餘呼叫端收到 metadata['coalesced'] 為 True 的空回應，不需另外發送
+    """
+
+    def __init__(self, debounce_window: float = 1.5, max_batch_size: int = 10, separator: str = '\n'):
+        """
+        初始化用戶訊息佇列
+
+        Args:
+            debounce_window: 最後一則訊息抵達後等待更多訊息的秒數
+            max_batch_size: 單次合併的最大訊息數
+            separator: 合併訊息內容時使用的分隔字串
+        """
+        self.debounce_window = max(0.0, float(debounce_window))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.separator = separator
+
+        self._cond = threading.Condition()
+        self._states: Dict[Tuple[str, str], _UserState] = {}
+
+        # 統計資訊
+        self.message_count = 0
+        self.model_call_count = 0
+        self.coalesced_count = 0
+
+        logger.info(f"UserMessageQueue initialized: debounce_window={self.debounce_window}s, max_batch_size={self.max_batch_size}")
+
+    @staticmethod
+    def _key(message: PlatformMessage) -> Tuple[str, str]:
+        return message.user.platform.value, message.user.user_id
+
+    def submit(self, message: PlatformMessage,
+               process_func: Callable[[PlatformMessage], PlatformResponse]) -> PlatformResponse:
+        """
+        依用戶順序處理訊息，必要時與後續訊息合併
+
+        Args:
+            message: 平台訊息
+            process_func: 實際呼叫模型的處理函數
+
+        Returns:
+            PlatformResponse: 處理結果；被合併的訊息返回 metadata['coalesced'] 為 True 的空回應
+        """
+        key = self._key(message)
+        entry = _PendingMessage(message)
+
+        with self._cond:
+            self.message_count += 1
+            state = self._states.setdefault(key, _UserState())
+            # 前一批剛結束、等待中的呼叫端尚未接手時 busy 為 False，新訊息仍須排在等待清單之後
+            if state.busy or state.pending:
+                state.pending.append(entry)
+                state.last_arrival = time.monotonic()
+                logger.debug(f"User {key[1]} on {key[0]} busy, queued message {message.message_id} ({len(state.pending)} pending)")
+                batch = self._wait_for_turn(state, entry)
+                if batch is None:
+                    return self._result(entry)
+            else:
+                state.busy = True
+                batch = [entry]
+
+        self._process_batch(key, state, batch, process_func)
+        return self._result(entry)
+
+    def _wait_for_turn(self, state: _UserState, entry: _PendingMessage) -> Optional[List[_PendingMessage]]:
+        """
+        等待輪到自己處理（需持有 self._cond）
+
+        Returns:
+            需要由目前執行緒處理的訊息批次；若已被其他執行緒合併處理則返回 None
+        """
+        while not entry.done and (state.busy or state.pending[0] is not entry):
+            self._cond.wait()
+
+        if entry.done:
+            return None
+
+        # 成為這一批的處理者，先在 debounce 時間窗內收集後續訊息
+        state.busy = True
+        while len(state.pending) < self.max_batch_size:
+            remaining = state.last_arrival + self.debounce_window - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        batch = state.pending[:self.max_batch_size]
+        del state.pending[:len(batch)]
+        return batch
+
+    def _process_batch(self, key: Tuple[str, str], state: _UserState,
+                       batch: List[_PendingMessage],
+                       process_func: Callable[[PlatformMessage], PlatformResponse]) -> None:
+        """處理一批訊息並將結果分派給各呼叫端"""
+        target = batch[-1]
+        response = None
+        error = None
+        try:
+            merged = self._merge(batch)
+            if len(batch) > 1:
+                logger.info(f"Coalesced {len(batch)} messages from user {key[1]} on {key[0]} into one model call")
+            response = process_func(merged)
+        except BaseException as e:
+            error = e
+        finally:
+            with self._cond:
+                self.model_call_count += 1
+                self.coalesced_count += len(batch) - 1
+                for item in batch:
+                    if item is target:
+                        item.response = response
+                        item.error = error
+                    else:
+                        item.response = PlatformResponse(
+                            content='',
+                            response_type='text',
+                            metadata={'coalesced': True, 'coalesced_into': target.message.message_id}
+                        )
+                    item.done = True
+
+                state.busy = False
+                if not state.pending and self._states.get(key) is state:
+                    del self._states[key]
+                self._cond.notify_all()
+
+    def _merge(self, batch: List[_PendingMessage]) -> PlatformMessage:
+        """將多則訊息合併為一則"""
+        if len(batch) == 1:
+            return batch[0].message
+
+        last = batch[-1].message
+        metadata = dict(last.metadata or {})
+        metadata['coalesced_message_ids'] = [item.message.message_id for item in batch]
+        return PlatformMessage(
+            message_id=last.message_id,
+            user=last.user,
+            content=self.separator.join(item.message.content for item in batch),
+            message_type=last.message_type,
+            raw_data=last.raw_data,
+            reply_token=last.reply_token,
+            metadata=metadata
+        )
+
+    @staticmethod
+    def _result(entry: _PendingMessage) -> PlatformResponse:
+        if entry.error is not None:
+            raise entry.error
+        return entry.response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得佇列統計資訊"""
+        with self._cond:
+            return {
+                'active_users': sum(1 for s in self._states.values() if s.busy),
+                'pending_messages': sum(len(s.pending) for s in self._states.values()),
+                'messages': self.message_count,
+                'model_calls': self.model_call_count,
+                'coalesced_messages': self.coalesced_count,
+                'debounce_window': self.debounce_window,
+            }
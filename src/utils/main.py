@@ -1,4 +1,3 @@
-import opencc
 import re
 from typing import Match
 from ..core.logger import get_logger
@@ -6,8 +5,23 @@ from datetime import datetime, timedelta
 
 logger = get_logger(__name__)
 
-s2t_converter = opencc.OpenCC('s2t')
-t2s_converter = opencc.OpenCC('t2s')
+
+class _LazyConverter:
+    """第一次轉換時才載入 OpenCC 字典，縮短啟動時間（介面與 opencc.OpenCC 相同）"""
+
+    def __init__(self, config: str):
+        self.config = config
+        self._converter = None
+
+    def convert(self, text: str) -> str:
+        if self._converter is None:
+            import opencc
+            self._converter = opencc.OpenCC(self.config)
+        return self._converter.convert(text)
+
+
+s2t_converter = _LazyConverter('s2t')
+t2s_converter = _LazyConverter('t2s')
 
 def get_response_data(response) -> dict:
     for item in response['data']:
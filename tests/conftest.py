@@ -184,6 +184,13 @@ def disable_security_middleware():
     with patch('src.core.security.SecurityMiddleware._before_request'):
         yield
 
+@pytest.fixture(autouse=True)
+def reset_engine_registry():
+    """每個測試結束後清空共用資料庫引擎，避免測試之間共用連線池"""
+    yield
+    from src.database.engine import get_engine_registry
+    get_engine_registry().dispose_all()
+
 @pytest.fixture
 def temp_file():
     """創建一個暫存檔案用於測試"""
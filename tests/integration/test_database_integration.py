@@ -254,9 +254,9 @@ class TestHighAvailabilityConfig:
         engine = manager.engine
         assert engine.pool is not None
         
-        # SQLite 不支援連線池，但確保配置存在
-        pool_class = engine.pool.__class__.__name__
-        assert pool_class in ['StaticPool', 'QueuePool']
+        # SQLite 不支援連線池，但確保配置存在（共用引擎使用 QueuePool 子類別）
+        from sqlalchemy.pool import QueuePool, StaticPool
+        assert isinstance(engine.pool, (StaticPool, QueuePool))
     
     def test_ssl_config_structure(self):
         """測試 SSL 配置結構"""
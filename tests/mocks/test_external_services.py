@@ -16,7 +16,7 @@ class TestOpenAIMocks:
     def openai_model(self):
         return OpenAIModel(api_key="test_key", assistant_id="test_assistant")
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_chat_completion_success(self, mock_post, openai_model):
         """測試模擬 OpenAI 聊天完成 API"""
         # 設定模擬回應
@@ -55,7 +55,7 @@ class TestOpenAIMocks:
         call_args = mock_post.call_args
         assert 'https://api.openai.com/v1/chat/completions' in call_args[0][0]
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_chat_completion_error(self, mock_post, openai_model):
         """測試模擬 OpenAI API 錯誤回應"""
         mock_response = Mock()
@@ -77,7 +77,7 @@ class TestOpenAIMocks:
         assert response is None
         assert 'Rate limit exceeded' in error
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_assistant_api_create_thread(self, mock_post, openai_model):
         """測試模擬 Assistant API 建立對話串"""
         mock_response = Mock()
@@ -96,7 +96,7 @@ class TestOpenAIMocks:
         assert thread_info.thread_id == 'thread_abc123'
         assert error is None
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_assistant_api_run_thread(self, mock_post, openai_model):
         """測試模擬 Assistant API 執行對話串"""
         # 模擬多個 API 調用的序列
@@ -153,7 +153,7 @@ class TestAnthropicMocks:
     def anthropic_model(self):
         return AnthropicModel(api_key="test_key")
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_mock_anthropic_completion(self, mock_request, anthropic_model):
         """測試模擬 Anthropic 完成 API"""
         mock_response = Mock()
@@ -184,7 +184,7 @@ class TestAnthropicMocks:
         call_args = mock_request.call_args
         assert 'anthropic.com' in call_args[0][1]
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_mock_anthropic_error(self, mock_request, anthropic_model):
         """測試模擬 Anthropic API 錯誤"""
         mock_response = Mock()
@@ -212,7 +212,7 @@ class TestGeminiMocks:
     def gemini_model(self):
         return GeminiModel(api_key="test_key")
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_gemini_completion(self, mock_post, gemini_model):
         """測試模擬 Gemini 完成 API"""
         mock_response = Mock()
@@ -244,7 +244,7 @@ class TestGeminiMocks:
         assert response.content == 'Hello! How can I assist you today?'
         assert error is None
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_gemini_semantic_retrieval(self, mock_post, gemini_model):
         """測試模擬 Gemini 語義檢索 API"""
         responses = [
@@ -283,7 +283,7 @@ class TestOllamaMocks:
     def ollama_model(self):
         return OllamaModel(model_name="llama2", base_url="http://localhost:11434")
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_ollama_completion(self, mock_post, ollama_model):
         """測試模擬 Ollama 完成 API"""
         mock_response = Mock()
@@ -313,7 +313,7 @@ class TestOllamaMocks:
         assert response.content == 'Hello! I can help you with that.'
         assert error is None
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_mock_ollama_models_list(self, mock_get, ollama_model):
         """測試模擬 Ollama 模型列表 API"""
         mock_response = Mock()
@@ -342,7 +342,7 @@ class TestOllamaMocks:
         assert error is None
         mock_get.assert_called_once()
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_mock_ollama_embeddings(self, mock_post, ollama_model):
         """測試模擬 Ollama 嵌入 API"""
         mock_response = Mock()
@@ -453,9 +453,9 @@ class TestExternalServiceIntegration:
         """測試完整服務鏈的模擬"""
         # 這個測試展示如何模擬完整的外部服務調用鏈
         
-        with patch('requests.post') as mock_post, \
-             patch('requests.get') as mock_get, \
-             patch('src.database.connection.create_engine'), \
+        with patch('requests.Session.post') as mock_post, \
+             patch('requests.Session.get') as mock_get, \
+             patch('src.database.engine.create_engine'), \
              patch('src.database.connection.sessionmaker') as mock_sessionmaker:
             
             # 設定資料庫模擬
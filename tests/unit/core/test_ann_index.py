@@ -0,0 +1,122 @@
+"""
+測試 IVF 近似最近鄰索引的單元測試
+"""
+import numpy as np
+
+from src.core.ann_index import IVFIndex
+from src.core.vector_index import VectorIndex
+
+
+def _clustered_store(rng, files=4, chunks=500, dimension=32, clusters=20):
+    """產生群聚分布的測試知識庫（接近真實文件嵌入的分布）"""
+    centers = rng.normal(size=(clusters, dimension))
+    return {
+        f'file{f}': {
+            'filename': f'file{f}.txt',
+            'chunks': [
+                {
+                    'text': f'f{f}c{c}',
+                    'embedding': (centers[rng.integers(clusters)] + 0.3 * rng.normal(size=dimension)).tolist()
+                }
+                for c in range(chunks)
+            ]
+        }
+        for f in range(files)
+    }, centers
+
+
+def _trained_index(store, **kwargs):
+    index = VectorIndex(ann=IVFIndex(**kwargs))
+    index.sync(store)
+    index.search(np.ones(index.dimension), top_k=1)  # 觸發背景訓練
+    index.ann.wait_for_training(10)
+    return index
+
+
+class TestIVFIndex:
+    """測試 IVF 索引訓練、查詢與增量維護"""
+
+    def test_from_config_disabled(self):
+        assert IVFIndex.from_config(None) is None
+        assert IVFIndex.from_config({'enabled': False}) is None
+        assert IVFIndex.from_config({'enabled': True, 'nprobe': 4}).nprobe == 4
+
+    def test_small_store_uses_exact_search(self):
+        rng = np.random.default_rng(0)
+        store, _ = _clustered_store(rng, files=1, chunks=50)
+        index = VectorIndex(ann=IVFIndex(min_size=100))
+        index.sync(store)
+
+        index.search(rng.normal(size=32), top_k=3)
+
+        stats = index.get_stats()['ann']
+        assert not stats['trained'] and not stats['training']
+        assert stats['exact_queries'] == 1
+
+    def test_ann_recall_against_exact(self):
+        rng = np.random.default_rng(1)
+        store, centers = _clustered_store(rng)
+        index = _trained_index(store, min_size=1000, nlist=40, nprobe=8)
+        assert index.get_stats()['ann']['trained']
+
+        hits = 0
+        for center in centers:
+            query = center + 0.3 * rng.normal(size=32)
+            exact = {r['text'] for r in index.search(query, top_k=10, threshold=-1.0, exact=True)}
+            approx = {r['text'] for r in index.search(query, top_k=10, threshold=-1.0)}
+            hits += len(exact & approx)
+
+        assert hits / (10 * len(centers)) >= 0.9
+        assert index.get_stats()['ann']['ann_queries'] == len(centers)
+
+    def test_full_probe_matches_exact(self):
+        rng = np.random.default_rng(2)
+        store, _ = _clustered_store(rng, files=2)
+        index = _trained_index(store, min_size=500, nlist=16)
+        query = rng.normal(size=32)
+
+        exact = index.search(query, top_k=5, threshold=-1.0, exact=True)
+        approx = index.search(query, top_k=5, threshold=-1.0, nprobe=16)
+
+        assert [r['text'] for r in approx] == [r['text'] for r in exact]
+
+    def test_add_and_remove_after_training(self):
+        rng = np.random.default_rng(3)
+        store, _ = _clustered_store(rng)
+        index = _trained_index(store, min_size=1000, nlist=20, nprobe=20, retrain_growth=10.0)
+
+        index.add_file('new', 'new.txt', [{'text': 'needle', 'embedding': [1.0] + [0.0] * 31}])
+        index.remove_file('file0')
+
+        results = index.search([1.0] + [0.0] * 31, top_k=1, threshold=-1.0)
+        assert results[0]['text'] == 'needle'
+        assert all(r['file_id'] != 'file0' for r in index.search(rng.normal(size=32), top_k=50, threshold=-1.0))
+        assert index.get_stats()['ann']['ann_queries'] == 2
+
+    def test_load_discards_training(self):
+        rng = np.random.default_rng(4)
+        store, _ = _clustered_store(rng, files=2)
+        index = _trained_index(store, min_size=500)
+
+        index.load(None, [], [], [], {})
+
+        assert not index.get_stats()['ann']['trained']
+
+    def test_retrains_after_growth(self):
+        rng = np.random.default_rng(5)
+        store, _ = _clustered_store(rng, files=1, chunks=200)
+        index = _trained_index(store, min_size=100, nlist=8, retrain_growth=2.0)
+        assert index.get_stats()['ann']['trainings'] == 1
+
+        grown, _ = _clustered_store(rng, files=6, chunks=200)
+        store.update({f'grown{f}': data for f, data in enumerate(grown.values())})
+        index.sync(store)
+
+        # 重新訓練完成前仍以既有串列回答查詢
+        assert index.search(rng.normal(size=32), top_k=3, threshold=-1.0)
+        index.ann.wait_for_training(10)
+
+        stats = index.get_stats()['ann']
+        assert stats['trainings'] == 2
+        assert stats['trained_size'] == 1400
+        assert stats['ann_queries'] == 1
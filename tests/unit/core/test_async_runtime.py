@@ -0,0 +1,110 @@
+"""
+測試進程內共用背景事件迴圈的單元測試
+"""
+import asyncio
+import concurrent.futures
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from src.core.async_runtime import BackgroundEventLoop
+from src.core.mcp_client import MCPClient
+
+
+class TestBackgroundEventLoop:
+    """測試同步提交、跨迴圈等待、死結保護與 fork 後重建"""
+
+    def setup_method(self):
+        self.runtime = BackgroundEventLoop(name='TestAsyncRuntime')
+
+    def teardown_method(self):
+        self.runtime.stop()
+
+    def test_run_reuses_one_loop(self):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = self.runtime.run(current_loop())
+        second = self.runtime.run(current_loop())
+
+        assert first is second
+        assert self.runtime.get_stats() == {'running': True, 'submitted': 2, 'loops_created': 1}
+
+    def test_run_async_from_other_loop(self):
+        async def thread_name():
+            return threading.current_thread().name
+
+        async def caller():
+            return await self.runtime.run_async(thread_name())
+
+        assert asyncio.run(caller()) == 'TestAsyncRuntime'
+
+    def test_run_timeout_cancels(self):
+        with pytest.raises(concurrent.futures.TimeoutError):
+            self.runtime.run(asyncio.sleep(5), timeout=0.05)
+
+    def test_blocking_inside_loop_thread_raises(self):
+        async def nested():
+            self.runtime.run(asyncio.sleep(0))
+
+        with pytest.raises(RuntimeError):
+            self.runtime.run(nested())
+
+    def test_after_fork_recreates_loop(self):
+        original = self.runtime.get_loop()
+        self.runtime.after_fork()
+
+        assert self.runtime.get_loop() is not original
+        assert self.runtime.get_stats()['loops_created'] == 2
+
+
+class TestPersistentMCPSession:
+    """測試 MCP 客戶端在背景迴圈上跨呼叫保留 session"""
+
+    def setup_method(self):
+        self.runtime = BackgroundEventLoop(name='TestMCPRuntime')
+        self.client = MCPClient({'base_url': 'http://localhost:3000/api/mcp', 'timeout': 5})
+
+    def teardown_method(self):
+        self.runtime.run(self.client.close())
+        self.runtime.stop()
+
+    def test_session_reused_across_calls(self):
+        self.runtime.run(self.client._ensure_session())
+        session = self.client._session
+        self.runtime.run(self.client._ensure_session())
+
+        assert self.client._session is session
+        assert self.client.sessions_created == 1
+        assert session.connector.limit == self.client.pool_limit
+
+    def test_session_from_other_loop_replaced(self):
+        self.runtime.run(self.client._ensure_session())
+        asyncio.run(self.client._ensure_session())
+
+        assert self.client.sessions_created == 2
+
+    def test_service_sync_call_runs_on_background_loop(self):
+        from src.services.mcp_service import MCPService
+
+        with patch('src.services.mcp_service.MCPConfigManager') as mock_config_manager, \
+                patch('src.services.mcp_service.get_async_runtime', return_value=self.runtime):
+            mock_config_manager.return_value.is_mcp_enabled.return_value = False
+            service = MCPService()
+            thread_names = []
+
+            async def call_tool(tool_name, arguments):
+                thread_names.append(threading.current_thread().name)
+                return {'success': True, 'data': 'ok'}
+
+            service.is_enabled = True
+            service.mcp_client = Mock(base_url='http://localhost', call_tool=AsyncMock(side_effect=call_tool))
+            service.config_manager.validate_function_arguments.return_value = (True, None)
+            service.config_manager.get_function_by_name.return_value = {'mcp_tool': 'search'}
+
+            for _ in range(2):
+                assert service.handle_function_call_sync('search', {'q': 'x'})['success'] is True
+
+        assert thread_names == ['TestMCPRuntime', 'TestMCPRuntime']
+        assert self.runtime.get_stats()['loops_created'] == 1
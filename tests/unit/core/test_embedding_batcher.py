@@ -0,0 +1,61 @@
+"""
+測試批次嵌入向量生成的單元測試
+"""
+import threading
+
+from src.core.embedding_batcher import embed_in_batches
+
+
+class TestEmbedInBatches:
+    """測試 embed_in_batches 的批次切分、並行與退回機制"""
+
+    def test_results_keep_input_order(self):
+        texts = [f't{i}' for i in range(10)]
+        calls = []
+        lock = threading.Lock()
+
+        def embed_batch(batch):
+            with lock:
+                calls.append(list(batch))
+            return [[float(text[1:])] for text in batch]
+
+        results = embed_in_batches(texts, embed_batch, batch_size=3, max_workers=3)
+
+        assert results == [[float(i)] for i in range(10)]
+        assert sorted(len(batch) for batch in calls) == [1, 3, 3, 3]
+
+    def test_failed_batch_falls_back_to_single_requests(self):
+        single_calls = []
+
+        def fallback(text):
+            single_calls.append(text)
+            return None if text == 'bad' else [1.0]
+
+        results = embed_in_batches(['a', 'bad', 'c'], lambda batch: None, fallback=fallback, batch_size=2)
+
+        assert results == [[1.0], None, [1.0]]
+        assert single_calls == ['a', 'bad', 'c']
+
+    def test_partial_batch_results_are_filled_by_fallback(self):
+        results = embed_in_batches(
+            ['a', 'b'], lambda batch: [[0.5], None], fallback=lambda text: [9.0], batch_size=2
+        )
+
+        assert results == [[0.5], [9.0]]
+
+    def test_exception_without_fallback_marks_batch_failed(self):
+        def embed_batch(batch):
+            raise RuntimeError('boom')
+
+        assert embed_in_batches(['a', 'b'], embed_batch) == [None, None]
+
+    def test_progress_callback(self):
+        progress = []
+
+        embed_in_batches(
+            [str(i) for i in range(5)], lambda batch: [[0.0]] * len(batch),
+            batch_size=2, max_workers=1, progress_callback=lambda done, total: progress.append((done, total))
+        )
+
+        assert progress == [(2, 5), (4, 5), (5, 5)]
+        assert embed_in_batches([], lambda batch: []) == []
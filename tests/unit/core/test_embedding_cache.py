@@ -0,0 +1,90 @@
+"""
+測試跨行程嵌入向量快取的單元測試
+"""
+import sqlite3
+
+import pytest
+
+from src.core import embedding_cache
+from src.core.embedding_cache import EmbeddingCache, text_digest
+
+
+class TestEmbeddingCache:
+    """測試 EmbeddingCache 記憶體層與 SQLite 持久層"""
+
+    def test_memory_only_lru(self):
+        cache = EmbeddingCache(max_memory_entries=2)
+        cache.set('m', 'a', [1.0])
+        cache.set('m', 'b', [2.0])
+        assert cache.get('m', 'a') == [1.0]  # a 成為最近使用
+        cache.set('m', 'c', [3.0])
+
+        assert cache.get('m', 'b') is None
+        assert cache.get('m', 'a') == [1.0]
+        assert not cache.persistent
+        assert len(cache) == 2
+
+    def test_keys_include_model(self):
+        cache = EmbeddingCache()
+        cache.set('model-a', 'text', [1.0, 0.0])
+
+        assert cache.get('model-b', 'text') is None
+        assert cache.get('model-a', 'text') == [1.0, 0.0]
+
+    def test_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / 'cache' / 'embeddings.sqlite3')
+        writer = EmbeddingCache(path)
+        writer.set_many('m', [('a', [0.5, 0.25]), ('b', [1.0, 2.0])])
+
+        reader = EmbeddingCache(path)
+        results = reader.get_many('m', ['b', 'missing', 'a', 'b'])
+
+        assert results == [[1.0, 2.0], None, [0.5, 0.25], [1.0, 2.0]]
+        stats = reader.get_stats()
+        assert stats['persistent'] and stats['entries'] == 2
+        assert stats['disk_hits'] == 3 and stats['misses'] == 1
+
+    def test_evicts_least_recently_used(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(embedding_cache, 'EVICT_CHECK_INTERVAL', 1)
+        path = str(tmp_path / 'embeddings.sqlite3')
+        cache = EmbeddingCache(path, max_entries=10)
+        for i in range(10):
+            cache.set('m', f't{i}', [float(i)])
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE embeddings SET last_access = 0 WHERE digest = ?", (text_digest('t0'),))
+        conn.commit()
+        conn.close()
+
+        cache.set('m', 't10', [10.0])
+
+        fresh = EmbeddingCache(path)
+        assert len(fresh) == 9
+        assert fresh.get('m', 't0') is None
+        assert fresh.get('m', 't10') == [10.0]
+
+    def test_unusable_path_falls_back_to_memory(self, tmp_path):
+        blocker = tmp_path / 'file'
+        blocker.write_text('not a directory')
+
+        cache = EmbeddingCache(str(blocker / 'embeddings.sqlite3'))
+        cache.set('m', 'a', [1.0])
+
+        assert not cache.persistent
+        assert cache.get('m', 'a') == [1.0]
+
+    def test_connection_reopened_after_fork(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'embeddings.sqlite3')
+        cache = EmbeddingCache(path)
+        assert cache._connection is None  # 建立時不開啟連線（preload_app 的 master 不持有連線）
+
+        cache.set('m', 'a', [1.0])
+        parent_connection = cache._connection
+
+        # 模擬 fork 後的 worker：使用新的連線，不沿用也不關閉繼承的連線
+        monkeypatch.setattr(embedding_cache.os, 'getpid', lambda: -1)
+        cache._after_fork()
+        cache._memory.clear()
+
+        assert cache.get('m', 'a') == [1.0]
+        assert cache._connection is not parent_connection
+        parent_connection.execute("SELECT 1")
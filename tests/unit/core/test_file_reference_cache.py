@@ -0,0 +1,86 @@
+"""
+測試檔案引用對應表快取的單元測試
+"""
+import threading
+import time
+from unittest.mock import Mock
+
+from src.core.file_reference_cache import FileReferenceCache
+
+
+class TestFileReferenceCache:
+    """測試 TTL、single-flight 更新、個別查詢與跨 worker 共用"""
+
+    def test_lookup_uses_cache_within_ttl(self):
+        loader = Mock(return_value={'file_1': 'doc1', 'file_2': 'doc2'})
+        cache = FileReferenceCache(loader)
+
+        assert cache.lookup(['file_1']) == {'file_1': 'doc1'}
+        assert cache.lookup(['file_1', 'file_2']) == {'file_1': 'doc1', 'file_2': 'doc2'}
+        assert loader.call_count == 1
+
+    def test_unknown_ids_resolved_individually(self):
+        loader = Mock(return_value={'file_1': 'doc1'})
+        resolver = Mock(side_effect=lambda fid: 'new_doc' if fid == 'file_new' else None)
+        cache = FileReferenceCache(loader, resolver)
+
+        assert cache.lookup(['file_1', 'file_new', 'file_gone']) == {'file_1': 'doc1', 'file_new': 'new_doc'}
+        # 已解析的 ID 進入快取，查不到的 ID 在 negative_ttl 內不再重查
+        assert cache.lookup(['file_new', 'file_gone']) == {'file_new': 'new_doc'}
+        assert resolver.call_count == 2
+        assert loader.call_count == 1
+
+    def test_concurrent_cold_lookups_share_one_listing(self):
+        release = threading.Event()
+        loader = Mock(side_effect=lambda: release.wait(5) and {'file_1': 'doc1'})
+        cache = FileReferenceCache(loader, cold_wait=5)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(cache.lookup(['file_1']))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert results == [{'file_1': 'doc1'}] * 5
+        assert loader.call_count == 1
+
+    def test_slow_cold_listing_does_not_block_reply(self):
+        release = threading.Event()
+        loader = Mock(side_effect=lambda: release.wait(5) and {'file_1': 'doc1'})
+        resolver = Mock(return_value='doc1')
+        cache = FileReferenceCache(loader, resolver, cold_wait=0.05)
+
+        start = time.time()
+        assert cache.lookup(['file_1']) == {'file_1': 'doc1'}
+        assert time.time() - start < 1
+        resolver.assert_called_once_with('file_1')
+        release.set()
+
+    def test_stale_cache_refreshes_in_background(self):
+        loader = Mock(side_effect=[{'file_1': 'old'}, {'file_1': 'new'}])
+        cache = FileReferenceCache(loader, ttl=0.05)
+        cache.lookup(['file_1'])
+        time.sleep(0.1)
+
+        # 過期時立即返回舊資料，更新在背景完成
+        assert cache.lookup(['file_1']) == {'file_1': 'old'}
+        for _ in range(50):
+            if not cache.get_stats()['refreshing']:
+                break
+            time.sleep(0.02)
+        assert cache._references == {'file_1': 'new'}
+
+    def test_shared_file_reused_by_other_workers(self, tmp_path):
+        path = str(tmp_path / 'refs.json')
+        first = FileReferenceCache(Mock(return_value={'file_1': 'doc1'}), path=path)
+        first.lookup(['file_1'])
+
+        other_loader = Mock(return_value={})
+        second = FileReferenceCache(other_loader, path=path)
+
+        assert second.lookup(['file_1']) == {'file_1': 'doc1'}
+        other_loader.assert_not_called()
+        assert second.get_stats()['shared_loads'] == 1
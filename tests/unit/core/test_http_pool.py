@@ -0,0 +1,84 @@
+"""
+測試模型提供商共用 HTTP 連線池的單元測試
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core.http_pool import HTTPSessionRegistry, get_pool_settings
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestHTTPSessionRegistry:
+    """測試共用 session、連線重用與統計"""
+
+    def test_session_shared_per_provider(self):
+        registry = HTTPSessionRegistry()
+        assert registry.get_session('openai') is registry.get_session('openai')
+        assert registry.get_session('openai') is not registry.get_session('gemini')
+        registry.close_all()
+
+    def test_connections_are_reused(self, server_url):
+        registry = HTTPSessionRegistry()
+        session = registry.get_session('ollama')
+
+        for _ in range(5):
+            assert session.get(f"{server_url}/api/tags", timeout=5).json() == {'ok': True}
+
+        stats = registry.get_stats()['ollama']
+        assert stats['requests'] == 5
+        assert stats['new_connections'] == 1
+        assert stats['reused_connections'] == 4
+        assert stats['connect_latency_ms']['max'] >= 0
+        registry.close_all()
+
+    def test_configure_rebuilds_session(self):
+        registry = HTTPSessionRegistry()
+        original = registry.get_session('anthropic')
+
+        registry.configure('anthropic', {'pool_maxsize': 4})
+        rebuilt = registry.get_session('anthropic')
+
+        assert rebuilt is not original
+        assert rebuilt.get_adapter('https://api.anthropic.com')._pool_maxsize == 4
+        registry.configure('anthropic', {'pool_maxsize': 4})
+        assert registry.get_session('anthropic') is rebuilt
+        registry.close_all()
+
+    def test_after_fork_drops_sessions(self):
+        registry = HTTPSessionRegistry()
+        original = registry.get_session('openai')
+
+        registry.after_fork()
+
+        assert registry.get_session('openai') is not original
+
+    def test_pool_settings_ignore_invalid_values(self):
+        settings = get_pool_settings({'pool_maxsize': 0, 'pool_connections': 8, 'unknown': 1, 'pool_block': 1})
+        assert settings == {'pool_connections': 8, 'pool_maxsize': 16, 'pool_block': True}
+        assert get_pool_settings(False)['pool_maxsize'] == 16
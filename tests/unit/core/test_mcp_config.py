@@ -6,6 +6,7 @@ import pytest
 import json
 import tempfile
 import os
+import time
 from unittest.mock import patch, mock_open, MagicMock
 from src.core.mcp_config import MCPConfigManager
 
@@ -350,4 +351,44 @@ class TestMCPConfigManager:
         
         default_params = self.config_manager.get_default_params("test.json")
         assert default_params["max_results"] == 20
-        assert default_params["timeout"] == 30
\ No newline at end of file
+        assert default_params["timeout"] == 30    
+    def test_compiled_config_reused_until_content_changes(self):
+        """測試編譯結果只在設定檔內容改變時重建"""
+        config_file = os.path.join(self.temp_dir, "test.json")
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(self.test_config, f)
+        manager = MCPConfigManager(self.temp_dir, check_interval=0)
+        
+        compiled = manager.get_compiled_config("test.json")
+        assert manager.get_compiled_config("test.json") is compiled
+        assert manager.get_function_schemas_for_gemini("test.json")[0]["name"] == "test_function"
+        
+        # 重寫相同內容（mtime 改變但雜湊相同）不重新編譯
+        os.utime(config_file, (time.time() + 5, time.time() + 5))
+        assert manager.get_compiled_config("test.json") is compiled
+        
+        changed = {**self.test_config, "functions": [{**self.test_config["functions"][0], "name": "renamed"}]}
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(changed, f)
+        os.utime(config_file, (time.time() + 10, time.time() + 10))
+        
+        recompiled = manager.get_compiled_config("test.json")
+        assert recompiled is not compiled and recompiled.version != compiled.version
+        assert manager.get_function_by_name("renamed", "test.json") is not None
+    
+    def test_no_stat_within_check_interval(self):
+        """測試 check_interval 內不重新檢查檔案"""
+        config_file = os.path.join(self.temp_dir, "test.json")
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(self.test_config, f)
+        manager = MCPConfigManager(self.temp_dir, check_interval=60)
+        manager.load_mcp_config()
+        
+        with patch('os.path.exists') as mock_exists, patch('os.listdir') as mock_listdir:
+            valid, error = manager.validate_function_arguments("test_function", {"query": "x" * 101})
+            schemas = manager.get_function_schemas_for_openai()
+        
+        assert valid is False and "exceeds max length" in error
+        assert schemas[0]["function"]["name"] == "test_function"
+        mock_exists.assert_not_called()
+        mock_listdir.assert_not_called()
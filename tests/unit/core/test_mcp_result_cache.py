@@ -0,0 +1,82 @@
+"""
+測試 MCP 工具結果快取的單元測試
+"""
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.core.mcp_result_cache import MCPResultCache, canonicalize_arguments
+
+
+class TestMCPResultCache:
+    """測試快取鍵、TTL、容量限制與 single-flight"""
+
+    def test_canonical_key_ignores_argument_order(self):
+        assert canonicalize_arguments({'b': 1, 'a': '議員'}) == canonicalize_arguments({'a': '議員', 'b': 1})
+        assert MCPResultCache.make_key('search', {'q': 'x'}) != MCPResultCache.make_key('other', {'q': 'x'})
+
+    def test_hit_within_ttl_and_expiry(self):
+        cache = MCPResultCache()
+        call = AsyncMock(return_value={'success': True, 'data': 'motion'})
+        key = cache.make_key('search_motions', {'q': '預算'})
+
+        async def run():
+            await cache.get_or_call(key, 0.1, call)
+            await cache.get_or_call(key, 0.1, call)
+            await asyncio.sleep(0.15)
+            await cache.get_or_call(key, 0.1, call)
+
+        asyncio.run(run())
+        assert call.await_count == 2
+        stats = cache.get_stats()
+        assert stats['hits'] == 1 and stats['misses'] == 2
+        assert stats['hit_rate'] == '33.3%'
+
+    def test_failures_not_cached(self):
+        cache = MCPResultCache()
+        call = AsyncMock(side_effect=[{'success': False, 'error': 'x'}, RuntimeError('down'), {'success': True}])
+        key = cache.make_key('search', {})
+
+        async def run():
+            await cache.get_or_call(key, 60, call)
+            with pytest.raises(RuntimeError):
+                await cache.get_or_call(key, 60, call)
+            return await cache.get_or_call(key, 60, call)
+
+        assert asyncio.run(run()) == {'success': True}
+        assert call.await_count == 3
+
+    def test_concurrent_identical_calls_share_one_request(self):
+        cache = MCPResultCache()
+        calls = 0
+
+        async def slow_call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {'success': True, 'data': 'councillor'}
+
+        async def run():
+            key = cache.make_key('get_councillor', {'name': '王'})
+            return await asyncio.gather(*(cache.get_or_call(key, 60, slow_call) for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert calls == 1
+        assert all(r['data'] == 'councillor' for r in results)
+        assert cache.get_stats()['coalesced'] == 4
+
+    def test_bounded_by_entries_and_bytes(self):
+        cache = MCPResultCache(max_entries=2, max_bytes=10_000)
+        for i in range(3):
+            cache.set(cache.make_key('t', {'i': i}), {'data': i}, 60)
+        assert cache.get(cache.make_key('t', {'i': 0})) is None
+        assert cache.get_stats()['entries'] == 2 and cache.get_stats()['evictions'] == 1
+
+        small = MCPResultCache(max_bytes=100)
+        small.set(small.make_key('t', {'i': 1}), {'data': 'x' * 60}, 60)
+        small.set(small.make_key('t', {'i': 2}), {'data': 'y' * 60}, 60)
+        assert small.get_stats()['entries'] == 1
+        small.set(small.make_key('t', {'i': 3}), {'data': 'z' * 200}, 60)
+        assert small.get(small.make_key('t', {'i': 3})) is None
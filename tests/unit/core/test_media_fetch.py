@@ -0,0 +1,128 @@
+"""
+測試語音訊息背景預取的單元測試
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from src.core.exceptions import PlatformError
+from src.core.media_fetch import MediaFetcher, MediaTooLargeError, configure_media_fetcher
+from src.services.audio import AudioHandler
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = MediaFetcher(max_concurrent=2, max_bytes=1024, spool_threshold=16, timeout=5)
+    yield fetcher
+    fetcher.shutdown()
+
+
+class TestMediaFetcher:
+    """測試背景下載與暫存"""
+
+    def test_streams_chunks_into_spooled_file(self, fetcher):
+        def download(sink):
+            for _ in range(4):
+                sink.write(b'x' * 32)
+
+        handle = fetcher.submit(download, name='voice.m4a')
+
+        assert handle.read() == b'x' * 128
+        assert handle.size == 128
+        # 超過 spool_threshold 時改寫入磁碟
+        assert handle.result()._rolled
+        stats = fetcher.get_stats()
+        assert stats['completed'] == 1
+        assert stats['bytes_fetched'] == 128
+        handle.close()
+
+    def test_size_limit_aborts_download(self, fetcher):
+        chunks_written = []
+
+        def download(sink):
+            for _ in range(100):
+                sink.write(b'x' * 512)
+                chunks_written.append(1)
+
+        handle = fetcher.submit(download)
+
+        with pytest.raises(MediaTooLargeError):
+            handle.read()
+        # 超過上限後不再繼續下載
+        assert len(chunks_written) == 2
+        assert fetcher.get_stats()['too_large'] == 1
+
+    def test_download_error_raised_on_read(self, fetcher):
+        def download(sink):
+            raise ConnectionError("boom")
+
+        handle = fetcher.submit(download)
+
+        with pytest.raises(ConnectionError):
+            handle.read()
+        assert fetcher.get_stats()['failed'] == 1
+
+    def test_timeout_raises_platform_error(self):
+        fetcher = MediaFetcher(max_concurrent=1, timeout=0.05)
+        release = threading.Event()
+        handle = fetcher.submit(lambda sink: release.wait(5))
+
+        with pytest.raises(PlatformError, match="timed out"):
+            handle.read()
+        release.set()
+        fetcher.shutdown()
+
+    def test_concurrency_is_bounded(self, fetcher):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def download(sink):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            sink.write(b'ok')
+
+        handles = [fetcher.submit(download) for _ in range(6)]
+
+        assert all(handle.read() == b'ok' for handle in handles)
+        assert max(peak) <= 2
+
+    def test_submit_returns_immediately(self, fetcher):
+        release = threading.Event()
+        start = time.perf_counter()
+        handle = fetcher.submit(lambda sink: release.wait(5))
+
+        assert time.perf_counter() - start < 0.5
+        assert not handle.done()
+        release.set()
+        handle.result()
+
+    def test_configure_ignores_unknown_keys(self):
+        configured = configure_media_fetcher({'max_concurrent': 8, 'unknown': True})
+        try:
+            assert configured.max_concurrent == 8
+            assert configured.max_bytes == 25 * 1024 * 1024
+        finally:
+            configure_media_fetcher()
+
+
+class TestAudioHandlerWithMediaHandle:
+    """測試音訊處理器直接讀取背景下載的結果"""
+
+    def test_temp_file_created_from_handle(self, fetcher):
+        handle = fetcher.submit(lambda sink: sink.write(b'audio-bytes'), name='voice.m4a')
+        handler = AudioHandler()
+
+        path = handler._create_temp_file_optimized(handle)
+        try:
+            with open(path, 'rb') as f:
+                assert f.read() == b'audio-bytes'
+        finally:
+            os.remove(path)
+            handle.close()
@@ -8,7 +8,9 @@ from src.core.smart_polling import (
     SmartPollingStrategy, 
     PollingContext, 
     smart_polling_wait,
-    OpenAIPollingStrategy
+    OpenAIPollingStrategy,
+    AdaptivePollingStrategy,
+    LatencyHistogram
 )
 
 
@@ -526,5 +528,99 @@ class TestSmartPollingEdgeCases:
         assert "平均間隔 10.0秒" in summary  # 零嘗試時，平均間隔等於總時間
 
 
+class TestLatencyHistogram:
+    """測試線上延遲直方圖"""
+    
+    def test_quantiles_follow_observations(self):
+        histogram = LatencyHistogram()
+        for seconds in range(1, 101):
+            histogram.add(seconds / 10)  # 0.1 ~ 10 秒均勻分布
+        
+        assert histogram.quantile(0.5) == pytest.approx(5.0, rel=0.2)
+        assert histogram.quantile(0.9) == pytest.approx(9.0, rel=0.2)
+        assert histogram.quantile(0.25) < histogram.quantile(0.5) < histogram.quantile(0.99)
+    
+    def test_decay_keeps_distribution(self):
+        histogram = LatencyHistogram(max_weight=100)
+        for _ in range(500):
+            histogram.add(4.0)
+        
+        assert histogram.total <= 100
+        assert histogram.quantile(0.5) == pytest.approx(4.0, rel=0.25)
+
+
+class TestAdaptivePollingStrategy:
+    """測試依狀態持續時間分布調整的輪詢策略"""
+    
+    def _trained(self, durations, **kwargs):
+        strategy = AdaptivePollingStrategy(min_samples=10, **kwargs)
+        for duration in durations:
+            strategy.record_status_duration('in_progress', duration)
+        return strategy
+    
+    def test_cold_start_uses_fixed_sequence(self):
+        strategy = AdaptivePollingStrategy()
+        assert strategy.get_wait_time(0, 'queued', status_elapsed=0.0) == 7.5
+        assert strategy.get_wait_time(0, 'in_progress', status_elapsed=0.0) == 5
+    
+    def test_checks_near_predicted_quantiles(self):
+        strategy = self._trained([12.0] * 50, max_interval=30.0)
+        
+        # 所有 run 約 12 秒完成：第一次檢查就落在 12 秒附近，而非 5 秒
+        first_wait = strategy.get_wait_time(0, 'in_progress', status_elapsed=0.0)
+        assert first_wait == pytest.approx(12.0, rel=0.25)
+    
+    def test_wait_is_bounded(self):
+        strategy = self._trained([60.0] * 50, max_interval=5.0)
+        assert strategy.get_wait_time(0, 'in_progress', status_elapsed=0.0) == 5.0
+        # 超過預測尾端後以固定短間隔檢查
+        assert strategy.get_wait_time(9, 'in_progress', status_elapsed=200.0) == strategy.final_interval
+    
+    def test_fewer_polls_than_fixed_sequence(self):
+        strategy = self._trained([18.0 + i % 5 for i in range(100)], max_interval=30.0)
+        
+        def polls_until(done_at, wait_for):
+            elapsed, polls = 0.0, 0
+            while elapsed < done_at:
+                elapsed += wait_for(polls, elapsed)
+                polls += 1
+            return polls, elapsed - done_at
+        
+        fixed = OpenAIPollingStrategy()
+        fixed_polls, _ = polls_until(20.0, lambda n, _: fixed.get_wait_time(n, 'in_progress'))
+        adaptive_polls, overshoot = polls_until(
+            20.0, lambda n, elapsed: strategy.get_wait_time(n, 'in_progress', status_elapsed=elapsed)
+        )
+        
+        assert adaptive_polls < fixed_polls
+        assert overshoot <= 5.0
+    
+    def test_histograms_persist_across_instances(self, tmp_path):
+        path = str(tmp_path / 'polling.json')
+        strategy = self._trained([8.0] * 30, path=path)
+        strategy.save()
+        
+        restored = AdaptivePollingStrategy(path=path, min_samples=10)
+        
+        assert restored.predict('in_progress')['p50'] == pytest.approx(8.0, rel=0.25)
+        assert restored.get_stats()['samples']['openai:in_progress'] == 30
+    
+    def test_polling_context_records_status_durations(self):
+        strategy = Mock(spec=AdaptivePollingStrategy)
+        with patch('time.time', return_value=0), patch('src.core.smart_polling.logger'):
+            context = PollingContext("run", strategy)
+        
+        context.observe('queued', 2.0)
+        context.observe('in_progress', 4.0)
+        context.observe('in_progress', 10.0)
+        context.observe('completed', 12.0)
+        
+        assert strategy.record_status_duration.call_args_list == [
+            call('queued', 3.0), call('in_progress', 8.0)
+        ]
+        context.next_wait()
+        strategy.get_wait_time.assert_called_with(0, 'completed', status_elapsed=1.0)
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+測試 Server-Sent Events 解析的單元測試
+"""
+from src.core.sse import iter_sse_events
+
+
+class TestIterSSEEvents:
+    """測試 iter_sse_events"""
+
+    def test_parses_events_and_multiline_data(self):
+        lines = [
+            ': keep-alive', '',
+            'event: thread.run.created', 'data: {"id": "run_1"}', '',
+            b'event: thread.message.delta', b'data: line1', b'data:line2', b'',
+            'event: done', 'data: [DONE]',
+        ]
+
+        assert list(iter_sse_events(lines)) == [
+            ('thread.run.created', '{"id": "run_1"}'),
+            ('thread.message.delta', 'line1\nline2'),
+            ('done', '[DONE]'),
+        ]
+
+    def test_data_without_event_name(self):
+        assert list(iter_sse_events(['data: x\r', ''])) == [(None, 'x')]
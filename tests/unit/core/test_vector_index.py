@@ -0,0 +1,102 @@
+"""
+測試本地知識庫向量索引的單元測試
+"""
+import numpy as np
+import pytest
+
+from src.core.vector_index import VectorIndex
+
+
+def _brute_force(store, query, top_k, threshold):
+    """純 Python 餘弦相似度，作為比對基準"""
+    results = []
+    q = np.asarray(query, dtype=np.float64)
+    for file_id, data in store.items():
+        for chunk in data['chunks']:
+            v = np.asarray(chunk['embedding'], dtype=np.float64)
+            sim = float(v @ q / (np.linalg.norm(v) * np.linalg.norm(q)))
+            if sim >= threshold:
+                results.append((sim, chunk['text']))
+    results.sort(key=lambda x: x[0], reverse=True)
+    return [text for _, text in results[:top_k]]
+
+
+class TestVectorIndex:
+    """測試 VectorIndex 搜尋與增量維護"""
+
+    def test_search_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        store = {
+            f'file{f}': {
+                'filename': f'file{f}.txt',
+                'chunks': [{'text': f'f{f}c{c}', 'embedding': rng.normal(size=16).tolist()} for c in range(50)]
+            }
+            for f in range(4)
+        }
+        index = VectorIndex(initial_capacity=8)
+        index.sync(store)
+        query = rng.normal(size=16).tolist()
+
+        results = index.search(query, top_k=5, threshold=-1.0)
+
+        assert [r['text'] for r in results] == _brute_force(store, query, 5, -1.0)
+        assert len(index) == 200
+        assert index.get_stats()['capacity'] >= 200
+        assert results[0]['similarity'] >= results[-1]['similarity']
+
+    def test_threshold_and_inclusive(self):
+        index = VectorIndex()
+        index.add_file('f', 'f.txt', [
+            {'text': 'same', 'embedding': [1.0, 0.0]},
+            {'text': 'orthogonal', 'embedding': [0.0, 1.0]},
+        ])
+
+        assert [r['text'] for r in index.search([1.0, 0.0], top_k=5, threshold=0.0)] == ['same', 'orthogonal']
+        assert [r['text'] for r in index.search([1.0, 0.0], top_k=5, threshold=0.0, inclusive=False)] == ['same']
+
+    def test_replacing_file_removes_old_chunks(self):
+        index = VectorIndex()
+        index.add_file('f', 'f.txt', [{'text': 'old', 'embedding': [1.0, 0.0]}])
+        index.add_file('g', 'g.txt', [{'text': 'other', 'embedding': [0.0, 1.0]}])
+        index.add_file('f', 'f.txt', [{'text': 'new', 'embedding': [1.0, 0.1]}])
+
+        texts = [r['text'] for r in index.search([1.0, 0.0], top_k=5, threshold=-1.0)]
+
+        assert texts == ['new', 'other']
+        assert len(index) == 2
+
+    def test_sync_tracks_store_changes(self):
+        index = VectorIndex()
+        store = {'a': {'filename': 'a.txt', 'chunks': [{'text': 'a', 'embedding': [1.0, 0.0]}]}}
+        index.sync(store)
+        assert 'a' in index
+
+        store['b'] = {'filename': 'b.txt', 'chunks': [{'text': 'b', 'embedding': [0.0, 1.0]}]}
+        del store['a']
+        index.sync(store)
+
+        assert 'a' not in index
+        assert [r['file_id'] for r in index.search([0.0, 1.0], top_k=5)] == ['b']
+
+    def test_chunks_without_embedding_and_bad_queries(self):
+        index = VectorIndex()
+        index.add_file('f', 'f.txt', [{'text': 'no embedding'}, {'text': 'ok', 'embedding': [0.0, 2.0]}])
+
+        assert len(index) == 1
+        assert index.search([0.0, 0.0], top_k=3) == []
+        assert index.search([1.0, 0.0, 0.0], top_k=3) == []
+        assert VectorIndex().search([1.0], top_k=3) == []
+
+    def test_dimension_mismatch_is_skipped(self):
+        index = VectorIndex()
+        index.add_file('f', 'f.txt', [{'text': 'a', 'embedding': [1.0, 0.0]}])
+
+        assert index.add_file('g', 'g.txt', [{'text': 'b', 'embedding': [1.0, 0.0, 0.0]}]) == 0
+        assert len(index) == 1
+
+    def test_matrix_is_normalized_float32(self):
+        index = VectorIndex()
+        index.add_file('f', 'f.txt', [{'text': 'a', 'embedding': [3.0, 4.0]}])
+
+        assert index._matrix.dtype == np.float32
+        assert index._matrix[0] == pytest.approx([0.6, 0.8])
@@ -0,0 +1,114 @@
+"""
+測試磁碟持久化向量索引的單元測試
+"""
+import os
+
+import numpy as np
+import pytest
+
+from src.core.vector_index import VectorIndex
+from src.core.vector_store import PersistentVectorStore, content_hash
+
+
+def _entry(filename, content, embeddings):
+    return {
+        'filename': filename,
+        'content': content,
+        'chunks': [
+            {'text': f'{content}-{i}', 'start': i, 'end': i + 1, 'embedding': embedding}
+            for i, embedding in enumerate(embeddings)
+        ],
+        'metadata': {'size': len(content)}
+    }
+
+
+class TestPersistentVectorStore:
+    """測試持久化索引的寫入、載入與跨 worker 重新載入"""
+
+    def test_save_and_load_in_new_process(self, tmp_path):
+        writer = PersistentVectorStore(str(tmp_path))
+        assert writer.save_file('a', _entry('a.txt', 'alpha', [[1.0, 0.0], [0.6, 0.8]]))
+        assert writer.save_file('b', _entry('b.txt', 'beta', [[0.0, 3.0]]))
+
+        store, index = {}, VectorIndex()
+        reader = PersistentVectorStore(str(tmp_path))
+        assert reader.refresh(store, index, force=True)
+
+        assert set(store) == {'a', 'b'}
+        assert store['a']['content'] == 'alpha'
+        assert store['a']['metadata'] == {'size': 5}
+        assert [c['text'] for c in store['a']['chunks']] == ['alpha-0', 'alpha-1']
+        assert isinstance(index._matrix, np.memmap)
+        assert not index._matrix.flags.writeable
+
+        results = index.search([0.0, 1.0], top_k=2, threshold=-1.0)
+        assert [r['file_id'] for r in results] == ['b', 'a']
+        assert results[0]['similarity'] == pytest.approx(1.0)
+
+        # 同步後不需重建，索引仍直接使用 mmap
+        index.sync(store)
+        assert isinstance(index._matrix, np.memmap)
+        assert reader.get_stats()['mmap'] is True
+
+    def test_identical_content_shares_embeddings(self, tmp_path):
+        store = PersistentVectorStore(str(tmp_path))
+        store.save_file('a', _entry('a.txt', 'same', [[1.0, 0.0]]))
+        store.refresh({}, VectorIndex(), force=True)
+
+        chunks = store.get_chunks(content_hash('same'))
+        assert [c['text'] for c in chunks] == ['same-0']
+        assert store.get_chunks(content_hash('other')) is None
+
+        store.save_file('b', {'filename': 'b.txt', 'content': 'same', 'chunks': chunks, 'metadata': {}})
+        knowledge, index = {}, VectorIndex()
+        store.refresh(knowledge, index, force=True)
+
+        stats = store.get_stats()
+        assert stats['files'] == 2
+        assert stats['contents'] == 1
+        assert stats['chunks'] == 1
+        assert len(index) == 2
+        assert {r['file_id'] for r in index.search([1.0, 0.0], top_k=5)} == {'a', 'b'}
+
+    def test_reload_picks_up_other_worker_changes(self, tmp_path):
+        worker_a = PersistentVectorStore(str(tmp_path), reload_interval=0)
+        worker_b = PersistentVectorStore(str(tmp_path), reload_interval=0)
+        store, index = {}, VectorIndex()
+        worker_b.refresh(store, index, force=True)
+        assert store == {}
+
+        worker_a.save_file('a', _entry('a.txt', 'alpha', [[1.0, 0.0]]))
+        assert worker_b.refresh(store, index)
+        assert 'a' in store
+        assert not worker_b.refresh(store, index)
+
+        worker_a.remove_file('a')
+        worker_b.refresh(store, index)
+        assert store == {}
+        assert len(index) == 0
+
+    def test_remove_compacts_matrix_and_cleans_old_generations(self, tmp_path):
+        store = PersistentVectorStore(str(tmp_path))
+        store.save_file('a', _entry('a.txt', 'alpha', [[1.0, 0.0]]))
+        store.save_file('b', _entry('b.txt', 'beta', [[0.0, 1.0]]))
+        store.save_file('c', _entry('c.txt', 'gamma', [[1.0, 1.0]]))
+        assert store.remove_file('a')
+        assert not store.remove_file('missing')
+
+        knowledge, index = {}, VectorIndex()
+        store.refresh(knowledge, index, force=True)
+        assert set(knowledge) == {'b', 'c'}
+        assert [r['file_id'] for r in index.search([0.0, 1.0], top_k=1)] == ['b']
+
+        npy_files = [name for name in os.listdir(tmp_path) if name.endswith('.npy')]
+        assert len(npy_files) <= 2
+
+    def test_dimension_mismatch_is_not_persisted(self, tmp_path):
+        store = PersistentVectorStore(str(tmp_path))
+        store.save_file('a', _entry('a.txt', 'alpha', [[1.0, 0.0]]))
+
+        assert not store.save_file('b', _entry('b.txt', 'beta', [[1.0, 0.0, 0.0]]))
+
+        knowledge = {}
+        store.refresh(knowledge, VectorIndex(), force=True)
+        assert set(knowledge) == {'a'}
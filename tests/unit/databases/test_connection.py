@@ -37,7 +37,7 @@ def mock_session():
 @pytest.fixture(autouse=True)
 def patch_db_dependencies(mock_engine, mock_session):
     """自動 patch 所有測試的資料庫依賴"""
-    with patch('src.database.connection.create_engine', return_value=mock_engine) as mock_create_engine, \
+    with patch('src.database.engine.create_engine', return_value=mock_engine) as mock_create_engine, \
          patch('src.database.connection.sessionmaker', return_value=lambda: mock_session) as mock_sessionmaker:
         yield mock_create_engine, mock_sessionmaker
 
@@ -727,7 +727,7 @@ class TestAnthropicModelHTTPRequests:
             with patch('src.core.config.get_value', return_value=False):
                 yield AnthropicModel(api_key='test_key')
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_json_decode_error(self, mock_request, model):
         """Test _request with JSON decode error (line 587-588)"""
         mock_response = Mock()
@@ -741,7 +741,7 @@ class TestAnthropicModelHTTPRequests:
         assert not success
         assert "Invalid JSON" in error
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_http_error(self, mock_request, model):
         """Test _request with HTTP error (line 582-589)"""
         mock_response = Mock()
@@ -755,7 +755,7 @@ class TestAnthropicModelHTTPRequests:
         assert not success
         assert "Invalid request" in error
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_connection_error(self, mock_request, model):
         """Test _request with connection error handled by retry decorator"""
         mock_request.side_effect = requests.exceptions.ConnectionError("Connection failed")
@@ -767,7 +767,7 @@ class TestAnthropicModelHTTPRequests:
         assert data is None
         assert "Connection failed" in error
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_timeout_error(self, mock_request, model):
         """Test _request with timeout error handled by retry decorator"""
         mock_request.side_effect = requests.exceptions.Timeout("Request timeout")
@@ -779,7 +779,7 @@ class TestAnthropicModelHTTPRequests:
         assert data is None
         assert "Request timeout" in error
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_request_exception(self, mock_request, model):
         """Test _request with RequestException handled by retry decorator"""
         mock_request.side_effect = requests.exceptions.RequestException("Request error")
@@ -791,7 +791,7 @@ class TestAnthropicModelHTTPRequests:
         assert data is None
         assert "Request error" in error
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_success(self, mock_request, model):
         """Test _request success case"""
         mock_response = Mock()
@@ -805,7 +805,7 @@ class TestAnthropicModelHTTPRequests:
         assert data['content'][0]['text'] == 'Success'
         assert error is None
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_http_error_response(self, mock_request, model):
         """Test _request with HTTPError exception (line 592-599)"""
         mock_response = Mock()
@@ -821,7 +821,7 @@ class TestAnthropicModelHTTPRequests:
         assert not success
         assert "Bad request" in error
     
-    @patch('src.models.anthropic_model.requests.request')
+    @patch('requests.Session.request')
     def test_request_http_error_invalid_json(self, mock_request, model):
         """Test _request with HTTPError and invalid JSON (line 597-598)"""
         mock_response = Mock()
@@ -155,7 +155,7 @@ class TestGeminiModel:
         mock_response.status_code = 200
         mock_response.json.return_value = {"success": True}
         
-        with patch('requests.post', return_value=mock_response):
+        with patch('requests.Session.post', return_value=mock_response):
             success, result, error = gemini_model._request(
                 "POST",
                 "generateContent",
@@ -172,7 +172,7 @@ class TestGeminiModel:
         mock_response.status_code = 400
         mock_response.json.return_value = {"error": {"message": "Bad request"}}
         
-        with patch('requests.post', return_value=mock_response):
+        with patch('requests.Session.post', return_value=mock_response):
             success, result, error = gemini_model._request(
                 "POST",
                 "generateContent",
@@ -252,7 +252,7 @@ class TestGeminiModel:
         import requests
         
         # Test chat_completion with network error - this will go through retry logic
-        with patch('requests.post', side_effect=requests.exceptions.RequestException("Network error")):
+        with patch('requests.Session.post', side_effect=requests.exceptions.RequestException("Network error")):
             messages = [ChatMessage(role="user", content="Hello")]
             success, response, error = gemini_model.chat_completion(messages)
             
@@ -280,7 +280,7 @@ class TestGeminiModel:
             assert is_successful == False
             assert error == 'API Error'
     
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_success(self, mock_post, gemini_model):
         """測試聊天完成成功"""
         # 模擬 API 回應
@@ -313,7 +313,7 @@ class TestGeminiModel:
         assert 'usage' in response.metadata
         assert error is None
     
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_with_multimodal(self, mock_post, gemini_model):
         """測試多模態聊天完成"""
         mock_response = Mock()
@@ -351,7 +351,7 @@ class TestGeminiModel:
         assert len(request_body['contents'][0]['parts']) == 2  # 文字 + 圖片
         assert 'inline_data' in request_body['contents'][0]['parts'][1]
     
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_with_system_instruction(self, mock_post, gemini_model):
         """測試系統指令支援"""
         mock_response = Mock()
@@ -522,7 +522,7 @@ class TestGeminiModel:
         assert rag_response.answer == 'Fallback response'
         mock_fallback.assert_called_once()
     
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_error_handling(self, mock_post, gemini_model):
         """測試錯誤處理"""
         mock_response = Mock()
@@ -551,7 +551,7 @@ class TestGeminiModel:
         assert 'Google Semantic Retrieval API' in system_prompt
         assert '如我們之前討論的' in system_prompt  # 長上下文引用示例
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_transcribe_audio_success(self, mock_post, gemini_model, tmp_path):
         """測試音訊轉錄成功"""
         # 建立一個假的音訊檔案
@@ -587,7 +587,7 @@ class TestGeminiModel:
         assert parts[1]['inline_data']['mime_type'] == 'audio/wav'
         assert parts[1]['inline_data']['data'] == base64.b64encode(audio_content).decode('utf-8')
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_transcribe_audio_api_error(self, mock_post, gemini_model, tmp_path):
         """測試音訊轉錄時 API 回傳錯誤"""
         audio_file = tmp_path / "test.mp3"
@@ -621,7 +621,7 @@ class TestGeminiModel:
             assert is_successful is False
             assert 'Network Error' in error
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_api_error(self, mock_post, gemini_model):
         """Test chat_completion when the API returns a non-200 status."""
         mock_response = Mock()
@@ -662,7 +662,7 @@ class TestGeminiModel:
         assert response is None
         assert ('not support' in error or '不支援' in error)
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_query_with_rag_no_relevant_passages(self, mock_post, gemini_model):
         """Test RAG query when no relevant passages are found."""
         gemini_model.corpora['test_corpus'] = {'name': 'corpora/test_corpus'}
@@ -725,7 +725,7 @@ class TestGeminiModel:
             assert len(chunk1_end_part) > 0
             assert len(chunk2_start_part) > 0
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_upload_knowledge_file_api_error(self, mock_post, gemini_model, tmp_path):
         """Test knowledge file upload when the API returns an error."""
         mock_response = Mock()
@@ -774,7 +774,7 @@ class TestGeminiModel:
             assert text is None
             assert "Encoding failed" in error
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_upload_knowledge_file_success(self, mock_post, gemini_model, tmp_path):
         """Test successful knowledge file upload."""
         mock_response = Mock()
@@ -804,7 +804,7 @@ class TestGeminiModel:
         assert file_info is None
         assert ("not found" in error.lower() or "no such file" in error.lower())
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_query_with_rag_success(self, mock_post, gemini_model):
         """Test successful RAG query with retrieval."""
         gemini_model.corpora['test_corpus'] = {'name': 'corpora/test_corpus'}
@@ -846,7 +846,7 @@ class TestGeminiModel:
         assert len(rag_response.sources) > 0
         assert error is None
 
-    @patch('src.models.gemini_model.requests.post')
+    @patch('requests.Session.post')
     def test_query_with_rag_retrieval_error(self, mock_post, gemini_model):
         """Test RAG query when retrieval fails."""
         gemini_model.corpora['test_corpus'] = {'name': 'corpora/test_corpus'}
@@ -915,7 +915,7 @@ class TestGeminiModel:
 
     def test_request_method_success(self, gemini_model):
         """Test _request method for successful API calls."""
-        with patch('src.models.gemini_model.requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {'success': True}
@@ -929,7 +929,7 @@ class TestGeminiModel:
 
     def test_request_method_failure(self, gemini_model):
         """Test _request method for failed API calls."""
-        with patch('src.models.gemini_model.requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 400
             mock_response.json.return_value = {'error': {'message': 'Bad request'}}
@@ -943,7 +943,7 @@ class TestGeminiModel:
 
     def test_request_method_exception(self, gemini_model):
         """Test _request method when an exception occurs."""
-        with patch('src.models.gemini_model.requests.post', side_effect=Exception("Network error")):
+        with patch('requests.Session.post', side_effect=Exception("Network error")):
             is_successful, response_data, error = gemini_model._request('POST', '/test', {'data': 'test'})
             
             assert is_successful is False
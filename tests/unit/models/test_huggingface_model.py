@@ -42,7 +42,7 @@ class TestHuggingFaceModel:
         provider = hf_model.get_provider()
         assert provider == ModelProvider.HUGGINGFACE
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_check_connection_success(self, mock_post, hf_model):
         """測試連線檢查成功"""
         mock_response = Mock()
@@ -54,7 +54,7 @@ class TestHuggingFaceModel:
         assert is_successful == True
         assert error is None
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_check_connection_failure(self, mock_post, hf_model):
         """測試連線檢查失敗"""
         mock_response = Mock()
@@ -66,7 +66,7 @@ class TestHuggingFaceModel:
         assert is_successful == False
         assert error is not None
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_success(self, mock_post, hf_model):
         """測試聊天完成成功"""
         mock_response = Mock()
@@ -84,7 +84,7 @@ class TestHuggingFaceModel:
         assert response.metadata['provider'] == 'huggingface'
         assert error is None
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_model_loading(self, mock_post, hf_model):
         """測試模型載入中的情況"""
         # 第一次請求返回 503 (模型載入中)
@@ -242,7 +242,7 @@ class TestHuggingFaceModel:
         assert file_info is None
         assert "not found" in error.lower()
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_get_embedding_success(self, mock_post, hf_model):
         """測試成功生成嵌入向量"""
         mock_response = Mock()
@@ -348,7 +348,7 @@ class TestHuggingFaceModel:
         assert is_successful == False
         assert "not found" in error
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_transcribe_audio_success(self, mock_post, hf_model, tmp_path):
         """測試語音轉文字成功"""
         # 創建測試音頻文件
@@ -374,7 +374,7 @@ class TestHuggingFaceModel:
         assert text is None
         assert "not found" in error
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_generate_image_success(self, mock_post, hf_model):
         """測試圖片生成成功"""
         mock_response = Mock()
@@ -388,7 +388,7 @@ class TestHuggingFaceModel:
         assert image_url.startswith("data:image/png;base64,")
         assert error is None
 
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_generate_image_failure(self, mock_post, hf_model):
         """測試圖片生成失敗"""
         mock_response = Mock()
@@ -604,7 +604,7 @@ class TestHuggingFaceModelAdditionalCoverage:
         ]
         return model
     
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_with_fallback(self, mock_post, hf_model_with_fallbacks):
         """測試主模型失敗時使用備用模型"""
         # 第一次請求失敗
@@ -738,7 +738,7 @@ class TestHuggingFaceModelAdditionalCoverage:
         """測試API請求超時處理"""
         payload = {"inputs": "test"}
         
-        with patch('src.models.huggingface_model.requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_post.side_effect = requests.exceptions.Timeout()
             
             result = hf_model._make_request("test-model", payload)
@@ -748,7 +748,7 @@ class TestHuggingFaceModelAdditionalCoverage:
         """測試API請求一般異常處理"""
         payload = {"inputs": "test"}
         
-        with patch('src.models.huggingface_model.requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_post.side_effect = Exception("General error")
             
             result = hf_model._make_request("test-model", payload)
@@ -788,7 +788,7 @@ class TestHuggingFaceModelAdditionalCoverage:
         assert rag_response is None
         assert "No user message" in error
     
-    @patch('src.models.huggingface_model.requests.post')
+    @patch('requests.Session.post')
     def test_generate_image_failure_response(self, mock_post, hf_model):
         """測試圖片生成失敗回應"""
         mock_response = Mock()
@@ -23,7 +23,7 @@ class TestOpenAIModel:
     def test_get_provider(self, openai_model):
         assert openai_model.get_provider() == ModelProvider.OPENAI
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_check_connection_success(self, mock_get, openai_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -35,7 +35,7 @@ class TestOpenAIModel:
         assert is_successful is True
         assert error is None
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_check_connection_failure(self, mock_get, openai_model):
         mock_response = Mock()
         mock_response.status_code = 401
@@ -49,7 +49,7 @@ class TestOpenAIModel:
         assert is_successful is False
         assert 'Invalid API key' in error
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_success(self, mock_post, openai_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -70,7 +70,7 @@ class TestOpenAIModel:
         assert response.finish_reason == 'stop'
         assert error is None
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_create_thread_success(self, mock_post, openai_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -88,7 +88,7 @@ class TestOpenAIModel:
         assert error is None
     
     @patch('builtins.open', create=True)
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_upload_knowledge_file_success(self, mock_post, mock_open, openai_model):
         mock_open.return_value.__enter__.return_value.read.return_value = "test content"
         
@@ -121,7 +121,7 @@ class TestAnthropicModel:
     def test_get_provider(self, anthropic_model):
         assert anthropic_model.get_provider() == ModelProvider.ANTHROPIC
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_chat_completion_success(self, mock_request, anthropic_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -139,7 +139,7 @@ class TestAnthropicModel:
         assert response.content == 'Hello! How can I assist you?'
         assert error is None
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_upload_knowledge_file_success(self, mock_request, anthropic_model):
         # Mock API response
         mock_response = Mock()
@@ -197,7 +197,7 @@ class TestGeminiModel:
     def test_get_provider(self, gemini_model):
         assert gemini_model.get_provider() == ModelProvider.GEMINI
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_success(self, mock_post, gemini_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -230,7 +230,7 @@ class TestOllamaModel:
     def test_get_provider(self, ollama_model):
         assert ollama_model.get_provider() == ModelProvider.OLLAMA
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_check_connection_success(self, mock_get, ollama_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -247,7 +247,7 @@ class TestOllamaModel:
         assert is_successful is True
         assert error is None
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_success(self, mock_post, ollama_model):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -4,6 +4,7 @@ import time
 import sys
 import importlib
 
+from src.core.embedding_cache import EmbeddingCache
 from src.models.ollama_model import OllamaModel
 from src.models.base import FileInfo, RAGResponse, ChatMessage, ChatResponse, ThreadInfo, ModelProvider
 
@@ -31,14 +32,14 @@ class TestOllamaModel:
         assert model.max_cache_size == 1000
         assert isinstance(model.knowledge_store, dict)
         assert isinstance(model.conversation_cache, dict)
-        assert isinstance(model.embeddings_cache, dict)
+        assert isinstance(model.embeddings_cache, EmbeddingCache)
     
     def test_get_provider(self, ollama_model):
         """測試模型提供商識別"""
         provider = ollama_model.get_provider()
         assert provider == ModelProvider.OLLAMA
     
-    @patch('src.models.ollama_model.requests.get')
+    @patch('requests.Session.get')
     def test_check_connection_success(self, mock_get, ollama_model):
         """測試連線檢查成功"""
         mock_response = Mock()
@@ -55,7 +56,7 @@ class TestOllamaModel:
         assert is_successful == True
         assert error is None
     
-    @patch('src.models.ollama_model.requests.get')
+    @patch('requests.Session.get')
     def test_check_connection_model_not_available(self, mock_get, ollama_model):
         """測試模型不可用"""
         mock_response = Mock()
@@ -73,7 +74,7 @@ class TestOllamaModel:
         assert 'llama3.1:8b' in error
         assert 'not available' in error.lower() or '不可用' in error
     
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_chat_completion_success(self, mock_post, ollama_model):
         """測試聊天完成成功"""
         mock_response = Mock()
@@ -292,7 +293,7 @@ class TestOllamaModel:
         ollama_model.knowledge_store['test_file'] = {
             'chunks': [{'text': 'chunk1'}, {'text': 'chunk2'}]
         }
-        ollama_model.embeddings_cache['test_embedding'] = [0.1] * 384
+        ollama_model.embeddings_cache.set(ollama_model.model_name, 'test_embedding', [0.1] * 384)
         
         stats = ollama_model.get_privacy_stats(user_id)
         
@@ -332,7 +333,7 @@ class TestOllamaModel:
         assert "Whisper 套件未安裝" in error
         mock_transcribe.assert_not_called()
     
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_error_handling(self, mock_post, ollama_model):
         """測試錯誤處理"""
         mock_response = Mock()
@@ -391,7 +392,7 @@ class TestOllamaModel:
         assert text is None
         assert "Whisper internal error" in error
 
-    @patch('src.models.ollama_model.requests.get')
+    @patch('requests.Session.get')
     def test_check_connection_exception(self, mock_get, ollama_model):
         """Test check_connection when the API call raises an exception."""
         mock_get.side_effect = Exception("Connection Refused")
@@ -399,7 +400,7 @@ class TestOllamaModel:
         assert is_successful is False
         assert "Connection Refused" in error
 
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_get_embedding_api_error(self, mock_post, ollama_model):
         """Test _get_embedding when the API returns an error."""
         mock_response = Mock()
@@ -415,6 +416,34 @@ class TestOllamaModel:
         results = ollama_model._vector_search([0.1] * 10, top_k=3)
         assert results == []
 
+    @patch('requests.Session.post')
+    def test_upload_knowledge_file_batches_embeddings(self, mock_post, tmp_path):
+        """測試上傳時以 /api/embed 批次請求嵌入向量並回報進度"""
+        model = OllamaModel(embedding_batch_size=2, embedding_concurrency=1)
+
+        def fake_post(url, headers=None, json=None, timeout=None):
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {'embeddings': [[1.0, float(i)] for i in range(len(json['input']))]}
+            return response
+        mock_post.side_effect = fake_post
+
+        file_path = tmp_path / "minutes.txt"
+        file_path.write_text("".join(f"第{i}案討論紀錄。" for i in range(400)))
+        progress = []
+
+        is_successful, file_info, error = model.upload_knowledge_file(
+            str(file_path), progress_callback=lambda done, total: progress.append((done, total))
+        )
+
+        assert is_successful is True
+        chunk_count = file_info.metadata['chunks']
+        assert chunk_count > 2
+        assert all(call.args[0].endswith('/api/embed') for call in mock_post.call_args_list)
+        assert mock_post.call_count == (chunk_count + 1) // 2
+        assert progress[-1] == (chunk_count, chunk_count)
+        assert 'progress_callback' not in model.knowledge_store[file_info.file_id]['metadata']
+
     @patch('src.models.ollama_model.OllamaModel._get_embedding')
     def test_upload_knowledge_file_embedding_fails(self, mock_get_embedding, ollama_model, tmp_path):
         """Test upload_knowledge_file when embedding fails for a chunk."""
@@ -460,7 +489,7 @@ class TestOllamaModel:
             assert response.metadata['no_sources'] is True
             mock_chat.assert_called_once()
 
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_upload_knowledge_file_success(self, mock_post, ollama_model, tmp_path):
         """Test successful knowledge file upload."""
         file_path = tmp_path / "test.txt"
@@ -477,6 +506,29 @@ class TestOllamaModel:
             assert error is None
             assert file_info.file_id in ollama_model.knowledge_store
 
+    def test_upload_knowledge_file_persists_vector_index(self, tmp_path):
+        """Test persisted index is reused by new workers without re-embedding."""
+        index_dir = str(tmp_path / "index")
+        file_path = tmp_path / "test.txt"
+        file_path.write_text("Persisted knowledge content.")
+
+        first = OllamaModel(vector_index_dir=index_dir)
+        with patch.object(first, '_get_embedding', return_value=[1.0, 0.0]) as mock_embedding:
+            is_successful, file_info, error = first.upload_knowledge_file(str(file_path))
+        assert is_successful is True
+        assert mock_embedding.call_count == 1
+
+        second = OllamaModel(vector_index_dir=index_dir)
+        assert file_info.file_id in second.knowledge_store
+        with patch.object(second, '_get_embedding') as mock_embedding:
+            copy_path = tmp_path / "copy.txt"
+            copy_path.write_text("Persisted knowledge content.")
+            second.upload_knowledge_file(str(copy_path))
+        mock_embedding.assert_not_called()
+
+        results = second._vector_search([1.0, 0.0], top_k=5)
+        assert {r['filename'] for r in results} == {'test.txt', 'copy.txt'}
+
     def test_upload_knowledge_file_not_found(self, ollama_model):
         """Test uploading non-existent file."""
         is_successful, file_info, error = ollama_model.upload_knowledge_file("/non/existent/file.txt")
@@ -538,7 +590,7 @@ class TestOllamaModel:
         similarity = ollama_model._cosine_similarity(vec1, vec5)
         assert similarity == 0.0
 
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_get_embedding_success(self, mock_post, ollama_model):
         """Test successful embedding generation."""
         mock_response = Mock()
@@ -568,10 +620,10 @@ class TestOllamaModel:
             embedding = ollama_model._get_embedding("test text")
             assert embedding is None
 
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_request_method_get(self, mock_post, ollama_model):
         """Test _request method with GET."""
-        with patch('src.models.ollama_model.requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {'success': True}
@@ -592,7 +644,7 @@ class TestOllamaModel:
         assert response is None
         assert "Unsupported method" in error
 
-    @patch('src.models.ollama_model.requests.post')
+    @patch('requests.Session.post')
     def test_request_timeout(self, mock_post, ollama_model):
         """Test _request method with timeout."""
         import requests
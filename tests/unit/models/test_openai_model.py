@@ -295,6 +295,229 @@ class TestAssistantExecution:
             assert "Assistant run failed: Run failed" in error
 
 
+def _sse_response(events):
+    """建立回傳 SSE 事件的 mock 串流回應"""
+    lines = []
+    for event, payload in events:
+        lines.append(f"event: {event}")
+        lines.append(f"data: {payload if isinstance(payload, str) else json.dumps(payload)}")
+        lines.append("")
+    response = Mock()
+    response.status_code = 200
+    response.iter_lines.return_value = lines
+    return response
+
+
+class TestAssistantStreaming:
+    """測試以 SSE 串流執行助理"""
+
+    @pytest.fixture
+    def model(self):
+        with patch('src.core.config.get_value', return_value=False):
+            return OpenAIModel("test_key", "test_assistant_123", stream_runs=True)
+
+    @staticmethod
+    def _message(text):
+        return {
+            "id": "msg_1", "object": "thread.message", "role": "assistant",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}]
+        }
+
+    def test_completed_stream_uses_streamed_message(self, model):
+        events = [
+            ("thread.run.created", {"id": "run_1", "status": "queued"}),
+            ("thread.run.in_progress", {"id": "run_1", "status": "in_progress"}),
+            ("thread.message.delta", {"id": "msg_1", "delta": {}}),
+            ("thread.message.completed", self._message("串流回覆")),
+            ("thread.run.completed", {"id": "run_1", "status": "completed"}),
+            ("done", "[DONE]"),
+        ]
+        with patch('requests.Session.post', return_value=_sse_response(events)) as mock_post, \
+             patch.object(model, '_request') as mock_request:
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is True and error is None
+        assert chat_response.content == "串流回覆"
+        assert chat_response.metadata['thread_messages']['data'][0]['id'] == "msg_1"
+        assert mock_post.call_args.kwargs['json']['stream'] is True
+        assert mock_post.call_args.kwargs['stream'] is True
+        mock_request.assert_not_called()
+
+    def test_requires_action_submits_tool_outputs_on_stream(self, model):
+        model.enable_mcp = True
+        model.mcp_service = Mock()
+        model.mcp_service.handle_function_call_sync.return_value = {"success": True, "data": "ok"}
+        required = {
+            "id": "run_1", "status": "requires_action",
+            "required_action": {"submit_tool_outputs": {"tool_calls": [
+                {"id": "call_1", "function": {"name": "search", "arguments": "{\"q\": \"x\"}"}}
+            ]}}
+        }
+        first = _sse_response([("thread.run.created", {"id": "run_1"}), ("thread.run.requires_action", required)])
+        second = _sse_response([
+            ("thread.message.completed", self._message("工具回覆")),
+            ("thread.run.completed", {"id": "run_1", "status": "completed"}),
+        ])
+        with patch('requests.Session.post', side_effect=[first, second]) as mock_post:
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is True and chat_response.content == "工具回覆"
+        submit_url = mock_post.call_args_list[1].args[0]
+        assert submit_url.endswith('/threads/thread_1/runs/run_1/submit_tool_outputs')
+        assert mock_post.call_args_list[1].kwargs['json']['tool_outputs'][0]['tool_call_id'] == "call_1"
+        model.mcp_service.handle_function_call_sync.assert_called_once_with("search", {"q": "x"})
+
+    def test_failed_event_returns_error(self, model):
+        events = [("thread.run.failed", {"id": "run_1", "status": "failed", "last_error": {"message": "boom"}})]
+        with patch('requests.Session.post', return_value=_sse_response(events)):
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is False and chat_response is None
+        assert error == "Assistant run failed: Run failed: boom"
+
+    def test_stream_unavailable_falls_back_to_polling(self, model):
+        with patch('requests.Session.post', side_effect=RequestException("no stream")), \
+             patch.object(model, '_request', return_value=(True, {"id": "run_1", "status": "queued"}, None)), \
+             patch.object(model, '_wait_for_run_completion_async', return_value=(True, {"status": "completed"}, None)), \
+             patch.object(model, '_get_thread_messages', return_value=(True, ChatResponse(content="輪詢回覆"), None)):
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is True and chat_response.content == "輪詢回覆"
+
+    def test_interrupted_stream_polls_existing_run(self, model):
+        events = [("thread.run.created", {"id": "run_1", "status": "queued"})]
+        with patch('requests.Session.post', return_value=_sse_response(events)), \
+             patch.object(model, '_request') as mock_request, \
+             patch.object(model, '_wait_for_run_completion_async',
+                          return_value=(True, {"status": "completed"}, None)) as mock_wait, \
+             patch.object(model, '_get_thread_messages', return_value=(True, ChatResponse(content="輪詢回覆"), None)):
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is True and chat_response.content == "輪詢回覆"
+        mock_wait.assert_called_once_with("thread_1", "run_1")
+        mock_request.assert_not_called()
+
+
+    def test_stream_interrupted_before_run_created_polls_latest_run(self, model):
+        """請求已被接受但 run 事件到達前中斷時，不重新建立 run，改查詢最新 run 並輪詢"""
+        latest = {"object": "list", "data": [{"id": "run_9", "status": "in_progress", "created_at": int(time.time())}]}
+        with patch('requests.Session.post', return_value=_sse_response([])) as mock_post, \
+             patch.object(model, '_request', return_value=(True, latest, None)) as mock_request, \
+             patch.object(model, '_wait_for_run_completion_async',
+                          return_value=(True, {"status": "completed"}, None)) as mock_wait, \
+             patch.object(model, '_get_thread_messages', return_value=(True, ChatResponse(content="輪詢回覆"), None)):
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is True and chat_response.content == "輪詢回覆"
+        mock_post.assert_called_once()
+        assert mock_request.call_args[0] == ('GET', '/threads/thread_1/runs?limit=1&order=desc')
+        mock_wait.assert_called_once_with("thread_1", "run_9")
+
+    def test_stream_interrupted_ignores_previous_run(self, model):
+        """最新的 run 早於本次請求時不沿用，也不重新建立 run"""
+        previous = {"object": "list", "data": [{"id": "run_old", "status": "completed", "created_at": 1}]}
+        with patch('requests.Session.post', return_value=_sse_response([])) as mock_post, \
+             patch.object(model, '_request', return_value=(True, previous, None)) as mock_request:
+            success, chat_response, error = model.run_assistant("thread_1")
+
+        assert success is False and "interrupted" in error
+        mock_post.assert_called_once()
+        mock_request.assert_called_once()
+
+    def test_combined_run_interrupted_after_thread_created(self, model):
+        """合併路徑在 run 事件前中斷時，不再建立第二個對話串"""
+        on_created = Mock()
+        events = [("thread.created", {"id": "thread_new", "object": "thread"})]
+        latest = {"object": "list", "data": [{"id": "run_1", "status": "queued", "created_at": int(time.time())}]}
+        with patch('requests.Session.post', return_value=_sse_response(events)) as mock_post, \
+             patch.object(model, '_request', return_value=(True, latest, None)), \
+             patch.object(model, '_wait_for_run_completion_async',
+                          return_value=(True, {"status": "completed"}, None)) as mock_wait, \
+             patch.object(model, '_get_thread_messages', return_value=(True, ChatResponse(content="回覆"), None)):
+            success, chat_response, error = model.create_thread_and_run(
+                ChatMessage(role='user', content="你好"), on_thread_created=on_created
+            )
+
+        assert success is True and chat_response.metadata['thread_id'] == "thread_new"
+        mock_post.assert_called_once()
+        on_created.assert_called_once_with("thread_new")
+        mock_wait.assert_called_once_with("thread_new", "run_1")
+
+class TestCombinedRuns:
+    """測試合併建立對話串與執行的快速路徑"""
+
+    @pytest.fixture
+    def model(self):
+        with patch('src.core.config.get_value', return_value=False):
+            return OpenAIModel("test_key", "test_assistant_123", combined_runs=True)
+
+    def test_create_thread_and_run_single_request(self, model):
+        on_created = Mock()
+        with patch.object(model, '_request', return_value=(True, {"id": "run_1", "thread_id": "thread_new", "status": "queued"}, None)) as mock_request, \
+             patch.object(model, '_wait_for_run_completion_async', return_value=(True, {"status": "completed"}, None)), \
+             patch.object(model, '_get_thread_messages', return_value=(True, ChatResponse(content="回覆"), None)) as mock_messages:
+            success, chat_response, error = model.create_thread_and_run(
+                ChatMessage(role='user', content="你好"), on_thread_created=on_created
+            )
+
+        assert success is True
+        assert chat_response.metadata['thread_id'] == "thread_new"
+        method, endpoint = mock_request.call_args[0]
+        body = mock_request.call_args[1]['body']
+        assert (method, endpoint) == ('POST', '/threads/runs')
+        assert body['thread']['messages'] == [{'role': 'user', 'content': "你好"}]
+        on_created.assert_called_once_with("thread_new")
+        mock_messages.assert_called_once_with("thread_new", "run_1")
+
+    def test_run_assistant_with_additional_messages(self, model):
+        with patch.object(model, '_request', return_value=(True, {"id": "run_1", "status": "queued"}, None)) as mock_request, \
+             patch.object(model, '_wait_for_run_completion_async', return_value=(True, {"status": "completed"}, None)), \
+             patch.object(model, '_get_thread_messages', return_value=(True, ChatResponse(content="回覆"), None)):
+            success, _, _ = model.run_assistant("thread_1", additional_messages=[ChatMessage(role='user', content="問題")])
+
+        assert success is True
+        assert mock_request.call_args[0][1] == '/threads/thread_1/runs'
+        assert mock_request.call_args[1]['body']['additional_messages'] == [{'role': 'user', 'content': "問題"}]
+
+    def test_get_thread_messages_fetches_latest_for_run(self, model):
+        with patch.object(model, '_request', return_value=(True, {"data": []}, None)) as mock_request:
+            model._get_thread_messages("thread_1", "run_1")
+
+        assert mock_request.call_args[0][1] == '/threads/thread_1/messages?limit=1&order=desc&run_id=run_1'
+
+    def test_chat_with_user_new_user_saves_thread(self, model):
+        def fake_create(message, on_thread_created=None, **kwargs):
+            on_thread_created("thread_new")
+            return True, ChatResponse(content="歡迎", metadata={'thread_id': "thread_new"}), None
+
+        with patch('src.database.connection.get_thread_id_by_user_id', return_value=None), \
+             patch('src.database.connection.save_thread_id') as mock_save, \
+             patch.object(model, 'create_thread_and_run', side_effect=fake_create), \
+             patch.object(model, 'create_thread') as mock_create_thread, \
+             patch.object(model, 'add_message_to_thread') as mock_add, \
+             patch.object(model, '_process_openai_response', return_value=("歡迎", [])):
+            success, rag_response, error = model.chat_with_user("user_1", "你好", "line")
+
+        assert success is True
+        assert rag_response.metadata['thread_id'] == "thread_new"
+        mock_save.assert_called_once_with("user_1", "thread_new", "line")
+        mock_create_thread.assert_not_called()
+        mock_add.assert_not_called()
+
+    def test_chat_with_user_existing_thread_sends_message_with_run(self, model):
+        with patch('src.database.connection.get_thread_id_by_user_id', return_value="thread_1"), \
+             patch.object(model, 'run_assistant',
+                          return_value=(True, ChatResponse(content="回覆", metadata={'thread_id': "thread_1"}), None)) as mock_run, \
+             patch.object(model, 'add_message_to_thread') as mock_add, \
+             patch.object(model, '_process_openai_response', return_value=("回覆", [])):
+            success, rag_response, _ = model.chat_with_user("user_1", "再問一題", "line")
+
+        assert success is True and rag_response.metadata['thread_id'] == "thread_1"
+        messages = mock_run.call_args[1]['additional_messages']
+        assert [m.content for m in messages] == ["再問一題"]
+        mock_add.assert_not_called()
+
+
 class TestFileOperations:
     """測試檔案操作"""
     
@@ -865,7 +1088,7 @@ class TestInternalMethods:
     
     def test_request_get_method(self, model):
         """測試 GET 請求"""
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {"data": "test"}
@@ -885,7 +1108,7 @@ class TestInternalMethods:
     
     def test_request_post_method(self, model):
         """測試 POST 請求"""
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {"success": True}
@@ -899,7 +1122,7 @@ class TestInternalMethods:
     
     def test_request_delete_method(self, model):
         """測試 DELETE 請求"""
-        with patch('requests.delete') as mock_delete:
+        with patch('requests.Session.delete') as mock_delete:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {"deleted": True}
@@ -912,7 +1135,7 @@ class TestInternalMethods:
     
     def test_request_rate_limit_error(self, model):
         """測試速率限制錯誤"""
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 429
             mock_response.json.return_value = {"error": {"message": "Rate limit exceeded"}}
@@ -927,7 +1150,7 @@ class TestInternalMethods:
     
     def test_request_server_error(self, model):
         """測試服務器錯誤"""
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 500
             mock_response.json.return_value = {"error": {"message": "Server error"}}
@@ -942,7 +1165,7 @@ class TestInternalMethods:
     
     def test_request_client_error(self, model):
         """測試客戶端錯誤"""
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 400
             mock_response.json.return_value = {
@@ -958,7 +1181,7 @@ class TestInternalMethods:
     
     def test_request_client_error_no_json(self, model):
         """測試客戶端錯誤無 JSON 格式"""
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 400
             mock_response.json.side_effect = ValueError("Invalid JSON")
@@ -972,7 +1195,7 @@ class TestInternalMethods:
     
     def test_request_network_exception(self, model):
         """測試網路異常"""
-        with patch('requests.post', side_effect=RequestException("Network error")):
+        with patch('requests.Session.post', side_effect=RequestException("Network error")):
             # 由於重試裝飾器的存在，異常會被捕獲並轉為返回值
             success, data, error = model._request('POST', '/test')
             
@@ -982,7 +1205,7 @@ class TestInternalMethods:
     
     def test_request_general_exception(self, model):
         """測試一般異常"""
-        with patch('requests.post', side_effect=Exception("General error")):
+        with patch('requests.Session.post', side_effect=Exception("General error")):
             success, data, error = model._request('POST', '/test')
             
             assert success is False
@@ -1340,7 +1563,7 @@ class TestEdgeCases:
     def test_malformed_response_handling(self, model):
         """測試格式錯誤的回應處理"""
         # 模擬無效的 JSON 回應
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.side_effect = ValueError("Invalid JSON")
@@ -1449,7 +1672,7 @@ class TestOpenAIAsyncWaitMethods:
                 success, response, error = await model._wait_for_run_completion_async("test_thread", "test_run")
                 assert success is True
                 assert len(sleep_calls) > 0
-                assert sleep_calls[0] == 5  # 第一次等待 5 秒
+                assert sleep_calls[0] == 7.5  # 尚無觀測資料時沿用固定序列：排隊狀態 5 * 1.5 秒
 
     @pytest.mark.asyncio
     async def test_async_error_handling(self, model):
@@ -1864,6 +2087,26 @@ class TestOpenAIModelMCPIntegration:
         # Test MCP service enabled check
         assert mcp_model.mcp_service.is_enabled == True
 
+    def test_multiple_tool_calls_dispatched_together_in_order(self, mcp_model):
+        """測試多個 tool calls 一次並行分派，tool outputs 保持原順序"""
+        mcp_model.mcp_service.handle_function_calls_sync.return_value = [
+            {"success": True, "data": "議員"}, {"success": True, "data": "提案"}
+        ]
+        tool_calls = [
+            {"id": "call_1", "function": {"name": "councillor", "arguments": "{\"name\": \"A\"}"}},
+            {"id": "call_2", "function": {"name": "broken", "arguments": "not json"}},
+            {"id": "call_3", "function": {"name": "motion", "arguments": "{\"q\": \"B\"}"}},
+        ]
+
+        outputs = mcp_model._collect_mcp_tool_outputs("mcp-test", tool_calls)
+
+        mcp_model.mcp_service.handle_function_calls_sync.assert_called_once_with(
+            [("councillor", {"name": "A"}), ("motion", {"q": "B"})]
+        )
+        assert [o["tool_call_id"] for o in outputs] == ["call_1", "call_2", "call_3"]
+        assert "議員" in outputs[0]["output"] and "提案" in outputs[2]["output"]
+        assert "Invalid function arguments format" in outputs[1]["output"]
+
 
 class TestOpenAIModelUnknownSourcesHandling:
     """測試 OpenAI Model 處理 Unknown 來源的功能"""
@@ -1874,7 +2117,7 @@ class TestOpenAIModelUnknownSourcesHandling:
             return OpenAIModel("test_key", "test_assistant")
     
     def test_process_openai_response_with_unknown_sources_retry(self, model):
-        """測試當發現 Unknown 來源時重新撈取檔案清單"""
+        """測試清單中沒有的檔案 ID 以 GET /files/{id} 個別查詢，不重新撈取檔案清單"""
         # 模擬 thread_messages 包含 citations
         thread_messages = {
             'data': [{
@@ -1895,13 +2138,10 @@ class TestOpenAIModelUnknownSourcesHandling:
             }]
         }
         
-        # 第一次 get_file_references 返回空字典（模擬找不到檔案）
-        # 第二次 get_file_references 返回包含檔案的字典（模擬重新撈取成功）
-        with patch.object(model, 'get_file_references') as mock_get_file_refs:
-            mock_get_file_refs.side_effect = [
-                {},  # 第一次呼叫：空字典，會產生 Unknown 來源
-                {'file_123': '測試檔案'}  # 第二次呼叫：找到檔案
-            ]
+        # 檔案清單中沒有 file_123，個別查詢可找到
+        with patch.object(model, 'get_file_references', return_value={'file_other': '其他檔案'}) as mock_get_file_refs, \
+             patch.object(model, 'retrieve_file',
+                          return_value=(True, FileInfo(file_id='file_123', filename='測試檔案.txt'), None)) as mock_retrieve:
             
             # 執行測試
             final_text, sources = model._process_openai_response(thread_messages)
@@ -1913,8 +2153,9 @@ class TestOpenAIModelUnknownSourcesHandling:
             assert sources[0]['file_id'] == 'file_123'
             assert sources[0]['quote'] == '測試引用'
             
-            # 驗證 get_file_references 被呼叫兩次
-            assert mock_get_file_refs.call_count == 2
+            # 驗證只列出檔案一次，未知 ID 個別查詢
+            assert mock_get_file_refs.call_count == 1
+            mock_retrieve.assert_called_once_with('file_123')
     
     def test_process_openai_response_with_unknown_sources_still_unknown(self, model):
         """測試當重新撈取後仍然是 Unknown 來源的情況"""
@@ -1938,15 +2179,14 @@ class TestOpenAIModelUnknownSourcesHandling:
             }]
         }
         
-        # 兩次 get_file_references 都返回空字典（模擬檔案始終找不到）
-        with patch.object(model, 'get_file_references') as mock_get_file_refs:
-            mock_get_file_refs.side_effect = [
-                {},  # 第一次呼叫：空字典
-                {}   # 第二次呼叫：仍然是空字典
-            ]
+        # 檔案清單與個別查詢都找不到
+        with patch.object(model, 'get_file_references', return_value={}) as mock_get_file_refs, \
+             patch.object(model, 'retrieve_file', return_value=(False, None, "No such File object")) as mock_retrieve:
             
             # 執行測試
             final_text, sources = model._process_openai_response(thread_messages)
+            # 查不到的 ID 短時間內不再重查
+            model._process_openai_response(thread_messages)
             
             # 驗證結果
             assert final_text == '這是一個測試回應[1]'
@@ -1954,8 +2194,8 @@ class TestOpenAIModelUnknownSourcesHandling:
             assert sources[0]['filename'] == 'Unknown'  # 仍然是 Unknown
             assert sources[0]['file_id'] == 'file_unknown'
             
-            # 驗證 get_file_references 被呼叫兩次
-            assert mock_get_file_refs.call_count == 2
+            assert mock_get_file_refs.call_count == 1
+            mock_retrieve.assert_called_once_with('file_unknown')
     
     def test_process_openai_response_no_unknown_sources(self, model):
         """測試當沒有 Unknown 來源時不會重新撈取"""
@@ -1980,11 +2220,14 @@ class TestOpenAIModelUnknownSourcesHandling:
         }
         
         # 第一次 get_file_references 就返回正確的檔案清單
-        with patch.object(model, 'get_file_references') as mock_get_file_refs:
+        with patch.object(model, 'get_file_references') as mock_get_file_refs, \
+             patch.object(model, 'retrieve_file') as mock_retrieve:
             mock_get_file_refs.return_value = {'file_123': '測試檔案'}
             
             # 執行測試
             final_text, sources = model._process_openai_response(thread_messages)
+            # 第二次回覆使用快取
+            model._process_openai_response(thread_messages)
             
             # 驗證結果
             assert final_text == '這是一個測試回應[1]'
@@ -1994,6 +2237,7 @@ class TestOpenAIModelUnknownSourcesHandling:
             
             # 驗證 get_file_references 只被呼叫一次（沒有重新撈取）
             assert mock_get_file_refs.call_count == 1
+            mock_retrieve.assert_not_called()
 
 
 if __name__ == "__main__":
@@ -655,4 +655,99 @@ class TestDiscordHandler:
         messages = handler.handle_webhook("test_body", {})
         
         # 即使有異常，也應該返回空列表
-        assert messages == []
\ No newline at end of file
+        assert messages == []
+
+@patch('src.platforms.discord_handler.DISCORD_AVAILABLE', True)
+class TestDiscordPushConsumer:
+    """測試 gateway 推送訊息、並行上限與單一 gateway 連線"""
+    
+    def _create_handler(self, tmp_path, **options):
+        config = {
+            'platforms': {
+                'discord': {
+                    'enabled': True,
+                    'bot_token': 'test_discord_token',
+                    'gateway_lock_path': str(tmp_path / 'gateway.lock'),
+                    **options
+                }
+            }
+        }
+        handler = DiscordHandler(config)
+        handler.bot = Mock()
+        return handler
+    
+    def test_dispatch_pushes_message_to_consumer(self, tmp_path):
+        handler = self._create_handler(tmp_path)
+        parsed = PlatformMessage(
+            message_id='1',
+            user=PlatformUser(user_id='u1', platform=PlatformType.DISCORD),
+            content='hello'
+        )
+        consumer = Mock()
+        
+        with patch.object(handler, '_start_bot'):
+            handler.start_consumer(consumer)
+        with patch.object(handler, '_parse_message_async', AsyncMock(return_value=parsed)):
+            asyncio.run(handler._dispatch_message(Mock()))
+        
+        consumer.assert_called_once_with(parsed)
+        assert handler.get_stats()['dispatched'] == 1
+        handler.stop_bot()
+    
+    def test_dispatch_respects_concurrency_limit(self, tmp_path):
+        import threading
+        import time
+        
+        handler = self._create_handler(tmp_path, max_concurrent_messages=2)
+        lock = threading.Lock()
+        active = []
+        peak = []
+        
+        def consumer(message):
+            with lock:
+                active.append(message)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(message)
+        
+        async def dispatch_all():
+            await asyncio.gather(*(handler._dispatch_message(Mock()) for _ in range(6)))
+        
+        with patch.object(handler, '_start_bot'):
+            handler.start_consumer(consumer)
+        with patch.object(handler, '_parse_message_async', AsyncMock(side_effect=lambda m: m)):
+            asyncio.run(dispatch_all())
+        
+        assert len(peak) == 6
+        assert max(peak) == 2
+        handler.stop_bot()
+    
+    def test_only_one_worker_holds_gateway(self, tmp_path):
+        owner = self._create_handler(tmp_path)
+        standby = self._create_handler(tmp_path)
+        
+        with patch.object(owner, '_start_bot') as owner_start, \
+                patch.object(standby, '_start_bot') as standby_start, \
+                patch.object(standby, '_start_standby') as standby_wait:
+            assert owner.start_gateway() is True
+            assert standby.start_gateway() is False
+        
+        owner_start.assert_called_once()
+        standby_start.assert_not_called()
+        standby_wait.assert_called_once()
+        
+        # 持有者釋放後，待命的 worker 可以接手
+        owner.stop_bot()
+        assert standby._acquire_gateway_lock() is True
+        standby.stop_bot()
+    
+    def test_gateway_deferred_until_fork(self, tmp_path, monkeypatch):
+        handler = self._create_handler(tmp_path)
+        monkeypatch.setenv('DEFER_PLATFORM_GATEWAYS', 'true')
+        
+        with patch.object(handler, '_start_bot') as mock_start:
+            assert handler.start_gateway() is False
+        
+        mock_start.assert_not_called()
+        assert handler.get_stats()['gateway_owner'] is False
@@ -158,14 +158,16 @@ class TestInstagramHandler:
             }]
         }
         
-        with patch.object(instagram_handler, '_download_media', return_value=b'fake_audio_data'):
+        with patch.object(instagram_handler, '_stream_media', side_effect=lambda source, sink: sink.write(b'fake_audio_data')):
             message = instagram_handler.parse_message(webhook_event)
+            # 音訊於背景預取，讀取時等待下載完成
+            audio_data = message.raw_data.read()
         
         assert message is not None
         assert message.message_id == 'mid.AUDIO123'
         assert '[Audio Message' in message.content
         assert message.message_type == 'audio'
-        assert message.raw_data == b'fake_audio_data'
+        assert audio_data == b'fake_audio_data'
     
     def test_parse_image_message(self, instagram_handler):
         """測試解析圖片訊息"""
@@ -3,7 +3,10 @@
 """
 import pytest
 import json
+import time
 from unittest.mock import Mock, patch, MagicMock
+from linebot.v3.messaging import ApiException
+from src.core.exceptions import DeliveryError
 from src.platforms.line_handler import LineHandler
 from src.platforms.base import PlatformType, PlatformMessage, PlatformResponse, PlatformUser
 
@@ -154,13 +157,17 @@ class TestLineHandlerMessageParsing:
             mock_api_client.return_value.__enter__ = Mock(return_value=mock_api_client.return_value)
             mock_api_client.return_value.__exit__ = Mock(return_value=None)
             
-            mock_blob_api.return_value.get_message_content.return_value = b'audio_data'
+            mock_raw = Mock()
+            mock_raw.stream.return_value = [b'audio_', b'data']
+            mock_blob_api.return_value.get_message_content_with_http_info.return_value = Mock(raw_data=mock_raw)
             
             result = handler.parse_message(mock_event)
             
             assert result is not None
             assert result.message_type == 'audio'
-            assert result.raw_data == b'audio_data'
+            # 音訊以串流方式於背景下載
+            assert result.raw_data.read() == b'audio_data'
+            mock_raw.release_conn.assert_called_once()
             assert result.content == '[Audio Message]'
     
     def test_parse_unsupported_message(self, handler):
@@ -325,4 +332,129 @@ class TestLineHandlerResponse:
         
         result = handler.send_response(response, message)
         
-        assert result is False
\ No newline at end of file
+        assert result is False
+    
+    def _message(self, timestamp=None, source=None):
+        event = Mock()
+        event.timestamp = timestamp
+        if source is not None:
+            event.source = source
+        return PlatformMessage(
+            message_id='msg_1',
+            user=PlatformUser(user_id='test_user_123', platform=PlatformType.LINE),
+            content='Hi',
+            reply_token='reply_token_123',
+            metadata={'line_event': event}
+        )
+    
+    def _send(self, handler, message, reply_side_effect=None):
+        with patch('src.platforms.line_handler.ApiClient') as mock_api_client, \
+             patch('src.platforms.line_handler.MessagingApi') as mock_messaging_api:
+            mock_api_client.return_value.__enter__ = Mock(return_value=mock_api_client.return_value)
+            mock_api_client.return_value.__exit__ = Mock(return_value=None)
+            api = mock_messaging_api.return_value
+            api.reply_message_with_http_info.side_effect = reply_side_effect
+            result = handler.send_response(PlatformResponse(content='Hello back!'), message)
+        return result, api
+    
+    def test_expired_reply_token_uses_push(self, handler):
+        """模型思考過久，reply_token 逾時時改用 push message"""
+        message = self._message(timestamp=int((time.time() - 120) * 1000))
+        
+        result, api = self._send(handler, message)
+        
+        assert result is True
+        api.reply_message_with_http_info.assert_not_called()
+        push_request = api.push_message_with_http_info.call_args[0][0]
+        assert push_request.to == 'test_user_123'
+    
+    def test_rejected_reply_token_falls_back_to_push(self, handler):
+        """LINE 拒絕 reply_token 時改用 push message"""
+        error = ApiException(status=400, reason='Bad Request')
+        error.body = '{"message":"Invalid reply token"}'
+        
+        result, api = self._send(handler, self._message(), reply_side_effect=error)
+        
+        assert result is True
+        api.push_message_with_http_info.assert_called_once()
+    
+    def test_push_fallback_disabled(self, handler):
+        """停用 push fallback 時不會發送 push message"""
+        handler.push_fallback = False
+        error = ApiException(status=400, reason='Bad Request')
+        error.body = '{"message":"Invalid reply token"}'
+        
+        result, api = self._send(handler, self._message(), reply_side_effect=error)
+        
+        assert result is False
+        api.push_message_with_http_info.assert_not_called()
+    
+    def test_rate_limited_raises_delivery_error(self, handler):
+        """429 交由發送排程重試"""
+        error = ApiException(status=429, reason='Too Many Requests')
+        error.headers = {'Retry-After': '2'}
+        
+        with pytest.raises(DeliveryError) as exc_info:
+            self._send(handler, self._message(), reply_side_effect=error)
+        
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after == 2.0
+    
+    def test_group_message_pushes_to_group(self, handler):
+        """群組中的訊息逾時後推送回原群組，而非用戶的一對一聊天"""
+        source = Mock(type='group', group_id='group_123', user_id='test_user_123')
+        message = self._message(timestamp=int((time.time() - 120) * 1000), source=source)
+        
+        result, api = self._send(handler, message)
+        
+        assert result is True
+        push_request = api.push_message_with_http_info.call_args[0][0]
+        assert push_request.to == 'group_123'
+    
+    def test_retry_after_server_error_does_not_push_duplicate(self, handler):
+        """5xx 後重試時 reply_token 被拒，前次回覆可能已送達，不再補發 push"""
+        message = self._message()
+        server_error = ApiException(status=500, reason='Internal Server Error')
+        with pytest.raises(DeliveryError):
+            self._send(handler, message, reply_side_effect=server_error)
+        
+        rejected = ApiException(status=400, reason='Bad Request')
+        rejected.body = '{"message":"Invalid reply token"}'
+        result, api = self._send(handler, message, reply_side_effect=rejected)
+        
+        assert result is False
+        api.push_message_with_http_info.assert_not_called()
+    
+    def test_retry_after_rate_limit_still_pushes(self, handler):
+        """429 時回覆未送達，重試時 reply_token 被拒仍改用 push"""
+        message = self._message()
+        rate_limited = ApiException(status=429, reason='Too Many Requests')
+        with pytest.raises(DeliveryError):
+            self._send(handler, message, reply_side_effect=rate_limited)
+        
+        rejected = ApiException(status=400, reason='Bad Request')
+        rejected.body = '{"message":"Invalid reply token"}'
+        result, api = self._send(handler, message, reply_side_effect=rejected)
+        
+        assert result is True
+        api.push_message_with_http_info.assert_called_once()
+    
+    def test_push_retry_reuses_retry_key(self, handler):
+        """push 重試時沿用同一個 retry key，LINE 回應 409 視為已送出"""
+        message = self._message(timestamp=int((time.time() - 120) * 1000))
+        with patch('src.platforms.line_handler.ApiClient') as mock_api_client, \
+             patch('src.platforms.line_handler.MessagingApi') as mock_messaging_api:
+            mock_api_client.return_value.__enter__ = Mock(return_value=mock_api_client.return_value)
+            mock_api_client.return_value.__exit__ = Mock(return_value=None)
+            api = mock_messaging_api.return_value
+            api.push_message_with_http_info.side_effect = [
+                ApiException(status=503, reason='Service Unavailable'),
+                ApiException(status=409, reason='Conflict'),
+            ]
+            
+            with pytest.raises(DeliveryError):
+                handler.send_response(PlatformResponse(content='Hello back!'), message)
+            assert handler.send_response(PlatformResponse(content='Hello back!'), message) is True
+        
+        retry_keys = [call.kwargs['x_line_retry_key'] for call in api.push_message_with_http_info.call_args_list]
+        assert retry_keys[0] and retry_keys[0] == retry_keys[1]
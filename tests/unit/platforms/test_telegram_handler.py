@@ -356,6 +356,7 @@ class TestTelegramHandler:
         handler = TelegramHandler(self.valid_config)
         
         mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
         mock_bot.send_message = AsyncMock(return_value=Mock())
         handler.bot = mock_bot
         
@@ -369,11 +370,11 @@ class TestTelegramHandler:
         
         response = PlatformResponse(content="Hello back!")
         
-        with patch('asyncio.run') as mock_run:
-            mock_run.return_value = True
-            result = handler.send_response(response, message)
+        result = handler.send_response(response, message)
         
         assert result is True
+        mock_bot.initialize.assert_awaited_once()
+        mock_bot.send_message.assert_awaited_once()
     
     @patch('src.platforms.telegram_handler.TELEGRAM_AVAILABLE', True)
     def test_send_response_no_bot(self):
@@ -421,6 +422,7 @@ class TestTelegramHandler:
         handler = TelegramHandler(self.valid_config)
         
         mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
         mock_bot.send_message = AsyncMock(return_value=Mock())
         handler.bot = mock_bot
         
@@ -436,13 +438,13 @@ class TestTelegramHandler:
         long_content = "A" * 5000
         response = PlatformResponse(content=long_content)
         
-        with patch('asyncio.run') as mock_run:
-            mock_run.return_value = True
-            result = handler.send_response(response, message)
+        result = handler.send_response(response, message)
         
         assert result is True
-        # 應該會被分割成多個部分
-        assert mock_run.call_count >= 1
+        # 應該會被分割成多個部分，依序發送
+        assert mock_bot.send_message.await_count == 2
+        sent = [call.kwargs['text'] for call in mock_bot.send_message.await_args_list]
+        assert sent == ["A" * 4096, "A" * 904]
     
     def test_download_audio_success(self):
         """測試成功下載音訊檔案"""
@@ -517,13 +519,13 @@ class TestTelegramHandler:
         handler = TelegramHandler(self.valid_config)
         
         mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
         mock_bot.set_webhook = AsyncMock(return_value=True)
         handler.bot = mock_bot
         
         webhook_url = "https://example.com/webhook"
         
-        with patch('asyncio.run', return_value=True):
-            result = handler.set_webhook(webhook_url)
+        result = handler.set_webhook(webhook_url)
         
         assert result is True
     
@@ -549,11 +551,11 @@ class TestTelegramHandler:
         handler = TelegramHandler(self.valid_config)
         
         mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
         mock_bot.delete_webhook = AsyncMock(return_value=True)
         handler.bot = mock_bot
         
-        with patch('asyncio.run', return_value=True):
-            result = handler.delete_webhook()
+        result = handler.delete_webhook()
         
         assert result is True
     
@@ -570,11 +572,11 @@ class TestTelegramHandler:
         mock_bot_info.can_join_groups = True
         mock_bot_info.can_read_all_group_messages = False
         mock_bot_info.supports_inline_queries = True
+        mock_bot.initialize = AsyncMock()
         mock_bot.get_me = AsyncMock(return_value=mock_bot_info)
         handler.bot = mock_bot
         
-        with patch('asyncio.run', return_value=mock_bot_info):
-            result = handler.get_bot_info()
+        result = handler.get_bot_info()
         
         # 實際方法返回字典，不是 Mock 對象
         expected_result = {
@@ -780,11 +782,11 @@ class TestTelegramHandler:
         handler = TelegramHandler(self.valid_config)
         
         mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
         mock_bot.delete_webhook = AsyncMock(return_value=True)
         handler.bot = mock_bot
         
-        with patch('asyncio.run', return_value=True):
-            result = handler.delete_webhook()
+        result = handler.delete_webhook()
         
         assert result is True
     
@@ -804,6 +806,7 @@ class TestTelegramHandler:
         handler = TelegramHandler(config_with_secret)
         
         mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
         mock_bot.set_webhook = AsyncMock(return_value=True)
         handler.bot = mock_bot
         
@@ -926,4 +929,84 @@ class TestTelegramUtils:
         
         assert "inline_keyboard" in keyboard_data
         assert len(keyboard_data["inline_keyboard"]) == 2
-        assert keyboard_data["inline_keyboard"][0][0]["text"] == "Button 1"
\ No newline at end of file
+        assert keyboard_data["inline_keyboard"][0][0]["text"] == "Button 1"
+
+class TestTelegramSharedRuntime:
+    """測試 Bot API 呼叫共用背景事件迴圈"""
+    
+    def setup_method(self):
+        self.config = {
+            'platforms': {
+                'telegram': {
+                    'enabled': True,
+                    'bot_token': 'test_telegram_token'
+                }
+            }
+        }
+    
+    def _handler_with_mock_bot(self):
+        handler = TelegramHandler(self.config)
+        mock_bot = Mock()
+        mock_bot.initialize = AsyncMock()
+        mock_bot.get_me = AsyncMock(side_effect=lambda: asyncio.get_running_loop())
+        handler.bot = mock_bot
+        return handler, mock_bot
+    
+    @patch('src.platforms.telegram_handler.TELEGRAM_AVAILABLE', True)
+    def test_calls_reuse_one_loop_and_initialize_once(self):
+        handler, mock_bot = self._handler_with_mock_bot()
+        
+        loops = {handler._run(lambda: handler.bot.get_me()) for _ in range(3)}
+        
+        assert len(loops) == 1
+        mock_bot.initialize.assert_awaited_once()
+    
+    @patch('src.platforms.telegram_handler.TELEGRAM_AVAILABLE', True)
+    def test_initialize_failure_is_retried(self):
+        handler, mock_bot = self._handler_with_mock_bot()
+        mock_bot.initialize.side_effect = [Exception("network down"), None]
+        
+        with pytest.raises(Exception, match="network down"):
+            handler._run(lambda: handler.bot.get_me())
+        handler._run(lambda: handler.bot.get_me())
+        
+        assert mock_bot.initialize.await_count == 2
+    
+    @patch('src.platforms.telegram_handler.TELEGRAM_AVAILABLE', True)
+    def test_rebuilds_bot_when_loop_changes(self):
+        handler, mock_bot = self._handler_with_mock_bot()
+        handler._run(lambda: handler.bot.get_me())
+        
+        # 模擬 fork 後背景迴圈重建：舊迴圈上的連線池不可再使用
+        handler._ready_loop = object()
+        new_bot = Mock()
+        new_bot.initialize = AsyncMock()
+        new_bot.get_me = AsyncMock(return_value='me')
+        
+        def rebuild():
+            handler.bot = new_bot
+        
+        with patch.object(handler, '_setup_bot', side_effect=rebuild) as mock_setup:
+            assert handler._run(lambda: handler.bot.get_me()) == 'me'
+        
+        mock_setup.assert_called_once()
+        new_bot.initialize.assert_awaited_once()
+    
+    @patch('src.platforms.telegram_handler.TELEGRAM_AVAILABLE', True)
+    def test_retry_skips_chunks_already_sent(self):
+        handler, mock_bot = self._handler_with_mock_bot()
+        mock_bot.send_message = AsyncMock(side_effect=[Mock(), Exception("flood"), Mock()])
+        message = PlatformMessage(
+            message_id="100",
+            user=PlatformUser(user_id="1", platform=PlatformType.TELEGRAM),
+            content="Hi",
+            metadata={'chat_id': 42}
+        )
+        response = PlatformResponse(content="A" * 4096 + "B" * 10)
+        
+        assert handler.send_response(response, message) is False
+        assert handler.send_response(response, message) is True
+        
+        sent = [call.kwargs['text'] for call in mock_bot.send_message.await_args_list]
+        assert sent == ["A" * 4096, "B" * 10, "B" * 10]
+        assert message.metadata['telegram_sent_chunks'] == 2
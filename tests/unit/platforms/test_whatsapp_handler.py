@@ -1,6 +1,7 @@
 import pytest
 import json
 from unittest.mock import Mock, patch, MagicMock
+from src.core.exceptions import DeliveryError
 from src.platforms.whatsapp_handler import WhatsAppHandler
 from src.platforms.base import PlatformType, PlatformUser, PlatformMessage, PlatformResponse
 
@@ -160,14 +161,16 @@ class TestWhatsAppHandler:
             }]
         }
         
-        with patch.object(whatsapp_handler, '_download_media', return_value=b'fake_audio_data'):
+        with patch.object(whatsapp_handler, '_stream_media', side_effect=lambda source, sink: sink.write(b'fake_audio_data')):
             message = whatsapp_handler.parse_message(webhook_event)
+            # 音訊於背景預取，讀取時等待下載完成
+            audio_data = message.raw_data.read()
         
         assert message is not None
         assert message.message_id == 'wamid.AUDIO123'
         assert message.content == '[Audio Message]'
         assert message.message_type == 'audio'
-        assert message.raw_data == b'fake_audio_data'
+        assert audio_data == b'fake_audio_data'
     
     def test_parse_location_message(self, whatsapp_handler):
         """測試解析位置訊息"""
@@ -286,6 +289,25 @@ class TestWhatsAppHandler:
         
         assert result == False
     
+    @pytest.mark.parametrize('status_code, error_code', [(429, None), (503, None), (400, 131056), (400, 130429)])
+    @patch('src.platforms.whatsapp_handler.requests.post')
+    def test_send_text_message_rate_limited(self, mock_post, status_code, error_code, whatsapp_handler):
+        """速率限制與伺服器錯誤拋出 DeliveryError，交由發送排程重試"""
+        mock_response = Mock()
+        mock_response.status_code = status_code
+        mock_response.json.return_value = {'error': {'code': error_code}}
+        mock_response.headers = {'Retry-After': '3'}
+        mock_post.return_value = mock_response
+        
+        user = PlatformUser(user_id='16315555555', platform=PlatformType.WHATSAPP)
+        message = PlatformMessage(message_id='test_msg', user=user, content='Test message')
+        
+        with pytest.raises(DeliveryError) as exc_info:
+            whatsapp_handler.send_response(PlatformResponse(content='Hello back!'), message)
+        
+        assert exc_info.value.status_code == status_code
+        assert exc_info.value.retry_after == 3.0
+    
     def test_handle_webhook_single_message(self, whatsapp_handler):
         """測試處理單一 webhook 訊息"""
         webhook_data = {
@@ -782,13 +804,15 @@ class TestWhatsAppHandler:
             }]
         }
         
-        with patch.object(whatsapp_handler, '_download_media', return_value=None):
+        with patch.object(whatsapp_handler, '_stream_media', side_effect=Exception("Download failed")):
             message = whatsapp_handler.parse_message(webhook_event)
         
-        assert message is not None
-        assert message.message_type == 'audio'
-        assert message.content == '[Audio Message - Download Failed]'
-        assert message.raw_data is None  # 下載失敗，沒有原始數據
+            assert message is not None
+            assert message.message_type == 'audio'
+            assert message.content == '[Audio Message]'
+            # 背景下載失敗時，讀取音訊才拋出例外
+            with pytest.raises(Exception, match="Download failed"):
+                message.raw_data.read()
     
     def test_get_webhook_info_with_custom_config(self):
         """測試取得webhook資訊 - 自定義配置"""
@@ -636,5 +636,49 @@ class TestEdgeCases:
                 mock_handle.assert_called_once_with(user, "Hello", platform_type.value)
 
 
+class TestUserMessageQueueIntegration:
+    """測試 ChatService 與用戶訊息佇列的整合"""
+
+    @pytest.fixture
+    def chat_service(self):
+        mock_model = Mock(spec=FullLLMInterface)
+        mock_model.get_provider.return_value = ModelProvider.OPENAI
+        mock_config = {
+            'commands': {},
+            'user_message_queue': {'enabled': True, 'debounce_window': 0}
+        }
+        return ChatService(mock_model, Mock(spec=Database), mock_config)
+
+    @pytest.fixture
+    def mock_user(self):
+        return PlatformUser(user_id="test_user_123", platform=PlatformType.LINE)
+
+    def test_queue_disabled_by_default(self):
+        mock_model = Mock(spec=FullLLMInterface)
+        service = ChatService(mock_model, Mock(spec=Database), {'commands': {}})
+        assert service.user_message_queue is None
+
+    def test_text_message_goes_through_queue(self, chat_service, mock_user):
+        message = PlatformMessage(message_id="msg_1", user=mock_user, content="Hello")
+        expected = PlatformResponse(content="Hi")
+
+        with patch.object(chat_service, '_handle_text_message', return_value=expected) as mock_handle, \
+             patch.object(chat_service.user_message_queue, 'submit', wraps=chat_service.user_message_queue.submit) as mock_submit:
+            result = chat_service.handle_message(message)
+
+        assert result == expected
+        mock_submit.assert_called_once()
+        mock_handle.assert_called_once_with(mock_user, "Hello", "line")
+
+    def test_command_bypasses_queue(self, chat_service, mock_user):
+        message = PlatformMessage(message_id="msg_2", user=mock_user, content="/reset")
+
+        with patch.object(chat_service, '_handle_text_message', return_value=Mock()), \
+             patch.object(chat_service.user_message_queue, 'submit') as mock_submit:
+            chat_service.handle_message(message)
+
+        mock_submit.assert_not_called()
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
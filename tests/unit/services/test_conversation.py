@@ -52,12 +52,13 @@ class TestORMConversationManager:
         mock_session.add.assert_called_once()
         mock_session.commit.assert_called_once()
     
-    def test_add_message_clears_cache(self, conversation_manager, mock_session):
-        """測試添加訊息會清除快取"""
+    def test_add_message_appends_to_cache(self, conversation_manager, mock_session):
+        """測試添加訊息會附加到快取而非清除"""
         # 預設快取
         cache_key = "test_user:line:anthropic"
         conversation_manager.memory_cache[cache_key] = {
             'conversations': [],
+            'window': 10,
             'timestamp': datetime.now()
         }
         
@@ -69,8 +70,52 @@ class TestORMConversationManager:
             platform="line"
         )
         
-        # 快取應該被清除
-        assert cache_key not in conversation_manager.memory_cache
+        # 快取應該保留並包含新訊息
+        cached = conversation_manager.memory_cache.get(cache_key)
+        assert [item['content'] for item in cached['conversations']] == ["測試訊息"]
+        assert cached['conversations'][0]['role'] == "user"
+    
+    def test_add_message_trims_cached_window(self, conversation_manager, mock_session):
+        """測試快取視窗超過大小時裁切最舊的訊息"""
+        cache_key = "test_user:line:anthropic"
+        conversation_manager.memory_cache[cache_key] = {
+            'conversations': [{'role': 'user', 'content': f'舊訊息{i}', 'created_at': None} for i in range(4)],
+            'window': 4,
+            'complete': True,
+            'timestamp': datetime.now()
+        }
+        
+        conversation_manager.add_message("test_user", "anthropic", "assistant", "新回覆")
+        
+        cached = conversation_manager.memory_cache.get(cache_key)
+        assert [item['content'] for item in cached['conversations']] == ['舊訊息1', '舊訊息2', '舊訊息3', '新回覆']
+        assert cached['complete'] is False
+    
+    def test_larger_limit_than_cached_window_misses(self, conversation_manager, mock_session):
+        """測試要求的數量超過快取視窗（且快取非完整歷史）時重新查詢"""
+        conversation_manager.memory_cache["test_user:line:gemini"] = {
+            'conversations': [{'role': 'user', 'content': 'x', 'created_at': None}] * 4,
+            'window': 4,
+            'complete': False,
+            'timestamp': datetime.now()
+        }
+        mock_session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+        
+        conversation_manager.get_recent_conversations("test_user", "gemini", limit=5)
+        
+        mock_session.query.return_value.filter.return_value.order_by.assert_called_once()
+        assert conversation_manager.get_stats()['cache_by_provider']['gemini']['misses'] == 1
+    
+    def test_write_during_query_does_not_cache_stale_result(self, conversation_manager, mock_session):
+        """測試查詢期間有新訊息寫入時，不以過時結果覆蓋快取"""
+        def query_then_write(*args, **kwargs):
+            conversation_manager._write_generation += 1  # 模擬查詢期間其他執行緒寫入
+            return []
+        mock_session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.side_effect = query_then_write
+        
+        conversation_manager.get_recent_conversations("test_user", "anthropic")
+        
+        assert "test_user:line:anthropic" not in conversation_manager.memory_cache
     
     def test_add_message_failure(self, conversation_manager, mock_session):
         """測試添加訊息失敗"""
@@ -94,7 +139,9 @@ class TestORMConversationManager:
         ]
         conversation_manager.memory_cache[cache_key] = {
             'conversations': cached_conversations,
-            'timestamp': datetime.now()
+            'turns': 1,
+            'timestamp': datetime.now(),
+            'verified_at': datetime.now()
         }
         
         result = conversation_manager.get_recent_conversations(
@@ -104,8 +151,8 @@ class TestORMConversationManager:
         )
         
         assert result == cached_conversations
-        # 不應該查詢資料庫
-        mock_session.query.assert_not_called()
+        # 命中時不開啟資料庫 session
+        conversation_manager.session_factory.assert_not_called()
     
     def test_get_recent_conversations_from_database(self, conversation_manager, mock_session):
         """測試從資料庫取得對話"""
@@ -290,7 +337,7 @@ class TestConversationManagerCache:
             # 設置快取
             manager_with_cache.memory_cache[expected_key] = {"test": "data"}
             
-            # 添加訊息應該清除快取
+            # 格式不符的快取項目會被清除
             manager_with_cache.add_message(
                 user_id=user_id,
                 model_provider=model_provider,
@@ -321,4 +368,164 @@ class TestConversationManagerCache:
         assert cache_data is not None
         assert 'conversations' in cache_data
         assert cache_data['conversations'] == [{'test': 'data'}]
-        assert 'timestamp' in cache_data
\ No newline at end of file
+        assert 'timestamp' in cache_data
+
+class TestConversationCacheConsistency:
+    """快取視窗與資料庫一致性測試（多個 worker 共用同一資料庫）"""
+    
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from src.database.models import Base
+        
+        engine = create_engine(f"sqlite:///{tmp_path / 'conversation.db'}")
+        Base.metadata.create_all(bind=engine)
+        yield sessionmaker(bind=engine)
+        engine.dispose()
+    
+    def _manager(self, session_factory, **kwargs):
+        manager = ORMConversationManager(**kwargs)
+        manager.session_factory = session_factory
+        return manager
+    
+    def test_conversation_loop_reads_hit_cache(self, session_factory):
+        """測試對話迴圈中寫入後的讀取由快取提供，不重新查詢對話內容"""
+        manager = self._manager(session_factory)
+        
+        manager.get_recent_conversations("test_user", "anthropic", limit=5)
+        for turn in range(3):
+            manager.add_message("test_user", "anthropic", "user", f"問題{turn}")
+            history = manager.get_recent_conversations("test_user", "anthropic", limit=5)
+            manager.add_message("test_user", "anthropic", "assistant", f"回答{turn}")
+        
+        assert [item['content'] for item in history] == ['問題0', '回答0', '問題1', '回答1', '問題2']
+        stats = manager.get_stats()['cache_by_provider']['anthropic']
+        assert stats['hits'] == 3
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 75.0
+    
+    def test_turn_written_by_other_worker_invalidates_cache(self, session_factory):
+        """其他 worker 寫入同一用戶的訊息後，快取視窗不再使用"""
+        worker_a = self._manager(session_factory, cache_stale_after=0)
+        worker_b = self._manager(session_factory)
+        
+        worker_a.add_message("test_user", "gemini", "user", "問題一")
+        worker_a.get_recent_conversations("test_user", "gemini")
+        worker_b.add_message("test_user", "gemini", "assistant", "回答一")
+        
+        history = worker_a.get_recent_conversations("test_user", "gemini")
+        
+        assert [item['content'] for item in history] == ['問題一', '回答一']
+        assert worker_a.get_stats()['cache_by_provider']['gemini']['misses'] == 2
+    
+    def test_cache_hit_issues_no_query(self, session_factory):
+        """確認一致後的短時間內命中快取，不開啟資料庫 session"""
+        manager = self._manager(session_factory)
+        manager.add_message("test_user", "anthropic", "user", "問題")
+        manager.get_recent_conversations("test_user", "anthropic")
+        manager.session_factory = Mock(wraps=session_factory)
+        
+        history = manager.get_recent_conversations("test_user", "anthropic")
+        
+        assert [item['content'] for item in history] == ['問題']
+        manager.session_factory.assert_not_called()
+        assert manager.get_stats()['cache_by_provider']['anthropic']['hits'] == 1
+    
+    def test_stale_cache_is_revalidated_by_count(self, session_factory):
+        """超過 cache_stale_after 後以訊息數確認，一致時沿用快取視窗"""
+        manager = self._manager(session_factory, cache_stale_after=0)
+        manager.add_message("test_user", "gemini", "user", "問題")
+        manager.get_recent_conversations("test_user", "gemini")
+        cached = manager.memory_cache.cache["test_user:line:gemini"]
+        
+        history = manager.get_recent_conversations("test_user", "gemini")
+        
+        assert [item['content'] for item in history] == ['問題']
+        refreshed = manager.memory_cache.cache["test_user:line:gemini"]
+        assert refreshed['conversations'] is cached['conversations']
+        assert refreshed['verified_at'] > cached['verified_at']
+        assert manager.get_stats()['cache_by_provider']['gemini']['misses'] == 2
+    
+    def test_append_does_not_extend_cache_lifetime(self, session_factory):
+        """附加訊息不更新快取時間，持續對話時快取仍於 cache_ttl 後過期"""
+        manager = self._manager(session_factory)
+        manager.get_recent_conversations("test_user", "ollama")
+        cache_key = "test_user:line:ollama"
+        expired = datetime.now() - timedelta(seconds=manager.cache_ttl + 1)
+        manager.memory_cache.cache[cache_key]['timestamp'] = expired
+        
+        manager.add_message("test_user", "ollama", "user", "你好")
+        assert manager.memory_cache.cache[cache_key]['timestamp'] == expired
+        
+        assert [item['content'] for item in manager.get_recent_conversations("test_user", "ollama")] == ['你好']
+        assert manager.get_stats()['cache_by_provider']['ollama']['misses'] == 2
+
+class TestConversationWriteBehind:
+    """批次寫入模式測試"""
+    
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """使用 SQLite 並啟用批次寫入的管理器"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from src.database.models import Base
+        
+        engine = create_engine(f"sqlite:///{tmp_path / 'conversation.db'}")
+        Base.metadata.create_all(bind=engine)
+        
+        manager = ORMConversationManager({'enabled': True, 'max_batch_size': 100, 'flush_interval': 60})
+        manager.session_factory = sessionmaker(bind=engine)
+        yield manager
+        manager.shutdown()
+        engine.dispose()
+    
+    def test_add_message_is_buffered(self, manager):
+        """訊息先進入緩衝，不立即寫入資料庫"""
+        assert manager.add_message("test_user", "anthropic", "user", "你好") is True
+        
+        stats = manager.get_stats()['write_behind']
+        assert stats['pending'] == 1
+        assert stats['flushed_rows'] == 0
+    
+    def test_recent_conversations_include_buffered_turns(self, manager):
+        """讀取最近對話時能看到尚未寫入的訊息（read-your-writes）"""
+        manager.add_message("test_user", "anthropic", "user", "第一則")
+        manager.flush()
+        manager.add_message("test_user", "anthropic", "assistant", "第一則回覆")
+        manager.add_message("other_user", "anthropic", "user", "其他用戶")
+        
+        result = manager.get_recent_conversations("test_user", "anthropic", limit=5)
+        
+        assert [item['content'] for item in result] == ["第一則", "第一則回覆"]
+    
+    def test_flushed_rows_are_not_duplicated(self, manager):
+        """寫入後不會與緩衝重複"""
+        manager.add_message("test_user", "gemini", "user", "問題")
+        pending = manager.write_buffer.get_pending("test_user", "line", "gemini")
+        manager.write_buffer._write(pending)  # 模擬寫入已完成但尚未自緩衝移除
+        
+        result = manager.get_recent_conversations("test_user", "gemini")
+        
+        assert [item['content'] for item in result] == ["問題"]
+    
+    def test_clear_user_history_flushes_buffer_first(self, manager):
+        """清除歷史會先寫入緩衝，避免舊訊息在清除後才寫入"""
+        manager.add_message("test_user", "ollama", "user", "舊訊息")
+        
+        assert manager.clear_user_history("test_user", "ollama") is True
+        manager.flush()
+        
+        assert manager.get_conversation_count("test_user", "ollama") == 0
+        assert manager.get_recent_conversations("test_user", "ollama") == []
+
+    def test_buffered_turns_keep_cache_valid(self, manager):
+        """緩衝中的訊息計入訊息數，本 worker 的寫入不會使快取失效"""
+        manager.add_message("test_user", "anthropic", "user", "問題")
+        manager.get_recent_conversations("test_user", "anthropic")
+        manager.add_message("test_user", "anthropic", "assistant", "回答")
+        
+        history = manager.get_recent_conversations("test_user", "anthropic")
+        
+        assert [item['content'] for item in history] == ["問題", "回答"]
+        assert manager.get_stats()['cache_by_provider']['anthropic']['hits'] == 1
@@ -0,0 +1,93 @@
+"""
+測試對話歷史批次寫入緩衝的單元測試
+"""
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Base, SimpleConversationHistory
+from src.services.conversation_buffer import ConversationWriteBuffer
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'buffer.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _count(session_factory):
+    with session_factory() as session:
+        return session.query(SimpleConversationHistory).count()
+
+
+class TestConversationWriteBuffer:
+    """測試 ConversationWriteBuffer 的寫入行為"""
+
+    def test_flush_on_batch_size(self, session_factory):
+        buffer = ConversationWriteBuffer(session_factory, max_batch_size=3, flush_interval=10)
+        for i in range(3):
+            buffer.add('U1', 'line', 'anthropic', 'user', f'message {i}')
+
+        deadline = time.monotonic() + 2
+        while _count(session_factory) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert _count(session_factory) == 3
+        stats = buffer.get_stats()
+        assert stats['flush_batches'] == 1
+        assert stats['pending'] == 0
+        buffer.shutdown()
+
+    def test_flush_on_interval(self, session_factory):
+        buffer = ConversationWriteBuffer(session_factory, max_batch_size=100, flush_interval=0.05)
+        buffer.add('U1', 'line', 'gemini', 'user', 'hello')
+
+        assert buffer.get_pending('U1', 'line', 'gemini')[0]['content'] == 'hello'
+        deadline = time.monotonic() + 2
+        while _count(session_factory) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert _count(session_factory) == 1
+        assert buffer.get_pending('U1', 'line', 'gemini') == []
+        buffer.shutdown()
+
+    def test_shutdown_flushes_remaining_rows_and_writes_through_afterwards(self, session_factory):
+        buffer = ConversationWriteBuffer(session_factory, max_batch_size=100, flush_interval=10)
+        buffer.add('U1', 'line', 'ollama', 'user', 'q')
+        buffer.add('U1', 'line', 'ollama', 'assistant', 'a')
+
+        buffer.shutdown()
+        assert _count(session_factory) == 2
+
+        buffer.add('U1', 'line', 'ollama', 'user', 'late')
+        assert _count(session_factory) == 3
+
+        with session_factory() as session:
+            rows = session.query(SimpleConversationHistory).order_by(SimpleConversationHistory.created_at).all()
+        assert [row.content for row in rows] == ['q', 'a', 'late']
+
+    def test_failed_flush_keeps_rows_pending(self):
+        session = Mock()
+        session.execute.side_effect = RuntimeError('db down')
+        factory = Mock()
+        factory.return_value.__enter__ = Mock(return_value=session)
+        factory.return_value.__exit__ = Mock(return_value=None)
+
+        buffer = ConversationWriteBuffer(factory, max_batch_size=100, flush_interval=10)
+        buffer.add('U1', 'line', 'anthropic', 'user', 'kept')
+
+        assert buffer.flush() == 0
+        assert len(buffer.get_pending('U1', 'line', 'anthropic')) == 1
+        assert buffer.get_stats()['failed_flushes'] == 1
+
+        session.execute.side_effect = None
+        assert buffer.flush() == 1
+        rows = session.execute.call_args[0][1]
+        assert [row['content'] for row in rows] == ['kept']
+        with patch.object(buffer, '_write'):
+            buffer.shutdown()
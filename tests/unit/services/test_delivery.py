@@ -0,0 +1,138 @@
+"""
+測試回覆發送排程的單元測試
+"""
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.core.exceptions import DeliveryError
+from src.platforms.base import PlatformMessage, PlatformResponse, PlatformType, PlatformUser
+from src.services.delivery import DeliveryScheduler, TokenBucket
+
+
+def _message(user_id='U1', metadata=None):
+    return PlatformMessage(
+        message_id='m1',
+        user=PlatformUser(user_id=user_id, platform=PlatformType.LINE),
+        content='hi',
+        metadata=metadata or {}
+    )
+
+
+@pytest.fixture
+def sleeps():
+    with patch('src.services.delivery.time.sleep') as mock_sleep:
+        yield mock_sleep
+
+
+class TestTokenBucket:
+    """測試 token bucket"""
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=2, burst=2)
+
+        assert bucket.reserve(max_wait=10) == 0
+        assert bucket.reserve(max_wait=10) == 0
+        # 第三次需等待約 0.5 秒補充 token
+        assert bucket.reserve(max_wait=10) == pytest.approx(0.5, abs=0.05)
+
+    def test_reserve_beyond_max_wait_is_rejected(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.reserve(max_wait=0)
+
+        assert bucket.reserve(max_wait=0.1) is None
+        # 被拒絕的預留不會扣除 token
+        assert bucket.reserve(max_wait=1) == pytest.approx(1, abs=0.05)
+
+    def test_refund(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.reserve(max_wait=0)
+        bucket.refund()
+
+        assert bucket.reserve(max_wait=0) == 0
+
+
+class TestDeliveryScheduler:
+    """測試發送排程"""
+
+    def test_successful_delivery_records_latency(self, sleeps):
+        scheduler = DeliveryScheduler()
+        handler = Mock()
+        handler.send_response.return_value = True
+
+        assert scheduler.deliver(PlatformType.LINE, handler, PlatformResponse(content='ok'), _message()) is True
+
+        stats = scheduler.get_stats()['platforms']['line']
+        assert stats['sent'] == 1
+        assert stats['retries'] == 0
+        sleeps.assert_not_called()
+
+    def test_failed_send_is_not_retried(self, sleeps):
+        scheduler = DeliveryScheduler()
+        handler = Mock()
+        handler.send_response.return_value = False
+
+        assert scheduler.deliver(PlatformType.LINE, handler, PlatformResponse(content='ok'), _message()) is False
+
+        handler.send_response.assert_called_once()
+        assert scheduler.get_stats()['platforms']['line']['failed'] == 1
+
+    def test_retries_with_retry_after(self, sleeps):
+        scheduler = DeliveryScheduler(max_retries=3)
+        handler = Mock()
+        handler.send_response.side_effect = [DeliveryError("429", status_code=429, retry_after=2), True]
+
+        assert scheduler.deliver(PlatformType.LINE, handler, PlatformResponse(content='ok'), _message()) is True
+
+        sleeps.assert_called_once_with(2)
+        stats = scheduler.get_stats()['platforms']['line']
+        assert stats['retries'] == 1
+        assert stats['sent'] == 1
+
+    def test_exponential_backoff_without_retry_after(self, sleeps):
+        scheduler = DeliveryScheduler(max_retries=2, base_backoff=1, max_wait=100)
+        handler = Mock()
+        handler.send_response.side_effect = DeliveryError("503", status_code=503)
+
+        assert scheduler.deliver(PlatformType.LINE, handler, PlatformResponse(content='ok'), _message()) is False
+
+        assert handler.send_response.call_count == 3
+        delays = [call.args[0] for call in sleeps.call_args_list]
+        assert 0.5 <= delays[0] <= 1
+        assert 1 <= delays[1] <= 2
+        assert scheduler.get_stats()['platforms']['line']['dropped_retries_exhausted'] == 1
+
+    def test_retry_after_beyond_max_wait_is_dropped(self, sleeps):
+        scheduler = DeliveryScheduler(max_wait=5)
+        handler = Mock()
+        handler.send_response.side_effect = DeliveryError("429", status_code=429, retry_after=60)
+
+        assert scheduler.deliver(PlatformType.LINE, handler, PlatformResponse(content='ok'), _message()) is False
+
+        handler.send_response.assert_called_once()
+        sleeps.assert_not_called()
+
+    def test_recipient_budget_throttles_and_drops(self, sleeps):
+        scheduler = DeliveryScheduler(limits={'whatsapp': {'recipient_rate': 0.1, 'recipient_burst': 1}}, max_wait=15)
+        handler = Mock()
+        handler.send_response.return_value = True
+        response = PlatformResponse(content='ok')
+
+        assert scheduler.deliver(PlatformType.WHATSAPP, handler, response, _message('A')) is True
+        # 同一接收者第二則需等待約 10 秒
+        assert scheduler.deliver(PlatformType.WHATSAPP, handler, response, _message('A')) is True
+        assert sleeps.call_args.args[0] == pytest.approx(10, abs=0.1)
+        # 第三則需等待約 20 秒，超過 max_wait 而放棄
+        assert scheduler.deliver(PlatformType.WHATSAPP, handler, response, _message('A')) is False
+        # 其他接收者不受影響
+        assert scheduler.deliver(PlatformType.WHATSAPP, handler, response, _message('B')) is True
+
+        stats = scheduler.get_stats()['platforms']['whatsapp']
+        assert stats['sent'] == 3
+        assert stats['throttled'] == 1
+        assert stats['dropped_rate_limited'] == 1
+
+    def test_recipient_key_prefers_chat(self):
+        assert DeliveryScheduler.get_recipient_key(_message('U1', {'chat_id': 42})) == '42'
+        assert DeliveryScheduler.get_recipient_key(_message('U1', {'channel_id': 'C1'})) == 'C1'
+        assert DeliveryScheduler.get_recipient_key(_message('U1')) == 'U1'
@@ -325,7 +325,11 @@ class TestMCPService:
         mock_manager = Mock()
         mock_manager.is_mcp_enabled.return_value = True
         mock_manager.get_server_config.return_value = self.mock_config["mcp_server"]
-        mock_manager.load_mcp_config.return_value = self.mock_config
+        mock_manager.get_function_schemas_for_gemini.return_value = [{
+            "name": "test_function",
+            "description": "Test function",
+            "parameters": self.mock_config["functions"][0]["parameters"]
+        }]
         mock_config_manager.return_value = mock_manager
         
         with patch('src.services.mcp_service.MCPClient'):
@@ -827,4 +831,148 @@ class TestMCPServiceAsyncIntegration:
                 assert isinstance(result, dict)
                 assert result["success"] is False
                 assert "error" in result
-                assert "測試錯誤" in result["error"]
\ No newline at end of file
+                assert "測試錯誤" in result["error"]
+
+class TestParallelFunctionCalls:
+    """測試同一步驟多個 function call 的並行分派"""
+
+    def _service(self, max_concurrent_calls=4, call_timeout=60):
+        mock_config_manager = Mock()
+        mock_config_manager.is_mcp_enabled.return_value = False
+        with patch('src.services.mcp_service.MCPConfigManager', return_value=mock_config_manager):
+            service = MCPService()
+        service.is_enabled = True
+        service.max_concurrent_calls = max_concurrent_calls
+        service.call_timeout = call_timeout
+        return service
+
+    def test_calls_run_concurrently_in_order(self):
+        import asyncio
+        import time
+        service = self._service()
+
+        async def slow_call(function_name, arguments):
+            await asyncio.sleep(arguments['delay'])
+            return {"success": True, "data": function_name}
+
+        with patch.object(service, 'handle_function_call_async', side_effect=slow_call):
+            start = time.time()
+            results = service.handle_function_calls_sync([
+                ("councillor", {"delay": 0.3}), ("motion", {"delay": 0.1}), ("meeting", {"delay": 0.2})
+            ])
+
+        assert [r["data"] for r in results] == ["councillor", "motion", "meeting"]
+        assert time.time() - start < 0.55
+
+    def test_concurrency_limit(self):
+        import asyncio
+        service = self._service(max_concurrent_calls=2)
+        active, peak = 0, 0
+
+        async def tracked_call(function_name, arguments):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return {"success": True}
+
+        with patch.object(service, 'handle_function_call_async', side_effect=tracked_call):
+            results = service.handle_function_calls_sync([("f", {})] * 5)
+
+        assert len(results) == 5 and peak == 2
+
+    def test_timeout_returns_error_for_slow_call_only(self):
+        import asyncio
+        service = self._service(call_timeout=0.1)
+
+        async def call(function_name, arguments):
+            if function_name == "slow":
+                await asyncio.sleep(1)
+            return {"success": True}
+
+        with patch.object(service, 'handle_function_call_async', side_effect=call):
+            fast, slow = service.handle_function_calls_sync([("fast", {}), ("slow", {})])
+
+        assert fast["success"] is True
+        assert slow["success"] is False and "timeout" in slow["error"]
+
+    def test_dispatch_single_call_uses_sync_handler(self):
+        from src.services.mcp_service import dispatch_function_calls
+        service = Mock()
+        service.handle_function_call_sync.return_value = {"success": True}
+
+        assert dispatch_function_calls(service, [("f", {"q": 1})]) == [{"success": True}]
+        service.handle_function_call_sync.assert_called_once_with("f", {"q": 1})
+        service.handle_function_calls_sync.assert_not_called()
+        assert dispatch_function_calls(service, []) == []
+
+
+class TestMCPResultCaching:
+    """測試可快取工具的結果快取"""
+
+    def _service(self, tool_config):
+        mock_config_manager = Mock()
+        mock_config_manager.is_mcp_enabled.return_value = True
+        mock_config_manager.get_server_config.return_value = {"base_url": "http://localhost:3000/api/mcp"}
+        mock_config_manager.load_mcp_config.return_value = {"result_cache": {"max_entries": 10}}
+        mock_config_manager.validate_function_arguments.return_value = (True, None)
+        mock_config_manager.get_function_by_name.return_value = {"name": "search", "mcp_tool": "search_motions"}
+        mock_config_manager.get_tool_config.return_value = tool_config
+        with patch('src.services.mcp_service.MCPConfigManager', return_value=mock_config_manager), \
+                patch('src.services.mcp_service.MCPClient') as mock_client:
+            mock_client.return_value.call_tool = AsyncMock(return_value={"success": True, "data": "提案"})
+            service = MCPService()
+        return service
+
+    def test_cacheable_tool_served_from_cache(self):
+        service = self._service({"cacheable": True, "cache_ttl": 60})
+
+        first = service.handle_function_call_sync("search", {"q": "預算", "page": 1})
+        second = service.handle_function_call_sync("search", {"page": 1, "q": "預算"})
+
+        assert first["data"] == second["data"] == "提案"
+        assert service.mcp_client.call_tool.await_count == 1
+        assert service.get_cache_stats()["hits"] == 1
+        assert service.get_service_info()["result_cache"]["entries"] == 1
+
+    def test_non_cacheable_tool_always_called(self):
+        service = self._service({"cache_ttl": 60})
+
+        service.handle_function_call_sync("search", {"q": "預算"})
+        service.handle_function_call_sync("search", {"q": "預算"})
+
+        assert service.mcp_client.call_tool.await_count == 2
+        assert service.get_cache_stats()["misses"] == 0
+
+
+class TestToolDiscoveryCache:
+    """測試 tools/list 分頁結果快取"""
+
+    def _service(self):
+        mock_config_manager = Mock()
+        mock_config_manager.is_mcp_enabled.return_value = True
+        mock_config_manager.get_server_config.return_value = {"base_url": "http://localhost:3000/api/mcp"}
+        mock_config_manager.get_compiled_config.return_value = Mock(version="v1")
+        with patch('src.services.mcp_service.MCPConfigManager', return_value=mock_config_manager), \
+                patch('src.services.mcp_service.MCPClient') as mock_client:
+            mock_client.return_value.list_tools = AsyncMock(side_effect=lambda cursor=None: {
+                None: (True, [{"name": "councillor"}], "page2", None),
+                "page2": (True, [{"name": "motion"}], None, None),
+            }[cursor])
+            service = MCPService()
+        return service
+
+    def test_all_pages_cached_per_config_version(self):
+        import asyncio
+        service = self._service()
+
+        success, tools, error = asyncio.run(service.list_all_tools())
+        assert success is True and [t["name"] for t in tools] == ["councillor", "motion"]
+        asyncio.run(service.list_all_tools())
+        assert service.mcp_client.list_tools.await_count == 2
+
+        # 設定檔內容改變後重新取得
+        service.config_manager.get_compiled_config.return_value = Mock(version="v2")
+        asyncio.run(service.list_all_tools())
+        assert service.mcp_client.list_tools.await_count == 4
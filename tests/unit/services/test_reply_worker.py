@@ -0,0 +1,97 @@
+"""
+測試背景回覆工作池的單元測試
+"""
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from src.services.reply_worker import ReplyWorkerPool
+
+
+class TestReplyWorkerPool:
+    """測試 ReplyWorkerPool 核心功能"""
+
+    def test_submit_runs_job_in_background(self):
+        pool = ReplyWorkerPool(num_workers=2, max_queue_size=10)
+        done = threading.Event()
+        func = Mock(side_effect=lambda *args: done.set())
+
+        assert pool.submit('line', func, 'a', 'b') is True
+        assert done.wait(2)
+        func.assert_called_once_with('a', 'b')
+        pool.shutdown(timeout=2)
+
+    def test_queue_full_rejects_job(self):
+        pool = ReplyWorkerPool(num_workers=1, max_queue_size=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking_job():
+            started.set()
+            release.wait(2)
+
+        assert pool.submit('line', blocking_job) is True
+        assert started.wait(2)
+        assert pool.submit('line', Mock()) is True   # 佔滿佇列
+        assert pool.submit('line', Mock()) is False  # 被拒絕
+
+        stats = pool.get_stats()
+        assert stats['platforms']['line']['rejected'] == 1
+        assert stats['queue_depth'] == 1
+
+        release.set()
+        pool.shutdown(timeout=2)
+
+    def test_failed_job_is_counted_and_worker_survives(self):
+        pool = ReplyWorkerPool(num_workers=1, max_queue_size=10)
+        done = threading.Event()
+
+        pool.submit('telegram', Mock(side_effect=RuntimeError("boom")))
+        pool.submit('telegram', lambda: done.set())
+        assert done.wait(2)
+        pool.shutdown(timeout=2)
+
+        stats = pool.get_stats()['platforms']['telegram']
+        assert stats['failed'] == 1
+        assert stats['processed'] == 1
+        assert stats['submitted'] == 2
+
+    def test_stats_report_wait_time_and_throughput(self):
+        pool = ReplyWorkerPool(num_workers=1, max_queue_size=10)
+        for _ in range(3):
+            pool.submit('line', time.sleep, 0.01)
+        pool.shutdown(timeout=2)
+
+        stats = pool.get_stats()
+        assert stats['workers'] == 1
+        assert stats['queue_depth'] == 0
+        assert stats['platforms']['line']['processed'] == 3
+        assert stats['platforms']['line']['processed_last_minute'] == 3
+        assert stats['wait_time_ms']['max'] >= stats['wait_time_ms']['avg'] >= 0
+
+    def test_shutdown_drains_queue_and_rejects_new_jobs(self):
+        pool = ReplyWorkerPool(num_workers=1, max_queue_size=10)
+        results = []
+        for i in range(5):
+            pool.submit('line', results.append, i)
+
+        pool.shutdown(timeout=2)
+
+        assert results == [0, 1, 2, 3, 4]
+        assert pool.submit('line', results.append, 99) is False
+
+    def test_restarts_threads_after_fork(self, monkeypatch):
+        pool = ReplyWorkerPool(num_workers=1, max_queue_size=10)
+        done = threading.Event()
+        pool.submit('line', lambda: None)
+        first_threads = list(pool._threads)
+
+        # 模擬 gunicorn fork 後的子進程
+        monkeypatch.setattr('src.services.reply_worker.os.getpid', lambda: -1)
+        pool.submit('line', lambda: done.set())
+
+        assert done.wait(2)
+        assert pool._threads != first_threads
+        pool.shutdown(timeout=2)
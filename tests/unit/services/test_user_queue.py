@@ -0,0 +1,185 @@
+"""
+測試每位用戶訊息佇列的單元測試
+"""
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from src.platforms.base import PlatformMessage, PlatformResponse, PlatformUser, PlatformType
+from src.services.user_queue import UserMessageQueue
+
+
+def _message(content, user_id='U1', message_id=None, platform=PlatformType.LINE):
+    return PlatformMessage(
+        message_id=message_id or f'msg-{content}',
+        user=PlatformUser(user_id=user_id, platform=platform),
+        content=content,
+        reply_token=f'token-{content}'
+    )
+
+
+class TestUserMessageQueue:
+    """測試 UserMessageQueue 的序列化與合併行為"""
+
+    def test_single_message_processed_immediately(self):
+        queue = UserMessageQueue(debounce_window=0.5)
+        process = Mock(return_value=PlatformResponse(content='ok'))
+
+        start = time.monotonic()
+        response = queue.submit(_message('hello'), process)
+
+        assert response.content == 'ok'
+        assert time.monotonic() - start < 0.5
+        process.assert_called_once()
+        assert process.call_args[0][0].content == 'hello'
+
+    def test_messages_during_inflight_call_are_coalesced(self):
+        queue = UserMessageQueue(debounce_window=0.1)
+        first_started = threading.Event()
+        release_first = threading.Event()
+        calls = []
+
+        def process(message):
+            calls.append(message)
+            if len(calls) == 1:
+                first_started.set()
+                release_first.wait(2)
+            return PlatformResponse(content=f'reply:{message.content}')
+
+        results = {}
+
+        def run(content):
+            results[content] = queue.submit(_message(content), process)
+
+        first = threading.Thread(target=run, args=('a',))
+        first.start()
+        assert first_started.wait(2)
+
+        followers = []
+        for content in ('b', 'c'):
+            t = threading.Thread(target=run, args=(content,))
+            t.start()
+            followers.append(t)
+            time.sleep(0.02)
+
+        release_first.set()
+        for t in [first] + followers:
+            t.join(2)
+
+        # 第一則單獨處理，b 與 c 合併為一次呼叫
+        assert len(calls) == 2
+        assert calls[1].content == 'b\nc'
+        assert calls[1].reply_token == 'token-c'
+        assert calls[1].metadata['coalesced_message_ids'] == ['msg-b', 'msg-c']
+
+        assert results['a'].content == 'reply:a'
+        assert results['c'].content == 'reply:b\nc'
+        assert results['b'].metadata == {'coalesced': True, 'coalesced_into': 'msg-c'}
+
+        stats = queue.get_stats()
+        assert stats['messages'] == 3
+        assert stats['model_calls'] == 2
+        assert stats['coalesced_messages'] == 1
+        assert stats['active_users'] == 0
+
+    def test_different_users_are_not_serialized(self):
+        queue = UserMessageQueue(debounce_window=0.1)
+        barrier = threading.Barrier(2, timeout=2)
+
+        def process(message):
+            # 兩位用戶必須能同時進入處理函數
+            barrier.wait()
+            return PlatformResponse(content=message.user.user_id)
+
+        results = {}
+        threads = [
+            threading.Thread(target=lambda u=u: results.__setitem__(u, queue.submit(_message('hi', user_id=u), process)))
+            for u in ('U1', 'U2')
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(3)
+
+        assert results['U1'].content == 'U1'
+        assert results['U2'].content == 'U2'
+
+    def test_error_is_raised_to_target_caller_and_state_released(self):
+        queue = UserMessageQueue(debounce_window=0)
+
+        with pytest.raises(RuntimeError):
+            queue.submit(_message('boom'), Mock(side_effect=RuntimeError('model down')))
+
+        response = queue.submit(_message('again'), Mock(return_value=PlatformResponse(content='ok')))
+        assert response.content == 'ok'
+        assert queue.get_stats()['active_users'] == 0
+
+    def test_max_batch_size_limits_merge(self):
+        queue = UserMessageQueue(debounce_window=0.2, max_batch_size=2)
+        first_started = threading.Event()
+        release_first = threading.Event()
+        calls = []
+
+        def process(message):
+            calls.append(message.content)
+            if len(calls) == 1:
+                first_started.set()
+                release_first.wait(2)
+            return PlatformResponse(content='ok')
+
+        threads = [threading.Thread(target=queue.submit, args=(_message('a'), process))]
+        threads[0].start()
+        assert first_started.wait(2)
+        for content in ('b', 'c', 'd'):
+            t = threading.Thread(target=queue.submit, args=(_message(content), process))
+            t.start()
+            threads.append(t)
+            time.sleep(0.02)
+
+        release_first.set()
+        for t in threads:
+            t.join(3)
+
+        assert calls == ['a', 'b\nc', 'd']
+
+    def test_arrival_during_handoff_waits_behind_pending(self):
+        queue = UserMessageQueue(debounce_window=0, max_batch_size=1)
+        first_started = threading.Event()
+        release_first = threading.Event()
+        calls = []
+
+        def process(message):
+            calls.append(message.content)
+            if message.content == 'a':
+                first_started.set()
+                release_first.wait(2)
+            return PlatformResponse(content='ok')
+
+        # 第一批結束並喚醒等待者時，等待者尚未重新取得鎖；於此時送入新訊息
+        original_notify = queue._cond.notify_all
+        handoff = []
+
+        def notify_all():
+            original_notify()
+            if not handoff:
+                handoff.append(True)
+                queue.submit(_message('c'), process)
+
+        queue._cond.notify_all = notify_all
+
+        first = threading.Thread(target=queue.submit, args=(_message('a'), process))
+        first.start()
+        assert first_started.wait(2)
+        second = threading.Thread(target=queue.submit, args=(_message('b'), process))
+        second.start()
+        deadline = time.monotonic() + 2
+        while queue.get_stats()['pending_messages'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release_first.set()
+        first.join(5)
+        second.join(5)
+
+        assert calls == ['a', 'b', 'c']
+        assert queue.get_stats()['active_users'] == 0
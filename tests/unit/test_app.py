@@ -538,9 +538,82 @@ class TestMultiPlatformChatBotWebhook:
         
         with bot.app.test_request_context('/webhooks/line', method='POST', data='test_body', headers={'X-Line-Signature': 'test_signature'}):
             result = bot._handle_webhook('line')
-            
+
             assert result == 'OK'
 
+    def test_handle_webhook_queues_messages_when_worker_pool_enabled(self, chatbot_with_mocks):
+        """測試啟用背景工作池時訊息排入佇列並立即回應"""
+        bot = chatbot_with_mocks
+
+        from src.platforms.base import PlatformType, PlatformMessage, PlatformUser
+
+        mock_message = PlatformMessage(
+            message_id="msg_123",
+            user=PlatformUser(user_id="test_user", platform=PlatformType.LINE),
+            content="Hello"
+        )
+        bot.platform_manager.get_enabled_platforms.return_value = [PlatformType.LINE]
+        bot.platform_manager.handle_platform_webhook.return_value = [mock_message]
+        bot.reply_worker_pool = Mock()
+        bot.reply_worker_pool.submit.return_value = True
+
+        with bot.app.test_request_context('/webhooks/line', method='POST', data='test_body'):
+            result = bot._handle_webhook('line')
+
+        assert result == 'OK'
+        bot.reply_worker_pool.submit.assert_called_once_with(
+            'line', bot._process_message, PlatformType.LINE, mock_message
+        )
+        bot.chat_service.handle_message.assert_not_called()
+
+    def test_handle_webhook_falls_back_inline_when_queue_full(self, chatbot_with_mocks):
+        """測試佇列已滿時退回同步處理"""
+        bot = chatbot_with_mocks
+
+        from src.platforms.base import PlatformType, PlatformMessage, PlatformUser
+
+        mock_message = PlatformMessage(
+            message_id="msg_123",
+            user=PlatformUser(user_id="test_user", platform=PlatformType.LINE),
+            content="Hello"
+        )
+        mock_response = Mock()
+        bot.platform_manager.get_enabled_platforms.return_value = [PlatformType.LINE]
+        bot.platform_manager.handle_platform_webhook.return_value = [mock_message]
+        bot.chat_service.handle_message.return_value = mock_response
+        mock_handler = Mock()
+        bot.platform_manager.get_handler.return_value = mock_handler
+        bot.reply_worker_pool = Mock()
+        bot.reply_worker_pool.submit.return_value = False
+
+        with bot.app.test_request_context('/webhooks/line', method='POST', data='test_body'):
+            result = bot._handle_webhook('line')
+
+        assert result == 'OK'
+        bot.chat_service.handle_message.assert_called_once_with(mock_message)
+        mock_handler.send_response.assert_called_once_with(mock_response, mock_message)
+
+    def test_process_message_skips_reply_for_coalesced_response(self, chatbot_with_mocks):
+        """測試被合併的訊息不另外發送回應"""
+        bot = chatbot_with_mocks
+
+        from src.platforms.base import PlatformType, PlatformMessage, PlatformUser, PlatformResponse
+
+        mock_message = PlatformMessage(
+            message_id="msg_1",
+            user=PlatformUser(user_id="test_user", platform=PlatformType.LINE),
+            content="Hello"
+        )
+        bot.chat_service.handle_message.return_value = PlatformResponse(
+            content='', metadata={'coalesced': True, 'coalesced_into': 'msg_2'}
+        )
+        mock_handler = Mock()
+        bot.platform_manager.get_handler.return_value = mock_handler
+
+        bot._process_message(PlatformType.LINE, mock_message)
+
+        mock_handler.send_response.assert_not_called()
+
 
 class TestCreateAppFunction:
     """測試 create_app 工廠函數"""
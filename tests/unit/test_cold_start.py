@@ -0,0 +1,63 @@
+"""
+測試冷啟動延遲匯入的單元測試
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.models.base import ModelProvider
+from src.models.factory import load_model_class
+from src.platforms.base import BasePlatformHandler, PlatformType
+from src.platforms.factory import PlatformRegistry
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _loaded_modules(code: str) -> set:
+    """在乾淨的進程中執行程式碼，返回已載入的模組名稱"""
+    script = code + "\nimport sys, json\nprint(json.dumps(list(sys.modules)))"
+    env = dict(os.environ, LOG_FILE=os.environ.get('LOG_FILE', os.devnull))
+    result = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+class TestLazyImports:
+    """測試匯入工廠時不會載入未使用的模型提供商與平台處理器"""
+
+    def test_factories_do_not_import_unused_modules(self):
+        modules = _loaded_modules("import src.models.factory, src.platforms.factory, src.core.error_handler")
+
+        assert not {m for m in modules if m.startswith('src.models.') and m.endswith('_model')}
+        assert not {m for m in modules if m.startswith('src.platforms.') and m.endswith('_handler')}
+        assert 'linebot' not in modules
+
+    def test_only_requested_provider_is_loaded(self):
+        modules = _loaded_modules(
+            "from src.models.factory import load_model_class\n"
+            "from src.models.base import ModelProvider\n"
+            "load_model_class(ModelProvider.OLLAMA)"
+        )
+
+        assert 'src.models.ollama_model' in modules
+        assert 'src.models.openai_model' not in modules
+        assert 'src.models.gemini_model' not in modules
+
+
+class TestLazyRegistry:
+    """測試延遲註冊的平台處理器在取得時才載入"""
+
+    def test_handler_class_resolved_on_demand(self):
+        registry = PlatformRegistry()
+
+        assert isinstance(registry._handlers[PlatformType.TELEGRAM], str)
+        handler_class = registry.get_handler_class(PlatformType.TELEGRAM)
+
+        assert issubclass(handler_class, BasePlatformHandler)
+        assert registry._handlers[PlatformType.TELEGRAM] is handler_class
+
+    def test_load_model_class(self):
+        assert load_model_class(ModelProvider.OLLAMA).__name__ == 'OllamaModel'